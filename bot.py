@@ -1,14 +1,14 @@
 import json
 import logging
-import sqlite3
 import asyncio
 import config
 import sys
 import codecs
 import os
 import importlib
+import functools
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputFile
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, ContextTypes, filters, InlineQueryHandler
+from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, ContextTypes, filters, InlineQueryHandler, ChatMemberHandler, TypeHandler
 from telegram.error import NetworkError, Conflict, TimedOut, TelegramError
 from telegram.request import HTTPXRequest
 import time
@@ -18,6 +18,8 @@ from src.handlers.start_handler import start
 from src.handlers.callback_handler import menu_callback
 from src.handlers.message_handler import handle_message
 from src.handlers.inline_handler import handle_inline_query
+from src.handlers.admin_handlers import handle_channel_member_update
+from src.handlers.request_context import load_request_context
 
 # وارد کردن ماژول راهنما
 from src.services import help
@@ -54,59 +56,19 @@ else:
     )
     logger = logging.getLogger(__name__)
 
-# اتصال به دیتابیس
-conn = sqlite3.connect(config.DB_PATH)
-conn.row_factory = sqlite3.Row
-c = conn.cursor()
-
-# تابع کمکی برای دریافت اتصال به دیتابیس
-def get_db_connection():
-    """ایجاد و برگرداندن اتصال به دیتابیس"""
-    conn = sqlite3.connect(config.DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-# تابع برای اجرای کوئری با connection جدید (برای جلوگیری از مشکل با اتصال اصلی)
-def execute_db_query(query, params=None, fetchone=False, commit=False):
-    """اجرای کوئری SQL با یک اتصال جدید
-    
-    Args:
-        query (str): کوئری SQL
-        params (tuple, optional): پارامترهای کوئری
-        fetchone (bool, optional): آیا فقط یک نتیجه برگرداند
-        commit (bool, optional): آیا تغییرات را کامیت کند
-    
-    Returns:
-        list or dict: نتیجه کوئری
-    """
-    conn = None
-    try:
-        conn = get_db_connection()
-        c = conn.cursor()
-        
-        if params:
-            c.execute(query, params)
-        else:
-            c.execute(query)
-            
-        if commit:
-            conn.commit()
-            return True
-            
-        if fetchone:
-            return c.fetchone()
-        else:
-            return c.fetchall()
-            
-    except Exception as e:
-        logger.error(f"خطا در اجرای کوئری: {e}")
-        return None
-    finally:
-        if conn:
-            conn.close()
+# توابع دیتابیس از ماژول مشترک (اتصال‌ها از استخر اتصال گرفته می‌شوند)
+from src.database.connection_pool import close_all_pools
+from src.database.migrator import ensure_schema
+from src.database import async_db
+from src.services import ai_jobs
+from src.services import ai_precompute
+from src.handlers.ai_callbacks import deliver_ai_job
 
 async def main():
     """تابع اصلی ربات"""
+    # اجرای مایگریشن‌های دیتابیس (در صورت به‌روز بودن فقط یک کوئری نسخه)
+    ensure_schema()
+    
     # تنظیم پارامترهای اتصال و زمان انتظار
     request_kwargs = {
         'http_version': '1.1',
@@ -125,6 +87,9 @@ async def main():
     # افزودن مدیریت خطا
     app.add_error_handler(error_handler)
     
+    # بارگذاری اطلاعات هویتی کاربر پیش از همه هندلرها (گروه -1)
+    app.add_handler(TypeHandler(Update, load_request_context), group=-1)
+    
     # افزودن هندلرها با هندلرهای مدولار جدید
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CallbackQueryHandler(menu_callback))
@@ -132,6 +97,9 @@ async def main():
     
     # اضافه کردن هندلر برای inline query
     app.add_handler(InlineQueryHandler(handle_inline_query))
+    
+    # به‌روزرسانی کش عضویت کانال با رویدادهای عضویت/خروج (در صورت ادمین بودن ربات در کانال)
+    app.add_handler(ChatMemberHandler(handle_channel_member_update, ChatMemberHandler.CHAT_MEMBER))
       # اجرای ربات
     print("Bot started successfully...")
     logger.info("ربات با موفقیت راه‌اندازی شد")
@@ -151,6 +119,12 @@ async def main():
     # راه‌اندازی وظیفه keep-alive
     asyncio.create_task(keep_alive(app.bot))
     
+    # راه‌اندازی کارگرهای صف هوش مصنوعی (نتیجه هر کار در پیام منتظر آن ویرایش می‌شود)
+    await ai_jobs.start(functools.partial(deliver_ai_job, app.bot))
+    
+    # پیش‌محاسبه پروفایل و زاویه دید کاربران در مرز فصل‌ها
+    await ai_precompute.start()
+    
     try:
         # حلقه بی‌نهایت برای نگه داشتن برنامه در حال اجرا
         logger.info("ربات در حال کار است")
@@ -163,9 +137,15 @@ async def main():
     finally:
         # بستن ربات
         logger.info("در حال بستن ربات...")
+        await ai_precompute.stop()
+        await ai_jobs.stop()
         await app.updater.stop()
         await app.stop()
         await app.shutdown()
+        if AI_MODULE_AVAILABLE:
+            await ai.close_clients()
+        async_db.shutdown()
+        close_all_pools()
         logger.info("ربات با موفقیت بسته شد")
 
 async def keep_alive(bot):
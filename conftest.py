@@ -0,0 +1,54 @@
+"""
+تنظیمات مشترک pytest: هر تست دیتابیس موقت خودش را دارد
+
+فایل‌های تست مسیر دیتابیس را هنگام import تنظیم می‌کنند (برای اجرای مستقیم هر فایل)؛
+در یک اجرای pytest همه ماژول‌ها پیش از اولین تست import می‌شوند و بدون این fixture
+همه تست‌ها روی آخرین مسیر تنظیم شده اجرا می‌شدند. کش‌های حافظه هم بین تست‌ها خالی
+می‌شوند تا داده دیتابیس تست قبلی دیده نشود.
+"""
+import sys
+
+import pytest
+
+import config
+
+
+def _drain_writes():
+    """انتظار برای commit نوشتن‌های در صف پیش از تعویض دیتابیس"""
+    write_queue = sys.modules.get("src.database.write_queue")
+    if write_queue is not None:
+        try:
+            write_queue.run(lambda conn: None)
+        except Exception:
+            pass
+
+
+def _reset_caches():
+    season_functions = sys.modules.get("src.database.season_functions")
+    if season_functions is not None:
+        season_functions.invalidate_season_cache()
+    for name in ("settings", "permissions", "membership", "user_search", "rank_service"):
+        service = sys.modules.get(f"src.services.{name}")
+        if service is not None:
+            service.invalidate()
+    ai_cache = sys.modules.get("src.services.ai_cache")
+    if ai_cache is not None:
+        # invalidate جدول را هم پاک می‌کند؛ اینجا فقط کش حافظه لازم است
+        with ai_cache._lock:
+            ai_cache._entries.clear()
+    ai = sys.modules.get("src.services.ai")
+    if ai is not None:
+        ai.reset_breakers()
+
+
+@pytest.fixture(autouse=True)
+def isolated_db(tmp_path, monkeypatch):
+    """دیتابیس موقت جداگانه برای هر تست و بستن اتصال‌های آن پس از تست"""
+    _drain_writes()
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "kudos_test.db"))
+    _reset_caches()
+    yield
+    _drain_writes()
+    from src.database.connection_pool import close_all_pools
+    close_all_pools()
+    _reset_caches()
@@ -0,0 +1,86 @@
+"""
+بنچمارک کوچک برای مقایسه تأخیر هر کوئری:
+اتصال جدید برای هر کوئری (روش قبلی) در برابر استخر اتصال
+
+اجرا:
+    python scripts/benchmark_db_pool.py [تعداد_کوئری]
+"""
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.database.connection_pool import ConnectionPool
+
+QUERY = "SELECT name, balance FROM users WHERE user_id = ?"
+
+
+def _prepare_db(path, users=500):
+    """ساخت دیتابیس موقت با جدول کاربران"""
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (user_id INTEGER PRIMARY KEY, name TEXT, balance INTEGER)")
+    conn.executemany(
+        "INSERT INTO users (user_id, name, balance) VALUES (?, ?, ?)",
+        [(i, f"کاربر {i}", 10) for i in range(1, users + 1)]
+    )
+    conn.commit()
+    conn.close()
+
+
+def _bench_connect_per_query(path, n):
+    """روش قبلی: باز و بسته کردن اتصال برای هر کوئری"""
+    timings = []
+    for i in range(n):
+        start = time.perf_counter()
+        conn = sqlite3.connect(path)
+        conn.row_factory = sqlite3.Row
+        conn.execute(QUERY, (i % 500 + 1,)).fetchone()
+        conn.close()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _bench_pool(path, n):
+    """روش جدید: دریافت اتصال از استخر و برگرداندن آن"""
+    pool = ConnectionPool(path)
+    timings = []
+    for i in range(n):
+        start = time.perf_counter()
+        conn = pool.acquire()
+        conn.execute(QUERY, (i % 500 + 1,)).fetchone()
+        conn.close()
+        timings.append(time.perf_counter() - start)
+    stats = pool.get_stats()
+    pool.close_all()
+    return timings, stats
+
+
+def _report(title, timings):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{title}: میانگین {statistics.mean(timings) * 1e6:.1f}µs | "
+          f"میانه {statistics.median(timings) * 1e6:.1f}µs | p95 {p95 * 1e6:.1f}µs")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        _prepare_db(path)
+
+        before = _bench_connect_per_query(path, n)
+        after, stats = _bench_pool(path, n)
+
+        print(f"تعداد کوئری: {n}")
+        _report("قبل (اتصال جدید برای هر کوئری)", before)
+        _report("بعد (استخر اتصال)", after)
+        print(f"بهبود میانگین: {statistics.mean(before) / statistics.mean(after):.1f} برابر")
+        print(f"آمار استخر: {stats}")
+
+
+if __name__ == "__main__":
+    main()
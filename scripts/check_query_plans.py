@@ -0,0 +1,56 @@
+"""
+بررسی طرح اجرای (EXPLAIN QUERY PLAN) کوئری‌های پرتکرار ربات
+هر کوئری که کل یک جدول را اسکن کند با علامت ❌ مشخص می‌شود.
+
+اجرا:
+    python scripts/check_query_plans.py [--apply] [مسیر_دیتابیس]
+
+    --apply  پیش از بررسی، WAL و ایندکس‌ها را روی دیتابیس اعمال می‌کند
+"""
+import os
+import sys
+import sqlite3
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from src.database.indexes import apply_performance_tuning, explain_hot_queries
+
+
+def main():
+    args = sys.argv[1:]
+    apply = "--apply" in args
+    args = [a for a in args if a != "--apply"]
+    db_path = args[0] if args else config.DB_PATH
+
+    if not os.path.exists(db_path):
+        print(f"دیتابیس {db_path} پیدا نشد")
+        return 1
+
+    conn = sqlite3.connect(db_path)
+    try:
+        if apply:
+            indexes = apply_performance_tuning(conn)
+            print(f"تنظیمات کارایی اعمال شد ({len(indexes)} ایندکس)\n")
+
+        journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        print(f"journal_mode: {journal_mode}\n")
+
+        scans = 0
+        for title, plan, full_scan in explain_hot_queries(conn):
+            scans += int(full_scan)
+            print(f"{'❌' if full_scan else '✅'} {title}")
+            for step in plan:
+                print(f"    {step}")
+        print()
+        if scans:
+            print(f"{scans} کوئری پرتکرار کل جدول را اسکن می‌کند")
+            return 1
+        print("هیچ کوئری پرتکراری اسکن کامل جدول ندارد")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
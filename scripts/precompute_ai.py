@@ -0,0 +1,63 @@
+"""
+پیش‌محاسبه دستی پروفایل هوشمند و زاویه دید کاربران فعال یک فصل
+(توضیحات در src/services/ai_precompute.py). اجرای دوباره با همان کلید از نقطه
+بازیابی ادامه پیدا می‌کند؛ ربات می‌تواند همزمان در حال اجرا باشد.
+
+اجرا:
+    python scripts/precompute_ai.py [--season ID] [--key KEY] [--concurrency N] [--rps R] [--budget TOKENS]
+
+    --season       شناسه فصل (پیش‌فرض: فصل فعال)
+    --key          کلید اجرا برای ادامه یک اجرای قبلی (پیش‌فرض: «فصل:تاریخ امروز»)
+    --concurrency  تعداد کاربران همزمان
+    --rps          حداکثر شروع درخواست در ثانیه (0: بدون محدودیت)
+    --budget       سقف توکن تخمینی این اجرا (0: بدون محدودیت)
+"""
+import os
+import sys
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.database.migrator import ensure_schema
+from src.database import async_db
+from src.database.connection_pool import close_all_pools
+from src.database.season_functions import get_active_season
+from src.services import ai_precompute
+
+
+def main():
+    parser = argparse.ArgumentParser(description="پیش‌محاسبه پروفایل و زاویه دید کاربران")
+    parser.add_argument("--season", type=int)
+    parser.add_argument("--key")
+    parser.add_argument("--concurrency", type=int, default=ai_precompute.AI_PRECOMPUTE_CONCURRENCY)
+    parser.add_argument("--rps", type=float, default=ai_precompute.AI_PRECOMPUTE_RPS)
+    parser.add_argument("--budget", type=int, default=ai_precompute.AI_PRECOMPUTE_TOKEN_BUDGET)
+    args = parser.parse_args()
+
+    ensure_schema()
+    season_id = args.season
+    if season_id is None:
+        season = get_active_season()
+        if not season:
+            print("فصل فعالی وجود ندارد؛ شناسه فصل را با --season مشخص کنید")
+            return 1
+        season_id = season["id"]
+
+    try:
+        result = asyncio.run(ai_precompute.run(
+            season_id, args.key, concurrency=args.concurrency, rps=args.rps, token_budget=args.budget
+        ))
+    finally:
+        async_db.shutdown()
+        close_all_pools()
+
+    print(
+        f"اجرای {result.run_key}: {result.status} - {result.processed} کاربر، "
+        f"{result.failed} خطا، حدود {result.tokens} توکن (آخرین کاربر {result.last_user_id})"
+    )
+    return 0 if result.status == ai_precompute.RUN_DONE else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""
+ساخت دوباره جدول تجمیعی season_totals از روی کل جدول transactions
+در حالت عادی تریگرها جدول را به‌روز نگه می‌دارند. این اسکریپت برای پر کردن دوباره
+جدول (مثلاً پس از ویرایش دستی دیتابیس با تریگرهای غیرفعال) یا بررسی صحت آن است.
+
+اجرا:
+    python scripts/rebuild_season_totals.py [--check] [مسیر_دیتابیس]
+
+    --check  فقط مقایسه جدول فعلی با مقادیر محاسبه شده، بدون تغییر
+"""
+import os
+import sys
+import sqlite3
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from src.database.season_totals import rebuild_season_totals
+
+_COLUMNS = "season_id, user_id, received, given, received_count, given_count"
+
+
+def _snapshot(conn):
+    return set(conn.execute(f"SELECT {_COLUMNS} FROM season_totals").fetchall())
+
+
+def main():
+    args = sys.argv[1:]
+    check = "--check" in args
+    args = [a for a in args if a != "--check"]
+    db_path = args[0] if args else config.DB_PATH
+
+    if not os.path.exists(db_path):
+        print(f"دیتابیس {db_path} پیدا نشد")
+        return 1
+
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        # قفل نوشتن در طول ساخت دوباره تا تراکنش جدیدی از قلم نیفتد
+        conn.execute("BEGIN IMMEDIATE")
+        before = _snapshot(conn)
+        rows = rebuild_season_totals(conn)
+        after = _snapshot(conn)
+        if check:
+            conn.execute("ROLLBACK")
+        else:
+            conn.execute("COMMIT")
+    except sqlite3.Error as e:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        print(f"خطا در ساخت جدول season_totals: {e}")
+        return 1
+    finally:
+        conn.close()
+
+    mismatches = len(before ^ after)
+    if check:
+        print(f"{rows} سطر محاسبه شد؛ {mismatches} سطر با جدول فعلی متفاوت است")
+        return 1 if mismatches else 0
+    print(f"جدول season_totals با {rows} سطر ساخته شد ({mismatches} سطر اصلاح شد)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
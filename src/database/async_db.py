@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+لایه دسترسی ناهمگام (async) به دیتابیس
+هندلرهای تلگرام روی یک حلقه asyncio اجرا می‌شوند؛ اجرای مستقیم sqlite3 در آن‌ها
+همه به‌روزرسانی‌های دیگر را پشت I/O دیسک متوقف می‌کند. این ماژول کارهای دیتابیس را
+به تردهای جداگانه می‌فرستد: یک ترد نویسنده برای توابعی که خودشان commit می‌کنند،
+صف نوشتن با commit گروهی (write_queue) برای دستورهای نوشتن تکی و مجموعه‌ای از
+تردهای خواننده برای کوئری‌های فقط خواندنی.
+"""
+
+import asyncio
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from . import db_utils
+from . import season_functions
+from . import write_queue
+
+logger = logging.getLogger(__name__)
+
+# تعداد تردهای خواننده
+READER_THREADS = 4
+
+_executors_lock = threading.Lock()
+_writer = None
+_readers = None
+
+
+def _get_writer():
+    """اجراکننده تک‌ترده برای نوشتن در دیتابیس"""
+    global _writer
+    if _writer is None:
+        with _executors_lock:
+            if _writer is None:
+                _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+    return _writer
+
+
+def _get_readers():
+    """اجراکننده چندترده برای خواندن از دیتابیس"""
+    global _readers
+    if _readers is None:
+        with _executors_lock:
+            if _readers is None:
+                _readers = ThreadPoolExecutor(max_workers=READER_THREADS, thread_name_prefix="db-reader")
+    return _readers
+
+
+async def run_read(func, *args, **kwargs):
+    """اجرای یک تابع همگام فقط‌خواندنی دیتابیس در تردهای خواننده
+
+    Args:
+        func (callable): تابع همگام
+        *args, **kwargs: آرگومان‌های تابع
+
+    Returns:
+        خروجی تابع
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_readers(), functools.partial(func, *args, **kwargs))
+
+
+async def run_write(func, *args, **kwargs):
+    """اجرای یک تابع همگام که در دیتابیس می‌نویسد در ترد نویسنده
+
+    Args:
+        func (callable): تابع همگام
+        *args, **kwargs: آرگومان‌های تابع
+
+    Returns:
+        خروجی تابع
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_writer(), functools.partial(func, *args, **kwargs))
+
+
+async def execute_query(query, params=None, fetchone=False, commit=False):
+    """نسخه awaitable از execute_db_query
+
+    کوئری‌های دارای commit در صف نوشتن (commit گروهی) و بقیه در تردهای خواننده اجرا می‌شوند.
+
+    Args:
+        query (str): کوئری SQL
+        params (tuple, optional): پارامترهای کوئری
+        fetchone (bool, optional): آیا فقط یک نتیجه برگرداند
+        commit (bool, optional): آیا تغییرات را کامیت کند
+
+    Returns:
+        list or dict: نتیجه کوئری
+    """
+    if commit:
+        return await write_queue.execute_async(query, params)
+    return await run_read(db_utils.execute_db_query, query, params, fetchone, commit)
+
+
+async def get_user_profile(user_id):
+    """نسخه awaitable از get_user_profile"""
+    return await run_read(db_utils.get_user_profile, user_id)
+
+
+async def get_active_season():
+    """نسخه awaitable از get_active_season (None در صورت نبود فصل فعال)
+
+    در صورت وجود مقدار در کش فصل، بدون رفتن به ترد خواننده برمی‌گردد.
+    """
+    found, season = season_functions.cached_active_season()
+    if found:
+        return season
+    return await run_read(season_functions.get_active_season)
+
+
+def shutdown(wait=True):
+    """توقف تردهای دیتابیس (هنگام خاموش شدن ربات)"""
+    global _writer, _readers
+    # عملیات صف شده پیش از بستن اتصال‌ها commit می‌شوند
+    write_queue.shutdown(wait=wait)
+    with _executors_lock:
+        writer, readers = _writer, _readers
+        _writer = _readers = None
+    for executor in (writer, readers):
+        if executor is not None:
+            executor.shutdown(wait=wait)
+    logger.info("تردهای دیتابیس متوقف شدند")
@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+"""
+ماژول استخر اتصال (Connection Pool) دیتابیس
+به جای باز و بسته کردن اتصال SQLite برای هر کوئری، اتصال‌ها به ازای هر ترد
+نگه داشته می‌شوند و دوباره استفاده می‌شوند. هر اتصال کش دستورات آماده
+(prepared statements) خودش را دارد و پیش از استفاده مجدد سلامت آن بررسی می‌شود.
+"""
+
+import sqlite3
+import threading
+import logging
+import time
+import sys
+import os
+import weakref
+
+# اضافه کردن مسیر پوشه اصلی برای دسترسی به config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+import config
+
+from .indexes import apply_connection_pragmas
+
+logger = logging.getLogger(__name__)
+
+# تعداد دستورات آماده‌ای که هر اتصال در کش نگه می‌دارد
+DEFAULT_CACHED_STATEMENTS = 256
+# حداکثر اتصال بیکار نگه داشته شده در هر ترد
+DEFAULT_MAX_IDLE_PER_THREAD = 4
+# اگر اتصال بیش از این مدت (ثانیه) بیکار بوده، پیش از تحویل بررسی سلامت می‌شود
+DEFAULT_HEALTH_CHECK_INTERVAL = 30.0
+# زمان انتظار برای قفل دیتابیس (ثانیه)
+DEFAULT_TIMEOUT = 10.0
+
+
+class PooledConnection(sqlite3.Connection):
+    """اتصال SQLite که با فراخوانی close به استخر برمی‌گردد و واقعاً بسته نمی‌شود
+
+    کدهای موجود الگوی ``conn = get_db_connection() ... conn.close()`` را دارند؛
+    با این کلاس همان الگو بدون تغییر، اتصال را به استخر بازمی‌گرداند.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pool = None
+        self._last_used = time.monotonic()
+        self._checked_out = False
+
+    def close(self):
+        """بازگرداندن اتصال به استخر (در صورت نبود استخر، بستن واقعی)"""
+        if self._pool is not None:
+            self._pool.release(self)
+        else:
+            self.close_physical()
+
+    def close_physical(self):
+        """بستن واقعی اتصال"""
+        sqlite3.Connection.close(self)
+
+
+class ConnectionPool:
+    """استخر اتصال‌های SQLite با اتصال‌های جدا برای هر ترد
+
+    Args:
+        db_path (str): مسیر فایل دیتابیس
+        cached_statements (int): اندازه کش دستورات آماده هر اتصال
+        max_idle_per_thread (int): حداکثر اتصال بیکار در هر ترد
+        health_check_interval (float): فاصله زمانی بررسی سلامت اتصال بیکار
+        timeout (float): زمان انتظار برای قفل دیتابیس
+    """
+
+    def __init__(self, db_path, cached_statements=DEFAULT_CACHED_STATEMENTS,
+                 max_idle_per_thread=DEFAULT_MAX_IDLE_PER_THREAD,
+                 health_check_interval=DEFAULT_HEALTH_CHECK_INTERVAL,
+                 timeout=DEFAULT_TIMEOUT):
+        self.db_path = db_path
+        self.cached_statements = cached_statements
+        self.max_idle_per_thread = max_idle_per_thread
+        self.health_check_interval = health_check_interval
+        self.timeout = timeout
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # WeakSet: اتصالی که هیچ‌وقت برنگردد با جمع‌آوری زباله بسته می‌شود
+        self._all_connections = weakref.WeakSet()
+        self._closed = False
+        self._stats = {
+            "created": 0,
+            "reused": 0,
+            "released": 0,
+            "discarded": 0,
+            "health_checks": 0,
+            "health_check_failures": 0,
+        }
+
+    def _idle(self):
+        """لیست اتصال‌های بیکار ترد جاری"""
+        idle = getattr(self._local, "idle", None)
+        if idle is None:
+            idle = []
+            self._local.idle = idle
+        return idle
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _create_connection(self):
+        """ایجاد یک اتصال فیزیکی جدید"""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,
+            factory=PooledConnection,
+            cached_statements=self.cached_statements,
+            # هر اتصال فقط در ترد خودش استفاده می‌شود؛ این گزینه فقط برای
+            # بستن همه اتصال‌ها هنگام خاموش شدن از ترد اصلی لازم است
+            check_same_thread=False,
+        )
+        conn._pool = self
+        # synchronous، mmap_size و temp_store برای هر اتصال جداگانه تنظیم می‌شوند
+        apply_connection_pragmas(conn)
+        with self._lock:
+            self._all_connections.add(conn)
+            self._stats["created"] += 1
+        return conn
+
+    def _discard(self, conn):
+        """حذف و بستن واقعی یک اتصال"""
+        with self._lock:
+            self._all_connections.discard(conn)
+            self._stats["discarded"] += 1
+        try:
+            conn.close_physical()
+        except sqlite3.Error as e:
+            logger.warning(f"خطا در بستن اتصال دیتابیس: {e}")
+
+    def _is_healthy(self, conn):
+        """بررسی سلامت اتصال با یک کوئری ساده"""
+        self._count("health_checks")
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error as e:
+            logger.warning(f"اتصال دیتابیس سالم نیست و جایگزین می‌شود: {e}")
+            self._count("health_check_failures")
+            return False
+
+    def acquire(self, row_factory=sqlite3.Row):
+        """دریافت یک اتصال از استخر ترد جاری
+
+        Args:
+            row_factory: row_factory اتصال (پیش‌فرض sqlite3.Row، None برای tuple)
+
+        Returns:
+            PooledConnection: اتصال آماده استفاده
+        """
+        if self._closed:
+            raise sqlite3.ProgrammingError("استخر اتصال بسته شده است")
+
+        idle = self._idle()
+        conn = None
+        while idle:
+            candidate = idle.pop()
+            if time.monotonic() - candidate._last_used > self.health_check_interval:
+                if not self._is_healthy(candidate):
+                    self._discard(candidate)
+                    continue
+            conn = candidate
+            self._count("reused")
+            break
+
+        if conn is None:
+            conn = self._create_connection()
+
+        conn.row_factory = row_factory
+        conn._checked_out = True
+        return conn
+
+    def release(self, conn):
+        """بازگرداندن اتصال به استخر ترد جاری
+
+        تراکنش باز (کامیت نشده) مثل بستن اتصال معمولی rollback می‌شود.
+        """
+        if not conn._checked_out:
+            return
+        conn._checked_out = False
+
+        if self._closed:
+            self._discard(conn)
+            return
+
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error as e:
+            logger.warning(f"خطا در rollback اتصال برگشتی: {e}")
+            self._discard(conn)
+            return
+
+        conn.row_factory = sqlite3.Row
+        conn._last_used = time.monotonic()
+        idle = self._idle()
+        if len(idle) < self.max_idle_per_thread:
+            idle.append(conn)
+            self._count("released")
+        else:
+            self._discard(conn)
+
+    def connection(self, row_factory=sqlite3.Row):
+        """context manager برای استفاده کوتاه از یک اتصال
+
+        مثال:
+            with pool.connection() as conn:
+                conn.execute(...)
+        """
+        return _PooledConnectionContext(self, row_factory)
+
+    def get_stats(self):
+        """آمار استفاده از استخر"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["open_connections"] = len(self._all_connections)
+        return stats
+
+    def close_all(self):
+        """بستن همه اتصال‌های استخر (هنگام خاموش شدن ربات)"""
+        with self._lock:
+            self._closed = True
+            connections = list(self._all_connections)
+            self._all_connections.clear()
+        for conn in connections:
+            try:
+                conn.close_physical()
+            except sqlite3.Error as e:
+                logger.warning(f"خطا در بستن اتصال دیتابیس: {e}")
+        logger.info(f"استخر اتصال {self.db_path} بسته شد ({len(connections)} اتصال)")
+
+
+class _PooledConnectionContext:
+    """context manager که اتصال را پس از پایان بلوک به استخر برمی‌گرداند"""
+
+    def __init__(self, pool, row_factory):
+        self._pool = pool
+        self._row_factory = row_factory
+        self._conn = None
+
+    def __enter__(self):
+        self._conn = self._pool.acquire(self._row_factory)
+        return self._conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self._pool.release(self._conn)
+        self._conn = None
+        return False
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path=None):
+    """دریافت استخر اتصال مربوط به یک مسیر دیتابیس
+
+    Args:
+        db_path (str, optional): مسیر دیتابیس (پیش‌فرض config.DB_PATH در لحظه فراخوانی)
+
+    Returns:
+        ConnectionPool: استخر اتصال
+    """
+    path = db_path or config.DB_PATH
+    pool = _pools.get(path)
+    if pool is None or pool._closed:
+        with _pools_lock:
+            pool = _pools.get(path)
+            if pool is None or pool._closed:
+                pool = ConnectionPool(path)
+                _pools[path] = pool
+    return pool
+
+
+def get_connection(db_path=None, row_factory=sqlite3.Row):
+    """دریافت یک اتصال از استخر؛ با conn.close() به استخر برمی‌گردد"""
+    return get_pool(db_path).acquire(row_factory)
+
+
+def close_all_pools():
+    """بستن همه استخرهای اتصال"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close_all()
@@ -4,22 +4,27 @@
 این ماژول شامل توابعی برای مدیریت اتصال به دیتابیس و عملیات پایه روی آن است
 """
 
-import sqlite3
 import logging
 import config
 import traceback
+from .connection_pool import get_connection
+from . import season_functions
+from . import season_totals
+from . import write_queue
+from .transfer_functions import transfer_kudos, TRANSFER_OK
 
 # تنظیم لاگر
 logger = logging.getLogger(__name__)
 
 def get_db_connection():
-    """ایجاد و برگرداندن اتصال به دیتابیس"""
-    conn = sqlite3.connect(config.DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """دریافت اتصال به دیتابیس از استخر اتصال
+
+    اتصال با conn.close() به استخر برمی‌گردد و واقعاً بسته نمی‌شود.
+    """
+    return get_connection()
 
 def execute_db_query(query, params=None, fetchone=False, commit=False):
-    """اجرای کوئری SQL با یک اتصال جدید
+    """اجرای کوئری SQL با یک اتصال از استخر
     
     Args:
         query (str): کوئری SQL
@@ -68,11 +73,14 @@ def is_user_approved(user_id):
 
 def add_user(user):
     """اضافه کردن کاربر جدید به سیستم"""
-    return execute_db_query(
+    # import داخل تابع: سرویس user_search خودش از db_utils استفاده می‌کند
+    from ..services import user_search
+    result = write_queue.execute(
         "INSERT INTO users (user_id, username, name, balance, is_approved) VALUES (?, ?, ?, 10, 1)", 
-        (user.id, user.username, user.full_name), 
-        commit=True
+        (user.id, user.username, user.full_name)
     )
+    user_search.invalidate()
+    return result
 
 def get_user_by_id(user_id):
     """دریافت اطلاعات کاربر بر اساس شناسه"""
@@ -86,16 +94,12 @@ def get_all_users(exclude_id=None):
         return execute_db_query("SELECT user_id, name FROM users")
 
 def get_active_season():
-    """دریافت فصل فعال"""
-    try:
-        result = execute_db_query("SELECT id, name, balance FROM season WHERE is_active=1 LIMIT 1", fetchone=True)
-        if result:
-            return result
-        logger.warning("هیچ فصل فعالی یافت نشد - استفاده از مقادیر پیش‌فرض")
-        return (config.SEASON_ID, config.SEASON_NAME, 10)  # مقادیر پیش‌فرض
-    except Exception as e:
-        logger.warning(f"مشکل در دسترسی به جدول season: {e} - استفاده از مقادیر پیش‌فرض")
-        return (config.SEASON_ID, config.SEASON_NAME, 10)  # مقادیر پیش‌فرض
+    """دریافت فصل فعال (از کش فصل در season_functions)"""
+    result = season_functions.get_active_season()
+    if result:
+        return result
+    logger.warning("هیچ فصل فعالی یافت نشد - استفاده از مقادیر پیش‌فرض")
+    return (config.SEASON_ID, config.SEASON_NAME, 10)  # مقادیر پیش‌فرض
 
 def get_all_seasons():
     """دریافت همه فصل‌ها"""
@@ -132,55 +136,21 @@ def get_user_transactions(user_id, given=True, offset=0, limit=3, season_id=None
     return execute_db_query(query, params)
 
 def count_user_transactions(user_id, given=True, season_id=None):
-    """شمارش تراکنش‌های کاربر با امکان فیلتر بر اساس فصل"""
-    season_filter = ""
-    params = []
-    
-    if season_id is not None:
-        season_filter = " AND season_id=?"
-        params = [season_id]
-        
-    if given:
-        params = [user_id] + params
-        query = f"SELECT COUNT(*) FROM transactions WHERE user_id=?{season_filter}"
-    else:
-        params = [user_id] + params
-        query = f"SELECT COUNT(*) FROM transactions WHERE touser=?{season_filter}"
-    
-    result = execute_db_query(query, params, fetchone=True)
-    return result[0] if result else 0
+    """شمارش تراکنش‌های کاربر با امکان فیلتر بر اساس فصل (از شمارنده‌های season_totals)"""
+    return season_totals.get_user_transaction_count(user_id, given, season_id)
 
 def get_scoreboard(season_id=None):
-    """دریافت تابلوی امتیازات با امکان فیلتر بر اساس فصل"""
-    if season_id is not None:
-        return execute_db_query("""
-            SELECT touser, SUM(amount) as total, u.name 
-            FROM transactions t 
-            LEFT JOIN users u ON t.touser = u.user_id 
-            WHERE t.season_id=?
-            GROUP BY touser 
-            ORDER BY total DESC LIMIT 10
-        """, (season_id,))
-    else:
-        return execute_db_query("""
-            SELECT touser, SUM(amount) as total, u.name 
-            FROM transactions t 
-            LEFT JOIN users u ON t.touser = u.user_id 
-            GROUP BY touser 
-            ORDER BY total DESC LIMIT 10
-        """)
+    """دریافت تابلوی امتیازات با امکان فیلتر بر اساس فصل (از جدول تجمیعی season_totals)"""
+    return season_totals.get_season_leaderboard(season_id)
 
 def add_transaction(user_id, touser_id, amount, season_id, reason, message_id=None):
-    """اضافه کردن یک تراکنش جدید"""
-    # کم کردن از موجودی کاربر فرستنده
-    execute_db_query("UPDATE users SET balance = balance - ? WHERE user_id = ?", 
-                    (amount, user_id), commit=True)
-    
-    # اضافه کردن تراکنش
-    return execute_db_query("""
-        INSERT INTO transactions (user_id, touser, amount, season_id, reason, message_id)
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, (user_id, touser_id, amount, season_id, reason, message_id), commit=True)
+    """اضافه کردن یک تراکنش جدید (کسر اعتبار و درج تراکنش به صورت اتمیک)
+
+    Returns:
+        bool: True اگر تراکنش ثبت شد؛ False در صورت کافی نبودن اعتبار یا خطا
+    """
+    result = transfer_kudos(user_id, touser_id, amount, season_id, reason, message_id)
+    return result.status == TRANSFER_OK
 
 # توابع مدیریت ترین‌ها
 def get_all_top_questions():
@@ -268,21 +238,11 @@ def add_season(name, balance, description=''):
 
 def update_season(season_id, name=None, balance=None, description=None):
     """بروزرسانی فصل"""
-    if name is not None:
-        execute_db_query("UPDATE season SET name=? WHERE id=?", (name, season_id), commit=True)
-    if balance is not None:
-        execute_db_query("UPDATE season SET balance=? WHERE id=?", (balance, season_id), commit=True)
-    if description is not None:
-        execute_db_query("UPDATE season SET description=? WHERE id=?", (description, season_id), commit=True)
-    return True
+    return season_functions.update_season(season_id, name, balance, description)
 
 def end_season(season_id):
     """پایان فصل"""
-    try:
-        return execute_db_query("UPDATE season SET is_active=0 WHERE id=?", (season_id,), commit=True)
-    except Exception as e:
-        logger.error(f"خطا در پایان دادن به فصل: {e}")
-        return False
+    return season_functions.end_season(season_id)
 
 def delete_season(season_id):
     """حذف فصل"""
@@ -295,27 +255,14 @@ def delete_season(season_id):
 
 def activate_season(season_id):
     """فعال‌سازی فصل"""
-    try:
-        # غیرفعال کردن همه فصل‌های فعال قبلی
-        execute_db_query("UPDATE season SET is_active=0 WHERE is_active=1", commit=True)
-        
-        # فعال کردن فصل مورد نظر
-        execute_db_query("UPDATE season SET is_active=1 WHERE id=?", (season_id,), commit=True)
-        
-        # دریافت اعتبار فصل
-        balance_result = execute_db_query("SELECT balance FROM season WHERE id=?", (season_id,), fetchone=True)
-        balance = balance_result[0] if balance_result else 10
-        
-        # اعطای اعتبار به همه کاربران
-        execute_db_query("UPDATE users SET balance=?", (balance,), commit=True)
-        
-        return balance
-    except Exception as e:
-        logger.error(f"خطا در فعال‌سازی فصل: {e}")
-        return 10  # مقدار پیش‌فرض
+    return season_functions.activate_season(season_id)
 
 def get_user_profile(user_id):
     """دریافت پروفایل کاربر شامل نام، موجودی و مجموع دریافتی"""
+    # شناسه فصل فعال از کش (None اگر فصل فعالی نباشد)
+    season = season_functions.get_active_season()
+    season_id = season[0] if season else None
+    
     conn = get_db_connection()
     try:
         c = conn.cursor()
@@ -323,15 +270,11 @@ def get_user_profile(user_id):
         # دریافت اطلاعات کاربر
         c.execute("""
             SELECT u.name, u.user_id, us.season_id, u.balance,
-                (SELECT COALESCE(SUM(amount), 0) FROM transactions WHERE touser = u.user_id AND season_id = (
-                    SELECT id FROM season WHERE is_active = 1
-                )) as total_received
+                COALESCE((SELECT received FROM season_totals WHERE season_id = ? AND user_id = u.user_id), 0) as total_received
             FROM users u
-            LEFT JOIN user_season us ON u.user_id = us.user_id AND us.season_id = (
-                SELECT id FROM season WHERE is_active = 1
-            )
+            LEFT JOIN user_season us ON u.user_id = us.user_id AND us.season_id = ?
             WHERE u.user_id = ?
-        """, (user_id,))
+        """, (season_id, season_id, user_id))
         
         result = c.fetchone()
         
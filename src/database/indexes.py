@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""
+تنظیمات کارایی دیتابیس: حالت WAL، PRAGMAها و ایندکس‌های مسیرهای پرتکرار
+کوئری‌های اصلی ربات (تابلوی امتیازات، تاریخچه تراکنش‌ها، آمار فصل و رأی‌های ترین‌ها)
+همگی روی چند ستون ثابت فیلتر می‌شوند. بدون ایندکس، هر کدام کل جدول را می‌خوانند.
+"""
+
+import sqlite3
+import logging
+
+logger = logging.getLogger(__name__)
+
+# اندازه حافظه نگاشت‌شده (mmap) برای هر اتصال: 64 مگابایت
+MMAP_SIZE = 64 * 1024 * 1024
+
+# PRAGMAهایی که برای هر اتصال جداگانه تنظیم می‌شوند (در استخر اتصال اعمال می‌شوند)
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA mmap_size={MMAP_SIZE}",
+    "PRAGMA temp_store=MEMORY",
+)
+
+# (نام ایندکس، جدول، ستون‌ها)
+# ستون‌های انتهایی (created_at, amount) ایندکس را پوشا (covering) می‌کنند تا
+# شمارش، جمع و مرتب‌سازی بدون مراجعه به جدول اصلی انجام شود.
+PERFORMANCE_INDEXES = [
+    # تراکنش‌های دریافتی یک کاربر در فصل (get_user_transactions و صفحه‌بندی تاریخچه)
+    ("idx_transactions_touser_season", "transactions", "touser, season_id, created_at, amount"),
+    # تراکنش‌های ارسالی یک کاربر در فصل
+    ("idx_transactions_user_season", "transactions", "user_id, season_id, created_at, amount"),
+    # تابلوی امتیازات و رتبه‌بندی یک فصل (get_scoreboard, get_season_scoreboard)
+    ("idx_transactions_season_touser", "transactions", "season_id, touser, amount"),
+    # رأی‌های ثبت‌شده یک کاربر در فصل
+    ("idx_top_votes_user_season", "top_votes", "user_id, season_id, question_id"),
+    # رأی‌های دریافتی یک کاربر در فصل
+    ("idx_top_votes_voted_for_season", "top_votes", "voted_for_user_id, season_id, question_id"),
+    # نتایج هر سوال ترین‌ها
+    ("idx_top_votes_question_season", "top_votes", "question_id, season_id, voted_for_user_id"),
+    # پیدا کردن فصل فعال
+    ("idx_season_is_active", "season", "is_active"),
+    # عضویت کاربر در فصل
+    ("idx_user_season_user_season", "user_season", "user_id, season_id"),
+    # سوالات فعال یک فصل
+    ("idx_top_questions_season_active", "top_questions", "season_id, is_active"),
+]
+
+# کوئری‌های پرتکرار برای بررسی با EXPLAIN QUERY PLAN: (عنوان، کوئری، پارامترها)
+HOT_QUERIES = [
+    ("get_user_transactions (given)", """
+        SELECT t.amount, t.touser, u.name, t.reason, t.created_at, t.message_id, t.transaction_id, t.season_id
+        FROM transactions t
+        LEFT JOIN users u ON t.touser = u.user_id
+        WHERE t.user_id=? AND t.season_id=?
+        ORDER BY t.created_at DESC LIMIT ? OFFSET ?
+    """, (1, 1, 3, 0)),
+    ("get_user_transactions (received)", """
+        SELECT t.amount, t.user_id, u.name, t.reason, t.created_at, t.message_id, t.transaction_id, t.season_id
+        FROM transactions t
+        LEFT JOIN users u ON t.user_id = u.user_id
+        WHERE t.touser=? AND t.season_id=?
+        ORDER BY t.created_at DESC LIMIT ? OFFSET ?
+    """, (1, 1, 3, 0)),
+    ("transaction history page (received, keyset)", """
+        SELECT t.amount, t.user_id, u.name, t.reason, t.created_at, t.message_id, t.transaction_id, t.season_id
+        FROM transactions t
+        LEFT JOIN users u ON t.user_id = u.user_id
+        WHERE t.touser = ? AND t.season_id = ? AND (t.created_at, t.transaction_id) < (?, ?)
+        ORDER BY t.created_at DESC, t.transaction_id DESC
+        LIMIT ?
+    """, (1, 1, "2025-01-01 00:00:00", 1, 4)),
+    ("transaction history page (given, keyset)", """
+        SELECT t.amount, t.touser, u.name, t.reason, t.created_at, t.message_id, t.transaction_id, t.season_id
+        FROM transactions t
+        LEFT JOIN users u ON t.touser = u.user_id
+        WHERE t.user_id = ? AND t.season_id = ? AND (t.created_at, t.transaction_id) > (?, ?)
+        ORDER BY t.created_at ASC, t.transaction_id ASC
+        LIMIT ?
+    """, (1, 1, "2025-01-01 00:00:00", 1, 4)),
+    ("count_user_transactions",
+     "SELECT given_count FROM season_totals WHERE season_id = ? AND user_id = ?", (1, 1)),
+    ("get_scoreboard", """
+        SELECT st.user_id AS touser, st.received AS total, u.name
+        FROM season_totals st
+        LEFT JOIN users u ON st.user_id = u.user_id
+        WHERE st.season_id = ? AND st.received_count > 0
+        ORDER BY st.received DESC LIMIT ?
+    """, (1, 10)),
+    ("get_user_season_stats (totals)", """
+        SELECT received, given, received_count, given_count
+        FROM season_totals WHERE season_id = ? AND user_id = ?
+    """, (1, 1)),
+    ("get_user_season_stats (rank)", """
+        SELECT
+            (SELECT COUNT(*) FROM season_totals
+             WHERE season_id = ? AND received > ? AND received_count > 0),
+            (SELECT COUNT(*) FROM season_totals
+             WHERE season_id = ? AND received_count > 0)
+    """, (1, 0, 1)),
+    ("get_user_season_stats (top votes)", """
+        SELECT q.text, COUNT(v.vote_id) as vote_count, GROUP_CONCAT(u.name, ', ') as voters
+        FROM top_votes v
+        JOIN top_questions q ON v.question_id = q.question_id
+        JOIN users u ON v.user_id = u.user_id
+        WHERE v.voted_for_user_id=? AND v.season_id=?
+        GROUP BY q.question_id
+    """, (1, 1)),
+    ("user top votes in season",
+     "SELECT question_id FROM top_votes WHERE user_id=? AND season_id=?", (1, 1)),
+    ("get_active_season",
+     "SELECT id, name, balance FROM season WHERE is_active=1 LIMIT 1", ()),
+    ("transfer_kudos (idempotency key)",
+     "SELECT transaction_id FROM transactions WHERE idempotency_key = ?", ("transfer:1:x",)),
+    ("user perspective (new received points)", """
+        SELECT t.transaction_id, t.amount, t.reason, u.name AS from_name
+        FROM transactions t
+        LEFT JOIN users u ON t.user_id = u.user_id
+        WHERE t.touser = ? AND t.season_id = ? AND t.transaction_id > ?
+        ORDER BY t.created_at DESC, t.transaction_id DESC
+        LIMIT ?
+    """, (1, 1, 0, 300)),
+    ("user perspective (new received totals)", """
+        SELECT COUNT(*), COALESCE(SUM(amount), 0), MAX(transaction_id)
+        FROM transactions
+        WHERE touser = ? AND season_id = ? AND transaction_id > ?
+    """, (1, 1, 0)),
+    ("ai_jobs (in-flight job)",
+     "SELECT job_id FROM ai_jobs WHERE kind = ? AND user_id = ? AND season_id = ? AND status IN (?, ?)",
+     ("profile", 1, 0, "pending", "running")),
+    ("ai_jobs (claim)",
+     "SELECT job_id FROM ai_jobs WHERE status = ? ORDER BY job_id LIMIT 1", ("pending",)),
+    ("ai_response_cache (lookup)",
+     "SELECT response, created_at FROM ai_response_cache WHERE fingerprint = ? AND created_at > ?", ("x", 0)),
+    ("ai_jobs (latest job)", """
+        SELECT job_id FROM ai_jobs WHERE kind = ? AND user_id = ? AND season_id = ?
+        ORDER BY job_id DESC LIMIT 1
+    """, ("profile", 1, 0)),
+    ("ai_usage (report window)", """
+        SELECT created_at, caller, prompt_tokens, completion_tokens, latency_ms, retries, ok, cost
+        FROM ai_usage WHERE created_at >= ?
+    """, (0,)),
+    ("ai precompute (next users)",
+     "SELECT user_id FROM season_totals WHERE season_id = ? AND user_id > ? ORDER BY user_id LIMIT ?", (1, 0, 2)),
+]
+
+
+def table_exists(conn, table_name):
+    """بررسی وجود یک جدول در دیتابیس"""
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table_name,)
+    ).fetchone()
+    return row is not None
+
+
+def apply_connection_pragmas(conn):
+    """اعمال PRAGMAهای مخصوص هر اتصال (synchronous، mmap و ...)"""
+    for pragma in CONNECTION_PRAGMAS:
+        try:
+            conn.execute(pragma)
+        except sqlite3.Error as e:
+            logger.warning(f"خطا در اجرای {pragma}: {e}")
+
+
+def enable_wal(conn):
+    """فعال‌سازی حالت WAL (در خود فایل دیتابیس ذخیره می‌شود و یک بار کافی است)
+
+    Returns:
+        str: حالت journal پس از تنظیم
+    """
+    try:
+        mode = conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+        if str(mode).lower() != "wal":
+            logger.warning(f"حالت WAL فعال نشد؛ حالت فعلی: {mode}")
+        return mode
+    except sqlite3.Error as e:
+        logger.error(f"خطا در فعال‌سازی WAL: {e}")
+        return None
+
+
+def create_performance_indexes(conn):
+    """ایجاد ایندکس‌های مسیرهای پرتکرار (جداول ناموجود نادیده گرفته می‌شوند)
+
+    commit بر عهده فراخواننده است تا در تراکنش مایگریشن هم قابل استفاده باشد.
+
+    Returns:
+        list: نام ایندکس‌های ایجاد یا تأیید شده
+    """
+    created = []
+    for name, table, columns in PERFORMANCE_INDEXES:
+        if not table_exists(conn, table):
+            logger.debug(f"جدول {table} وجود ندارد؛ ایندکس {name} ساخته نشد")
+            continue
+        try:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+            created.append(name)
+        except sqlite3.Error as e:
+            logger.error(f"خطا در ایجاد ایندکس {name}: {e}")
+    return created
+
+
+def apply_performance_tuning(conn):
+    """مرحله کامل تنظیم کارایی: WAL، PRAGMAها، ایندکس‌ها و به‌روزرسانی آمار برنامه‌ریز
+
+    Args:
+        conn (sqlite3.Connection): اتصال دیتابیس
+    """
+    mode = enable_wal(conn)
+    apply_connection_pragmas(conn)
+    indexes = create_performance_indexes(conn)
+    conn.commit()
+    try:
+        # آمار جداول را برای انتخاب درست ایندکس توسط برنامه‌ریز به‌روز می‌کند
+        conn.execute("PRAGMA optimize")
+    except sqlite3.Error as e:
+        logger.warning(f"خطا در اجرای PRAGMA optimize: {e}")
+    logger.info(f"تنظیمات کارایی دیتابیس اعمال شد (journal_mode={mode}, {len(indexes)} ایندکس)")
+    return indexes
+
+
+def explain_hot_queries(conn):
+    """اجرای EXPLAIN QUERY PLAN روی کوئری‌های پرتکرار
+
+    مرحله‌ای که با «SCAN <جدول>» و بدون ایندکس شروع شود یعنی کل جدول خوانده می‌شود.
+
+    Returns:
+        list: لیست (عنوان، خطوط طرح اجرا، آیا اسکن کامل دارد)
+    """
+    results = []
+    for title, query, params in HOT_QUERIES:
+        try:
+            rows = conn.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"خطا در بررسی طرح اجرای {title}: {e}")
+            continue
+        plan = [row[3] for row in rows]
+        # اسکن CTEها و زیرکوئری‌ها (که خودشان از ایندکس خوانده شده‌اند) مشکلی ندارد
+        derived = {
+            step.split(" ", 1)[1] for step in plan
+            if step.startswith(("CO-ROUTINE ", "MATERIALIZE "))
+        }
+        full_scan = any(
+            step.startswith("SCAN ") and " USING " not in step
+            and step[5:] not in derived and not step[5:].startswith("(")
+            and "CONSTANT ROW" not in step
+            for step in plan
+        )
+        results.append((title, plan, full_scan))
+    return results
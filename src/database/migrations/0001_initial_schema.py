@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+طرح اولیه دیتابیس: همه جداولی که پیش‌تر db_init.py و DatabaseManager هنگام import
+می‌ساختند، به‌علاوه ستون‌هایی که در دیتابیس‌های قدیمی بعداً اضافه شده‌اند.
+"""
+import sys
+import os
+
+# اضافه کردن مسیر پوشه اصلی برای دسترسی به config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))))
+import config
+
+TABLES = [
+    # جدول کاربران
+    '''
+    CREATE TABLE IF NOT EXISTS users (
+        user_id INTEGER PRIMARY KEY,
+        username TEXT,
+        name TEXT,
+        balance INTEGER DEFAULT 0,
+        join_date TEXT DEFAULT CURRENT_TIMESTAMP,
+        birthday TEXT,
+        telegram_name TEXT,
+        is_approved INTEGER DEFAULT 0,
+        total_received INTEGER DEFAULT 0
+    )
+    ''',
+    # جدول تراکنش‌ها
+    '''
+    CREATE TABLE IF NOT EXISTS transactions (
+        transaction_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        touser INTEGER,
+        amount INTEGER,
+        season_id INTEGER,
+        message_id INTEGER,
+        reason TEXT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    # جدول فصل‌ها
+    '''
+    CREATE TABLE IF NOT EXISTS season (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        balance INTEGER DEFAULT 100,
+        is_active INTEGER DEFAULT 0,
+        start_date TEXT DEFAULT CURRENT_TIMESTAMP,
+        end_date TEXT,
+        description TEXT
+    )
+    ''',
+    # جدول ادمین‌ها
+    '''
+    CREATE TABLE IF NOT EXISTS admins (
+        user_id INTEGER PRIMARY KEY,
+        role TEXT NOT NULL, -- god یا admin
+        permissions TEXT -- رشته‌ای از دسترسی‌ها (مثلاً: add_user,view_stats,...)
+    )
+    ''',
+    # جدول سوالات ترین‌ها
+    '''
+    CREATE TABLE IF NOT EXISTS top_questions (
+        question_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        text TEXT NOT NULL,
+        season_id INTEGER,
+        is_active INTEGER DEFAULT 1
+    )
+    ''',
+    # جدول رای‌های ترین‌ها
+    '''
+    CREATE TABLE IF NOT EXISTS top_votes (
+        vote_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        question_id INTEGER NOT NULL,
+        voted_for_user_id INTEGER NOT NULL,
+        season_id INTEGER NOT NULL,
+        vote_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(user_id, question_id, season_id)
+    )
+    ''',
+    # جدول جامع سوالات ترین‌ها
+    '''
+    CREATE TABLE IF NOT EXISTS master_top_questions (
+        master_question_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        text TEXT UNIQUE NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    # جدول عضویت کاربران در فصل‌ها
+    '''
+    CREATE TABLE IF NOT EXISTS user_season (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        season_id INTEGER NOT NULL,
+        join_date INTEGER,
+        balance INTEGER DEFAULT 0,
+        is_active INTEGER DEFAULT 1
+    )
+    ''',
+    # جدول کاربران در انتظار تأیید
+    '''
+    CREATE TABLE IF NOT EXISTS pending_approval (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER UNIQUE,
+        first_name TEXT,
+        last_name TEXT,
+        username TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    # جدول پروفایل‌های هوش مصنوعی کاربران
+    '''
+    CREATE TABLE IF NOT EXISTS ai_user_profiles (
+        profile_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER UNIQUE,
+        skills TEXT,
+        strengths TEXT,
+        personality TEXT,
+        improvement_areas TEXT,
+        team_perception TEXT,
+        last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(user_id)
+    )
+    ''',
+    # جدول پروفایل‌های کاربر (برای AI)
+    '''
+    CREATE TABLE IF NOT EXISTS user_profiles (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER UNIQUE NOT NULL,
+        profile_text TEXT,
+        created_at TEXT
+    )
+    ''',
+    # جدول دیدگاه‌های کاربر (برای AI)
+    '''
+    CREATE TABLE IF NOT EXISTS user_perspectives (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        season_id INTEGER NOT NULL,
+        perspective TEXT,
+        created_at TEXT,
+        UNIQUE(user_id, season_id)
+    )
+    ''',
+    # جدول تاریخچه زاویه دید کاربران (ماژول هوش مصنوعی)
+    '''
+    CREATE TABLE IF NOT EXISTS ai_user_perspectives (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        season_id INTEGER,
+        perspective_text TEXT,
+        last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    # جدول تنظیمات
+    '''
+    CREATE TABLE IF NOT EXISTS settings (
+        key TEXT PRIMARY KEY,
+        value TEXT,
+        description TEXT,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+]
+
+# ستون‌هایی که در دیتابیس‌های قدیمی ممکن است وجود نداشته باشند
+# (ALTER TABLE پیش‌فرض غیرثابت مثل CURRENT_TIMESTAMP را نمی‌پذیرد)
+LEGACY_COLUMNS = {
+    "users": [
+        ("username", "TEXT"),
+        ("name", "TEXT"),
+        ("balance", "INTEGER DEFAULT 0"),
+        ("birthday", "TEXT"),
+        ("join_date", "TEXT"),
+        ("telegram_name", "TEXT"),
+        ("is_approved", "INTEGER DEFAULT 0"),
+        ("total_received", "INTEGER DEFAULT 0"),
+    ],
+    "top_votes": [
+        ("vote_time", "TIMESTAMP"),
+    ],
+}
+
+
+def _add_missing_columns(conn, table, columns):
+    """اضافه کردن ستون‌های ناموجود با یک PRAGMA برای کل جدول"""
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    for name, column_type in columns:
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
+
+
+def upgrade(conn):
+    for ddl in TABLES:
+        conn.execute(ddl)
+
+    for table, columns in LEGACY_COLUMNS.items():
+        _add_missing_columns(conn, table, columns)
+
+    # ادمین گاد و کاربر متناظر آن
+    conn.execute(
+        "INSERT OR IGNORE INTO admins (user_id, role, permissions) VALUES (?, 'god', NULL)",
+        (config.ADMIN_USER_ID,)
+    )
+    conn.execute(
+        "INSERT OR IGNORE INTO users (user_id, username, name, balance) VALUES (?, 'admin', 'Admin', 100)",
+        (config.ADMIN_USER_ID,)
+    )
+
+    # تنظیم پیش‌فرض نمایش کاربران
+    conn.execute(
+        "INSERT OR IGNORE INTO settings (key, value, description) VALUES (?, ?, ?)",
+        ('show_all_users', '1', 'نمایش لیست همه کاربران در منوی امتیازدهی')
+    )
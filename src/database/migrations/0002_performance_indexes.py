@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+"""
+ایندکس‌های مسیرهای پرتکرار (فهرست کامل در src/database/indexes.py)
+"""
+from ..indexes import create_performance_indexes
+
+
+def upgrade(conn):
+    create_performance_indexes(conn)
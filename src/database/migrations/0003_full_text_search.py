@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+جستجوی متن کامل (FTS5) روی دلیل تراکنش‌ها و نام فرستنده و گیرنده
+متن پیش از ذخیره با همان قواعد src/utils/text_normalize.py نرمال می‌شود و جدول با
+تریگر همگام می‌ماند؛ rowid هر سطر همان transaction_id است. نام‌ها در خود جدول FTS
+تکرار شده‌اند تا هر جستجو یک پیمایش نزولی روی rowid باشد که پس از یک صفحه متوقف می‌شود.
+"""
+import sqlite3
+import logging
+
+from ...utils.text_normalize import sql_normalize
+
+logger = logging.getLogger(__name__)
+
+# unicode61 حروف بزرگ/کوچک و اعراب لاتین را یکسان می‌کند؛ ایندکس پیشوند برای جستجوی «کلمه*»
+FTS_OPTIONS = "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'"
+
+
+def _name_of(user_id):
+    return f"(SELECT {sql_normalize('name')} FROM users WHERE user_id = {user_id})"
+
+
+def _columns(row):
+    """مقادیر (reason, giver, receiver) برای یک سطر تراکنش"""
+    return f"{sql_normalize(f'{row}.reason')}, {_name_of(f'{row}.user_id')}, {_name_of(f'{row}.touser')}"
+
+
+STATEMENTS = [
+    f"CREATE VIRTUAL TABLE transactions_fts USING fts5(reason, giver, receiver, {FTS_OPTIONS})",
+
+    f"""
+    CREATE TRIGGER transactions_fts_insert AFTER INSERT ON transactions
+    BEGIN
+        INSERT INTO transactions_fts(rowid, reason, giver, receiver)
+        VALUES (new.transaction_id, {_columns('new')});
+    END
+    """,
+    """
+    CREATE TRIGGER transactions_fts_delete AFTER DELETE ON transactions
+    BEGIN
+        DELETE FROM transactions_fts WHERE rowid = old.transaction_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER transactions_fts_update AFTER UPDATE OF reason, user_id, touser ON transactions
+    BEGIN
+        DELETE FROM transactions_fts WHERE rowid = old.transaction_id;
+        INSERT INTO transactions_fts(rowid, reason, giver, receiver)
+        VALUES (new.transaction_id, {_columns('new')});
+    END
+    """,
+    # تغییر نام کاربر (نادر) در همه تراکنش‌های او اعمال می‌شود
+    f"""
+    CREATE TRIGGER transactions_fts_user_rename AFTER UPDATE OF name ON users
+    BEGIN
+        UPDATE transactions_fts SET giver = {sql_normalize('new.name')}
+        WHERE rowid IN (SELECT transaction_id FROM transactions WHERE user_id = new.user_id);
+        UPDATE transactions_fts SET receiver = {sql_normalize('new.name')}
+        WHERE rowid IN (SELECT transaction_id FROM transactions WHERE touser = new.user_id);
+    END
+    """,
+
+    # پر کردن جدول از تراکنش‌های موجود
+    f"""
+    INSERT INTO transactions_fts(rowid, reason, giver, receiver)
+    SELECT transaction_id, {_columns('transactions')} FROM transactions
+    """,
+]
+
+
+def fts5_available(conn):
+    """بررسی پشتیبانی SQLite از FTS5"""
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)")
+        conn.execute("DROP TABLE temp.fts5_probe")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def upgrade(conn):
+    if not fts5_available(conn):
+        # جستجو در src/database/search_functions.py به LIKE برمی‌گردد
+        logger.warning("SQLite بدون FTS5 کامپایل شده است؛ جدول جستجوی متن کامل ساخته نشد")
+        return
+    for statement in STATEMENTS:
+        conn.execute(statement)
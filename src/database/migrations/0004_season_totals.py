@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+جدول تجمیعی season_totals و تریگرهای نگهداری آن (توضیحات در src/database/season_totals.py)
+تریگرها در همان تراکنشی اجرا می‌شوند که سطر transactions را تغییر می‌دهد؛ پس مجموع‌ها
+هیچ‌وقت از تراکنش‌ها عقب نمی‌مانند.
+"""
+from ..season_totals import NO_SEASON_ID, rebuild_season_totals
+
+
+def _add(row, sign):
+    """دستورهای اعمال اثر یک سطر transactions (sign=+1 برای درج، -1 برای حذف)"""
+    season = f"COALESCE({row}.season_id, {NO_SEASON_ID})"
+    amount = f"{sign} * COALESCE({row}.amount, 0)"
+    return f"""
+        INSERT INTO season_totals (season_id, user_id, received, received_count)
+        SELECT {season}, {row}.touser, {amount}, {sign} WHERE {row}.touser IS NOT NULL
+        ON CONFLICT (season_id, user_id) DO UPDATE SET
+            received = received + excluded.received,
+            received_count = received_count + excluded.received_count;
+        INSERT INTO season_totals (season_id, user_id, given, given_count)
+        SELECT {season}, {row}.user_id, {amount}, {sign} WHERE {row}.user_id IS NOT NULL
+        ON CONFLICT (season_id, user_id) DO UPDATE SET
+            given = given + excluded.given,
+            given_count = given_count + excluded.given_count;
+    """
+
+
+def _remove(row):
+    """اثر معکوس یک سطر و حذف سطرهایی که دیگر تراکنشی ندارند"""
+    season = f"COALESCE({row}.season_id, {NO_SEASON_ID})"
+    return _add(row, -1) + f"""
+        DELETE FROM season_totals
+        WHERE season_id = {season} AND user_id IN ({row}.touser, {row}.user_id)
+          AND received_count = 0 AND given_count = 0;
+    """
+
+
+STATEMENTS = [
+    """
+    CREATE TABLE season_totals (
+        season_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        received INTEGER NOT NULL DEFAULT 0,
+        given INTEGER NOT NULL DEFAULT 0,
+        received_count INTEGER NOT NULL DEFAULT 0,
+        given_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (season_id, user_id)
+    ) WITHOUT ROWID
+    """,
+    # تابلوی امتیازات و رتبه یک فصل
+    "CREATE INDEX idx_season_totals_received ON season_totals (season_id, received, received_count)",
+
+    f"""
+    CREATE TRIGGER season_totals_insert AFTER INSERT ON transactions
+    BEGIN
+        {_add('new', 1)}
+    END
+    """,
+    f"""
+    CREATE TRIGGER season_totals_delete AFTER DELETE ON transactions
+    BEGIN
+        {_remove('old')}
+    END
+    """,
+    f"""
+    CREATE TRIGGER season_totals_update AFTER UPDATE OF user_id, touser, amount, season_id ON transactions
+    BEGIN
+        {_remove('old')}
+        {_add('new', 1)}
+    END
+    """,
+]
+
+
+def upgrade(conn):
+    for statement in STATEMENTS:
+        conn.execute(statement)
+    rebuild_season_totals(conn)
@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+"""
+کلید یکتایی (idempotency key) تراکنش‌ها برای جلوگیری از ثبت دوباره یک امتیازدهی
+(توضیحات در src/database/transfer_functions.py)
+تراکنش‌های قدیمی و ثبت‌های مدیریتی کلید ندارند؛ پس ایندکس یکتا فقط روی سطرهای دارای کلید است.
+"""
+
+
+def upgrade(conn):
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(transactions)")]
+    if "idempotency_key" not in columns:
+        conn.execute("ALTER TABLE transactions ADD COLUMN idempotency_key TEXT")
+    conn.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_transactions_idempotency_key
+        ON transactions (idempotency_key) WHERE idempotency_key IS NOT NULL
+    """)
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+صف پایدار کارهای هوش مصنوعی (توضیحات در src/services/ai_jobs.py)
+ایندکس یکتای جزئی، در هر لحظه فقط یک کار در جریان (pending/running) برای هر
+(نوع، کاربر، فصل) مجاز می‌کند؛ درخواست‌های تکراری به همان کار می‌پیوندند.
+"""
+
+STATEMENTS = [
+    """
+    CREATE TABLE ai_jobs (
+        job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL,
+        user_id INTEGER NOT NULL DEFAULT 0,
+        season_id INTEGER NOT NULL DEFAULT 0,
+        status TEXT NOT NULL DEFAULT 'pending',
+        result TEXT,
+        error TEXT,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        started_at TEXT,
+        finished_at TEXT
+    )
+    """,
+    """
+    CREATE UNIQUE INDEX idx_ai_jobs_inflight ON ai_jobs (kind, user_id, season_id)
+    WHERE status IN ('pending', 'running')
+    """,
+    # برداشتن قدیمی‌ترین کار منتظر و آخرین کار هر کلید برای نمایش وضعیت
+    "CREATE INDEX idx_ai_jobs_status ON ai_jobs (status, job_id)",
+    "CREATE INDEX idx_ai_jobs_key ON ai_jobs (kind, user_id, season_id, job_id)",
+    # پیام‌های «در حال پردازش» که پس از پایان کار ویرایش می‌شوند
+    """
+    CREATE TABLE ai_job_waiters (
+        job_id INTEGER NOT NULL,
+        chat_id INTEGER NOT NULL,
+        message_id INTEGER NOT NULL,
+        PRIMARY KEY (job_id, chat_id, message_id)
+    ) WITHOUT ROWID
+    """,
+]
+
+
+def upgrade(conn):
+    for statement in STATEMENTS:
+        conn.execute(statement)
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""
+کش پاسخ‌های هوش مصنوعی با کلید اثر انگشت ورودی‌ها (توضیحات در src/services/ai_cache.py)
+"""
+
+STATEMENTS = [
+    """
+    CREATE TABLE ai_response_cache (
+        fingerprint TEXT PRIMARY KEY,
+        model TEXT NOT NULL,
+        response TEXT NOT NULL,
+        created_at INTEGER NOT NULL,
+        last_used_at INTEGER NOT NULL,
+        hits INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    """,
+    # حذف کم‌استفاده‌ترین و منقضی‌شده‌ترین سطرها
+    "CREATE INDEX idx_ai_response_cache_last_used ON ai_response_cache (last_used_at)",
+    "CREATE INDEX idx_ai_response_cache_created ON ai_response_cache (created_at)",
+]
+
+
+def upgrade(conn):
+    for statement in STATEMENTS:
+        conn.execute(statement)
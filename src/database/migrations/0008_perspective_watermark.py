@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+"""
+نشانگر پیشرفت (high-water mark) زاویه دید هر کاربر در هر فصل
+زاویه دید ذخیره شده خلاصه غلتان نظرات دیگران است؛ در به‌روزرسانی بعدی فقط امتیازهای
+دریافتی با شناسه بزرگ‌تر از last_transaction_id به مدل فرستاده می‌شوند
+(توضیحات در src/services/ai.py، تابع _prepare_user_perspective).
+"""
+
+COLUMNS = [
+    ("last_transaction_id", "INTEGER NOT NULL DEFAULT 0"),
+    ("last_vote_id", "INTEGER NOT NULL DEFAULT 0"),
+    ("feedback_count", "INTEGER NOT NULL DEFAULT 0"),
+]
+
+
+def upgrade(conn):
+    existing = [row[1] for row in conn.execute("PRAGMA table_info(user_perspectives)")]
+    for name, definition in COLUMNS:
+        if name not in existing:
+            conn.execute(f"ALTER TABLE user_perspectives ADD COLUMN {name} {definition}")
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""
+نقطه بازیابی (checkpoint) اجراهای پیش‌محاسبه دسته‌ای پروفایل و زاویه دید
+(توضیحات در src/services/ai_precompute.py). هر اجرا با run_key شناخته می‌شود و
+last_user_id آخرین کاربری است که همه کاربران تا آن پردازش شده‌اند؛ اجرای دوباره
+همان کلید از کاربر بعدی ادامه پیدا می‌کند.
+"""
+
+STATEMENTS = [
+    """
+    CREATE TABLE ai_precompute_runs (
+        run_key TEXT PRIMARY KEY,
+        season_id INTEGER NOT NULL,
+        status TEXT NOT NULL DEFAULT 'running',
+        last_user_id INTEGER NOT NULL DEFAULT 0,
+        processed INTEGER NOT NULL DEFAULT 0,
+        failed INTEGER NOT NULL DEFAULT 0,
+        tokens INTEGER NOT NULL DEFAULT 0,
+        started_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        updated_at TEXT,
+        finished_at TEXT
+    ) WITHOUT ROWID
+    """,
+]
+
+
+def upgrade(conn):
+    for statement in STATEMENTS:
+        conn.execute(statement)
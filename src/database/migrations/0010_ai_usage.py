@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""
+ثبت مصرف هر فراخوانی مدل هوش مصنوعی (توضیحات در src/services/ai_usage.py)
+جدول غلتان است؛ سطرهای قدیمی‌تر از AI_USAGE_RETENTION_DAYS حذف می‌شوند.
+"""
+
+STATEMENTS = [
+    """
+    CREATE TABLE ai_usage (
+        usage_id INTEGER PRIMARY KEY,
+        created_at INTEGER NOT NULL,
+        model TEXT NOT NULL,
+        caller TEXT NOT NULL,
+        prompt_tokens INTEGER NOT NULL DEFAULT 0,
+        completion_tokens INTEGER NOT NULL DEFAULT 0,
+        latency_ms INTEGER NOT NULL DEFAULT 0,
+        retries INTEGER NOT NULL DEFAULT 0,
+        ok INTEGER NOT NULL DEFAULT 1,
+        cost REAL NOT NULL DEFAULT 0
+    )
+    """,
+    # گزارش بازه اخیر و حذف سطرهای قدیمی
+    "CREATE INDEX idx_ai_usage_created ON ai_usage (created_at)",
+]
+
+
+def upgrade(conn):
+    for statement in STATEMENTS:
+        conn.execute(statement)
@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+"""
+مایگریشن‌های شماره‌دار طرح دیتابیس
+
+هر فایل با الگوی ``NNNN_name.py`` یک مرحله از طرح دیتابیس است و تابع
+``upgrade(conn)`` دارد. اجراکننده (src/database/migrator.py) مایگریشن‌ها را به ترتیب
+شماره اجرا می‌کند و شماره آخرین مرحله را در جدول ``schema_version`` ثبت می‌کند.
+
+قواعد نوشتن مایگریشن:
+    - مایگریشن commit نمی‌کند؛ هر مرحله در یک تراکنش اجرا و سپس ثبت می‌شود
+    - مایگریشنی که اجرا شده دیگر تغییر نمی‌کند؛ تغییر جدید = فایل جدید
+"""
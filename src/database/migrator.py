@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+اجراکننده مایگریشن‌های طرح دیتابیس
+به جای اجرای ده‌ها دستور CREATE/PRAGMA/ALTER در هر بار راه‌اندازی، شماره نسخه طرح در
+جدول schema_version نگه داشته می‌شود. اگر دیتابیس به‌روز باشد، راه‌اندازی فقط یک
+کوئری SELECT MAX(version) است؛ در غیر این صورت مایگریشن‌های جدیدتر به ترتیب اجرا می‌شوند.
+"""
+
+import os
+import re
+import sqlite3
+import logging
+import importlib
+import threading
+from datetime import datetime
+
+from .connection_pool import get_pool
+from .indexes import enable_wal
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_PACKAGE = f"{__package__}.migrations"
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "migrations")
+_MIGRATION_FILE = re.compile(r"^(\d{4})_(\w+)\.py$")
+
+_lock = threading.Lock()
+# مسیر دیتابیس‌هایی که در این پردازه به‌روز بودنشان تأیید شده است
+_ready = set()
+_migrations = None
+
+
+def discover_migrations():
+    """فهرست مایگریشن‌ها به ترتیب شماره
+
+    Returns:
+        list: لیست (شماره، نام ماژول)
+    """
+    global _migrations
+    if _migrations is None:
+        found = []
+        for filename in os.listdir(MIGRATIONS_DIR):
+            match = _MIGRATION_FILE.match(filename)
+            if match:
+                found.append((int(match.group(1)), filename[:-3]))
+        found.sort()
+        versions = [version for version, _ in found]
+        if len(versions) != len(set(versions)):
+            raise RuntimeError(f"شماره مایگریشن تکراری است: {versions}")
+        _migrations = found
+    return _migrations
+
+
+def latest_version():
+    """شماره آخرین مایگریشن موجود"""
+    migrations = discover_migrations()
+    return migrations[-1][0] if migrations else 0
+
+
+def get_schema_version(conn):
+    """نسخه فعلی طرح دیتابیس (0 اگر جدول schema_version وجود نداشته باشد)"""
+    try:
+        row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] or 0
+
+
+def _apply_migration(conn, version, module_name):
+    """اجرای یک مایگریشن و ثبت آن در یک تراکنش"""
+    module = importlib.import_module(f"{MIGRATIONS_PACKAGE}.{module_name}")
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # ممکن است پردازه دیگری همزمان همین مایگریشن را اجرا کرده باشد
+        if get_schema_version(conn) >= version:
+            conn.rollback()
+            return False
+        module.upgrade(conn)
+        conn.execute(
+            "INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)",
+            (version, module_name, datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    logger.info(f"مایگریشن {module_name} اجرا شد")
+    return True
+
+
+def migrate(conn):
+    """اجرای همه مایگریشن‌های اجرا نشده
+
+    Args:
+        conn (sqlite3.Connection): اتصال دیتابیس
+
+    Returns:
+        list: نام مایگریشن‌های اجرا شده
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TEXT
+        )
+    """)
+    conn.commit()
+
+    current = get_schema_version(conn)
+    applied = []
+    for version, module_name in discover_migrations():
+        if version <= current:
+            continue
+        if _apply_migration(conn, version, module_name):
+            applied.append(module_name)
+
+    if applied:
+        # WAL در خود فایل ذخیره می‌شود و خارج از تراکنش باید تنظیم شود
+        enable_wal(conn)
+        conn.execute("PRAGMA optimize")
+    return applied
+
+
+def ensure_schema(db_path=None):
+    """اطمینان از به‌روز بودن طرح دیتابیس (مسیر سریع: یک کوئری نسخه)
+
+    Args:
+        db_path (str, optional): مسیر دیتابیس (پیش‌فرض config.DB_PATH)
+
+    Returns:
+        int: نسخه طرح دیتابیس
+    """
+    pool = get_pool(db_path)
+    if pool.db_path in _ready:
+        return latest_version()
+
+    with _lock:
+        if pool.db_path in _ready:
+            return latest_version()
+        conn = pool.acquire(row_factory=None)
+        try:
+            target = latest_version()
+            version = get_schema_version(conn)
+            if version < target:
+                applied = migrate(conn)
+                version = get_schema_version(conn)
+                logger.info(f"طرح دیتابیس به نسخه {version} رسید ({len(applied)} مایگریشن)")
+            elif version > target:
+                logger.warning(f"نسخه طرح دیتابیس ({version}) از آخرین مایگریشن ({target}) جدیدتر است")
+            _ready.add(pool.db_path)
+            return version
+        finally:
+            conn.close()
@@ -1,7 +1,6 @@
 """
 مدل‌های پایگاه داده برای ربات کادوس
 """
-import sqlite3
 import logging
 import sys
 import os
@@ -9,6 +8,8 @@ import os
 # اضافه کردن مسیر پوشه اصلی برای دسترسی به config
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 import config
+from .connection_pool import get_pool
+from .migrator import ensure_schema
 
 logger = logging.getLogger(__name__)
 
@@ -16,55 +17,24 @@ class DatabaseManager:
     """کلاس مدیریت پایگاه داده"""
     
     def __init__(self, db_path=None):
-        self.db_path = db_path or config.DB_PATH
+        self._db_path = db_path
         self._init_db()
+
+    @property
+    def db_path(self):
+        """مسیر دیتابیس (در صورت مشخص نبودن، config.DB_PATH در لحظه استفاده)"""
+        return self._db_path or config.DB_PATH
     
     def _init_db(self):
-        """ایجاد جداول مورد نیاز"""
-        conn = self.get_connection()
-        c = conn.cursor()
-        
-        # ایجاد جدول جامع سوالات ترین‌ها
-        c.execute('''
-        CREATE TABLE IF NOT EXISTS master_top_questions (
-            master_question_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            text TEXT UNIQUE NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-        ''')
-        
-        # ایجاد جدول تنظیمات
-        c.execute('''
-        CREATE TABLE IF NOT EXISTS settings (
-            key TEXT PRIMARY KEY,
-            value TEXT,
-            description TEXT,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-        ''')
-        
-        # بررسی وجود تنظیم نمایش کاربران
-        c.execute("SELECT value FROM settings WHERE key='show_all_users'")
-        result = c.fetchone()
-        if result is None:
-            # اضافه کردن تنظیم پیش‌فرض
-            c.execute(
-                "INSERT INTO settings (key, value, description) VALUES (?, ?, ?)",
-                ('show_all_users', '1', 'نمایش لیست همه کاربران در منوی امتیازدهی')
-            )
-            logger.info("تنظیم پیش‌فرض نمایش کاربران اضافه شد")
-        
-        conn.commit()
-        conn.close()
+        """اطمینان از به‌روز بودن طرح دیتابیس (جداول با مایگریشن‌ها ساخته می‌شوند)"""
+        ensure_schema(self.db_path)
     
     def get_connection(self):
-        """ایجاد و برگرداندن اتصال به دیتابیس"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
+        """دریافت اتصال به دیتابیس از استخر اتصال (با conn.close() به استخر برمی‌گردد)"""
+        return get_pool(self.db_path).acquire()
     
     def execute_query(self, query, params=None, fetchone=False, commit=False):
-        """اجرای کوئری SQL با یک اتصال جدید"""
+        """اجرای کوئری SQL با یک اتصال از استخر"""
         conn = None
         try:
             conn = self.get_connection()
@@ -0,0 +1,113 @@
+"""
+توابع جستجوی متن کامل در تراکنش‌ها
+دلیل تراکنش‌ها و نام فرستنده و گیرنده در جدول FTS5 (مایگریشن 0003_full_text_search)
+ایندکس شده‌اند؛ هزینه هر جستجو به اندازه صفحه بستگی دارد نه به اندازه کل جدول transactions.
+اگر SQLite بدون FTS5 کامپایل شده باشد، جستجو با LIKE انجام می‌شود.
+"""
+import re
+import logging
+
+from .db_utils import get_db_connection
+from .indexes import table_exists
+from ..utils.text_normalize import normalize
+
+logger = logging.getLogger(__name__)
+
+# تعداد نتایج هر صفحه جستجوی ادمین
+SEARCH_PAGE_SIZE = 5
+
+_WORD = re.compile(r"\w+")
+# None: هنوز بررسی نشده
+_fts_ready = None
+
+
+def build_match_query(text):
+    """تبدیل متن جستجو به عبارت MATCH برای FTS5
+
+    هر کلمه به صورت پیشوندی جستجو می‌شود و همه کلمات باید وجود داشته باشند.
+
+    Returns:
+        str: عبارت MATCH یا None اگر متن کلمه‌ای نداشته باشد
+    """
+    words = _WORD.findall(normalize(text))
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def _fts_available(conn):
+    global _fts_ready
+    if _fts_ready is None:
+        _fts_ready = table_exists(conn, "transactions_fts")
+        if not _fts_ready:
+            logger.warning("جدول FTS وجود ندارد؛ جستجوی تراکنش‌ها با LIKE انجام می‌شود")
+    return _fts_ready
+
+
+_RESULT_COLUMNS = """
+    t.transaction_id, t.created_at, t.amount, t.reason, t.season_id,
+    t.user_id, g.name AS giver_name, t.touser, r.name AS receiver_name
+"""
+
+# پیمایش نزولی rowid در FTS5 با LIMIT: پس از یافتن یک صفحه نتیجه متوقف می‌شود
+_FTS_QUERY = """
+    SELECT {columns}
+    FROM transactions_fts f
+    JOIN transactions t ON t.transaction_id = f.rowid
+    LEFT JOIN users g ON g.user_id = t.user_id
+    LEFT JOIN users r ON r.user_id = t.touser
+    WHERE transactions_fts MATCH :match{season_filter}
+    ORDER BY f.rowid DESC
+    LIMIT :limit OFFSET :offset
+"""
+
+_LIKE_QUERY = """
+    SELECT {columns}
+    FROM transactions t
+    LEFT JOIN users g ON g.user_id = t.user_id
+    LEFT JOIN users r ON r.user_id = t.touser
+    WHERE (t.reason LIKE :pattern OR g.name LIKE :pattern OR r.name LIKE :pattern){season_filter}
+    ORDER BY t.transaction_id DESC
+    LIMIT :limit OFFSET :offset
+"""
+
+
+def search_transactions(text, season_id=None, page=0, page_size=SEARCH_PAGE_SIZE):
+    """جستجوی تراکنش‌ها بر اساس دلیل یا نام فرستنده/گیرنده (جدیدترین اول)
+
+    Args:
+        text (str): متن جستجو
+        season_id (int, optional): محدود کردن به یک فصل
+        page (int): شماره صفحه (از صفر)
+        page_size (int): تعداد نتایج هر صفحه
+
+    Returns:
+        tuple: (لیست نتایج، آیا صفحه بعدی وجود دارد)
+    """
+    match = build_match_query(text)
+    if not match:
+        return [], False
+
+    params = {"match": match, "limit": page_size + 1, "offset": page * page_size}
+    season_filter = ""
+    if season_id is not None:
+        season_filter = " AND t.season_id = :season_id"
+        params["season_id"] = season_id
+
+    conn = None
+    try:
+        conn = get_db_connection()
+        if _fts_available(conn):
+            query = _FTS_QUERY.format(columns=_RESULT_COLUMNS, season_filter=season_filter)
+        else:
+            query = _LIKE_QUERY.format(columns=_RESULT_COLUMNS, season_filter=season_filter)
+            params["pattern"] = f"%{text.strip()}%"
+        rows = conn.execute(query, params).fetchall()
+        # یک سطر اضافه فقط برای تشخیص وجود صفحه بعد خوانده می‌شود
+        return rows[:page_size], len(rows) > page_size
+    except Exception as e:
+        logger.error(f"خطا در جستجوی تراکنش‌ها: {e}")
+        return [], False
+    finally:
+        if conn:
+            conn.close()
@@ -3,6 +3,8 @@
 """
 import sqlite3
 import logging
+import threading
+import time
 from .models import db_manager
 import sys
 import os
@@ -13,19 +15,74 @@ import config
 
 logger = logging.getLogger(__name__)
 
+# فصل فعال چند بار در سال تغییر می‌کند ولی تقریباً در هر callback خوانده می‌شود؛
+# پس در حافظه نگه داشته می‌شود و توابع تغییر فصل کش را صریحاً باطل می‌کنند.
+# TTL فقط پشتیبان تغییرات خارج از این پردازه (مثلاً اسکریپت‌های scripts/) است.
+SEASON_CACHE_TTL = 600
+# نبود فصل فعال (یا خطای دیتابیس) مدت کوتاه‌تری کش می‌شود
+SEASON_CACHE_NEGATIVE_TTL = 30
+
+_season_cache_lock = threading.Lock()
+_season_cache = {"value": None, "expires": 0.0, "generation": 0}
+_season_cache_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+
+def cached_active_season():
+    """خواندن فصل فعال فقط از کش، بدون مراجعه به دیتابیس
+
+    Returns:
+        tuple: (found, season) که found نشان می‌دهد مقدار معتبری در کش بوده است
+    """
+    if time.monotonic() < _season_cache["expires"]:
+        _season_cache_stats["hits"] += 1
+        return True, _season_cache["value"]
+    return False, None
+
+
 def get_active_season():
-    """دریافت فصل فعال"""
+    """دریافت فصل فعال (از کش در صورت وجود)"""
+    found, season = cached_active_season()
+    if found:
+        return season
+
+    with _season_cache_lock:
+        generation = _season_cache["generation"]
+    _season_cache_stats["misses"] += 1
     try:
         result = db_manager.execute_query(
             "SELECT id, name, balance FROM season WHERE is_active=1 LIMIT 1", 
             fetchone=True
         )
-        return result
     except sqlite3.OperationalError:
         # در صورت عدم وجود ستون created_at یا جدول
         logger.warning("مشکل در دسترسی به جدول season - استفاده از مقادیر پیش‌فرض")
         return (config.SEASON_ID, config.SEASON_NAME, 10)  # مقادیر پیش‌فرض
 
+    with _season_cache_lock:
+        # اگر در حین خواندن کش باطل شده، مقدار قدیمی ذخیره نمی‌شود
+        if generation == _season_cache["generation"]:
+            ttl = SEASON_CACHE_TTL if result else SEASON_CACHE_NEGATIVE_TTL
+            _season_cache["value"] = result
+            _season_cache["expires"] = time.monotonic() + ttl
+    return result
+
+
+def invalidate_season_cache():
+    """باطل کردن کش فصل فعال (پس از هر تغییر در جدول season)"""
+    with _season_cache_lock:
+        _season_cache["value"] = None
+        _season_cache["expires"] = 0.0
+        _season_cache["generation"] += 1
+        _season_cache_stats["invalidations"] += 1
+
+
+def get_season_cache_stats():
+    """آمار کش فصل فعال"""
+    stats = dict(_season_cache_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+    return stats
+
 def get_all_seasons():
     """دریافت همه فصل‌ها"""
     try:
@@ -76,6 +133,7 @@ def update_season(season_id, name=None, balance=None, description=None):
             (description, season_id), 
             commit=True
         )
+    invalidate_season_cache()
     return True
 
 def end_season(season_id):
@@ -89,6 +147,35 @@ def end_season(season_id):
     except sqlite3.OperationalError as e:
         logger.error(f"خطا در پایان دادن به فصل: {e}")
         return False
+    finally:
+        invalidate_season_cache()
+
+def activate_season(season_id):
+    """فعال‌سازی فصل و اعطای اعتبار فصل به همه کاربران
+
+    Returns:
+        int: اعتبار فصل فعال شده
+    """
+    try:
+        conn = db_manager.get_connection()
+        try:
+            c = conn.cursor()
+            # غیرفعال کردن فصل‌های قبلی و فعال کردن فصل جدید در یک تراکنش
+            c.execute("UPDATE season SET is_active=0 WHERE is_active=1")
+            c.execute("UPDATE season SET is_active=1 WHERE id=?", (season_id,))
+            c.execute("SELECT balance FROM season WHERE id=?", (season_id,))
+            balance_result = c.fetchone()
+            balance = balance_result[0] if balance_result else 10
+            c.execute("UPDATE users SET balance=?", (balance,))
+            conn.commit()
+            return balance
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.error(f"خطا در فعال‌سازی فصل: {e}")
+        return 10  # مقدار پیش‌فرض
+    finally:
+        invalidate_season_cache()
 
 # توابع مربوط به سوالات ترین‌ها
 def get_all_top_questions():
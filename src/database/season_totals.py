@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+جدول تجمیعی season_totals: مجموع و تعداد امتیازهای دریافتی و داده شده هر کاربر در هر فصل
+تابلوی امتیازات، رتبه و آمار فصل قبلاً با GROUP BY روی کل جدول transactions محاسبه
+می‌شدند. این جدول با تریگرهای مایگریشن 0004_season_totals در همان تراکنشی که سطر
+transactions درج، ویرایش یا حذف می‌شود به‌روز می‌شود؛ پس خواندن آن یک جستجوی ایندکس
+است و به طول تاریخچه بستگی ندارد. تراکنش‌های بدون فصل با season_id = 0 ثبت می‌شوند.
+"""
+import logging
+
+from .connection_pool import get_connection
+
+logger = logging.getLogger(__name__)
+
+# شناسه فصل برای تراکنش‌هایی که season_id ندارند
+NO_SEASON_ID = 0
+
+REBUILD_QUERY = f"""
+    INSERT INTO season_totals (season_id, user_id, received, given, received_count, given_count)
+    SELECT season_id, user_id, SUM(received), SUM(given), SUM(received_count), SUM(given_count)
+    FROM (
+        SELECT COALESCE(season_id, {NO_SEASON_ID}) AS season_id, touser AS user_id,
+               COALESCE(amount, 0) AS received, 0 AS given, 1 AS received_count, 0 AS given_count
+        FROM transactions WHERE touser IS NOT NULL
+        UNION ALL
+        SELECT COALESCE(season_id, {NO_SEASON_ID}), user_id, 0, COALESCE(amount, 0), 0, 1
+        FROM transactions WHERE user_id IS NOT NULL
+    )
+    GROUP BY season_id, user_id
+"""
+
+
+def rebuild_season_totals(conn):
+    """ساخت دوباره season_totals از روی کل جدول transactions
+
+    commit بر عهده فراخواننده است تا در تراکنش مایگریشن هم قابل استفاده باشد.
+
+    Returns:
+        int: تعداد سطرهای ساخته شده
+    """
+    conn.execute("DELETE FROM season_totals")
+    conn.execute(REBUILD_QUERY)
+    return conn.execute("SELECT COUNT(*) FROM season_totals").fetchone()[0]
+
+
+def get_season_leaderboard(season_id=None, limit=10):
+    """تابلوی امتیازات (بیشترین امتیاز دریافتی)
+
+    Args:
+        season_id (int, optional): شناسه فصل؛ None یعنی مجموع همه فصل‌ها
+        limit (int): تعداد نفرات
+
+    Returns:
+        list: لیست (touser, total, name) یا [] در صورت خطا
+    """
+    conn = get_connection()
+    try:
+        c = conn.cursor()
+        if season_id is not None:
+            c.execute("""
+                SELECT st.user_id AS touser, st.received AS total, u.name
+                FROM season_totals st
+                LEFT JOIN users u ON st.user_id = u.user_id
+                WHERE st.season_id = ? AND st.received_count > 0
+                ORDER BY st.received DESC LIMIT ?
+            """, (season_id, limit))
+        else:
+            # مجموع همه فصل‌ها: حداکثر (تعداد فصل‌ها × تعداد کاربران) سطر
+            c.execute("""
+                SELECT st.user_id AS touser, SUM(st.received) AS total, u.name
+                FROM season_totals st
+                LEFT JOIN users u ON st.user_id = u.user_id
+                GROUP BY st.user_id
+                HAVING SUM(st.received_count) > 0
+                ORDER BY total DESC LIMIT ?
+            """, (limit,))
+        return c.fetchall()
+    except Exception as e:
+        logger.error(f"خطا در دریافت تابلوی امتیازات: {e}")
+        return []
+    finally:
+        if conn:
+            conn.close()
+
+
+def get_user_totals(user_id, season_id, conn=None):
+    """مجموع امتیازهای یک کاربر در یک فصل
+
+    Returns:
+        tuple: (received, given, received_count, given_count)؛ صفر اگر تراکنشی نداشته باشد
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        row = conn.execute("""
+            SELECT received, given, received_count, given_count
+            FROM season_totals WHERE season_id = ? AND user_id = ?
+        """, (season_id, user_id)).fetchone()
+        return tuple(row) if row else (0, 0, 0, 0)
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def get_user_rank(user_id, season_id, conn=None):
+    """رتبه کاربر بر اساس امتیاز دریافتی در فصل (مانند RANK(): امتیاز برابر = رتبه برابر)
+
+    Returns:
+        tuple: (rank, total_users)؛ (0, 0) اگر کاربر در این فصل امتیازی دریافت نکرده باشد
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        received, _, received_count, _ = get_user_totals(user_id, season_id, conn)
+        if not received_count:
+            return 0, 0
+        above, total_users = conn.execute("""
+            SELECT
+                (SELECT COUNT(*) FROM season_totals
+                 WHERE season_id = ? AND received > ? AND received_count > 0),
+                (SELECT COUNT(*) FROM season_totals
+                 WHERE season_id = ? AND received_count > 0)
+        """, (season_id, received, season_id)).fetchone()
+        return above + 1, total_users
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def get_user_transaction_count(user_id, given=True, season_id=None):
+    """تعداد تراکنش‌های داده شده یا دریافتی کاربر از شمارنده‌های season_totals
+
+    Args:
+        season_id (int, optional): شناسه فصل؛ None یعنی مجموع همه فصل‌ها
+
+    Returns:
+        int: تعداد تراکنش‌ها (0 در صورت خطا)
+    """
+    column = "given_count" if given else "received_count"
+    conn = get_connection()
+    try:
+        if season_id is not None:
+            row = conn.execute(
+                f"SELECT {column} FROM season_totals WHERE season_id = ? AND user_id = ?",
+                (season_id, user_id)
+            ).fetchone()
+        else:
+            # کلید اصلی (season_id, user_id) است؛ فصل‌ها یکی‌یکی با جستجوی ایندکس پیمایش
+            # می‌شوند (loose index scan) تا کل جدول اسکن نشود
+            row = conn.execute(f"""
+                WITH RECURSIVE seasons(id) AS (
+                    SELECT MIN(season_id) FROM season_totals
+                    UNION ALL
+                    SELECT (SELECT MIN(season_id) FROM season_totals WHERE season_id > seasons.id)
+                    FROM seasons WHERE seasons.id IS NOT NULL
+                )
+                SELECT SUM({column}) FROM season_totals
+                WHERE season_id IN (SELECT id FROM seasons) AND user_id = ?
+            """, (user_id,)).fetchone()
+        return (row[0] or 0) if row else 0
+    except Exception as e:
+        logger.error(f"خطا در شمارش تراکنش‌های کاربر {user_id}: {e}")
+        return 0
+    finally:
+        conn.close()
@@ -0,0 +1,123 @@
+"""
+صفحه‌بندی تاریخچه تراکنش‌های کاربر با کلید (keyset pagination)
+صفحه‌بندی با OFFSET برای صفحه n همه سطرهای صفحه‌های قبلی را هم می‌خواند و هر صفحه
+یک COUNT(*) جداگانه داشت. اینجا هر صفحه از جایگاه (created_at, transaction_id) آخرین
+سطر صفحه قبل با ایندکس‌های (touser|user_id, season_id, created_at) ادامه پیدا می‌کند و
+تعداد کل از شمارنده‌های season_totals خوانده می‌شود؛ پس صفحه‌های عمیق همان هزینه صفحه
+اول را دارند. جایگاه به شکل فشرده (cursor) در callback_data دکمه‌ها قرار می‌گیرد.
+"""
+import re
+import logging
+
+from .db_utils import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+# تعداد تراکنش‌های هر صفحه تاریخچه
+HISTORY_PAGE_SIZE = 3
+
+# قالب created_at که CURRENT_TIMESTAMP در SQLite تولید می‌کند
+_TIMESTAMP = re.compile(r"^(\d{4})-(\d{2})-(\d{2}) (\d{2}):(\d{2}):(\d{2})$")
+_DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+
+def _to_base36(number):
+    text = ""
+    while True:
+        number, digit = divmod(number, 36)
+        text = _DIGITS[digit] + text
+        if not number:
+            return text
+
+
+def encode_cursor(created_at, transaction_id):
+    """تبدیل جایگاه یک سطر به متن فشرده برای callback_data (مثلاً «2l3fq0kxa.1e8»)
+
+    Returns:
+        str: cursor یا None اگر created_at در قالب استاندارد نباشد
+    """
+    match = _TIMESTAMP.match(str(created_at or ""))
+    if not match or transaction_id is None:
+        return None
+    return f"{_to_base36(int(''.join(match.groups())))}.{_to_base36(int(transaction_id))}"
+
+
+def decode_cursor(cursor):
+    """تبدیل cursor به (created_at, transaction_id)
+
+    Returns:
+        tuple: جایگاه سطر یا None اگر cursor نامعتبر باشد
+    """
+    try:
+        stamp, transaction_id = cursor.split(".")
+        digits = str(int(stamp, 36)).zfill(14)
+        transaction_id = int(transaction_id, 36)
+    except (AttributeError, ValueError):
+        return None
+    if len(digits) != 14:
+        return None
+    created_at = f"{digits[:4]}-{digits[4:6]}-{digits[6:8]} {digits[8:10]}:{digits[10:12]}:{digits[12:]}"
+    return created_at, transaction_id
+
+
+def _page_query(given, season_id, after, newer):
+    # تراکنش‌های داده شده: طرف مقابل گیرنده است؛ دریافتی: طرف مقابل فرستنده است
+    owner, other = ("user_id", "touser") if given else ("touser", "user_id")
+    conditions = [f"t.{owner} = ?"]
+    if season_id is not None:
+        conditions.append("t.season_id = ?")
+    if after is not None:
+        conditions.append(f"(t.created_at, t.transaction_id) {'>' if newer else '<'} (?, ?)")
+    order = "ASC" if newer else "DESC"
+    return f"""
+        SELECT t.amount, t.{other}, u.name, t.reason, t.created_at, t.message_id, t.transaction_id, t.season_id
+        FROM transactions t
+        LEFT JOIN users u ON t.{other} = u.user_id
+        WHERE {' AND '.join(conditions)}
+        ORDER BY t.created_at {order}, t.transaction_id {order}
+        LIMIT ?
+    """
+
+
+def get_transactions_page(user_id, given=True, season_id=None, cursor=None, newer=False,
+                          limit=HISTORY_PAGE_SIZE):
+    """یک صفحه از تراکنش‌های کاربر (جدیدترین اول)
+
+    Args:
+        user_id (int): شناسه کاربر
+        given (bool): تراکنش‌های داده شده (True) یا دریافتی (False)
+        season_id (int, optional): شناسه فصل؛ None یعنی همه فصل‌ها
+        cursor (str, optional): جایگاه سطر مرز؛ None یعنی صفحه اول
+        newer (bool): صفحه سطرهای جدیدتر از cursor (دکمه قبلی) به جای قدیمی‌تر (دکمه بعدی)
+        limit (int): تعداد سطرهای صفحه
+
+    Returns:
+        tuple: (rows, has_more) که rows با ستون‌های get_user_transactions است و has_more
+        یعنی در همان جهت حرکت سطر دیگری وجود دارد
+    """
+    after = decode_cursor(cursor) if cursor else None
+    if after is None:
+        newer = False
+    params = [user_id]
+    if season_id is not None:
+        params.append(season_id)
+    if after is not None:
+        params.extend(after)
+    params.append(limit + 1)
+
+    conn = None
+    try:
+        conn = get_db_connection()
+        rows = conn.execute(_page_query(given, season_id, after, newer), params).fetchall()
+    except Exception as e:
+        logger.error(f"خطا در دریافت صفحه تراکنش‌های کاربر {user_id}: {e}")
+        return [], False
+    finally:
+        if conn:
+            conn.close()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if newer:
+        rows.reverse()
+    return rows, has_more
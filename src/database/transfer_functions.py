@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+انتقال امتیاز بین کاربران به صورت اتمیک
+پیش‌تر موجودی فرستنده جدا خوانده و سپس کم می‌شد و درج تراکنش هم جدا انجام می‌شد؛
+دو کلیک پشت سر هم یا دو درخواست همزمان می‌توانستند بیش از موجودی خرج کنند.
+transfer_kudos کسر مشروط موجودی (WHERE balance >= ?) و درج تراکنش را به عنوان یک
+عملیات صف نوشتن (write_queue) در یک SAVEPOINT داخل BEGIN IMMEDIATE دسته انجام می‌دهد
+و با کلید یکتایی هر درخواست را حداکثر یک بار ثبت می‌کند.
+"""
+import sqlite3
+import logging
+from collections import namedtuple
+
+from . import write_queue
+from .connection_pool import get_connection
+
+logger = logging.getLogger(__name__)
+
+# وضعیت‌های نتیجه انتقال
+TRANSFER_OK = "ok"
+TRANSFER_INSUFFICIENT_BALANCE = "insufficient_balance"
+TRANSFER_DUPLICATE = "duplicate"
+TRANSFER_INVALID = "invalid"
+TRANSFER_ERROR = "error"
+
+# status: یکی از وضعیت‌های بالا، transaction_id: شناسه سطر transactions (در DUPLICATE
+# شناسه سطر ثبت شده قبلی)، balance: موجودی فرستنده پس از عملیات (None اگر نامعلوم)
+TransferResult = namedtuple("TransferResult", ["status", "transaction_id", "balance"])
+
+
+def make_idempotency_key(user_id, request_id):
+    """کلید یکتایی یک درخواست امتیازدهی (شناسه تراکنش ساخته شده در گفتگو + فرستنده)"""
+    return f"transfer:{user_id}:{request_id}"
+
+
+def _existing(conn, idempotency_key):
+    row = conn.execute(
+        "SELECT transaction_id FROM transactions WHERE idempotency_key = ?", (idempotency_key,)
+    ).fetchone()
+    return row[0] if row else None
+
+
+def _balance(conn, user_id):
+    row = conn.execute("SELECT balance FROM users WHERE user_id = ?", (user_id,)).fetchone()
+    return row[0] if row else None
+
+
+def _transfer(conn, sender_id, receiver_id, amount, season_id, reason, message_id, idempotency_key):
+    """عملیات صف نوشتن: بررسی کلید، کسر مشروط اعتبار و درج تراکنش
+
+    خطای یکتایی (IntegrityError) به فراخواننده می‌رسد و صف، SAVEPOINT را برمی‌گرداند.
+    """
+    if idempotency_key is not None:
+        existing = _existing(conn, idempotency_key)
+        if existing is not None:
+            return TransferResult(TRANSFER_DUPLICATE, existing, _balance(conn, sender_id))
+
+    cursor = conn.execute(
+        "UPDATE users SET balance = balance - ? WHERE user_id = ? AND balance >= ?",
+        (amount, sender_id, amount)
+    )
+    if cursor.rowcount == 0:
+        return TransferResult(TRANSFER_INSUFFICIENT_BALANCE, None, _balance(conn, sender_id))
+
+    cursor = conn.execute("""
+        INSERT INTO transactions (user_id, touser, amount, season_id, reason, message_id, idempotency_key)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (sender_id, receiver_id, amount, season_id, reason, message_id, idempotency_key))
+    return TransferResult(TRANSFER_OK, cursor.lastrowid, _balance(conn, sender_id))
+
+
+def _is_valid(sender_id, receiver_id, amount):
+    return bool(isinstance(amount, int) and amount > 0 and receiver_id and sender_id != receiver_id)
+
+
+def _failed(error, sender_id, receiver_id, amount, idempotency_key):
+    """نتیجه عملیات شکست خورده (ایندکس یکتای کلید، آخرین سد در برابر ثبت دوباره است)"""
+    if isinstance(error, sqlite3.IntegrityError) and idempotency_key is not None:
+        conn = get_connection()
+        try:
+            existing = _existing(conn, idempotency_key)
+            if existing is not None:
+                logger.warning(f"تراکنش تکراری با کلید {idempotency_key} رد شد")
+                return TransferResult(TRANSFER_DUPLICATE, existing, _balance(conn, sender_id))
+        finally:
+            conn.close()
+    logger.error(f"خطا در انتقال {amount} امتیاز از {sender_id} به {receiver_id}: {error}")
+    return TransferResult(TRANSFER_ERROR, None, None)
+
+
+def transfer_kudos(sender_id, receiver_id, amount, season_id, reason, message_id=None, idempotency_key=None):
+    """کم کردن اعتبار فرستنده و ثبت تراکنش در یک تراکنش دیتابیس
+
+    Args:
+        sender_id (int): شناسه کاربر فرستنده
+        receiver_id (int): شناسه کاربر گیرنده
+        amount (int): مقدار امتیاز (مثبت)
+        season_id (int): شناسه فصل
+        reason (str): دلیل امتیازدهی
+        message_id (int, optional): شناسه پیام تلگرام
+        idempotency_key (str, optional): کلید یکتایی؛ درخواست تکراری با همین کلید ثبت نمی‌شود
+
+    Returns:
+        TransferResult: (status, transaction_id, balance)
+    """
+    if not _is_valid(sender_id, receiver_id, amount):
+        return TransferResult(TRANSFER_INVALID, None, None)
+    try:
+        return write_queue.run(
+            _transfer, sender_id, receiver_id, amount, season_id, reason, message_id, idempotency_key
+        )
+    except Exception as e:
+        return _failed(e, sender_id, receiver_id, amount, idempotency_key)
+
+
+async def transfer_kudos_async(sender_id, receiver_id, amount, season_id, reason, message_id=None,
+                               idempotency_key=None):
+    """نسخه awaitable از transfer_kudos (انتظار روی صف نوشتن بدون اشغال ترد)"""
+    if not _is_valid(sender_id, receiver_id, amount):
+        return TransferResult(TRANSFER_INVALID, None, None)
+    try:
+        return await write_queue.run_async(
+            _transfer, sender_id, receiver_id, amount, season_id, reason, message_id, idempotency_key
+        )
+    except Exception as e:
+        return _failed(e, sender_id, receiver_id, amount, idempotency_key)
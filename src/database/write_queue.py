@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+صف نوشتن با commit گروهی (group commit)
+هر مسیر نوشتن قبلاً اتصال خودش را باز می‌کرد و جداگانه commit می‌کرد؛ SQLite در هر
+لحظه فقط یک نویسنده دارد و زیر بار، نوشتن‌ها پشت قفل صف می‌کشیدند یا با
+«database is locked» شکست می‌خوردند. در این ماژول یک ترد نویسنده، عملیات صف شده را
+جمع می‌کند (حداکثر WRITE_BATCH_MAX_OPS عملیات یا WRITE_BATCH_MAX_DELAY ثانیه پس از
+رسیدن اولین عملیات) و همه را در یک BEGIN IMMEDIATE و یک commit اجرا می‌کند.
+
+هر عملیات تابعی به شکل ``op(conn, *args)`` است که در SAVEPOINT خودش اجرا می‌شود؛
+خطای یک عملیات فقط همان عملیات را برمی‌گرداند و بقیه دسته commit می‌شوند.
+فراخواننده یک Future می‌گیرد که پس از commit (یا شکست) دسته مقدار می‌گیرد؛ پس
+هر کاری که باید پس از ثبت قطعی انجام شود (باطل کردن کش و ...) بعد از انتظار روی
+Future انجام می‌شود. عملیات نباید خودش commit یا rollback کند.
+"""
+
+import time
+import queue
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+
+from .connection_pool import get_connection
+
+logger = logging.getLogger(__name__)
+
+# حداکثر تعداد عملیات در یک commit
+WRITE_BATCH_MAX_OPS = 100
+# حداکثر زمان انتظار برای پر شدن دسته پس از رسیدن اولین عملیات (ثانیه)
+WRITE_BATCH_MAX_DELAY = 0.005
+
+_STOP = object()
+
+
+class _WriteOp:
+    """یک عملیات صف شده"""
+
+    __slots__ = ("func", "args", "kwargs", "future", "queued_at")
+
+    def __init__(self, func, args, kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+        self.queued_at = time.monotonic()
+
+
+class WriteQueue:
+    """صف نوشتن با یک ترد نویسنده و commit گروهی
+
+    Args:
+        max_ops (int): حداکثر عملیات هر دسته
+        max_delay (float): حداکثر انتظار برای پر شدن دسته (ثانیه)
+    """
+
+    def __init__(self, max_ops=WRITE_BATCH_MAX_OPS, max_delay=WRITE_BATCH_MAX_DELAY):
+        self.max_ops = max_ops
+        self.max_delay = max_delay
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = False
+        self._stats = {
+            "submitted": 0,
+            "committed": 0,
+            "failed": 0,
+            "batches": 0,
+            "batch_failures": 0,
+            "max_batch": 0,
+            "commit_ms_total": 0.0,
+            "commit_ms_last": 0.0,
+            "commit_ms_max": 0.0,
+            "wait_ms_total": 0.0,
+            "wait_ms_max": 0.0,
+        }
+
+    def _ensure_thread(self):
+        if self._thread is None or self._stopped:
+            with self._lock:
+                if self._stopped:
+                    raise RuntimeError("صف نوشتن دیتابیس متوقف شده است")
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="db-group-writer", daemon=True)
+                    self._thread.start()
+
+    def submit(self, func, *args, **kwargs):
+        """افزودن یک عملیات به صف
+
+        Args:
+            func (callable): تابع ``func(conn, *args, **kwargs)``
+
+        Returns:
+            concurrent.futures.Future: خروجی تابع پس از commit دسته
+        """
+        self._ensure_thread()
+        op = _WriteOp(func, args, kwargs)
+        with self._lock:
+            self._stats["submitted"] += 1
+        self._queue.put(op)
+        return op.future
+
+    def _collect(self):
+        """انتظار برای اولین عملیات و جمع کردن دسته تا رسیدن به سقف تعداد یا زمان"""
+        first = self._queue.get()
+        if first is _STOP:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_ops:
+            remaining = deadline - time.monotonic()
+            try:
+                op = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if op is _STOP:
+                # عملیات باقیمانده پیش از توقف اجرا می‌شوند
+                self._queue.put(_STOP)
+                break
+            batch.append(op)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                break
+            self._commit_batch(batch)
+
+    def _commit_batch(self, batch):
+        started = time.monotonic()
+        results = []
+        conn = get_connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for op in batch:
+                # فراخواننده‌ای که پیش از اجرا لغو شده (مثلاً task لغو شده asyncio) اجرا نمی‌شود
+                if not op.future.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT write_op")
+                try:
+                    result = op.func(conn, *op.args, **op.kwargs)
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write_op")
+                    conn.execute("RELEASE write_op")
+                    results.append((op, None, e))
+                else:
+                    conn.execute("RELEASE write_op")
+                    results.append((op, result, None))
+            conn.commit()
+        except Exception as e:
+            logger.error(f"خطا در commit گروهی {len(batch)} عملیات: {e}")
+            try:
+                if conn.in_transaction:
+                    conn.rollback()
+            except Exception as rollback_error:
+                logger.warning(f"خطا در rollback دسته نوشتن: {rollback_error}")
+            with self._lock:
+                self._stats["batches"] += 1
+                self._stats["batch_failures"] += 1
+                self._stats["failed"] += len(batch)
+            for op in batch:
+                if op.future.running() or op.future.set_running_or_notify_cancel():
+                    op.future.set_exception(e)
+            return
+        finally:
+            conn.close()
+
+        finished = time.monotonic()
+        commit_ms = (finished - started) * 1000
+        failed = sum(1 for _, _, error in results if error is not None)
+        with self._lock:
+            stats = self._stats
+            stats["batches"] += 1
+            stats["committed"] += len(results) - failed
+            stats["failed"] += failed
+            stats["max_batch"] = max(stats["max_batch"], len(batch))
+            stats["commit_ms_last"] = commit_ms
+            stats["commit_ms_total"] += commit_ms
+            stats["commit_ms_max"] = max(stats["commit_ms_max"], commit_ms)
+            for op in batch:
+                wait_ms = (finished - op.queued_at) * 1000
+                stats["wait_ms_total"] += wait_ms
+                stats["wait_ms_max"] = max(stats["wait_ms_max"], wait_ms)
+
+        for op, result, error in results:
+            if error is not None:
+                op.future.set_exception(error)
+            else:
+                op.future.set_result(result)
+
+    def depth(self):
+        """تعداد عملیات منتظر در صف"""
+        return self._queue.qsize()
+
+    def get_stats(self):
+        """آمار صف: عمق صف، تعداد دسته‌ها و زمان commit و انتظار (میلی‌ثانیه)"""
+        with self._lock:
+            stats = dict(self._stats)
+        batches = stats["batches"] or 1
+        done = (stats["committed"] + stats["failed"]) or 1
+        stats["queue_depth"] = self.depth()
+        stats["avg_batch"] = round((stats["committed"] + stats["failed"]) / batches, 2)
+        stats["commit_ms_avg"] = round(stats.pop("commit_ms_total") / batches, 3)
+        stats["wait_ms_avg"] = round(stats.pop("wait_ms_total") / done, 3)
+        return stats
+
+    def stop(self, wait=True):
+        """توقف ترد نویسنده پس از اجرای عملیات صف شده"""
+        with self._lock:
+            self._stopped = True
+            thread = self._thread
+        if thread is None:
+            return
+        self._queue.put(_STOP)
+        if wait:
+            thread.join()
+
+
+_default_queue = WriteQueue()
+
+
+def submit(func, *args, **kwargs):
+    """افزودن یک عملیات به صف پیش‌فرض (خروجی: Future)"""
+    return _default_queue.submit(func, *args, **kwargs)
+
+
+def run(func, *args, **kwargs):
+    """اجرای همگام یک عملیات در صف و انتظار برای commit
+
+    نباید از داخل خود یک عملیات صف فراخوانی شود.
+    """
+    return _default_queue.submit(func, *args, **kwargs).result()
+
+
+async def run_async(func, *args, **kwargs):
+    """نسخه awaitable از run (بدون اشغال ترد در زمان انتظار)"""
+    return await asyncio.wrap_future(_default_queue.submit(func, *args, **kwargs))
+
+
+def _execute(conn, query, params):
+    conn.execute(query, params or ())
+    return True
+
+
+def execute(query, params=None):
+    """اجرای یک دستور نوشتن در صف (هم‌ارز execute_db_query با commit=True)
+
+    Returns:
+        bool: True در صورت موفقیت، None در صورت خطا
+    """
+    try:
+        return run(_execute, query, params)
+    except Exception as e:
+        logger.error(f"خطا در اجرای کوئری: {e}")
+        logger.error(f"کوئری: {query}")
+        logger.error(f"پارامترها: {params}")
+        return None
+
+
+async def execute_async(query, params=None):
+    """نسخه awaitable از execute"""
+    try:
+        return await run_async(_execute, query, params)
+    except Exception as e:
+        logger.error(f"خطا در اجرای کوئری: {e}")
+        logger.error(f"کوئری: {query}")
+        logger.error(f"پارامترها: {params}")
+        return None
+
+
+def get_stats():
+    """آمار صف نوشتن پیش‌فرض"""
+    return _default_queue.get_stats()
+
+
+def shutdown(wait=True):
+    """توقف صف نوشتن پیش‌فرض (هنگام خاموش شدن ربات)"""
+    _default_queue.stop(wait=wait)
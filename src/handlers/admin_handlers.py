@@ -1,6 +1,7 @@
 """
 Handler های مربوط به عملیات ادمین
 """
+import html
 import logging
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
@@ -12,56 +13,59 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 import config
 
-from ..database.models import db_manager
 from ..database.user_functions import get_or_create_user
+from ..database.async_db import run_read, execute_query
+from ..database.search_functions import search_transactions
+from ..services import settings
+from ..services import permissions
+from ..services import membership
 
 logger = logging.getLogger(__name__)
 
-async def check_channel_membership(user_id, context):
-    """بررسی عضویت کاربر در کانال"""
+async def check_channel_membership(user_id, context, force_refresh=False):
+    """بررسی عضویت کاربر در کانال
+
+    نتیجه در کش عضویت نگه داشته می‌شود؛ با force_refresh همیشه از API تلگرام پرسیده می‌شود.
+    """
+    if not force_refresh:
+        cached = membership.get_cached(user_id)
+        if cached is not None:
+            return cached
+    else:
+        membership.note_refresh()
+    
     try:
-        logger.info(f"Checking membership for user {user_id} in channel {config.CHANNEL_ID}")
+        logger.debug(f"Checking membership for user {user_id} in channel {config.CHANNEL_ID}")
         
         # بررسی عضویت در کانال
         member = await context.bot.get_chat_member(config.CHANNEL_ID, user_id)
-        is_member = member.status in ['member', 'administrator', 'creator']
+        is_member = membership.record_status(user_id, member.status)
         
-        logger.info(f"User {user_id} membership status: {member.status}")
+        logger.debug(f"User {user_id} membership status: {member.status}")
         return is_member
         
     except TelegramError as e:
         logger.error(f"Error checking channel membership: {e}")
         return False
 
+async def handle_channel_member_update(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """به‌روزرسانی کش عضویت با رویدادهای chat_member کانال
+
+    فقط وقتی ربات در کانال ادمین باشد این رویدادها دریافت می‌شوند.
+    """
+    chat_member = update.chat_member
+    if not chat_member or str(chat_member.chat.id) != str(config.CHANNEL_ID):
+        return
+    new_member = chat_member.new_chat_member
+    membership.apply_member_update(new_member.user.id, new_member.status)
+
 def is_admin(user_id):
-    """بررسی آیا کاربر ادمین است"""
-    result = db_manager.execute_query(
-        "SELECT role, permissions FROM admins WHERE user_id=?", 
-        (user_id,), 
-        fetchone=True
-    )
-    return result is not None
+    """بررسی آیا کاربر ادمین است (از کش سرویس دسترسی‌ها)"""
+    return permissions.is_admin(user_id)
 
 def get_admin_permissions(user_id):
-    """دریافت دسترسی‌های ادمین"""
-    result = db_manager.execute_query(
-        "SELECT role, permissions FROM admins WHERE user_id=?", 
-        (user_id,), 
-        fetchone=True
-    )
-    
-    if not result:
-        return [], ""
-    
-    role, permissions = result
-    
-    if role == 'god':
-        from ..database.models import ADMIN_PERMISSIONS
-        return [p[0] for p in ADMIN_PERMISSIONS], role
-    elif permissions:
-        return [p.strip() for p in permissions.split(",") if p.strip()], role
-    else:
-        return [], role
+    """دریافت دسترسی‌های ادمین (از کش سرویس دسترسی‌ها)"""
+    return permissions.get_admin_permissions(user_id)
 
 async def handle_user_approval(update: Update, context: ContextTypes.DEFAULT_TYPE, user_id: int, approved: bool):
     """پردازش تایید یا رد کاربر"""
@@ -112,7 +116,7 @@ async def handle_user_approval(update: Update, context: ContextTypes.DEFAULT_TYP
 
 async def handle_broadcast_message(context: ContextTypes.DEFAULT_TYPE, message_text: str, sender_id: int):
     """ارسال پیام همگانی به تمام کاربران"""
-    users = db_manager.execute_query("SELECT user_id FROM users")
+    users = await execute_query("SELECT user_id FROM users")
     success_count = 0
     fail_count = 0
     
@@ -145,7 +149,7 @@ async def handle_admin_callbacks(update: Update, context: ContextTypes.DEFAULT_T
     user_id = query.from_user.id
     
     # بررسی دسترسی ادمین
-    if not is_admin(user_id):
+    if not await permissions.is_admin_async(user_id):
         await query.answer("❌ شما دسترسی ادمین ندارید.", show_alert=True)
         return True
     
@@ -153,7 +157,7 @@ async def handle_admin_callbacks(update: Update, context: ContextTypes.DEFAULT_T
         if data == "admin_panel^":
             # نمایش پنل ادمین با استفاده از کیبورد تعریف شده در ui_helpers_new
             from ..utils.ui_helpers_new import create_admin_panel_keyboard
-            admin_keyboard = create_admin_panel_keyboard(user_id)
+            admin_keyboard = await run_read(create_admin_panel_keyboard, user_id)
             
             if not admin_keyboard:
                 await query.answer("شما دسترسی ادمین ندارید.", show_alert=True)
@@ -205,6 +209,33 @@ async def handle_admin_callbacks(update: Update, context: ContextTypes.DEFAULT_T
             await _handle_toggle_ai_features(query, user_id)
             return True
             
+        elif data == "admin_search^":
+            # راهنمای جستجو در تراکنش‌ها
+            await query.edit_message_text(
+                "🔎 <b>جستجوی تراکنش‌ها</b>\n\n"
+                "متن مورد نظر را در پیام بعدی ارسال کنید.\n\n"
+                "📝 نکته: جستجو در دلیل امتیازها و نام فرستنده و گیرنده انجام می‌شود.",
+                parse_mode="HTML",
+                reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 بازگشت", callback_data="admin_panel^")]])
+            )
+            
+            # تنظیم state برای دریافت متن جستجو
+            context.user_data['waiting_for_admin_search'] = True
+            return True
+            
+        elif data.startswith("admin_search_page^"):
+            # صفحه‌بندی نتایج جستجو (متن جستجو در user_data نگه داشته می‌شود)
+            parts = data.split("^")
+            page = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 0
+            search_text = context.user_data.get('admin_search_query')
+            if not search_text:
+                await query.answer("جستجو منقضی شده است. لطفاً دوباره جستجو کنید.", show_alert=True)
+                return True
+            
+            text, keyboard = await build_admin_search_page(search_text, page)
+            await query.edit_message_text(text, parse_mode="HTML", reply_markup=keyboard)
+            return True
+            
         elif data == "admin_users^" or data == "admin_transactions^" or data == "admin_stats^" or data == "manage_admins^" or data == "broadcast_menu^" or data == "manage_top_questions^" or data == "manage_seasons^":
             # این کالبک‌ها هنوز در حال توسعه هستند
             await query.answer("این بخش در حال توسعه است و به زودی آماده خواهد شد.", show_alert=True)
@@ -216,40 +247,58 @@ async def handle_admin_callbacks(update: Update, context: ContextTypes.DEFAULT_T
     
     return False
 
-async def _handle_toggle_show_users(query, user_id):
-    """تغییر وضعیت نمایش کاربران در جستجو"""
-    from ..database.models import db_manager
+async def build_admin_search_page(search_text, page=0):
+    """ساخت متن و کیبورد یک صفحه از نتایج جستجوی تراکنش‌ها
     
-    # بررسی وضعیت فعلی
-    result = db_manager.execute_query(
-        "SELECT value FROM settings WHERE key='show_all_users'", 
-        fetchone=True
-    )
-    
-    current_value = result[0] if result else "0"
-    new_value = "0" if current_value == "1" else "1"
+    Returns:
+        tuple: (متن پیام، کیبورد)
+    """
+    rows, has_more = await run_read(search_transactions, search_text, page=page)
     
-    # آپدیت وضعیت در دیتابیس
-    if result:
-        db_manager.execute_query(
-            "UPDATE settings SET value=? WHERE key='show_all_users'", 
-            (new_value,), 
-            commit=True
-        )
+    if not rows:
+        text = f"🔎 هیچ تراکنشی برای «{html.escape(search_text)}» یافت نشد."
     else:
-        db_manager.execute_query(
-            "INSERT INTO settings (key, value) VALUES ('show_all_users', ?)", 
-            (new_value,), 
-            commit=True
-        )
+        text = f"🔎 <b>نتایج جستجو برای «{html.escape(search_text)}»</b> (صفحه {page + 1}):\n\n"
+        for i, row in enumerate(rows):
+            text += f"💎 <b>{row['amount']}</b> امتیاز از 👤 {html.escape(row['giver_name'] or 'نامشخص')} "
+            text += f"به 👤 {html.escape(row['receiver_name'] or 'نامشخص')}\n"
+            text += f"📝 دلیل: {html.escape(row['reason'] or '-')}\n"
+            text += f"🕒 تاریخ: {row['created_at']}\n"
+            
+            # اگر این آخرین آیتم نیست، خط جداکننده اضافه کن
+            if i < len(rows) - 1:
+                text += "\n" + "┄" * 20 + "\n\n"
+    
+    # دکمه‌های ناوبری
+    keyboard = []
+    nav_buttons = []
+    if page > 0:
+        nav_buttons.append(InlineKeyboardButton("« قبلی", callback_data=f"admin_search_page^{page-1}"))
+    if has_more:
+        nav_buttons.append(InlineKeyboardButton("بعدی »", callback_data=f"admin_search_page^{page+1}"))
+    if nav_buttons:
+        keyboard.append(nav_buttons)
+    
+    keyboard.append([InlineKeyboardButton("🔎 جستجوی جدید", callback_data="admin_search^")])
+    keyboard.append([InlineKeyboardButton("🔙 بازگشت", callback_data="admin_panel^")])
+    
+    return text, InlineKeyboardMarkup(keyboard)
+
+async def _handle_toggle_show_users(query, user_id):
+    """تغییر وضعیت نمایش کاربران در جستجو"""
+    # تغییر وضعیت از طریق سرویس تنظیمات (کش همه خوانندگان به‌روز می‌شود)
+    enabled = await settings.toggle_async("show_all_users")
+    if enabled is None:
+        await query.answer("❌ خطا در تغییر تنظیمات.", show_alert=True)
+        return
     
     # نمایش پیام موفقیت
-    status_text = "فعال" if new_value == "1" else "غیرفعال"
+    status_text = "فعال" if enabled else "غیرفعال"
     await query.answer(f"نمایش لیست کاربران {status_text} شد.", show_alert=True)
     
     # به‌روزرسانی پنل ادمین
     from ..utils.ui_helpers_new import create_admin_panel_keyboard
-    admin_keyboard = create_admin_panel_keyboard(user_id)
+    admin_keyboard = await run_read(create_admin_panel_keyboard, user_id)
     
     await query.edit_message_text(
         "👨‍💼 <b>پنل مدیریت</b>\n\n"
@@ -261,38 +310,19 @@ async def _handle_toggle_show_users(query, user_id):
 
 async def _handle_toggle_ai_features(query, user_id):
     """تغییر وضعیت فعال/غیرفعال بودن قابلیت‌های هوش مصنوعی"""
-    from ..database.models import db_manager
-    
-    # بررسی وضعیت فعلی
-    result = db_manager.execute_query(
-        "SELECT value FROM settings WHERE key='ai_features_enabled'", 
-        fetchone=True
-    )
-    
-    current_value = result[0] if result else "1"  # پیش‌فرض: فعال
-    new_value = "0" if current_value == "1" else "1"
-    
-    # آپدیت وضعیت در دیتابیس
-    if result:
-        db_manager.execute_query(
-            "UPDATE settings SET value=? WHERE key='ai_features_enabled'", 
-            (new_value,), 
-            commit=True
-        )
-    else:
-        db_manager.execute_query(
-            "INSERT INTO settings (key, value) VALUES ('ai_features_enabled', ?)", 
-            (new_value,), 
-            commit=True
-        )
+    # تغییر وضعیت از طریق سرویس تنظیمات (کش همه خوانندگان به‌روز می‌شود)
+    enabled = await settings.toggle_async("ai_features_enabled")
+    if enabled is None:
+        await query.answer("❌ خطا در تغییر تنظیمات.", show_alert=True)
+        return
     
     # نمایش پیام موفقیت
-    status_text = "فعال" if new_value == "1" else "غیرفعال"
+    status_text = "فعال" if enabled else "غیرفعال"
     await query.answer(f"قابلیت‌های هوش مصنوعی {status_text} شد.", show_alert=True)
     
     # به‌روزرسانی پنل ادمین
     from ..utils.ui_helpers_new import create_admin_panel_keyboard
-    admin_keyboard = create_admin_panel_keyboard(user_id)
+    admin_keyboard = await run_read(create_admin_panel_keyboard, user_id)
     
     await query.edit_message_text(
         "👨‍💼 <b>پنل مدیریت</b>\n\n"
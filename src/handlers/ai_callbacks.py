@@ -13,7 +13,6 @@ import os
 import sys
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
-import sqlite3
 import datetime
 import random
 
@@ -24,9 +23,12 @@ import config
 # Database and utility imports
 from ..database.models import DatabaseManager
 from ..database.user_functions import get_user_by_id, get_all_users
-from ..database.db_utils import get_user_profile
-from ..database.season_functions import get_active_season
-from ..services.ai import get_user_perspective, generate_user_profile, analyze_admin_data, AI_MODULE_AVAILABLE
+from ..services import permissions
+from ..database.async_db import run_read, execute_query, get_active_season
+from ..services import settings
+from ..services.ai import AI_MODULE_AVAILABLE
+from ..services import ai_jobs
+from ..services import ai_usage
 from ..utils.ui_helpers_new import main_menu_keyboard
 from .top_vote_handlers import handle_top_vote_callbacks, _process_next_top_question, _save_top_vote, _get_active_top_questions, _get_top_results_for_question
 
@@ -41,17 +43,12 @@ async def handle_ai_callbacks(update: Update, context: ContextTypes.DEFAULT_TYPE
     user = update.effective_user
     
     # بررسی وضعیت فعال/غیرفعال بودن قابلیت‌های هوش مصنوعی
-    ai_features_enabled = db_manager.execute_query(
-        "SELECT value FROM settings WHERE key='ai_features_enabled'", 
-        fetchone=True
-    )
-    ai_features_enabled = ai_features_enabled[0] if ai_features_enabled else "1"  # پیش‌فرض: فعال
+    ai_features_enabled = await settings.get_bool_async("ai_features_enabled")
     
     # اگر قابلیت‌های هوش مصنوعی غیرفعال شده باشند و کاربر ادمین نباشد، پیام مناسب نمایش دهیم
     # فقط برای کالبک‌های مرتبط با هوش مصنوعی اعمال شود نه ترین‌ها
-    if ai_features_enabled == "0" and not callback_data.startswith(("top_vote^", "top_select^", "top_results^")):
-        from ..handlers.admin_handlers import is_admin
-        if not is_admin(user.id):
+    if not ai_features_enabled and not callback_data.startswith(("top_vote^", "top_select^", "top_results^")):
+        if not await permissions.is_admin_async(user.id):
             await query.answer("⚠️ این بخش موقتاً غیرفعال است.", show_alert=True)
             await query.edit_message_text(
                 "🤖 <b>دستیار هوشمند</b>\n\n"
@@ -102,6 +99,8 @@ async def handle_ai_callbacks(update: Update, context: ContextTypes.DEFAULT_TYPE
         await _handle_ai_profile(query, user.id)
     elif callback_data == "ai_seasons_view^":
         await _handle_ai_seasons_view(query, user.id)
+    elif callback_data.startswith("ai_job^"):
+        await _handle_ai_job_status(query, user.id, callback_data)
     elif callback_data.startswith("ai_model^"):
         await _handle_ai_model_selection(query, user.id, callback_data, context)
     elif callback_data.startswith("ai_analysis^"):
@@ -157,7 +156,7 @@ async def _handle_ai_perspective(query, user_id, data):
         return
     
     # دریافت فصل فعال
-    active_season = get_active_season()
+    active_season = await get_active_season()
     if not active_season:
         await query.edit_message_text(
             "در حال حاضر هیچ فصل فعالی وجود ندارد!",
@@ -172,7 +171,7 @@ async def _handle_ai_perspective(query, user_id, data):
     if len(data.split("^")) > 1 and data.split("^")[1]:
         season_id = int(data.split("^")[1])
         # دریافت نام فصل
-        season_data = db_manager.execute_query(
+        season_data = await execute_query(
             "SELECT name FROM season WHERE id=?", 
             (season_id,), 
             fetchone=True
@@ -181,18 +180,11 @@ async def _handle_ai_perspective(query, user_id, data):
             season_name = season_data[0]
     
     # بررسی آیا کاربر اخیراً زاویه دید را برای این فصل دریافت کرده است
-    conn = None
     try:
-        conn = sqlite3.connect(config.DB_PATH)
-        conn.row_factory = sqlite3.Row
-        c = conn.cursor()
-        
-        c.execute("""
+        existing = await execute_query("""
             SELECT perspective, created_at FROM user_perspectives 
             WHERE user_id = ? AND season_id = ?
-        """, (user_id, season_id))
-        
-        existing = c.fetchone()
+        """, (user_id, season_id), fetchone=True)
         
         # اگر زاویه دید قبلی وجود دارد، زمان آخرین به‌روزرسانی را بررسی کنیم
         if existing:
@@ -205,9 +197,6 @@ async def _handle_ai_perspective(query, user_id, data):
                 remaining_hours = 24 - int(time_diff)
                 remaining_minutes = 60 - int((time_diff - int(time_diff)) * 60)
                 
-                # فرمت تاریخ و زمان فارسی
-                jalali_time = created_time.strftime("%Y/%m/%d %H:%M:%S")
-                
                 # نمایش پیغام به کاربر با پاپ‌آپ
                 await query.answer(
                     f"شما باید {remaining_hours} ساعت و {remaining_minutes} دقیقه دیگر صبر کنید تا بتوانید زاویه دید را برای این فصل به‌روزرسانی کنید.",
@@ -215,102 +204,21 @@ async def _handle_ai_perspective(query, user_id, data):
                 )
                 
                 # نمایش زاویه دید موجود با افزودن زمان آخرین به‌روزرسانی
-                # افزودن ایموجی‌ها به پاراگراف‌های متن
-                perspective_text = existing['perspective']
-                enhanced_perspective = _add_emojis_to_profile(perspective_text)  # از همان تابع استفاده می‌کنیم
-                
-                # ایجاد دکمه‌های فصل
-                season_buttons = []
-                seasons = db_manager.execute_query(
-                    "SELECT id, name, is_active FROM season ORDER BY is_active DESC, id DESC"
-                )
-                
-                for s in seasons:
-                    s_id, s_name, is_active = s
-                    status = "🟢" if is_active == 1 else "🔴"
-                    if s_id != season_id:  # فصل فعلی را نشان نده
-                        season_buttons.append(
-                            InlineKeyboardButton(f"فصل {s_name} {status}", callback_data=f"ai_perspective^{s_id}")
-                        )
-                
-                # ایجاد دکمه‌های کیبورد
-                keyboard = []
-                # دکمه‌های فصل را به صورت 1 در هر ردیف نمایش بده
-                for button in season_buttons:
-                    keyboard.append([button])
-                
-                keyboard.append([InlineKeyboardButton("» بازگشت", callback_data="ai_chat^")])
-                
-                # تنظیم عنوان پیام
-                message_title = f"🔍 <b>زاویه دید در فصل {season_name}</b>"
-                
-                await query.edit_message_text(
-                    f"{message_title}\n\n{enhanced_perspective}\n\n"
-                    f"🕒 <i>آخرین به‌روزرسانی: {jalali_time}</i>",
-                    reply_markup=InlineKeyboardMarkup(keyboard),
-                    parse_mode="HTML"
+                text, reply_markup = await _perspective_view(
+                    season_id, season_name, existing['perspective'], created_time.strftime("%Y/%m/%d %H:%M:%S")
                 )
+                await query.edit_message_text(text, reply_markup=reply_markup, parse_mode="HTML")
                 return
     except Exception as e:
         logger.error(f"خطا در بررسی وضعیت زاویه دید: {e}")
-    finally:
-        if conn:
-            conn.close()
     
-    # نمایش پیام در حال دریافت
-    await query.edit_message_text(
+    # ثبت کار در صف و نمایش پیام در حال دریافت (پس از پایان کار همین پیام ویرایش می‌شود)
+    await _start_ai_job(
+        query, ai_jobs.JOB_PERSPECTIVE, user_id, season_id,
         f"🔍 <b>در حال تحلیل زاویه دید دیگران...</b>\n\n"
         f"لطفاً کمی صبر کنید. در حال دریافت و تحلیل نظرات دیگران درباره شما در فصل {season_name}...",
-        parse_mode="HTML"
+        "ai_chat^"
     )
-    
-    try:
-        # دریافت زاویه دید دیگران
-        perspective = get_user_perspective(user_id, season_id)
-        
-        # افزودن ایموجی‌ها به پاراگراف‌های متن
-        enhanced_perspective = _add_emojis_to_profile(perspective)
-        
-        # ایجاد دکمه‌های فصل
-        season_buttons = []
-        seasons = db_manager.execute_query(
-            "SELECT id, name, is_active FROM season ORDER BY is_active DESC, id DESC"
-        )
-        
-        for s in seasons:
-            s_id, s_name, is_active = s
-            status = "🟢" if is_active == 1 else "🔴"
-            if s_id != season_id:  # فصل فعلی را نشان نده
-                season_buttons.append(
-                    InlineKeyboardButton(f"فصل {s_name} {status}", callback_data=f"ai_perspective^{s_id}")
-                )
-        
-        # ایجاد دکمه‌های کیبورد
-        keyboard = []
-        # دکمه‌های فصل را به صورت 1 در هر ردیف نمایش بده
-        for button in season_buttons:
-            keyboard.append([button])
-        
-        keyboard.append([InlineKeyboardButton("» بازگشت", callback_data="ai_chat^")])
-        
-        # تنظیم عنوان پیام
-        message_title = f"🔍 <b>زاویه دید در فصل {season_name}</b>"
-        
-        # زمان فعلی برای نمایش زمان به‌روزرسانی
-        current_time = datetime.datetime.now().strftime("%Y/%m/%d %H:%M:%S")
-        
-        await query.edit_message_text(
-            f"{message_title}\n\n{enhanced_perspective}\n\n"
-            f"🕒 <i>آخرین به‌روزرسانی: {current_time}</i>",
-            reply_markup=InlineKeyboardMarkup(keyboard),
-            parse_mode="HTML"
-        )
-    except Exception as e:
-        logger.error(f"خطا در دریافت زاویه دید: {e}")
-        await query.edit_message_text(
-            "❌ متأسفانه در دریافت زاویه دید خطایی رخ داد. لطفاً دوباره تلاش کنید.",
-            reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("» بازگشت", callback_data="ai_chat^")]])
-        )
 
 
 async def _handle_ai_profile(query, user_id):
@@ -328,14 +236,12 @@ async def _handle_ai_profile(query, user_id):
         return
     
     # بررسی آیا کاربر اخیراً پروفایل هوشمند دریافت کرده است
-    conn = None
     try:
-        conn = sqlite3.connect(config.DB_PATH)
-        conn.row_factory = sqlite3.Row
-        c = conn.cursor()
-        
-        c.execute("SELECT profile_text, created_at FROM user_profiles WHERE user_id = ?", (user_id,))
-        existing = c.fetchone()
+        existing = await execute_query(
+            "SELECT profile_text, created_at FROM user_profiles WHERE user_id = ?",
+            (user_id,),
+            fetchone=True
+        )
         
         # اگر پروفایل قبلی وجود دارد، زمان آخرین به‌روزرسانی را بررسی کنیم
         if existing:
@@ -348,9 +254,6 @@ async def _handle_ai_profile(query, user_id):
                 remaining_hours = 24 - int(time_diff)
                 remaining_minutes = 60 - int((time_diff - int(time_diff)) * 60)
                 
-                # فرمت تاریخ و زمان فارسی
-                jalali_time = created_time.strftime("%Y/%m/%d %H:%M:%S")
-                
                 # نمایش پیغام به کاربر با پاپ‌آپ
                 await query.answer(
                     f"شما باید {remaining_hours} ساعت و {remaining_minutes} دقیقه دیگر صبر کنید تا بتوانید پروفایل خود را به‌روزرسانی کنید.",
@@ -358,75 +261,202 @@ async def _handle_ai_profile(query, user_id):
                 )
                 
                 # نمایش پروفایل موجود با افزودن زمان آخرین به‌روزرسانی
-                # افزودن ایموجی‌های مناسب به متن برای خوانایی بهتر
-                profile_text = existing['profile_text']
-                
-                # افزودن ایموجی‌ها به پاراگراف‌های متن
-                enhanced_profile = _add_emojis_to_profile(profile_text)
-                
-                # دریافت اطلاعات کاربر
-                c.execute("SELECT name FROM users WHERE user_id=?", (user_id,))
-                user_data = c.fetchone()
-                user_name = user_data['name'] if user_data else "کاربر"
-                
-                await query.edit_message_text(
-                    f"👤 <b>پروفایل هوشمند {user_name}</b>\n\n"
-                    f"{enhanced_profile}\n\n"
-                    f"🕒 <i>آخرین به‌روزرسانی: {jalali_time}</i>",
-                    reply_markup=InlineKeyboardMarkup([
-                        [InlineKeyboardButton("🔄 به‌روزرسانی پروفایل", callback_data="ai_profile^")],
-                        [InlineKeyboardButton("» بازگشت", callback_data="ai_chat^")]
-                    ]),
-                    parse_mode="HTML"
+                text, reply_markup = await _profile_view(
+                    user_id, existing['profile_text'], created_time.strftime("%Y/%m/%d %H:%M:%S")
                 )
+                await query.edit_message_text(text, reply_markup=reply_markup, parse_mode="HTML")
                 return
     except Exception as e:
         logger.error(f"خطا در بررسی وضعیت پروفایل: {e}")
-    finally:
-        if conn:
-            conn.close()
     
-    # نمایش پیام در حال دریافت
-    await query.edit_message_text(
+    # ثبت کار در صف و نمایش پیام در حال دریافت
+    await _start_ai_job(
+        query, ai_jobs.JOB_PROFILE, user_id, None,
         "👤 <b>در حال ایجاد پروفایل هوشمند...</b>\n\n"
         "لطفاً کمی صبر کنید. در حال تحلیل داده‌ها و ایجاد پروفایل هوشمند شما...",
-        parse_mode="HTML"
+        "ai_chat^"
     )
+
+
+async def _perspective_view(season_id, season_name, perspective, updated_at):
+    """متن و دکمه‌های نمایش زاویه دید (دکمه فصل‌های دیگر و بازگشت)"""
+    # افزودن ایموجی‌ها به پاراگراف‌های متن
+    enhanced_perspective = _add_emojis_to_profile(perspective)
     
-    try:
-        # ایجاد پروفایل کاربر
-        profile = generate_user_profile(user_id)
-        
-        # افزودن ایموجی‌های مناسب به متن برای خوانایی بهتر
-        enhanced_profile = _add_emojis_to_profile(profile)
-        
-        # دریافت اطلاعات کاربر
-        user_data = db_manager.execute_query(
-            "SELECT name FROM users WHERE user_id=?", 
-            (user_id,), 
-            fetchone=True
+    seasons = await execute_query(
+        "SELECT id, name, is_active FROM season ORDER BY is_active DESC, id DESC"
+    )
+    # دکمه‌های فصل را به صورت 1 در هر ردیف نمایش بده (فصل فعلی را نشان نده)
+    keyboard = []
+    for s_id, s_name, is_active in seasons or []:
+        status = "🟢" if is_active == 1 else "🔴"
+        if s_id != season_id:
+            keyboard.append([InlineKeyboardButton(f"فصل {s_name} {status}", callback_data=f"ai_perspective^{s_id}")])
+    keyboard.append([InlineKeyboardButton("» بازگشت", callback_data="ai_chat^")])
+    
+    text = (
+        f"🔍 <b>زاویه دید در فصل {season_name}</b>\n\n{enhanced_perspective}\n\n"
+        f"🕒 <i>آخرین به‌روزرسانی: {updated_at}</i>"
+    )
+    return text, InlineKeyboardMarkup(keyboard)
+
+
+async def _profile_view(user_id, profile, updated_at):
+    """متن و دکمه‌های نمایش پروفایل هوشمند"""
+    # افزودن ایموجی‌های مناسب به متن برای خوانایی بهتر
+    enhanced_profile = _add_emojis_to_profile(profile)
+    
+    # دریافت اطلاعات کاربر
+    user_data = await execute_query("SELECT name FROM users WHERE user_id=?", (user_id,), fetchone=True)
+    user_name = user_data[0] if user_data else "کاربر"
+    
+    text = (
+        f"👤 <b>پروفایل هوشمند {user_name}</b>\n\n"
+        f"{enhanced_profile}\n\n"
+        f"🕒 <i>آخرین به‌روزرسانی: {updated_at}</i>"
+    )
+    return text, InlineKeyboardMarkup([
+        [InlineKeyboardButton("🔄 به‌روزرسانی پروفایل", callback_data="ai_profile^")],
+        [InlineKeyboardButton("» بازگشت", callback_data="ai_chat^")]
+    ])
+
+
+def _analysis_view(season_id, season_name, analysis):
+    """متن و دکمه‌های نمایش تحلیل ادمین"""
+    keyboard = [
+        [InlineKeyboardButton("🔄 به‌روزرسانی تحلیل", callback_data=f"ai_analysis^{season_id if season_id else 'all'}^general")],
+        [InlineKeyboardButton("↩️ انتخاب فصل دیگر", callback_data="ai_analysis^back")],
+        [InlineKeyboardButton("» بازگشت به پنل ادمین", callback_data="admin_panel^")]
+    ]
+    return f"🧠 <b>تحلیل هوش مصنوعی - {season_name}</b>\n\n{analysis}", InlineKeyboardMarkup(keyboard)
+
+
+# نام نمایشی قابلیت‌ها در گزارش مصرف
+_USAGE_FEATURES = {
+    "perspective": "زاویه دید",
+    "profile": "پروفایل هوشمند",
+    "analysis": "تحلیل ادمین",
+    "reason": "بهبود متن دلیل",
+    ai_usage.DEFAULT_CALLER: "گفتگو و سایر",
+}
+
+
+def _usage_view(report):
+    """متن و دکمه‌های گزارش مصرف هوش مصنوعی (تأخیر و هزینه هر قابلیت)"""
+    keyboard = InlineKeyboardMarkup([
+        [InlineKeyboardButton("🔄 به‌روزرسانی گزارش", callback_data="ai_analysis^usage")],
+        [InlineKeyboardButton("↩️ بازگشت", callback_data="ai_analysis^back")]
+    ])
+    if report is None:
+        return "💰 <b>مصرف هوش مصنوعی</b>\n\nخطا در دریافت گزارش مصرف.", keyboard
+    if not report["features"]:
+        return f"💰 <b>مصرف هوش مصنوعی</b>\n\nدر {report['days']} روز اخیر فراخوانی ثبت نشده است.", keyboard
+
+    total = sum(f["cost"] for f in report["features"])
+    lines = [f"💰 <b>مصرف هوش مصنوعی - {report['days']} روز اخیر</b>", f"هزینه کل: ${total:.4f}", ""]
+    for f in report["features"]:
+        name = _USAGE_FEATURES.get(f["caller"], f["caller"])
+        lines.append(
+            f"🔹 <b>{name}</b>: {f['calls']} فراخوانی ({f['errors']} خطا، {f['retries']} تلاش دوباره)\n"
+            f"   توکن: {f['prompt_tokens']} ورودی / {f['completion_tokens']} خروجی - ${f['cost']:.4f}\n"
+            f"   تأخیر: میانه {f['p50_ms'] / 1000:.1f} ثانیه، صدک ۹۵ {f['p95_ms'] / 1000:.1f} ثانیه"
         )
-        user_name = user_data[0] if user_data else "کاربر"
-        
-        # زمان فعلی برای نمایش زمان به‌روزرسانی
-        current_time = datetime.datetime.now().strftime("%Y/%m/%d %H:%M:%S")
-        
+    lines += ["", "📅 <b>هزینه روزانه</b>"]
+    for day, caller, calls, tokens, spend in report["daily"][:20]:
+        lines.append(f"{day} - {_USAGE_FEATURES.get(caller, caller)}: {calls} فراخوانی، {tokens} توکن، ${spend:.4f}")
+    return "\n".join(lines), keyboard
+
+
+async def _start_ai_job(query, kind, user_id, season_id, waiting_text, back):
+    """نمایش پیام در حال پردازش و ثبت کار در صف هوش مصنوعی
+
+    هندلر بلافاصله برمی‌گردد؛ کارگر صف پس از دریافت پاسخ، همین پیام را ویرایش می‌کند.
+    درخواست‌های تکراری تا پایان کار قبلی به همان کار می‌پیوندند.
+    """
+    await query.edit_message_text(
+        waiting_text,
+        reply_markup=InlineKeyboardMarkup([
+            [InlineKeyboardButton("🔄 بررسی وضعیت", callback_data=f"ai_job^{kind}^{season_id or 0}")],
+            [InlineKeyboardButton("» بازگشت", callback_data=back)]
+        ]),
+        parse_mode="HTML"
+    )
+    job_id = await ai_jobs.enqueue_async(
+        kind, user_id, season_id, chat_id=query.message.chat_id, message_id=query.message.message_id
+    )
+    if job_id is None:
         await query.edit_message_text(
-            f"👤 <b>پروفایل هوشمند {user_name}</b>\n\n"
-            f"{enhanced_profile}\n\n"
-            f"🕒 <i>آخرین به‌روزرسانی: {current_time}</i>",
-            reply_markup=InlineKeyboardMarkup([
-                [InlineKeyboardButton("🔄 به‌روزرسانی پروفایل", callback_data="ai_profile^")],
-                [InlineKeyboardButton("» بازگشت", callback_data="ai_chat^")]
-            ]),
-            parse_mode="HTML"
+            "❌ متأسفانه در ثبت درخواست خطایی رخ داد. لطفاً دوباره تلاش کنید.",
+            reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("» بازگشت", callback_data=back)]])
         )
-    except Exception as e:
-        logger.error(f"خطا در ایجاد پروفایل هوشمند: {e}")
-        await query.edit_message_text(
-            "❌ متأسفانه در ایجاد پروفایل هوشمند خطایی رخ داد. لطفاً دوباره تلاش کنید.",
-            reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("» بازگشت", callback_data="ai_chat^")]])
+
+
+async def _job_view(job):
+    """متن و دکمه‌های نتیجه یک کار تمام شده صف هوش مصنوعی"""
+    back = "ai_analysis^back" if job.kind == ai_jobs.JOB_ANALYSIS else "ai_chat^"
+    if job.status != ai_jobs.JOB_DONE:
+        return (
+            "❌ متأسفانه در دریافت پاسخ هوش مصنوعی خطایی رخ داد. لطفاً دوباره تلاش کنید.",
+            InlineKeyboardMarkup([[InlineKeyboardButton("» بازگشت", callback_data=back)]])
         )
+    
+    # زمان فعلی برای نمایش زمان به‌روزرسانی
+    current_time = datetime.datetime.now().strftime("%Y/%m/%d %H:%M:%S")
+    if job.kind == ai_jobs.JOB_PROFILE:
+        return await _profile_view(job.user_id, job.result, current_time)
+    
+    season_name = "همه فصل‌ها"
+    if job.season_id:
+        season_data = await execute_query("SELECT name FROM season WHERE id=?", (job.season_id,), fetchone=True)
+        season_name = season_data[0] if season_data else "نامشخص"
+    if job.kind == ai_jobs.JOB_PERSPECTIVE:
+        return await _perspective_view(job.season_id, season_name, job.result, current_time)
+    return _analysis_view(job.season_id, season_name, job.result)
+
+
+async def deliver_ai_job(bot, job, waiters):
+    """ویرایش پیام‌های منتظر یک کار صف هوش مصنوعی با نتیجه آن (notifier صف)"""
+    text, reply_markup = await _job_view(job)
+    for chat_id, message_id in waiters:
+        try:
+            await bot.edit_message_text(
+                text, chat_id=chat_id, message_id=message_id, reply_markup=reply_markup, parse_mode="HTML"
+            )
+        except Exception as e:
+            logger.warning(f"خطا در ویرایش پیام نتیجه هوش مصنوعی ({chat_id}/{message_id}): {e}")
+
+
+async def _handle_ai_job_status(query, user_id, data):
+    """نمایش وضعیت کار صف هوش مصنوعی (دکمه بررسی وضعیت پیام در حال پردازش)"""
+    try:
+        _, kind, season_id = data.split("^")[:3]
+        season_id = int(season_id)
+    except ValueError:
+        await query.answer("درخواست نامعتبر است.", show_alert=True)
+        return
+    
+    # تحلیل ادمین به کاربر خاصی تعلق ندارد
+    if kind == ai_jobs.JOB_ANALYSIS:
+        if not await permissions.has_permission_async(user_id, "admin_stats"):
+            await query.answer("شما به این بخش دسترسی ندارید!", show_alert=True)
+            return
+        user_id = 0
+    
+    job = await ai_jobs.get_latest_job_async(kind, user_id, season_id)
+    if job is None:
+        await query.answer("درخواستی یافت نشد.", show_alert=True)
+        return
+    if job.status == ai_jobs.JOB_PENDING:
+        position = await ai_jobs.get_queue_position_async(job.job_id)
+        await query.answer(f"⏳ درخواست شما در صف است (نوبت {position}). پس از آماده شدن، همین پیام به‌روز می‌شود.")
+        return
+    if job.status == ai_jobs.JOB_RUNNING:
+        await query.answer("⚙️ در حال پردازش... پس از آماده شدن، همین پیام به‌روز می‌شود.")
+        return
+    
+    await query.answer()
+    text, reply_markup = await _job_view(job)
+    await query.edit_message_text(text, reply_markup=reply_markup, parse_mode="HTML")
 
 
 def _add_emojis_to_profile(text):
@@ -471,13 +501,7 @@ async def _handle_ai_model_selection(query, user_id, data, context):
 async def _handle_ai_analysis(query, user_id, data):
     """پردازش تحلیل ادمین با هوش مصنوعی"""
     # بررسی مجوز ادمین
-    admin_data = db_manager.execute_query(
-        "SELECT role, permissions FROM admins WHERE user_id=?", 
-        (user_id,), 
-        fetchone=True
-    )
-    
-    if not admin_data or (admin_data[0] != 'god' and "admin_stats" not in admin_data[1].split(",")):
+    if not await permissions.has_permission_async(user_id, "admin_stats"):
         await query.answer("شما به این بخش دسترسی ندارید!", show_alert=True)
         return
     
@@ -503,9 +527,14 @@ async def _handle_ai_analysis(query, user_id, data):
             # نمایش منوی انتخاب فصل
             await _show_ai_analysis_season_menu(query)
             return
+        elif data.split("^")[1] == "usage":
+            # گزارش مصرف توکن، تأخیر و هزینه هر قابلیت
+            text, reply_markup = _usage_view(await ai_usage.get_report_async())
+            await query.edit_message_text(text, reply_markup=reply_markup, parse_mode="HTML")
+            return
         else:
             season_id = int(data.split("^")[1])
-            season_data = db_manager.execute_query(
+            season_data = await execute_query(
                 "SELECT name FROM season WHERE id=?", 
                 (season_id,), 
                 fetchone=True
@@ -514,42 +543,20 @@ async def _handle_ai_analysis(query, user_id, data):
                 season_name = season_data[0]
     else:
         # دریافت فصل فعال
-        active_season = get_active_season()
+        active_season = await get_active_season()
         if active_season:
             season_id = active_season[0]
             season_name = active_season[1]
     
     # اگر انتخاب نوع تحلیل
     if len(data.split("^")) > 2:
-        # نمایش پیام در حال دریافت
-        await query.edit_message_text(
+        # ثبت کار در صف و نمایش پیام در حال دریافت
+        await _start_ai_job(
+            query, ai_jobs.JOB_ANALYSIS, 0, season_id,
             f"🧠 <b>در حال تحلیل داده‌ها...</b>\n\n"
             f"لطفاً کمی صبر کنید. در حال تحلیل اطلاعات {season_name}...",
-            parse_mode="HTML"
+            "ai_analysis^back"
         )
-        
-        try:
-            # دریافت تحلیل از هوش مصنوعی
-            analysis = analyze_admin_data(season_id)
-            
-            # ایجاد دکمه‌های بازگشت
-            keyboard = [
-                [InlineKeyboardButton("🔄 به‌روزرسانی تحلیل", callback_data=f"ai_analysis^{season_id if season_id else 'all'}^general")],
-                [InlineKeyboardButton("↩️ انتخاب فصل دیگر", callback_data="ai_analysis^back")],
-                [InlineKeyboardButton("» بازگشت به پنل ادمین", callback_data="admin_panel^")]
-            ]
-            
-            await query.edit_message_text(
-                f"🧠 <b>تحلیل هوش مصنوعی - {season_name}</b>\n\n{analysis}",
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode="HTML"
-            )
-        except Exception as e:
-            logger.error(f"خطا در دریافت تحلیل هوش مصنوعی: {e}")
-            await query.edit_message_text(
-                "❌ متأسفانه در دریافت تحلیل خطایی رخ داد. لطفاً دوباره تلاش کنید.",
-                reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("» بازگشت", callback_data="ai_analysis^back")]])
-            )
         return
     
     # نمایش منوی انتخاب فصل
@@ -559,7 +566,7 @@ async def _handle_ai_analysis(query, user_id, data):
 async def _show_ai_analysis_season_menu(query):
     """نمایش منوی انتخاب فصل برای تحلیل ادمین"""
     keyboard = []
-    seasons = db_manager.execute_query(
+    seasons = await execute_query(
         "SELECT id, name, is_active FROM season ORDER BY id DESC"
     )
     
@@ -568,6 +575,7 @@ async def _show_ai_analysis_season_menu(query):
         keyboard.append([InlineKeyboardButton(f"{s[1]} {status}", callback_data=f"ai_analysis^{s[0]}^general")])
     
     keyboard.append([InlineKeyboardButton("📊 همه فصل‌ها", callback_data=f"ai_analysis^all^general")])
+    keyboard.append([InlineKeyboardButton("💰 مصرف و هزینه هوش مصنوعی", callback_data="ai_analysis^usage")])
     keyboard.append([InlineKeyboardButton("» بازگشت به پنل ادمین", callback_data="admin_panel^")])
     
     await query.edit_message_text(
@@ -625,7 +633,7 @@ async def _handle_top_results(query, user_id):
     await query.answer()
     
     # دریافت فصل فعال
-    active_season = get_active_season()
+    active_season = await get_active_season()
     if not active_season:
         season_id = config.SEASON_ID
         season_name = config.SEASON_NAME
@@ -634,7 +642,7 @@ async def _handle_top_results(query, user_id):
         season_name = active_season[1]
     
     # دریافت سوالات فعال
-    questions = _get_active_top_questions()
+    questions = await run_read(_get_active_top_questions)
     
     if not questions:
         await query.edit_message_text(
@@ -650,7 +658,7 @@ async def _handle_top_results(query, user_id):
         result_text += f"<b>{q_text}</b>\n"
         
         # دریافت نتایج برای این سوال
-        top_results = _get_top_results_for_question(q_id)
+        top_results = await run_read(_get_top_results_for_question, q_id)
         
         if top_results:
             for i, (voted_for, count, name) in enumerate(top_results[:3]):
@@ -683,7 +691,7 @@ async def _handle_ai_seasons_view(query, user_id):
     
     # ایجاد دکمه‌های فصل
     keyboard = []
-    seasons = db_manager.execute_query(
+    seasons = await execute_query(
         "SELECT id, name, is_active FROM season ORDER BY is_active DESC, id DESC"
     )
     
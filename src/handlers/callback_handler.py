@@ -12,11 +12,13 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 import config
 
 from ..database.user_functions import get_or_create_user
-from ..database.season_functions import get_active_season
 from ..database.models import db_manager
+from ..database.async_db import run_read
 from ..utils.ui_helpers_new import main_menu_keyboard
 from ..services import help
-from .admin_handlers import check_channel_membership, is_admin, handle_admin_callbacks
+from ..services import permissions
+from .request_context import get_request_context
+from .admin_handlers import check_channel_membership, handle_admin_callbacks
 from .user_callbacks import handle_user_callbacks
 from .voting_callbacks import handle_voting_callbacks
 from .gift_callbacks import handle_gift_callbacks
@@ -31,8 +33,8 @@ async def menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = query.from_user
     data = query.data
     
-    # بررسی عضویت در کانال برای تمام کالبک‌ها
-    is_member = await check_channel_membership(user.id, context)
+    # بررسی عضویت در کانال برای تمام کالبک‌ها (از کش عضویت؛ دکمه «عضو شدم» کش را تازه می‌کند)
+    is_member = await check_channel_membership(user.id, context, force_refresh=data.startswith("joinedch^"))
     if not is_member and not data.startswith("joinedch^"):
         keyboard = [[InlineKeyboardButton("عضویت در کانال", url=config.CHANNEL_LINK)]]
         await query.edit_message_text(
@@ -40,12 +42,12 @@ async def menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             reply_markup=InlineKeyboardMarkup(keyboard)
         )
         return
-      # بررسی دسترسی کاربر - آیا کاربر در دیتابیس تایید شده است
-    from ..database.user_functions import is_user_approved
-    from ..handlers.admin_handlers import is_admin
+    # اطلاعات هویتی کاربر (ردیف users، نقش ادمین و فصل فعال) یک بار برای کل به‌روزرسانی
+    request_ctx = await get_request_context(context, user.id)
+    user_is_admin = request_ctx.is_admin
     
-    # ادمین‌ها نیاز به بررسی تایید ندارند
-    if not is_admin(user.id) and not is_user_approved(user.id) and not data.startswith("joinedch^"):
+    # بررسی دسترسی کاربر - ادمین‌ها نیاز به بررسی تایید ندارند
+    if not user_is_admin and not data.startswith("joinedch^") and not request_ctx.is_approved:
         keyboard = [[InlineKeyboardButton(f"👤 پشتیبانی", url=f"https://t.me/{config.SUPPORT_USERNAME.strip('@')}")]]
         await query.edit_message_text(
             f"کاربر گرامی، شما هنوز دسترسی به {config.BOT_NAME} ندارید.\n\n"
@@ -54,10 +56,15 @@ async def menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
     
+    # بررسی دسترسی لازم برای callbackهای مدیریتی
+    required = permissions.required_permission(data)
+    if required and not request_ctx.has_permission(required):
+        await query.answer("❌ شما به این بخش دسترسی ندارید.", show_alert=True)
+        return
+    
     # بررسی وجود فصل فعال برای اکثر دکمه‌ها
-    if await _needs_active_season(data, user.id):
-        active_season = get_active_season()
-        if not active_season:
+    if await _needs_active_season(data, user_is_admin):
+        if not request_ctx.season:
             await query.answer("هیچ فصل فعالی وجود ندارد!", show_alert=True)
             await query.edit_message_text(
                 "⚠️ <b>هیچ فصل فعالی وجود ندارد!</b>\n\n"
@@ -83,7 +90,7 @@ async def menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # نمایش منوی دستیار هوشمند
         from .ai_callbacks import handle_ai_chat_menu
         await handle_ai_chat_menu(query, user.id)
-    elif data.startswith(("ai_model^", "ai_profile^", "ai_perspective^", "ai_seasons_view^", "top_results^", "ai_analysis^", "top_vote^", "top_select^")):
+    elif data.startswith(("ai_model^", "ai_profile^", "ai_perspective^", "ai_seasons_view^", "ai_job^", "top_results^", "ai_analysis^", "top_vote^", "top_select^")):
         await handle_ai_callbacks(update, context, data)
     elif data == "joinedch^":
         await _handle_channel_join(query, user)
@@ -91,7 +98,7 @@ async def menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # سایر callback های پیچیده که نیاز به پردازش خاص دارند
         await _handle_other_callbacks(update, context)
 
-async def _needs_active_season(data: str, user_id: int) -> bool:
+async def _needs_active_season(data: str, user_is_admin: bool) -> bool:
     """بررسی آیا callback نیاز به فصل فعال دارد"""
     # لیست دکمه‌هایی که نیاز به فصل فعال ندارند
     excluded_buttons = [
@@ -108,7 +115,7 @@ async def _needs_active_season(data: str, user_id: int) -> bool:
     excluded_prefixes = [
         "Scoreboard^", "receivedpoints^", "givenpoints^", "admin_", "manage_", 
         "edit_season", "delete_season", "toggle_season", "edit_question", "toggle_question",
-        "giftcard_", "help_", "ai_profile", "ai_perspective", "ai_model", "season_details^", 
+        "giftcard_", "help_", "ai_profile", "ai_perspective", "ai_model", "ai_job^", "season_details^", 
         "top_results^", "ai_analysis^", "top_vote^", "top_select^", "vu^", "gp^"
     ]
     
@@ -121,7 +128,7 @@ async def _needs_active_season(data: str, user_id: int) -> bool:
             return False
     
     # اگر کاربر ادمین است، نیازی به فصل فعال ندارد
-    if is_admin(user_id):
+    if user_is_admin:
         return False
     
     return True
@@ -150,7 +157,7 @@ async def _handle_main_menu(query, user_id):
     await query.answer()
     await query.edit_message_text(
         f"کاربر گرامی\nلطفا یکی از گزینه‌های زیر رو برای {config.BOT_NAME} انتخاب کنید :",
-        reply_markup=main_menu_keyboard(user_id)
+        reply_markup=await run_read(main_menu_keyboard, user_id)
     )
 
 async def _handle_channel_join(query, user):
@@ -158,7 +165,7 @@ async def _handle_channel_join(query, user):
     await query.answer()
     await query.edit_message_text(
         f"کاربر گرامی\nلطفا یکی از گزینه‌های زیر رو برای {config.BOT_NAME} انتخاب کنید :",
-        reply_markup=main_menu_keyboard(user.id)
+        reply_markup=await run_read(main_menu_keyboard, user.id)
     )
 
 async def _handle_other_callbacks(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -12,10 +12,10 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 import config
 
 from ..database.user_functions import get_all_users
-from ..database.db_utils import get_db_connection
 from ..utils.ui_helpers_new import main_menu_keyboard
 from ..services import giftcard
-from ..database.models import db_manager
+from ..database.async_db import run_read, execute_query
+from ..services import settings
 
 logger = logging.getLogger(__name__)
 
@@ -37,11 +37,11 @@ async def _handle_letter_start(query, user_id, context):
     await query.answer()
     
     # دریافت لیست کاربران برای ارسال تشکرنامه (همه کاربران به جز خودش)
-    users = get_all_users()
+    users = await run_read(get_all_users)
     if not users:
         await query.edit_message_text(
             "هیچ کاربری برای ارسال تشکر‌نامه وجود ندارد!", 
-            reply_markup=main_menu_keyboard(user_id)
+            reply_markup=await run_read(main_menu_keyboard, user_id)
         )
         return
     
@@ -51,16 +51,12 @@ async def _handle_letter_start(query, user_id, context):
     if not users:
         await query.edit_message_text(
             "هیچ کاربر دیگری برای ارسال تشکر‌نامه وجود ندارد!", 
-            reply_markup=main_menu_keyboard(user_id)
+            reply_markup=await run_read(main_menu_keyboard, user_id)
         )
         return
     
     # بررسی تنظیمات نمایش کاربران
-    show_all_users_result = db_manager.execute_query(
-        "SELECT value FROM settings WHERE key='show_all_users'", 
-        fetchone=True
-    )
-    show_all_users = show_all_users_result[0] if show_all_users_result else "0"
+    show_all_users = await settings.get_bool_async("show_all_users")
       # تنظیم وضعیت برای تشخیص حالت ارسال تشکرنامه در انتخاب کاربر با جستجو
     # دسترسی مستقیم به context که از پارامتر تابع منتقل شده
     
@@ -92,7 +88,7 @@ async def _handle_letter_start(query, user_id, context):
     ])
     
     # اگر نمایش همه کاربران فعال باشد، لیست کاربران را نیز نشان می‌دهیم
-    if show_all_users == "1":
+    if show_all_users:
         welcome_message += "👥 لطفاً کاربر مورد نظر را انتخاب کنید:"
         # اضافه کردن دکمه‌های کاربران
         row = []
@@ -120,12 +116,8 @@ async def _handle_select_user(query, user_id, data, context):
     receiver_id = int(data.split("^")[1])
     
     # دریافت نام گیرنده از دیتابیس
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT name FROM users WHERE user_id=?", (receiver_id,))
-    result = cursor.fetchone()
+    result = await execute_query("SELECT name FROM users WHERE user_id=?", (receiver_id,), fetchone=True)
     receiver_name = result[0] if result else "کاربر"
-    conn.close()
     
     # پاک کردن سایر وضعیت‌ها که ممکن است مزاحمت ایجاد کند
     context.user_data.pop('top_vote_mode', None)
@@ -158,12 +150,8 @@ async def handle_gift_message(update: Update, context: ContextTypes.DEFAULT_TYPE
     sender_id = user.id
     
     # دریافت نام فرستنده از دیتابیس
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT name FROM users WHERE user_id=?", (sender_id,))
-    sender_result = cursor.fetchone()
+    sender_result = await execute_query("SELECT name FROM users WHERE user_id=?", (sender_id,), fetchone=True)
     sender_name = sender_result[0] if sender_result else "یک دوست"
-    conn.close()
 
     # پاک کردن وضعیت انتظار
     context.user_data.pop('waiting_for_gift_card_message', None)
@@ -217,7 +205,7 @@ async def handle_gift_message(update: Update, context: ContextTypes.DEFAULT_TYPE
         await status_message.edit_text(
             f"✅ تشکر‌نامه با موفقیت به {receiver_name} ارسال شد!\n\n"
             "از این قابلیت می‌توانید هر زمان که بخواهید استفاده کنید.",
-            reply_markup=main_menu_keyboard(sender_id)
+            reply_markup=await run_read(main_menu_keyboard, sender_id)
         )
         
         # حذف فایل موقت
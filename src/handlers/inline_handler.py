@@ -9,8 +9,9 @@ from telegram.ext import ContextTypes
 import uuid
 
 # وارد کردن توابع مورد نیاز
-from ..database.user_functions import search_users, get_user_by_id
 from ..database.season_functions import get_active_season
+from .request_context import get_request_context
+from ..services import user_search
 
 logger = logging.getLogger(__name__)
 
@@ -22,12 +23,11 @@ async def handle_inline_query(update: Update, context: ContextTypes.DEFAULT_TYPE
     # اضافه کردن گزارش برای اشکال‌زدایی
     logger.debug(f"درخواست جستجوی اینلاین از کاربر {user_id} با متن: '{query}'")
     
-    # بررسی آیا کاربر ادمین است
-    from ..handlers.admin_handlers import is_admin
-    from ..database.user_functions import is_user_approved
+    # اطلاعات هویتی کاربر (ردیف users و نقش ادمین) یک بار برای کل به‌روزرسانی
+    request_ctx = await get_request_context(context, user_id)
     
     # بررسی دسترسی کاربر
-    if not is_admin(user_id) and not is_user_approved(user_id):
+    if not request_ctx.is_admin and not request_ctx.is_approved:
         logger.warning(f"کاربر {user_id} دسترسی لازم برای استفاده از جستجو را ندارد")
         await update.inline_query.answer([
             InlineQueryResultArticle(
@@ -42,7 +42,7 @@ async def handle_inline_query(update: Update, context: ContextTypes.DEFAULT_TYPE
         return
     
     # بررسی آیا کاربر در سیستم تعریف شده است
-    user_profile = get_user_by_id(user_id)
+    user_profile = request_ctx.user
     logger.debug(f"نتیجه get_user_by_id برای کاربر {user_id}: {user_profile}")
     
     if not user_profile:
@@ -66,22 +66,8 @@ async def handle_inline_query(update: Update, context: ContextTypes.DEFAULT_TYPE
     # اگر در حالت معمولی (امتیازدهی) است، موجودی را بررسی می‌کنیم
     if not is_gift_card_mode and not is_top_vote_mode:
         try:
-            from ..database.models import db_manager
-            balance_result = db_manager.execute_query(
-                "SELECT balance FROM users WHERE user_id = ?", 
-                (user_id,), 
-                fetchone=True
-            )
-            
-            # ثبت نتیجه برای اشکال‌زدایی
-            logger.debug(f"نتیجه بررسی موجودی کاربر {user_id}: {balance_result}")
-            
-            # بررسی نتیجه و تبدیل به عدد
-            if balance_result is None:
-                user_balance = 0
-                logger.warning(f"موجودی برای کاربر {user_id} یافت نشد")
-            else:
-                user_balance = balance_result[0] if balance_result[0] is not None else 0
+            # موجودی از ردیف کاربر در کانتکست درخواست
+            user_balance = request_ctx.balance
                 
             # تبدیل به عدد صحیح
             try:
@@ -126,7 +112,7 @@ async def handle_inline_query(update: Update, context: ContextTypes.DEFAULT_TYPE
     
     # جستجوی کاربران بر اساس نام
     logger.debug(f"جستجوی کاربران با عبارت '{query}' (به جز کاربر {user_id})")
-    users = search_users(query, limit=10, exclude_id=user_id)
+    users = await user_search.search_async(query, limit=10, exclude_id=user_id)
     logger.debug(f"نتیجه جستجو: {len(users) if users else 0} کاربر یافت شد")
     
     # اگر هیچ کاربری یافت نشد
@@ -150,20 +136,7 @@ async def handle_inline_query(update: Update, context: ContextTypes.DEFAULT_TYPE
     for user in users:
         user_id = user[0]  # شناسه کاربر
         name = user[1]     # نام کاربر
-        username = None    # نام کاربری (به طور پیش‌فرض خالی)
-        
-        # سعی می‌کنیم نام کاربری را از دیتابیس بگیریم
-        try:
-            from ..database.models import db_manager
-            user_data = db_manager.execute_query(
-                "SELECT username FROM users WHERE user_id=?", 
-                (user_id,), 
-                fetchone=True
-            )
-            if user_data and user_data[0]:
-                username = user_data[0]
-        except Exception as e:
-            logger.error(f"خطا در دریافت نام کاربری: {e}")
+        username = user[2] # نام کاربری (از ایندکس جستجو، بدون کوئری جداگانه)
         
         # تنظیم آدرس تصویر پروفایل
         # برای کاربرانی که نام کاربری دارند، لینک به پروفایل تلگرام
@@ -17,7 +17,12 @@ from ..utils.ui_helpers_new import main_menu_keyboard
 
 logger = logging.getLogger(__name__)
 
-from ..database.db_utils import get_db_connection
+from ..database import write_queue
+from ..services import permissions
+from .request_context import get_request_context
+from ..database.async_db import run_read, execute_query, get_user_profile, get_active_season
+from ..services import settings
+from ..services import user_search
 from ..services.giftcard import create_gift_card_image
 from ..services import ai
 
@@ -102,8 +107,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             context.user_data['gift_card_receiver_id'] = user_id
             
             # دریافت نام گیرنده از دیتابیس
-            from ..database.models import db_manager
-            target_user = db_manager.execute_query(
+            target_user = await execute_query(
                 "SELECT name FROM users WHERE user_id=?", 
                 (user_id,), 
                 fetchone=True
@@ -150,7 +154,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         if not touser_id or not amount:
             await message.reply_text(
                 "اطلاعات امتیازدهی ناقص است. لطفاً دوباره امتیازدهی را انجام دهید.",
-                reply_markup=main_menu_keyboard(user.id)
+                reply_markup=await run_read(main_menu_keyboard, user.id)
             )
             # پاک کردن وضعیت انتظار
             context.user_data.pop('waiting_for_reason', None)
@@ -167,7 +171,8 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         reason = text.strip()
         
         # ایجاد یک شناسه تراکنش منحصر به فرد
-        transaction_id = str(uuid.uuid4())[:8]  # استفاده از 8 کاراکتر اول UUID برای کوتاه‌تر بودن
+        # کل UUID (۳۲ نویسه، در سقف ۶۴ بایتی callback_data) چون کلید یکتایی تراکنش از آن ساخته می‌شود
+        transaction_id = uuid.uuid4().hex
         
         # ذخیره اطلاعات تراکنش در context
         context.user_data['transaction'] = {
@@ -178,14 +183,8 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         }
         
         # بررسی وضعیت فعال/غیرفعال بودن قابلیت‌های هوش مصنوعی
-        from ..database.db_utils import execute_db_query
-        from ..handlers.admin_handlers import is_admin
         
-        ai_features_enabled = execute_db_query(
-            "SELECT value FROM settings WHERE key='ai_features_enabled'", 
-            fetchone=True
-        )
-        ai_features_enabled = ai_features_enabled[0] if ai_features_enabled else "1"  # پیش‌فرض: فعال
+        ai_features_enabled = await settings.get_bool_async("ai_features_enabled")
         
         # تنظیم دکمه تأیید و لغو
         keyboard = [
@@ -193,7 +192,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         ]
         
         # اگر هوش مصنوعی فعال است یا کاربر ادمین است، دکمه بهبود با هوش مصنوعی را نمایش بده
-        if ai_features_enabled == "1" or is_admin(update.effective_user.id):
+        if ai_features_enabled or await permissions.is_admin_async(update.effective_user.id):
             keyboard.append([InlineKeyboardButton("🤖 بهبود با هوش مصنوعی", callback_data=f"improve_reason^{transaction_id}")])
         
         keyboard.append([InlineKeyboardButton("❌ لغو", callback_data="tovote^")])
@@ -238,7 +237,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             logger.error(f"خطا در ارسال پیام تایید: {e}")
             await message.reply_text(
                 "متأسفانه در پردازش درخواست خطایی رخ داد. لطفاً دوباره تلاش کنید.",
-                reply_markup=main_menu_keyboard(user.id)
+                reply_markup=await run_read(main_menu_keyboard, user.id)
             )
         
         # پاک کردن وضعیت انتظار
@@ -256,10 +255,10 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
     # بررسی وضعیت کاربر - اگر در انتظار پیام همگانی است
     elif context.user_data.get('waiting_for_broadcast'):
-        from ..handlers.admin_handlers import is_admin, handle_broadcast_message
+        from ..handlers.admin_handlers import handle_broadcast_message
         
         # بررسی دسترسی ادمین
-        if not is_admin(user.id):
+        if not await permissions.is_admin_async(user.id):
             await message.reply_text("شما دسترسی ادمین ندارید.")
             return
         
@@ -294,6 +293,25 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         )
         return
 
+    # بررسی وضعیت کاربر - اگر در انتظار متن جستجوی تراکنش‌ها (ادمین) است
+    elif context.user_data.get('waiting_for_admin_search'):
+        from ..handlers.admin_handlers import build_admin_search_page
+        
+        context.user_data.pop('waiting_for_admin_search', None)
+        
+        # بررسی دسترسی ادمین
+        if not await permissions.has_permission_async(user.id, "admin_transactions"):
+            await message.reply_text("شما دسترسی لازم برای این بخش را ندارید.")
+            return
+        
+        logger.debug(f"ادمین {user.id} در تراکنش‌ها جستجو کرد: '{text}'")
+        
+        # متن جستجو برای صفحه‌بندی نگه داشته می‌شود
+        context.user_data['admin_search_query'] = text
+        result_text, keyboard = await build_admin_search_page(text)
+        await message.reply_text(result_text, parse_mode="HTML", reply_markup=keyboard)
+        return
+
     # بررسی وضعیت کاربر - اگر در انتظار پیام AI است
     elif context.user_data.get('waiting_for_ai_prompt'):
         logger.debug(f"کاربر {user.id} پیام AI را ارسال کرد")
@@ -316,10 +334,8 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         return True
 
     # پردازش سایر پیام‌ها
-    from ..database.user_functions import is_user_approved
-    from ..handlers.admin_handlers import is_admin
-    
-    if not is_admin(user.id) and not is_user_approved(user.id):
+    request_ctx = await get_request_context(context, user.id)
+    if not request_ctx.is_admin and not request_ctx.is_approved:
         # کاربر تایید نشده است
         markup = InlineKeyboardMarkup([
             [InlineKeyboardButton("👤 پشتیبانی", url=f"https://t.me/{config.SUPPORT_USERNAME.strip('@')}")]
@@ -337,7 +353,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             f"سلام {user.first_name}!\n"
             f"به {config.BOT_NAME} خوش آمدید!\n\n"
             f"لطفا از منوی زیر گزینه مورد نظر را انتخاب کنید:",
-            reply_markup=main_menu_keyboard(user.id)
+            reply_markup=await run_read(main_menu_keyboard, user.id)
         )
     except Exception as e:
         logger.error(f"خطا در ارسال منوی اصلی: {e}")
@@ -359,8 +375,7 @@ async def handle_vote_user_selection(update: Update, context: ContextTypes.DEFAU
         touser_id = int(parts[1])
         
         # دریافت اطلاعات کاربر مقصد
-        from ..database.models import db_manager
-        target_user = db_manager.execute_query(
+        target_user = await execute_query(
             "SELECT name FROM users WHERE user_id=?", 
             (touser_id,), 
             fetchone=True
@@ -388,8 +403,7 @@ async def handle_vote_user_selection(update: Update, context: ContextTypes.DEFAU
         voting_menu = context.user_data.get('voting_menu')
         
         # بررسی موجودی کاربر
-        from ..database.db_utils import get_user_profile
-        profile = get_user_profile(user.id)
+        profile = await get_user_profile(user.id)
         if not profile or profile[3] < 1:
             if voting_menu:
                 # ویرایش منوی موجود
@@ -397,13 +411,13 @@ async def handle_vote_user_selection(update: Update, context: ContextTypes.DEFAU
                     "اعتبار کافی برای امتیازدهی ندارید!",
                     chat_id=voting_menu['chat_id'],
                     message_id=voting_menu['message_id'],
-                    reply_markup=main_menu_keyboard(user.id)
+                    reply_markup=await run_read(main_menu_keyboard, user.id)
                 )
             else:
                 # ارسال پیام جدید
                 await update.effective_chat.send_message(
                     "اعتبار کافی برای امتیازدهی ندارید!",
-                    reply_markup=main_menu_keyboard(user.id)
+                    reply_markup=await run_read(main_menu_keyboard, user.id)
                 )
             return
         
@@ -471,7 +485,7 @@ async def handle_vote_user_selection(update: Update, context: ContextTypes.DEFAU
         logger.error(f"خطا در پردازش انتخاب کاربر: {e}")
         await update.effective_chat.send_message(
             "متأسفانه در پردازش انتخاب کاربر خطایی رخ داد. لطفاً دوباره تلاش کنید.",
-            reply_markup=main_menu_keyboard(user.id)
+            reply_markup=await run_read(main_menu_keyboard, user.id)
         )
 
 async def handle_inline_user_selection(update: Update, context: ContextTypes.DEFAULT_TYPE, message_text: str):
@@ -485,8 +499,7 @@ async def handle_inline_user_selection(update: Update, context: ContextTypes.DEF
     logger.debug(f"نام کاربر انتخاب شده: '{selected_name}'")
     
     # ابتدا همه کاربران را دریافت می‌کنیم
-    from ..database.models import db_manager
-    all_users = db_manager.execute_query("SELECT user_id, name FROM users")
+    all_users = await execute_query("SELECT user_id, name FROM users")
     
     # یافتن کاربر با مقایسه نام‌های پاک‌سازی شده
     selected_user = None
@@ -500,7 +513,7 @@ async def handle_inline_user_selection(update: Update, context: ContextTypes.DEF
         logger.warning(f"کاربر با نام '{selected_name}' یافت نشد")
         await update.message.reply_text(
             "❌ کاربر مورد نظر یافت نشد!",
-            reply_markup=main_menu_keyboard(user.id)
+            reply_markup=await run_read(main_menu_keyboard, user.id)
         )
         return
     
@@ -520,7 +533,7 @@ async def handle_inline_user_selection(update: Update, context: ContextTypes.DEF
         if not question_id:
             await update.effective_chat.send_message(
                 "❌ خطا در پردازش انتخاب. لطفاً دوباره از منوی اصلی شروع کنید.",
-                reply_markup=main_menu_keyboard(user.id)
+                reply_markup=await run_read(main_menu_keyboard, user.id)
             )
             return
         
@@ -540,7 +553,7 @@ async def handle_inline_user_selection(update: Update, context: ContextTypes.DEF
         else:
             await msg.edit_text(
                 "❌ خطا در ثبت رأی. ممکن است قبلاً به این سوال رأی داده باشید.",
-                reply_markup=main_menu_keyboard(user.id)
+                reply_markup=await run_read(main_menu_keyboard, user.id)
             )
             
     elif context.user_data.get('gift_card_mode'):
@@ -560,12 +573,11 @@ async def handle_inline_user_selection(update: Update, context: ContextTypes.DEF
     else:
         # در حالت امتیازدهی معمولی
         # بررسی موجودی کاربر
-        from ..database.db_utils import get_user_profile
-        profile = get_user_profile(user.id)
+        profile = await get_user_profile(user.id)
         if not profile or profile[3] < 1:
             await update.effective_chat.send_message(
                 "❌ اعتبار کافی برای امتیازدهی ندارید!",
-                reply_markup=main_menu_keyboard(user.id)
+                reply_markup=await run_read(main_menu_keyboard, user.id)
             )
             return
         
@@ -643,20 +655,14 @@ async def handle_inline_user_selection(update: Update, context: ContextTypes.DEF
 async def handle_ai_chat_message(update: Update, context: ContextTypes.DEFAULT_TYPE, message_text: str):
     """پردازش پیام‌های چت با هوش مصنوعی"""
     # بررسی وضعیت فعال/غیرفعال بودن قابلیت‌های هوش مصنوعی
-    from ..database.db_utils import execute_db_query
-    ai_features_enabled = execute_db_query(
-        "SELECT value FROM settings WHERE key='ai_features_enabled'", 
-        fetchone=True
-    )
-    ai_features_enabled = ai_features_enabled[0] if ai_features_enabled else "1"  # پیش‌فرض: فعال
+    ai_features_enabled = await settings.get_bool_async("ai_features_enabled")
     
     # اگر قابلیت‌های هوش مصنوعی غیرفعال شده باشند و کاربر ادمین نباشد، پیام مناسب نمایش دهیم
-    if ai_features_enabled == "0":
-        from ..handlers.admin_handlers import is_admin
-        if not is_admin(update.effective_user.id):
+    if not ai_features_enabled:
+        if not await permissions.is_admin_async(update.effective_user.id):
             await update.message.reply_text(
                 "⚠️ این بخش موقتاً غیرفعال است.",
-                reply_markup=main_menu_keyboard(update.effective_user.id)
+                reply_markup=await run_read(main_menu_keyboard, update.effective_user.id)
             )
             return
     
@@ -680,7 +686,7 @@ async def handle_ai_chat_message(update: Update, context: ContextTypes.DEFAULT_T
         if not AI_MODULE_AVAILABLE:
             await update.message.reply_text(
                 "⚠️ سرویس هوش مصنوعی موقتاً غیرفعال است.",
-                reply_markup=main_menu_keyboard()
+                reply_markup=await run_read(main_menu_keyboard, update.effective_user.id)
             )
             return
         
@@ -737,36 +743,19 @@ async def handle_admin_user_approval(update: Update, context: ContextTypes.DEFAU
     context.user_data.pop('waiting_for_name', None)
     context.user_data.pop('pending_approval', None)
     
-    conn = None
     try:
-        # افزودن کاربر به دیتابیس
-        conn = get_db_connection()
-        c = conn.cursor()
-        
-        # بررسی وجود فصل فعال و دریافت امتیاز پیش‌فرض
-        c.execute("SELECT id, balance FROM season WHERE is_active=1")
-        active_season = c.fetchone()
+        # بررسی وجود فصل فعال و دریافت امتیاز پیش‌فرض (از کش فصل)
+        active_season = await get_active_season()
         if not active_season:
             await update.message.reply_text("خطا: هیچ فصل فعالی یافت نشد!")
             return
-            
-        season_id = active_season[0]
-        season_balance = active_season[1]  # امتیاز پیش‌فرض فصل (مثلاً 100 امتیاز)
-        
-        # ثبت کاربر در دیتابیس با امتیاز پیش‌فرض فصل
-        # کاربر جدید همان امتیازی را دریافت می‌کند که برای فصل فعال تعریف شده
-        c.execute("""
-            INSERT INTO users (user_id, username, telegram_name, name, join_date, is_approved, balance)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (user_id, username or '', telegram_name, real_name, int(time.time()), 1, season_balance))
-        
-        # افزودن کاربر به فصل فعلی با همان امتیاز پیش‌فرض
-        c.execute("""
-            INSERT INTO user_season (user_id, season_id, join_date, balance)
-            VALUES (?, ?, ?, ?)
-        """, (user_id, season_id, int(time.time()), season_balance))
+        season_balance = active_season[2]  # امتیاز پیش‌فرض فصل (مثلاً 100 امتیاز)
         
-        conn.commit()
+        # افزودن کاربر به دیتابیس در صف نوشتن
+        await write_queue.run_async(
+            _register_approved_user, user_id, username, telegram_name, real_name, active_season[0], season_balance
+        )
+        user_search.invalidate()
         
         # ارسال پیام موفقیت به ادمین با اطلاعات کامل
         await update.message.reply_text(
@@ -784,7 +773,7 @@ async def handle_admin_user_approval(update: Update, context: ContextTypes.DEFAU
         await context.bot.send_message(
             chat_id=user_id,
             text=welcome_text,
-            reply_markup=main_menu_keyboard(user_id)
+            reply_markup=await run_read(main_menu_keyboard, user_id)
         )
 
     except Exception as e:
@@ -793,9 +782,21 @@ async def handle_admin_user_approval(update: Update, context: ContextTypes.DEFAU
             f"❌ خطا در ثبت کاربر: {e}",
             reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("» بازگشت", callback_data="admin_panel^")]])
         )
-    finally:
-        if conn:
-            conn.close()
+
+def _register_approved_user(conn, user_id, username, telegram_name, real_name, season_id, season_balance):
+    """ثبت کاربر تایید شده در دیتابیس و فصل فعال (عملیات صف نوشتن)"""
+    # ثبت کاربر در دیتابیس با امتیاز پیش‌فرض فصل
+    # کاربر جدید همان امتیازی را دریافت می‌کند که برای فصل فعال تعریف شده
+    conn.execute("""
+        INSERT INTO users (user_id, username, telegram_name, name, join_date, is_approved, balance)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (user_id, username or '', telegram_name, real_name, int(time.time()), 1, season_balance))
+    
+    # افزودن کاربر به فصل فعلی با همان امتیاز پیش‌فرض
+    conn.execute("""
+        INSERT INTO user_season (user_id, season_id, join_date, balance)
+        VALUES (?, ?, ?, ?)
+    """, (user_id, season_id, int(time.time()), season_balance))
 
 async def handle_voting_reason(update: Update, context: ContextTypes.DEFAULT_TYPE, message_text: str):
     """پردازش دلیل امتیازدهی"""
@@ -813,8 +814,7 @@ async def handle_voting_reason(update: Update, context: ContextTypes.DEFAULT_TYP
         return
     
     # دریافت نام کاربر مقصد
-    from ..database.models import db_manager
-    target_user = db_manager.execute_query(
+    target_user = await execute_query(
         "SELECT name FROM users WHERE user_id=?", 
         (touser_id,), 
         fetchone=True
@@ -822,25 +822,23 @@ async def handle_voting_reason(update: Update, context: ContextTypes.DEFAULT_TYP
     touser_name = target_user[0] if target_user else "کاربر"
     
     # بررسی موجودی کاربر
-    from ..database.db_utils import get_user_profile
-    profile = get_user_profile(user.id)
+    profile = await get_user_profile(user.id)
     if not profile or profile[3] < amount:
         await update.message.reply_text(
             "اعتبار کافی ندارید!",
-            reply_markup=main_menu_keyboard(user.id)
+            reply_markup=await run_read(main_menu_keyboard, user.id)
         )
         return
     
     # دریافت فصل فعال
-    from ..database.season_functions import get_active_season
-    active_season = get_active_season()
+    active_season = await get_active_season()
     if not active_season:
         season_id = config.SEASON_ID
     else:
         season_id = active_season[0]
     
     # دریافت نام کاربر فرستنده
-    sender_info = db_manager.execute_query(
+    sender_info = await execute_query(
         "SELECT name FROM users WHERE user_id=?", 
         (user.id,), 
         fetchone=True
@@ -848,7 +846,7 @@ async def handle_voting_reason(update: Update, context: ContextTypes.DEFAULT_TYP
     sender_name = sender_info[0] if sender_info else "کاربر"
     
     # ایجاد یک شناسه تراکنش منحصر به فرد
-    transaction_id = str(uuid.uuid4())[:8]
+    transaction_id = uuid.uuid4().hex
     
     # ذخیره اطلاعات تراکنش در context
     context.user_data['transaction'] = {
@@ -859,14 +857,8 @@ async def handle_voting_reason(update: Update, context: ContextTypes.DEFAULT_TYP
     }
     
     # بررسی وضعیت فعال/غیرفعال بودن قابلیت‌های هوش مصنوعی
-    from ..database.db_utils import execute_db_query
-    from ..handlers.admin_handlers import is_admin
     
-    ai_features_enabled = execute_db_query(
-        "SELECT value FROM settings WHERE key='ai_features_enabled'", 
-        fetchone=True
-    )
-    ai_features_enabled = ai_features_enabled[0] if ai_features_enabled else "1"  # پیش‌فرض: فعال
+    ai_features_enabled = await settings.get_bool_async("ai_features_enabled")
     
     # تنظیم دکمه تأیید و لغو
     keyboard = [
@@ -874,7 +866,7 @@ async def handle_voting_reason(update: Update, context: ContextTypes.DEFAULT_TYP
     ]
     
     # اگر هوش مصنوعی فعال است یا کاربر ادمین است، دکمه بهبود با هوش مصنوعی را نمایش بده
-    if ai_features_enabled == "1" or is_admin(user.id):
+    if ai_features_enabled or await permissions.is_admin_async(user.id):
         keyboard.append([InlineKeyboardButton("🤖 بهبود با هوش مصنوعی", callback_data=f"improve_reason^{transaction_id}")])
     
     keyboard.append([InlineKeyboardButton("❌ لغو", callback_data="tovote^")])
@@ -894,14 +886,8 @@ async def handle_gift_card_message(update: Update, context: ContextTypes.DEFAULT
     sender_id = user.id
     
     # دریافت نام فرستنده از دیتابیس
-    conn = get_db_connection()
-    try:
-        c = conn.cursor()
-        c.execute("SELECT name FROM users WHERE user_id=?", (sender_id,))
-        sender_result = c.fetchone()
-        sender_name = sender_result[0] if sender_result else "یک دوست"
-    finally:
-        conn.close()
+    sender_result = await execute_query("SELECT name FROM users WHERE user_id=?", (sender_id,), fetchone=True)
+    sender_name = sender_result[0] if sender_result else "یک دوست"
 
     # پاک کردن وضعیت انتظار
     context.user_data.pop('waiting_for_gift_card_message', None)
@@ -991,7 +977,7 @@ async def handle_gift_card_message(update: Update, context: ContextTypes.DEFAULT
         # آپدیت پیام وضعیت
         await status_message.edit_text(
             "✅ تشکر‌نامه با موفقیت ارسال شد!",
-            reply_markup=main_menu_keyboard(user.id)
+            reply_markup=await run_read(main_menu_keyboard, user.id)
         )
     except Exception as e:
         logger.error(f"خطا در پردازش تشکر‌نامه: {e}")
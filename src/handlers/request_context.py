@@ -0,0 +1,97 @@
+"""
+کانتکست هر به‌روزرسانی (request context)
+اطلاعات هویتی کاربر فرستنده (ردیف users، نقش ادمین و فصل فعال) یک بار در ابتدای
+پردازش هر به‌روزرسانی بارگذاری می‌شود و همه هندلرها از همان استفاده می‌کنند؛
+به جای اینکه هر هندلر جداگانه is_admin، is_user_approved و SELECT name/username اجرا کند.
+"""
+import logging
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from ..database.db_utils import execute_db_query
+from ..database.async_db import run_read, get_active_season
+from ..services import permissions
+
+logger = logging.getLogger(__name__)
+
+# نام ویژگی context که کانتکست درخواست در آن ذخیره می‌شود
+CONTEXT_ATTR = "request_ctx"
+
+
+class RequestContext:
+    """اطلاعات هویتی کاربر برای یک به‌روزرسانی
+
+    Attributes:
+        user_id (int): شناسه کاربر
+        user: ردیف جدول users (sqlite3.Row) یا None اگر کاربر ثبت نشده باشد
+        admin (tuple): (role, frozenset(permissions)) یا None اگر ادمین نباشد
+        season: فصل فعال (id, name, balance) یا None
+    """
+
+    __slots__ = ("user_id", "user", "admin", "season")
+
+    def __init__(self, user_id, user, admin, season):
+        self.user_id = user_id
+        self.user = user
+        self.admin = admin
+        self.season = season
+
+    @property
+    def is_admin(self):
+        return self.admin is not None
+
+    @property
+    def is_approved(self):
+        """کاربر تایید شده است (در جدول users وجود دارد)"""
+        return self.user is not None
+
+    @property
+    def role(self):
+        return self.admin[0] if self.admin else None
+
+    @property
+    def name(self):
+        return self.user["name"] if self.user else None
+
+    @property
+    def username(self):
+        return self.user["username"] if self.user else None
+
+    @property
+    def balance(self):
+        """موجودی در لحظه شروع پردازش به‌روزرسانی"""
+        return (self.user["balance"] or 0) if self.user else 0
+
+    def has_permission(self, permission):
+        return self.admin is not None and permission in self.admin[1]
+
+
+def _load_user_row(user_id):
+    return execute_db_query("SELECT * FROM users WHERE user_id=?", (user_id,), fetchone=True)
+
+
+async def build_request_context(user_id):
+    """ساخت کانتکست درخواست: یک کوئری برای ردیف کاربر، نقش و فصل از کش"""
+    user = await run_read(_load_user_row, user_id)
+    admin = await permissions.get_admin_async(user_id)
+    season = await get_active_season()
+    return RequestContext(user_id, user, admin, season)
+
+
+async def load_request_context(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """پیش‌هندلر (گروه -1): بارگذاری کانتکست درخواست برای پیام‌ها، callbackها و inline queryها"""
+    if not (update.message or update.callback_query or update.inline_query):
+        return
+    user = update.effective_user
+    if user is None:
+        return
+    setattr(context, CONTEXT_ATTR, await build_request_context(user.id))
+
+
+async def get_request_context(context: ContextTypes.DEFAULT_TYPE, user_id):
+    """دریافت کانتکست درخواست (در صورت اجرا نشدن پیش‌هندلر، همین‌جا ساخته می‌شود)"""
+    request_ctx = getattr(context, CONTEXT_ATTR, None)
+    if request_ctx is None or request_ctx.user_id != user_id:
+        request_ctx = await build_request_context(user_id)
+        setattr(context, CONTEXT_ATTR, request_ctx)
+    return request_ctx
@@ -11,9 +11,11 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 import config
 
-from ..database.user_functions import get_or_create_user, is_user_approved
+from ..database.user_functions import get_or_create_user
 from ..utils.ui_helpers_new import main_menu_keyboard
 from .admin_handlers import check_channel_membership
+from ..database.async_db import run_read
+from .request_context import get_request_context
 
 logger = logging.getLogger(__name__)
 
@@ -33,7 +35,8 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     # بررسی آیا کاربر تایید شده است
-    if not is_user_approved(user.id):
+    request_ctx = await get_request_context(context, user.id)
+    if not request_ctx.is_approved:
         keyboard = [[InlineKeyboardButton(f"👤 پشتیبانی", url=f"{config.SUPPORT_USERNAME.strip('@')}")]]
         await update.message.reply_text(
             f"کاربر گرامی، شما هنوز دسترسی به {config.BOT_NAME} ندارید.\n\n"
@@ -65,5 +68,5 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     await update.message.reply_text(
         f"کاربر گرامی\nلطفا یکی از گزینه‌های زیر رو برای {config.BOT_NAME} انتخاب کنید :",
-        reply_markup=main_menu_keyboard(user.id)
+        reply_markup=await run_read(main_menu_keyboard, user.id)
     )
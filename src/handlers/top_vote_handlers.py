@@ -6,7 +6,6 @@ Handler های مربوط به سیستم رأی‌گیری ترین‌ها
 import logging
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
-import sqlite3
 import sys
 import os
 
@@ -14,9 +13,13 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 import config
 
-from ..database.models import db_manager
+from ..database.connection_pool import get_connection
+from ..database import write_queue
 from ..database.user_functions import get_all_users
 from ..database.season_functions import get_active_season
+from ..database.async_db import run_read, execute_query
+from ..database.async_db import get_active_season as get_active_season_async
+from ..services import settings
 from ..utils.ui_helpers_new import main_menu_keyboard
 
 logger = logging.getLogger(__name__)
@@ -79,7 +82,7 @@ async def _handle_top_results(query, user_id):
     await query.answer()
     
     # دریافت فصل فعال
-    active_season = get_active_season()
+    active_season = await get_active_season_async()
     if not active_season:
         season_id = config.SEASON_ID
         season_name = config.SEASON_NAME
@@ -88,7 +91,7 @@ async def _handle_top_results(query, user_id):
         season_name = active_season[1]
     
     # دریافت سوالات فعال
-    questions = _get_active_top_questions()
+    questions = await run_read(_get_active_top_questions)
     
     if not questions:
         await query.edit_message_text(
@@ -104,7 +107,7 @@ async def _handle_top_results(query, user_id):
         result_text += f"<b>{q_text}</b>\n"
         
         # دریافت نتایج برای این سوال
-        top_results = _get_top_results_for_question(q_id)
+        top_results = await run_read(_get_top_results_for_question, q_id)
         
         if top_results:
             for i, (voted_for, count, name) in enumerate(top_results[:3]):
@@ -125,7 +128,7 @@ async def _handle_top_results(query, user_id):
 async def _process_next_top_question(query, user_id, context):
     """پردازش سوال بعدی در رأی‌گیری ترین‌ها"""
     # دریافت فصل فعال
-    active_season = get_active_season()
+    active_season = await get_active_season_async()
     if not active_season:
         season_id = config.SEASON_ID
         season_name = config.SEASON_NAME
@@ -134,11 +137,11 @@ async def _process_next_top_question(query, user_id, context):
         season_name = active_season[1]
     
     # دریافت سوال بعدی
-    next_question = _get_next_unanswered_question(user_id)
+    next_question = await run_read(_get_next_unanswered_question, user_id)
     
     if not next_question:
         # اگر همه سوالات پاسخ داده شده‌اند، نمایش خلاصه رأی‌های کاربر
-        user_votes = _get_user_top_votes(user_id)
+        user_votes = await run_read(_get_user_top_votes, user_id)
         summary = f"🎉 <b>تبریک!</b>\n\nشما به تمام سوالات ترین‌های فصل {season_name} پاسخ دادید.\n\n<b>رأی‌های شما:</b>\n\n"
         
         for q_text, voted_name, _ in user_votes:
@@ -200,14 +203,10 @@ async def _process_next_top_question(query, user_id, context):
     context.user_data['current_question_id'] = question_id
     
     # دریافت تنظیم نمایش همه کاربران
-    show_all_users_result = db_manager.execute_query(
-        "SELECT value FROM settings WHERE key='show_all_users'", 
-        fetchone=True
-    )
-    show_all_users = show_all_users_result[0] if show_all_users_result else "0"
+    show_all_users = await settings.get_bool_async("show_all_users")
     
     # دریافت لیست کاربران برای رأی‌دهی (به جز خود کاربر)
-    users = get_all_users(exclude_id=user_id)
+    users = await run_read(get_all_users, exclude_id=user_id)
     keyboard = []
     
     # اضافه کردن دکمه جستجو با حالت اینلاین
@@ -216,7 +215,7 @@ async def _process_next_top_question(query, user_id, context):
     ])
     
     # اضافه کردن دکمه‌های کاربران اگر تنظیمات نمایش همه کاربران فعال باشد
-    if show_all_users == "1":
+    if show_all_users:
         row = []
         for i, u in enumerate(users):
             row.append(InlineKeyboardButton(f"{i+1}- {u[1]}", callback_data=f"top_select^{question_id}^{u[0]}"))
@@ -228,10 +227,10 @@ async def _process_next_top_question(query, user_id, context):
     
     message_text = (
         f"🏆 <b>ترین‌های فصل {season_name}</b>\n\n"
-        f"<b>سوال {len(_get_user_top_votes(user_id))+1}:</b> {question_text}\n\n"
+        f"<b>سوال {len(await run_read(_get_user_top_votes, user_id))+1}:</b> {question_text}\n\n"
     )
     
-    if show_all_users == "1":
+    if show_all_users:
         message_text += "لطفاً یکی از همکاران خود را انتخاب کنید:\n\n"
     
     message_text += "برای جستجوی سریع‌تر می‌توانید از دکمه 🔍 جستجو استفاده کنید."
@@ -279,49 +278,48 @@ async def _process_next_top_question(query, user_id, context):
                 logger.error(f"خطا در ارسال پیام به کاربر: {e2}")
 
 async def _save_top_vote(user_id, question_id, voted_for):
-    """ذخیره رأی کاربر برای سوال ترین‌ها"""
+    """ذخیره رأی کاربر برای سوال ترین‌ها (در صف نوشتن دیتابیس)"""
+    # دریافت فصل فعال
+    active_season = await get_active_season_async()
+    if not active_season:
+        season_id = config.SEASON_ID
+    else:
+        season_id = active_season[0]
     try:
-        # دریافت فصل فعال
-        active_season = get_active_season()
-        if not active_season:
-            season_id = config.SEASON_ID
-        else:
-            season_id = active_season[0]
-        
-        conn = sqlite3.connect(config.DB_PATH)
-        conn.row_factory = sqlite3.Row
-        c = conn.cursor()
-        
-        # بررسی آیا کاربر قبلاً به این سوال رأی داده است
-        c.execute("""
-            SELECT vote_id FROM top_votes 
-            WHERE user_id = ? AND question_id = ? AND season_id = ?
-        """, (user_id, question_id, season_id))
-        
-        existing_vote = c.fetchone()
-        
-        if existing_vote:
-            # اگر قبلاً رأی داده، آن را به‌روز کنیم
-            c.execute("""
-                UPDATE top_votes 
-                SET voted_for_user_id = ?, vote_time = CURRENT_TIMESTAMP
-                WHERE user_id = ? AND question_id = ? AND season_id = ?
-            """, (voted_for, user_id, question_id, season_id))
-        else:
-            # رأی جدید ثبت کنیم
-            c.execute("""
-                INSERT INTO top_votes (user_id, question_id, voted_for_user_id, season_id, vote_time)
-                VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
-            """, (user_id, question_id, voted_for, season_id))
-        
-        conn.commit()
-        conn.close()
-        return True
+        return await write_queue.run_async(_save_top_vote_op, user_id, question_id, voted_for, season_id)
     except Exception as e:
         logger.error(f"خطا در ذخیره رأی ترین‌ها: {e}")
         return False
 
 
+def _save_top_vote_op(conn, user_id, question_id, voted_for, season_id):
+    """ذخیره رأی کاربر برای سوال ترین‌ها (عملیات صف نوشتن)"""
+    c = conn.cursor()
+    
+    # بررسی آیا کاربر قبلاً به این سوال رأی داده است
+    c.execute("""
+        SELECT vote_id FROM top_votes 
+        WHERE user_id = ? AND question_id = ? AND season_id = ?
+    """, (user_id, question_id, season_id))
+    
+    existing_vote = c.fetchone()
+    
+    if existing_vote:
+        # اگر قبلاً رأی داده، آن را به‌روز کنیم
+        c.execute("""
+            UPDATE top_votes 
+            SET voted_for_user_id = ?, vote_time = CURRENT_TIMESTAMP
+            WHERE user_id = ? AND question_id = ? AND season_id = ?
+        """, (voted_for, user_id, question_id, season_id))
+    else:
+        # رأی جدید ثبت کنیم
+        c.execute("""
+            INSERT INTO top_votes (user_id, question_id, voted_for_user_id, season_id, vote_time)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+        """, (user_id, question_id, voted_for, season_id))
+    return True
+
+
 def _get_next_unanswered_question(user_id):
     """دریافت سوال بعدی ترین‌ها که کاربر هنوز به آن پاسخ نداده است"""
     try:
@@ -332,8 +330,7 @@ def _get_next_unanswered_question(user_id):
         else:
             season_id = active_season[0]
         
-        conn = sqlite3.connect(config.DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_connection()
         c = conn.cursor()
         
         # یافتن سوالات فعال برای فصل که کاربر هنوز پاسخ نداده است
@@ -365,8 +362,7 @@ def _get_next_unanswered_question(user_id):
 def _get_active_top_questions():
     """دریافت لیست سوالات فعال ترین‌ها"""
     try:
-        conn = sqlite3.connect(config.DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_connection()
         c = conn.cursor()
         
         c.execute("""
@@ -397,8 +393,7 @@ def _get_user_top_votes(user_id):
         else:
             season_id = active_season[0]
         
-        conn = sqlite3.connect(config.DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_connection()
         c = conn.cursor()
         
         c.execute("""
@@ -431,8 +426,7 @@ def _get_top_results_for_question(question_id):
         else:
             season_id = active_season[0]
         
-        conn = sqlite3.connect(config.DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_connection()
         c = conn.cursor()
           # شمارش رأی‌ها برای هر کاربر
         c.execute("""
@@ -479,7 +473,7 @@ async def _get_top_vote_results(question_id=None, season_id=None):
             """
             params = (season_id,)
         
-        results = db_manager.execute_query(query, params)
+        results = await execute_query(query, params)
         return [(row[0], row[1], row[2]) for row in results]
     except Exception as e:
         logger.error(f"خطا در دریافت نتایج رأی‌گیری: {e}")
@@ -11,11 +11,18 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 import config
 
-from ..database.user_functions import get_user_transactions, count_user_transactions, get_scoreboard
-from ..database.season_functions import get_active_season, get_all_seasons
-from ..database.db_utils import get_db_connection, get_user_profile
+from ..database.user_functions import count_user_transactions, get_scoreboard
+from ..database.transaction_history import (
+    get_transactions_page, encode_cursor, decode_cursor, HISTORY_PAGE_SIZE,
+)
+from ..database.season_functions import get_all_seasons
+from ..database import season_functions
+from ..database.db_utils import get_db_connection
+from ..database.async_db import run_read, get_user_profile, get_active_season
 from ..utils.ui_helpers_new import main_menu_keyboard
+from .request_context import get_request_context
 from ..utils.season_utils import get_season_scoreboard, get_user_season_stats
+from ..services import rank_service
 
 logger = logging.getLogger(__name__)
 
@@ -26,7 +33,7 @@ async def handle_user_callbacks(update: Update, context: ContextTypes.DEFAULT_TY
     data = query.data
     
     if data == "userprofile^":
-        await _handle_user_profile(query, user.id)
+        await _handle_user_profile(query, user.id, await get_request_context(context, user.id))
     elif data == "historypoints^":
         await _handle_history_points(query, user.id)
     elif data.startswith("receivedpoints^"):
@@ -40,30 +47,26 @@ async def handle_user_callbacks(update: Update, context: ContextTypes.DEFAULT_TY
     elif data.startswith("Scoreboard^"):
         await _handle_scoreboard(query, data)
 
-async def _handle_user_profile(query, user_id):
+async def _handle_user_profile(query, user_id, request_ctx):
     """نمایش پروفایل کاربر"""
     await query.answer()
-    profile = get_user_profile(user_id)
+    profile = await get_user_profile(user_id)
     if profile:
         # profile = [name, user_id, season_id, balance, total_received]
         name = profile[0]
         balance = profile[3]
         total_received = profile[4] or 0
         
-        # دریافت یوزرنیم از جدول users
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT username FROM users WHERE user_id = ?", (user_id,))
-            username_result = cursor.fetchone()
-            username = username_result[0] if username_result and username_result[0] else "ندارد"
-            conn.close()
-        except Exception as e:
-            logger.error(f"خطا در دریافت یوزرنیم: {e}")
-            username = "ندارد"
+        # یوزرنیم از ردیف کاربر در کانتکست درخواست
+        username = request_ctx.username or "ندارد"
+        
+        # رتبه زنده در فصل فعال
+        rank_text = ""
+        if request_ctx.season:
+            rank_text = await _format_live_rank(user_id, request_ctx.season[0])
         
         await query.edit_message_text(
-            f"👤 پروفایل شما\n\nنام: {name}\nیوزرنیم: @{username}\nاعتبار فعلی: {balance}\nمجموع امتیازات دریافتی: {total_received}",
+            f"👤 پروفایل شما\n\nنام: {name}\nیوزرنیم: @{username}\nاعتبار فعلی: {balance}\nمجموع امتیازات دریافتی: {total_received}{rank_text}",
             reply_markup=InlineKeyboardMarkup([
                 [InlineKeyboardButton("🧠 پروفایل هوشمند", callback_data="ai_profile^")],
                 [InlineKeyboardButton("» بازگشت", callback_data="userpanel^")]
@@ -72,15 +75,26 @@ async def _handle_user_profile(query, user_id):
     else:
         await query.edit_message_text(
             "خطا در دریافت اطلاعات پروفایل!",
-            reply_markup=main_menu_keyboard(user_id)
+            reply_markup=await run_read(main_menu_keyboard, user_id)
         )
 
+async def _format_live_rank(user_id, season_id):
+    """متن رتبه کاربر در فصل و فاصله تا رتبه بالاتر (از رتبه‌بندی زنده در حافظه)"""
+    rank = await rank_service.get_rank_async(user_id, season_id)
+    if not rank:
+        return ""
+    text = f"\nرتبه شما در فصل: {rank.rank} از {rank.total} (بهتر از {rank.percentile}٪ کاربران)"
+    above, _ = await rank_service.get_neighbours_async(user_id, season_id, above=1, below=0)
+    if above and above[0][1] > rank.score:
+        text += f"\nفاصله تا رتبه بالاتر: {above[0][1] - rank.score} امتیاز"
+    return text
+
 async def _handle_history_points(query, user_id):
     """نمایش منوی تاریخچه امتیازات"""
     await query.answer()
     
     # دریافت فصل فعال
-    active_season = get_active_season()
+    active_season = await get_active_season()
     if not active_season:
         season_id = config.SEASON_ID
         season_name = config.SEASON_NAME
@@ -101,18 +115,80 @@ async def _handle_history_points(query, user_id):
         reply_markup=InlineKeyboardMarkup(keyboard)
     )
 
-async def _handle_received_points(query, user_id, data):
-    """نمایش امتیازات دریافتی"""
-    await query.answer()
+async def _load_history_page(user_id, data, given):
+    """خواندن صفحه تاریخچه از callback_data به شکل «prefix^page^season^cursor»
+
+    cursor با «o» (قدیمی‌ترها، دکمه بعدی) یا «n» (جدیدترها، دکمه قبلی) شروع می‌شود.
+
+    Returns:
+        tuple: (rows, page, season_id, has_prev, has_next, total_count)
+    """
     parts = data.split("^")
-    
-    # پردازش صفحه‌بندی
     page = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 0
     season_id = int(parts[2]) if len(parts) > 2 and parts[2].isdigit() else None
+    token = parts[3] if len(parts) > 3 else ""
+    newer = token.startswith("n")
+    cursor = token[1:] if page > 0 and token[:1] in ("o", "n") else None
+    if cursor and decode_cursor(cursor) is None:
+        cursor = None
+
+    rows, has_more = await run_read(
+        get_transactions_page, user_id, given=given, season_id=season_id, cursor=cursor, newer=newer
+    )
+    if cursor and not rows:
+        # سطرهای صفحه حذف شده‌اند؛ بازگشت به صفحه اول
+        page, newer, cursor = 0, False, None
+        rows, has_more = await run_read(get_transactions_page, user_id, given=given, season_id=season_id)
+    if not cursor:
+        page = 0
+
+    if newer:
+        has_prev, has_next = has_more, True
+    else:
+        has_prev, has_next = page > 0, has_more
+    total_count = await run_read(count_user_transactions, user_id, given=given, season_id=season_id)
+    return rows, page, season_id, has_prev, has_next, total_count
+
+
+def _history_keyboard(prefix, rows, page, season_id, has_prev, has_next):
+    """دکمه‌های ناوبری تاریخچه با cursor اولین/آخرین سطر صفحه"""
+    keyboard = []
+    nav_buttons = []
+    season = season_id or ''
+    
+    if has_prev and page > 0:
+        first = rows[0]
+        cursor = encode_cursor(first[4], first[6])
+        if page == 1 or not cursor:
+            callback = f"{prefix}^0^{season}"
+        else:
+            callback = f"{prefix}^{page-1}^{season}^n{cursor}"
+        nav_buttons.append(InlineKeyboardButton("« قبلی", callback_data=callback))
     
-    # دریافت تراکنش‌ها
-    transactions = get_user_transactions(user_id, given=False, offset=page*3, limit=3, season_id=season_id)
-    total_count = count_user_transactions(user_id, given=False, season_id=season_id)
+    if has_next:
+        last = rows[-1]
+        cursor = encode_cursor(last[4], last[6])
+        if cursor:
+            nav_buttons.append(InlineKeyboardButton("بعدی »", callback_data=f"{prefix}^{page+1}^{season}^o{cursor}"))
+    
+    if nav_buttons:
+        keyboard.append(nav_buttons)
+    
+    keyboard.append([InlineKeyboardButton("» بازگشت", callback_data="historypoints^")])
+    return InlineKeyboardMarkup(keyboard)
+
+
+def _page_caption(page, total_count):
+    pages = max(1, (total_count + HISTORY_PAGE_SIZE - 1) // HISTORY_PAGE_SIZE)
+    return f"📄 صفحه {page + 1} از {pages} ({total_count} مورد)"
+
+
+async def _handle_received_points(query, user_id, data):
+    """نمایش امتیازات دریافتی"""
+    await query.answer()
+    
+    # دریافت تراکنش‌ها (صفحه‌بندی با cursor)
+    transactions, page, season_id, has_prev, has_next, total_count = await _load_history_page(user_id, data, given=False)
     
     if not transactions:
         season_text = f"در فصل انتخابی" if season_id else "در کل"
@@ -133,40 +209,20 @@ async def _handle_received_points(query, user_id, data):
         # اگر این آخرین آیتم نیست، خط جداکننده اضافه کن
         if i < len(transactions) - 1:
             text += "\n" + "┄" * 20 + "\n\n"
-    
-    # دکمه‌های ناوبری
-    keyboard = []
-    nav_buttons = []
-    
-    if page > 0:
-        nav_buttons.append(InlineKeyboardButton("« قبلی", callback_data=f"receivedpoints^{page-1}^{season_id or ''}"))
-    
-    if (page + 1) * 3 < total_count:
-        nav_buttons.append(InlineKeyboardButton("بعدی »", callback_data=f"receivedpoints^{page+1}^{season_id or ''}"))
-    
-    if nav_buttons:
-        keyboard.append(nav_buttons)
-    
-    keyboard.append([InlineKeyboardButton("» بازگشت", callback_data="historypoints^")])
+    text += f"\n\n{_page_caption(page, total_count)}"
     
     await query.edit_message_text(
         text,
-        reply_markup=InlineKeyboardMarkup(keyboard),
+        reply_markup=_history_keyboard("receivedpoints", transactions, page, season_id, has_prev, has_next),
         parse_mode="HTML"
     )
 
 async def _handle_given_points(query, user_id, data):
     """نمایش امتیازات داده شده"""
     await query.answer()
-    parts = data.split("^")
     
-    # پردازش صفحه‌بندی
-    page = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 0
-    season_id = int(parts[2]) if len(parts) > 2 and parts[2].isdigit() else None
-    
-    # دریافت تراکنش‌ها
-    transactions = get_user_transactions(user_id, given=True, offset=page*3, limit=3, season_id=season_id)
-    total_count = count_user_transactions(user_id, given=True, season_id=season_id)
+    # دریافت تراکنش‌ها (صفحه‌بندی با cursor)
+    transactions, page, season_id, has_prev, has_next, total_count = await _load_history_page(user_id, data, given=True)
     
     if not transactions:
         season_text = f"در فصل انتخابی" if season_id else "در کل"
@@ -187,25 +243,11 @@ async def _handle_given_points(query, user_id, data):
         # اگر این آخرین آیتم نیست، خط جداکننده اضافه کن
         if i < len(transactions) - 1:
             text += "\n" + "┄" * 20 + "\n\n"
-    
-    # دکمه‌های ناوبری
-    keyboard = []
-    nav_buttons = []
-    
-    if page > 0:
-        nav_buttons.append(InlineKeyboardButton("« قبلی", callback_data=f"givenpoints^{page-1}^{season_id or ''}"))
-    
-    if (page + 1) * 3 < total_count:
-        nav_buttons.append(InlineKeyboardButton("بعدی »", callback_data=f"givenpoints^{page+1}^{season_id or ''}"))
-    
-    if nav_buttons:
-        keyboard.append(nav_buttons)
-    
-    keyboard.append([InlineKeyboardButton("» بازگشت", callback_data="historypoints^")])
+    text += f"\n\n{_page_caption(page, total_count)}"
     
     await query.edit_message_text(
         text,
-        reply_markup=InlineKeyboardMarkup(keyboard),
+        reply_markup=_history_keyboard("givenpoints", transactions, page, season_id, has_prev, has_next),
         parse_mode="HTML"
     )
 
@@ -213,7 +255,7 @@ async def _handle_season_archive(query, user_id):
     """نمایش آرشیو فصل‌ها"""
     await query.answer()
     
-    seasons = get_all_seasons()
+    seasons = await run_read(get_all_seasons)
     if not seasons:
         await query.edit_message_text(
             "هیچ فصلی در سیستم تعریف نشده است!",
@@ -251,7 +293,7 @@ async def _handle_season_details(query, user_id, data):
         return
     
     # دریافت اطلاعات فصل
-    seasons = get_all_seasons()
+    seasons = await run_read(get_all_seasons)
     selected_season = None
     
     for season in seasons:
@@ -269,10 +311,10 @@ async def _handle_season_details(query, user_id, data):
     season_id, season_name, balance, is_active = selected_season
     
     # دریافت تابلوی امتیازات فصل
-    scoreboard = get_season_scoreboard(season_id)
+    scoreboard = await run_read(get_season_scoreboard, season_id)
     
     # دریافت آمار کاربر در این فصل
-    stats = get_user_season_stats(user_id, season_id)
+    stats = await run_read(get_user_season_stats, user_id, season_id)
     
     status = "🟢 فعال" if is_active else "⚪️ غیرفعال"
     
@@ -306,7 +348,7 @@ async def _handle_season_details(query, user_id, data):
     text += f"<b>📊 آمار من در فصل {season_name}:</b>\n\n"
     
     if stats['rank'] > 0:
-        text += f"• رتبه شما: <b>{stats['rank']}</b> از {stats['total_users']} کاربر\n"
+        text += f"• رتبه شما: <b>{stats['rank']}</b> از {stats['total_users']} کاربر (بهتر از {stats['percentile']}٪ کاربران)\n"
     text += f"• تعداد امتیازهای دریافتی: {stats['received_count']} (مجموع: {stats['received_amount']})\n"
     text += f"• تعداد امتیازهای داده شده: {stats['given_count']} (مجموع: {stats['given_amount']})\n\n"
     
@@ -341,7 +383,7 @@ async def _handle_scoreboard(query, data):
     # دریافت اطلاعات فصل
     if season_id:
         # اگر فصل مشخص شده باشد از آن استفاده می‌کنیم
-        seasons = get_all_seasons()
+        seasons = await run_read(get_all_seasons)
         selected_season = None
         
         for season in seasons:
@@ -355,7 +397,7 @@ async def _handle_scoreboard(query, data):
             season_name = selected_season[1]
     else:
         # در غیر این صورت از فصل فعال استفاده می‌کنیم
-        active_season = get_active_season()
+        active_season = await get_active_season()
         if active_season:
             season_id = active_season[0]
             season_name = active_season[1]
@@ -367,7 +409,7 @@ async def _handle_scoreboard(query, data):
             return
     
     # دریافت تابلوی امتیازات
-    scoreboard = get_scoreboard(season_id)
+    scoreboard = await run_read(get_scoreboard, season_id)
     
     if not scoreboard:
         await query.edit_message_text(
@@ -400,26 +442,20 @@ async def _handle_scoreboard(query, data):
         parse_mode="HTML"
     )
 
-async def handle_scoreboard(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """نمایش تابلوی امتیازات"""
-    query = update.callback_query
-    user = update.effective_user
-    
+def _get_active_season_top_users():
+    """دریافت فصل فعال و ۱۰ نفر برتر آن (همگام، برای اجرا در ترد خواننده)
+
+    Returns:
+        tuple: (season, top_users) که season در صورت نبود فصل فعال None است
+    """
     conn = get_db_connection()
     try:
         c = conn.cursor()
         
-        # دریافت اطلاعات فصل فعال
-        c.execute("SELECT id, name FROM season WHERE is_active = 1")
-        season = c.fetchone()
+        # دریافت اطلاعات فصل فعال (از کش فصل)
+        season = season_functions.get_active_season()
         if not season:
-            await query.edit_message_text(
-                "❌ هیچ فصل فعالی یافت نشد!",
-                reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("» بازگشت", callback_data="userpanel^")]])
-            )
-            return
-            
-        season_id, season_name = season
+            return None, []
         
         # دریافت لیست برتر‌ها
         c.execute("""
@@ -429,9 +465,27 @@ async def handle_scoreboard(update: Update, context: ContextTypes.DEFAULT_TYPE):
             WHERE us.season_id = ?
             ORDER BY us.balance DESC
             LIMIT 10
-        """, (season_id,))
+        """, (season[0],))
         
-        top_users = c.fetchall()
+        return season, c.fetchall()
+    finally:
+        conn.close()
+
+async def handle_scoreboard(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """نمایش تابلوی امتیازات"""
+    query = update.callback_query
+    user = update.effective_user
+    
+    try:
+        season, top_users = await run_read(_get_active_season_top_users)
+        if not season:
+            await query.edit_message_text(
+                "❌ هیچ فصل فعالی یافت نشد!",
+                reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("» بازگشت", callback_data="userpanel^")]])
+            )
+            return
+            
+        season_id, season_name = season
         
         if not top_users:
             await query.edit_message_text(
@@ -465,5 +519,3 @@ async def handle_scoreboard(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "❌ خطا در دریافت اطلاعات تابلوی امتیازات. لطفاً دوباره تلاش کنید.",
             reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("» بازگشت", callback_data="userpanel^")]])
         )
-    finally:
-        conn.close()
@@ -6,16 +6,21 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 import sys
 import os
-import asyncio
 
 # اضافه کردن مسیر پوشه اصلی برای دسترسی به config
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 import config
 
-from ..database.models import db_manager
 from ..database.user_functions import get_all_users
-from ..database.db_utils import get_user_profile, get_db_connection
-from ..database.season_functions import get_active_season
+from ..services import permissions
+from .request_context import get_request_context
+from ..database.async_db import run_read, execute_query, get_user_profile, get_active_season
+from ..services import settings
+from ..services import rank_service
+from ..database.transfer_functions import (
+    transfer_kudos_async, make_idempotency_key,
+    TRANSFER_OK, TRANSFER_INSUFFICIENT_BALANCE, TRANSFER_DUPLICATE,
+)
 from ..utils.ui_helpers_new import main_menu_keyboard
 
 logger = logging.getLogger(__name__)
@@ -47,10 +52,8 @@ async def _handle_voting_menu(query, user_id, context):
     logger.debug(f"درخواست منوی امتیازدهی از کاربر {user_id}")
     
     # بررسی آیا کاربر در سیستم تعریف شده است
-    from ..database.models import db_manager
-    
     # دریافت مستقیم اطلاعات کاربر با دستور SQL
-    user_data = db_manager.execute_query(
+    user_data = await execute_query(
         "SELECT user_id, name, balance FROM users WHERE user_id = ?", 
         (user_id,), 
         fetchone=True
@@ -63,7 +66,7 @@ async def _handle_voting_menu(query, user_id, context):
         logger.warning(f"کاربر {user_id} در سیستم یافت نشد")
         await query.edit_message_text(
             "⚠️ اطلاعات شما در سیستم یافت نشد. لطفاً با پشتیبانی تماس بگیرید.", 
-            reply_markup=main_menu_keyboard(user_id)
+            reply_markup=await run_read(main_menu_keyboard, user_id)
         )
         return
     
@@ -77,7 +80,7 @@ async def _handle_voting_menu(query, user_id, context):
         logger.error(f"خطا در تبدیل موجودی کاربر {user_id}: {e}")
     
     # دریافت فصل فعال
-    active_season = get_active_season()
+    active_season = await get_active_season()
     if not active_season:
         season_id = config.SEASON_ID
         season_name = config.SEASON_NAME
@@ -88,11 +91,7 @@ async def _handle_voting_menu(query, user_id, context):
         logger.debug(f"فصل فعال: {season_id}, {season_name}")
     
     # بررسی تنظیمات نمایش کاربران
-    show_all_users_result = db_manager.execute_query(
-        "SELECT value FROM settings WHERE key='show_all_users'", 
-        fetchone=True
-    )
-    show_all_users = show_all_users_result[0] if show_all_users_result else "0"
+    show_all_users = await settings.get_bool_async("show_all_users")
     logger.debug(f"تنظیم نمایش همه کاربران: {show_all_users}")
     
     # پاک کردن سایر حالت‌های فعال
@@ -107,9 +106,9 @@ async def _handle_voting_menu(query, user_id, context):
     ]
     
     # اگر نمایش همه کاربران فعال باشد، لیست کاربران را نیز نشان می‌دهیم
-    if show_all_users == "1":
+    if show_all_users:
         # دریافت کاربران (به جز خود کاربر)
-        users = get_all_users(exclude_id=user_id)
+        users = await run_read(get_all_users, exclude_id=user_id)
         logger.debug(f"تعداد کاربران یافت شده (به جز خود کاربر): {len(users) if users else 0}")
         
         if users:
@@ -125,7 +124,7 @@ async def _handle_voting_menu(query, user_id, context):
     keyboard.append([InlineKeyboardButton("» بازگشت", callback_data="userpanel^")])
     
     # متن پیام بر اساس حالت نمایش
-    if show_all_users == "1":
+    if show_all_users:
         message_text = (
             f"#{season_name}\n\n"
             f"تو {balance} امتیاز داری که می‌تونی به دوستات بدی 🎁\n\n"
@@ -171,7 +170,7 @@ async def _handle_select_user(query, user_id, data):
         page = int(parts[2])
     
     # دریافت اطلاعات کاربر مقصد
-    target_user = db_manager.execute_query(
+    target_user = await execute_query(
         "SELECT name FROM users WHERE user_id=?", 
         (touser_id,), 
         fetchone=True
@@ -190,11 +189,11 @@ async def _handle_select_user(query, user_id, data):
                 logger.error(f"خطا در پاک کردن پیام قبلی: {e}")
     
     # بررسی موجودی کاربر
-    profile = get_user_profile(user_id)
+    profile = await get_user_profile(user_id)
     if not profile or profile[3] < 1:
         await query.edit_message_text(
             "اعتبار کافی برای امتیازدهی ندارید!", 
-            reply_markup=main_menu_keyboard(user_id)
+            reply_markup=await run_read(main_menu_keyboard, user_id)
         )
         return
     
@@ -257,7 +256,7 @@ async def _handle_select_user(query, user_id, data):
         logger.error(f"خطا در نمایش دکمه‌های امتیاز: {e}")
         await query.edit_message_text(
             "متأسفانه در نمایش دکمه‌های امتیاز خطایی رخ داد. لطفاً دوباره تلاش کنید.",
-            reply_markup=main_menu_keyboard(user_id)
+            reply_markup=await run_read(main_menu_keyboard, user_id)
         )
 
 async def _handle_give_points(query, user_id, data, context):
@@ -269,7 +268,7 @@ async def _handle_give_points(query, user_id, data, context):
     if len(parts) < 3:
         await query.edit_message_text(
             "خطا در پردازش درخواست. لطفاً دوباره تلاش کنید.",
-            reply_markup=main_menu_keyboard(user_id)
+            reply_markup=await run_read(main_menu_keyboard, user_id)
         )
         return
     
@@ -277,22 +276,13 @@ async def _handle_give_points(query, user_id, data, context):
     amount = int(parts[2])
     
     # دریافت اطلاعات کاربر مقصد
-    target_user = db_manager.execute_query(
+    target_user = await execute_query(
         "SELECT name FROM users WHERE user_id=?", 
         (touser_id,), 
         fetchone=True
     )
     touser_name = target_user[0] if target_user else "کاربر"
     
-    # بررسی موجودی کاربر
-    profile = get_user_profile(user_id)
-    if not profile or profile[3] < amount:
-        await query.edit_message_text(
-            "اعتبار کافی ندارید!",
-            reply_markup=main_menu_keyboard(user_id)
-        )
-        return
-    
     # ذخیره اطلاعات تراکنش در context
     context.user_data['pending_transaction'] = {
         'touser_id': touser_id,
@@ -332,7 +322,7 @@ async def _handle_confirm_transaction(query, user_id, data, context):
     if transaction_id != transaction_data.get('id', ''):
         await query.edit_message_text(
             "❌ خطا: اطلاعات تراکنش معتبر نیست. لطفاً دوباره تلاش کنید.",
-            reply_markup=main_menu_keyboard(user_id)
+            reply_markup=await run_read(main_menu_keyboard, user_id)
         )
         return
     
@@ -344,119 +334,60 @@ async def _handle_confirm_transaction(query, user_id, data, context):
     if not touser_id or not amount:
         await query.edit_message_text(
             "❌ خطا: اطلاعات تراکنش ناقص است. لطفاً دوباره تلاش کنید.",
-            reply_markup=main_menu_keyboard(user_id)
-        )
-        return
-    
-    # بررسی موجودی کاربر
-    profile = get_user_profile(user_id)
-    if not profile or profile[3] < amount:
-        await query.edit_message_text(
-            "اعتبار کافی ندارید!",
-            reply_markup=main_menu_keyboard(user_id)
+            reply_markup=await run_read(main_menu_keyboard, user_id)
         )
         return
     
     # دریافت فصل فعال
-    active_season = get_active_season()
+    active_season = await get_active_season()
     if not active_season:
         season_id = config.SEASON_ID
     else:
         season_id = active_season[0]
     
     # دریافت نام کاربر فرستنده و مقصد
-    sender_info = db_manager.execute_query(
-        "SELECT name FROM users WHERE user_id=?", 
-        (user_id,), 
-        fetchone=True
-    )
-    sender_name = sender_info[0] if sender_info else "کاربر"
+    request_ctx = await get_request_context(context, user_id)
+    sender_name = request_ctx.name or "کاربر"
     
-    target_info = db_manager.execute_query(
+    target_info = await execute_query(
         "SELECT name FROM users WHERE user_id=?", 
         (touser_id,), 
         fetchone=True
     )
     touser_name = target_info[0] if target_info else "کاربر"
     
+    # کسر مشروط اعتبار و ثبت تراکنش در یک تراکنش دیتابیس؛ کلید یکتایی جلوی ثبت دوباره
+    # با کلیک دوباره روی «تأیید» یا درخواست همزمان را می‌گیرد
+    message_id = query.message.message_id if hasattr(query, 'message') and query.message else None
+    result = await transfer_kudos_async(
+        user_id, touser_id, amount, season_id, reason, message_id,
+        idempotency_key=make_idempotency_key(user_id, transaction_id)
+    )
+    if result.status == TRANSFER_INSUFFICIENT_BALANCE:
+        await query.edit_message_text(
+            "اعتبار کافی ندارید!",
+            reply_markup=await run_read(main_menu_keyboard, user_id)
+        )
+        return
+    if result.status == TRANSFER_DUPLICATE:
+        logger.info(f"تأیید تکراری تراکنش {transaction_id} از کاربر {user_id} نادیده گرفته شد")
+        await query.edit_message_text(
+            "ℹ️ این امتیازدهی قبلاً ثبت شده است.",
+            reply_markup=await run_read(main_menu_keyboard, user_id)
+        )
+        return
+    if result.status != TRANSFER_OK:
+        await query.edit_message_text(
+            "خطا در انجام تراکنش! لطفاً دوباره تلاش کنید.",
+            reply_markup=await run_read(main_menu_keyboard, user_id)
+        )
+        return
+    
     try:
-        # ایجاد یک connection جدید و شروع تراکنش 
-        conn = db_manager.get_connection()
-        c = conn.cursor()
+        logger.info(f"تراکنش {amount} امتیاز از {user_id} به {touser_id} با موفقیت انجام شد")
         
-        try:
-            # کم کردن اعتبار از فرستنده
-            c.execute(
-                "UPDATE users SET balance = balance - ? WHERE user_id = ?", 
-                (amount, user_id)
-            )
-            
-            # تبدیل تاریخ میلادی به شمسی
-            import jdatetime
-            from datetime import datetime
-            current_time = datetime.now()
-            jalali_date = jdatetime.datetime.fromgregorian(datetime=current_time)
-            
-            # نگاشت دستی روزها و ماه‌های فارسی
-            fa_weekdays = {
-                'Saturday': 'شنبه',
-                'Sunday': 'یکشنبه',
-                'Monday': 'دوشنبه',
-                'Tuesday': 'سه‌شنبه',
-                'Wednesday': 'چهارشنبه',
-                'Thursday': 'پنجشنبه',
-                'Friday': 'جمعه',
-            }
-            fa_months = {
-                'Farvardin': 'فروردین',
-                'Ordibehesht': 'اردیبهشت',
-                'Khordad': 'خرداد',
-                'Tir': 'تیر',
-                'Mordad': 'مرداد',
-                'Shahrivar': 'شهریور',
-                'Mehr': 'مهر',
-                'Aban': 'آبان',
-                'Azar': 'آذر',
-                'Dey': 'دی',
-                'Bahman': 'بهمن',
-                'Esfand': 'اسفند',
-            }
-            
-            # تبدیل اعداد انگلیسی به فارسی
-            def en_to_fa_numbers(text):
-                fa_nums = {'0': '۰', '1': '۱', '2': '۲', '3': '۳', '4': '۴',
-                          '5': '۵', '6': '۶', '7': '۷', '8': '۸', '9': '۹'}
-                for en, fa in fa_nums.items():
-                    text = text.replace(en, fa)
-                return text
-            
-            weekday_en = jalali_date.strftime("%A")
-            month_en = jalali_date.strftime("%B")
-            weekday = fa_weekdays.get(weekday_en, weekday_en)
-            month = fa_months.get(month_en, month_en)
-            day = en_to_fa_numbers(str(jalali_date.day))
-            year = en_to_fa_numbers(str(jalali_date.year))
-            
-            jalali_date_str = f"{weekday} {day} {month} {year}"
-            
-            # ثبت تراکنش
-            c.execute(
-                "INSERT INTO transactions (user_id, touser, amount, season_id, reason, message_id) VALUES (?, ?, ?, ?, ?, ?)", 
-                (user_id, touser_id, amount, season_id, reason, query.message.message_id if hasattr(query, 'message') and query.message else None)
-            )
-            
-            # کامیت کردن تراکنش
-            conn.commit()
-            logger.info(f"تراکنش {amount} امتیاز از {user_id} به {touser_id} با موفقیت انجام شد")
-            
-        except Exception as db_error:
-            # در صورت بروز خطا، rollback انجام می‌دهیم
-            conn.rollback()
-            logger.error(f"خطا در تراکنش دیتابیس: {db_error}")
-            raise db_error
-        finally:
-            # بستن اتصال دیتابیس
-            conn.close()
+        # به‌روزرسانی رتبه‌بندی زنده فصل (season_totals را تریگرها در همان تراکنش به‌روز کرده‌اند)
+        rank_service.record_transaction(season_id, touser_id, amount)
         
         # ارسال پیام اطلاع‌رسانی به کاربر گیرنده
         try:
@@ -537,7 +468,7 @@ async def _handle_confirm_transaction(query, user_id, data, context):
         await query.edit_message_text(
             f"✅ {amount} امتیاز به {touser_name} داده شد!\n\n"  
             f"دلیل: {reason}",
-            reply_markup=main_menu_keyboard(user_id)
+            reply_markup=await run_read(main_menu_keyboard, user_id)
         )
         
         # پاک کردن اطلاعات تراکنش از context
@@ -551,7 +482,7 @@ async def _handle_confirm_transaction(query, user_id, data, context):
         logger.error(f"Error in transaction: {e}")
         await query.edit_message_text(
             "خطا در انجام تراکنش! لطفاً دوباره تلاش کنید.",
-            reply_markup=main_menu_keyboard(user_id)
+            reply_markup=await run_read(main_menu_keyboard, user_id)
         )
 
 async def _handle_custom_points(query, user_id, data, context):
@@ -560,7 +491,7 @@ async def _handle_custom_points(query, user_id, data, context):
     touser_id = int(data.split("^")[1])
     
     # دریافت اطلاعات کاربر مقصد
-    target_user = db_manager.execute_query(
+    target_user = await execute_query(
         "SELECT name FROM users WHERE user_id=?", 
         (touser_id,), 
         fetchone=True
@@ -568,11 +499,11 @@ async def _handle_custom_points(query, user_id, data, context):
     touser_name = target_user[0] if target_user else "کاربر"
     
     # بررسی موجودی کاربر
-    profile = get_user_profile(user_id)
+    profile = await get_user_profile(user_id)
     if not profile or profile[3] < 1:
         await query.edit_message_text(
             "اعتبار کافی برای امتیازدهی ندارید!", 
-            reply_markup=main_menu_keyboard(user_id)
+            reply_markup=await run_read(main_menu_keyboard, user_id)
         )
         return
     
@@ -608,7 +539,7 @@ async def _handle_improve_reason(query, user_id, data, context):
     if transaction_id != transaction_data.get('id', ''):
         await query.edit_message_text(
             "❌ خطا: اطلاعات تراکنش معتبر نیست. لطفاً دوباره تلاش کنید.",
-            reply_markup=main_menu_keyboard(user_id)
+            reply_markup=await run_read(main_menu_keyboard, user_id)
         )
         return
     
@@ -620,12 +551,12 @@ async def _handle_improve_reason(query, user_id, data, context):
     if not touser_id or not amount:
         await query.edit_message_text(
             "❌ خطا: اطلاعات تراکنش ناقص است. لطفاً دوباره تلاش کنید.",
-            reply_markup=main_menu_keyboard(user_id)
+            reply_markup=await run_read(main_menu_keyboard, user_id)
         )
         return
     
     # دریافت نام کاربر مقصد
-    target_info = db_manager.execute_query(
+    target_info = await execute_query(
         "SELECT name FROM users WHERE user_id=?", 
         (touser_id,), 
         fetchone=True
@@ -633,17 +564,11 @@ async def _handle_improve_reason(query, user_id, data, context):
     touser_name = target_info[0] if target_info else "کاربر"
     
     # بررسی وضعیت فعال/غیرفعال بودن قابلیت‌های هوش مصنوعی
-    from ..database.db_utils import execute_db_query
-    from ..handlers.admin_handlers import is_admin
     
-    ai_features_enabled = execute_db_query(
-        "SELECT value FROM settings WHERE key='ai_features_enabled'", 
-        fetchone=True
-    )
-    ai_features_enabled = ai_features_enabled[0] if ai_features_enabled else "1"  # پیش‌فرض: فعال
+    ai_features_enabled = await settings.get_bool_async("ai_features_enabled")
     
     # اگر قابلیت‌های هوش مصنوعی غیرفعال شده باشند و کاربر ادمین نباشد، پیام مناسب نمایش دهیم
-    if ai_features_enabled == "0" and not is_admin(user_id):
+    if not ai_features_enabled and not await permissions.is_admin_async(user_id):
         await query.edit_message_text(
             f"✨ شما در حال ارسال {amount} امتیاز به {touser_name} هستید.\n\n"
             f"💬 دلیل: {original_reason}\n\n"
@@ -666,7 +591,7 @@ async def _handle_improve_reason(query, user_id, data, context):
     
     try:
         # وارد کردن ماژول هوش مصنوعی
-        from ..services.ai import improve_reason_text, AI_MODULE_AVAILABLE
+        from ..services.ai import improve_reason_text_async, AI_MODULE_AVAILABLE
         
         if not AI_MODULE_AVAILABLE:
             # اگر ماژول هوش مصنوعی در دسترس نیست
@@ -682,8 +607,7 @@ async def _handle_improve_reason(query, user_id, data, context):
             return
         
         # بهبود متن با هوش مصنوعی
-        improved_reason = await asyncio.to_thread(
-            improve_reason_text, 
+        improved_reason = await improve_reason_text_async(
             user_id, 
             original_reason, 
             touser_name, 
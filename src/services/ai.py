@@ -2,157 +2,685 @@
 ماژول هوش مصنوعی برای ربات کادوس
 این ماژول شامل کلاس‌ها و توابع مورد نیاز برای ارتباط با سرویس‌های هوش مصنوعی مختلف است
 از جمله OpenAI و Google Gemini
+
+هر مدل دو مسیر دارد: get_completion (همگام، برای تردها و اسکریپت‌ها) و
+get_completion_async (با AsyncOpenAI روی حلقه asyncio ربات). در هر دو مسیر تعداد
+درخواست‌های همزمان محدود است، هر درخواست timeout دارد و تلاش دوباره با تأخیر نمایی
+تصادفی (jitter) انجام می‌شود؛ لغو task در مسیر ناهمگام درخواست در جریان را هم لغو می‌کند.
+مدل‌های هر سرویس و کلاینت‌های HTTP آن‌ها در کل فرایند مشترک‌اند (get_ai_model) تا
+اتصال‌های keep-alive بین درخواست‌ها دوباره استفاده شوند؛ close_clients هنگام خاموش
+شدن ربات آن‌ها را می‌بندد.
+FakeAIModel یک پشتیبان محلی بدون شبکه برای تست و اجرای آفلاین است
+(get_ai_model("fake") یا AI_BACKEND = "fake" در config).
 """
 
 import logging
 import config
-import sqlite3
-from openai import OpenAI
 from abc import ABC, abstractmethod
+from collections import namedtuple
 
-# متغیر مشخص کننده در دسترس بودن ماژول هوش مصنوعی
-AI_MODULE_AVAILABLE = True
+try:
+    from openai import OpenAI, AsyncOpenAI
+    # متغیر مشخص کننده در دسترس بودن ماژول هوش مصنوعی
+    AI_MODULE_AVAILABLE = True
+except ImportError:
+    OpenAI = AsyncOpenAI = None
+    # پشتیبان آفلاین به کتابخانه openai نیازی ندارد
+    AI_MODULE_AVAILABLE = getattr(config, "AI_BACKEND", None) == "fake"
 import traceback
 import datetime
 import time
+import random
+import asyncio
+import threading
+import weakref
+import importlib.util
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
 # وارد کردن توابع مدیریت دیتابیس
 from ..database import db_utils
+from ..database import season_functions
+from . import permissions
+from ..database.connection_pool import get_connection
+from ..database import write_queue
+from ..database.async_db import run_read
+from . import ai_cache
+from . import ai_usage
+from .prompt_builder import PromptBuilder, Item, estimate_tokens, CHARS_PER_TOKEN
 
 # تنظیم لاگر
 logger = logging.getLogger(__name__)
 
+# تعداد دلایل اخیر خوانده شده برای تحلیل ادمین، حداکثر طول هر دلیل و بودجه توکن
+# بخش دلایل و کل پرامپت
+ANALYSIS_REASON_LIMIT = 300
+ANALYSIS_REASON_CHARS = 200
+ANALYSIS_REASON_TOKENS = 400
+ANALYSIS_PROMPT_TOKENS = 2500
+
+# حداکثر درخواست همزمان به سرویس‌های هوش مصنوعی (جداگانه برای مسیر همگام و ناهمگام)
+AI_MAX_CONCURRENCY = 4
+# حداکثر زمان هر درخواست (ثانیه)
+AI_REQUEST_TIMEOUT = 30.0
+# تعداد کل تلاش‌ها برای هر پاسخ
+AI_MAX_RETRIES = 3
+# پایه و سقف تأخیر نمایی بین تلاش‌ها (ثانیه)
+AI_BACKOFF_BASE = 1.0
+AI_BACKOFF_MAX = 8.0
+
+# مدارشکن هر سرویس: تعداد خطاهای گذرای پشت سر هم برای باز شدن مدار، مدت باز ماندن
+# (ثانیه؛ پس از هر شکست آزمایش نیمه‌باز دو برابر تا سقف) و ضریب میانگین نمایی سلامت
+AI_BREAKER_FAILURES = 5
+AI_BREAKER_COOLDOWN = 30.0
+AI_BREAKER_COOLDOWN_MAX = 300.0
+AI_BREAKER_HEALTH_ALPHA = 0.2
+# سرویس اصلی تا وقتی سلامتش بیش از این مقدار از پشتیبان کمتر نشده ترجیح دارد
+AI_ROUTING_MARGIN = 0.2
+
+# استخر اتصال HTTP مشترک هر سرویس: حداکثر اتصال باز، اتصال‌های بیکار نگه داشته شده
+# و مدت نگهداری اتصال بیکار (ثانیه). HTTP/2 فقط وقتی بسته h2 نصب باشد فعال است.
+AI_HTTP_MAX_CONNECTIONS = 10
+AI_HTTP_KEEPALIVE_CONNECTIONS = AI_MAX_CONCURRENCY
+AI_HTTP_KEEPALIVE_EXPIRY = 60.0
+AI_HTTP2 = importlib.util.find_spec("h2") is not None
+
+_sync_slots = threading.BoundedSemaphore(AI_MAX_CONCURRENCY)
+# هر حلقه asyncio سمافور خودش را دارد (تست‌ها و اسکریپت‌ها حلقه‌های جدا می‌سازند)
+_async_slots = weakref.WeakKeyDictionary()
+
+
+def _async_slot():
+    loop = asyncio.get_running_loop()
+    slot = _async_slots.get(loop)
+    if slot is None:
+        slot = _async_slots[loop] = asyncio.Semaphore(AI_MAX_CONCURRENCY)
+    return slot
+
+
+def backoff_delay(attempt, base=AI_BACKOFF_BASE, cap=AI_BACKOFF_MAX):
+    """تأخیر پیش از تلاش بعدی: عدد تصادفی بین صفر و base * 2^attempt (حداکثر cap)"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+# پاسخ یک درخواست همراه توکن‌های گزارش شده توسط سرویس (None اگر گزارش نشده باشد)
+Completion = namedtuple("Completion", ["text", "prompt_tokens", "completion_tokens"])
+Completion.__new__.__defaults__ = (None, None)
+
+
+def _is_overloaded(error):
+    message = str(error).lower()
+    return "overloaded" in message or "503" in message or "unavailable" in message
+
+
+def _is_retryable(error):
+    """خطاهای گذرا (بار اضافی، محدودیت نرخ، timeout و قطعی شبکه) ارزش تلاش دوباره دارند"""
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    message = str(error).lower()
+    if "invalid" in message and "key" in message:
+        return False
+    return _is_overloaded(error) or any(
+        word in message for word in ("429", "rate limit", "timeout", "timed out", "connection", "500", "502", "504")
+    )
+
+
+class AIRequestError(Exception):
+    """هیچ سرویسی پاسخ نداد و پاسخ قبلی هم برای نمایش وجود ندارد (متن: پیام خطای قابل نمایش)"""
+
+
+class CircuitOpenError(Exception):
+    """مدار سرویس باز است و درخواست بدون تماس با سرویس رد شد"""
+
+    def __init__(self, backend):
+        super().__init__(f"circuit open for {backend}")
+        self.backend = backend
+
+
+class CircuitBreaker:
+    """مدارشکن یک سرویس هوش مصنوعی
+
+    بسته: درخواست‌ها عبور می‌کنند و خطاهای گذرای پشت سر هم شمرده می‌شوند. با رسیدن به
+    threshold مدار باز می‌شود و تا پایان cooldown همه درخواست‌ها فوراً رد می‌شوند. پس از
+    آن مدار نیمه‌باز است و فقط یک درخواست آزمایشی عبور می‌کند؛ موفقیت آن مدار را می‌بندد
+    و شکستش مدار را با cooldown دو برابر دوباره باز می‌کند. health میانگین نمایی نرخ
+    موفقیت (بین 0 و 1) برای انتخاب سرویس است.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, threshold=AI_BREAKER_FAILURES, cooldown=AI_BREAKER_COOLDOWN,
+                 max_cooldown=AI_BREAKER_COOLDOWN_MAX):
+        self.name = name
+        self.threshold = threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.health = 1.0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def _ready(self, now):
+        return self.state == self.OPEN and now - self.opened_at >= self.cooldown
+
+    def available(self):
+        """آیا درخواست بعدی پذیرفته می‌شود (بدون تغییر وضعیت)"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN:
+                return not self._probing
+            return self._ready(time.monotonic())
+
+    def allow(self):
+        """اجازه ارسال یک درخواست؛ در مدار نیمه‌باز فقط اولین فراخواننده آزمایش می‌کند"""
+        with self._lock:
+            if self._ready(time.monotonic()):
+                self.state = self.HALF_OPEN
+                logger.info(f"مدار {self.name} نیمه‌باز شد؛ ارسال درخواست آزمایشی")
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def _update_health(self, ok):
+        self.health += AI_BREAKER_HEALTH_ALPHA * ((1.0 if ok else 0.0) - self.health)
+
+    def record_success(self):
+        with self._lock:
+            self._update_health(True)
+            if self.state != self.CLOSED:
+                logger.info(f"مدار {self.name} دوباره بسته شد")
+            self.state = self.CLOSED
+            self.failures = 0
+            self.cooldown = self.base_cooldown
+            self._probing = False
+
+    def record_failure(self, error):
+        """ثبت خطای یک درخواست؛ فقط خطاهای گذرا (قطعی، بار اضافی، timeout) شمرده می‌شوند"""
+        with self._lock:
+            if not _is_retryable(error):
+                # سرویس پاسخ داده است؛ آزمایش بعدی می‌تواند انجام شود
+                self._probing = False
+                return
+            self._update_health(False)
+            self.failures += 1
+            if self.state == self.HALF_OPEN:
+                self.cooldown = min(self.max_cooldown, self.cooldown * 2)
+                self._open()
+            elif self.state == self.CLOSED and self.failures >= self.threshold:
+                self._open()
+
+    def _open(self):
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self._probing = False
+        logger.warning(f"مدار {self.name} پس از {self.failures} خطای پشت سر هم برای {self.cooldown:.0f} ثانیه باز شد")
+
+    def release(self):
+        """آزاد کردن آزمایش نیمه‌باز درخواستی که پیش از پاسخ لغو شد"""
+        with self._lock:
+            self._probing = False
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "state": self.state, "failures": self.failures, "health": round(self.health, 3),
+                "cooldown": self.cooldown, "rejected": self.rejected,
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(backend):
+    """مدارشکن مشترک یک سرویس (gemini، openai و ...)"""
+    with _breakers_lock:
+        breaker = _breakers.get(backend)
+        if breaker is None:
+            breaker = _breakers[backend] = CircuitBreaker(backend)
+        return breaker
+
+
+def get_breaker_stats():
+    """وضعیت مدارشکن سرویس‌ها"""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.snapshot() for breaker in breakers}
+
+
+def reset_breakers():
+    """بستن همه مدارها (برای تست و پس از تعویض کلید API)"""
+    with _breakers_lock:
+        _breakers.clear()
+
+
+def route(models):
+    """مرتب‌سازی سرویس‌ها بر اساس سلامت مدارشان
+
+    مدل اول (اصلی) تا وقتی سلامتش بیش از AI_ROUTING_MARGIN از بقیه کمتر نشده اول
+    می‌ماند؛ مدل‌هایی که مدارشان باز است آخر می‌آیند (و فوراً رد می‌شوند).
+    """
+    primary = models[0]
+
+    def score(model):
+        breaker = model.breaker
+        if not breaker.available():
+            return -1.0
+        return breaker.health + (AI_ROUTING_MARGIN if model is primary else 0.0)
+
+    return sorted(models, key=score, reverse=True)
+
+
 class AIModel(ABC):
-    """کلاس پایه برای مدل‌های هوش مصنوعی"""
-    
+    """کلاس پایه برای مدل‌های هوش مصنوعی
+
+    زیرکلاس‌ها فقط _request و _request_async را پیاده می‌کنند (خروجی: متن یا
+    Completion)؛ محدودیت همزمانی، timeout، تلاش دوباره، مدارشکن و ثبت مصرف در
+    ai_usage در complete و complete_async مشترک است.
+    """
+
+    name = "ai"
+
+    @property
+    def breaker(self):
+        """مدارشکن سرویس این مدل (مشترک بین همه نمونه‌های یک سرویس)"""
+        return get_breaker(self.name)
+
+    def close(self):
+        """بستن اتصال‌های مدل (مسیر همگام)"""
+
+    async def aclose(self):
+        """بستن اتصال‌های مدل"""
+        self.close()
+
     @abstractmethod
-    def get_completion(self, prompt, system_message=None):
-        """دریافت پاسخ از مدل هوش مصنوعی"""
-        pass
+    def _request(self, messages):
+        """ارسال یک درخواست همگام و برگرداندن متن پاسخ"""
+
+    @abstractmethod
+    async def _request_async(self, messages):
+        """ارسال یک درخواست ناهمگام و برگرداندن متن پاسخ"""
+
+    @staticmethod
+    def _messages(prompt, system_message):
+        messages = []
+        if system_message:
+            messages.append({"role": "system", "content": system_message})
+        messages.append({"role": "user", "content": prompt})
+        return messages
+
+    def _record(self, messages, result, started, attempt, caller):
+        """ثبت مصرف یک فراخوانی و برگرداندن متن پاسخ (result=None یعنی شکست)"""
+        if result is None:
+            ai_usage.record(_model_id(self), caller, 0, 0, time.monotonic() - started, attempt, ok=False)
+            return None
+        if not isinstance(result, Completion):
+            result = Completion(result)
+        prompt_tokens = result.prompt_tokens
+        if prompt_tokens is None:
+            prompt_tokens = sum(estimate_tokens(message["content"]) for message in messages)
+        completion_tokens = result.completion_tokens
+        if completion_tokens is None:
+            completion_tokens = estimate_tokens(result.text)
+        ai_usage.record(
+            _model_id(self), caller, prompt_tokens, completion_tokens, time.monotonic() - started, attempt
+        )
+        return result.text
+
+    def complete(self, prompt, system_message=None, caller=None):
+        """دریافت پاسخ با تلاش دوباره؛ در صورت شکست همه تلاش‌ها خطای آخر را بالا می‌فرستد
 
-class OpenAIModel(AIModel):
-    """کلاس مدیریت ارتباط با سرویس OpenAI"""
-    
-    def __init__(self, api_key=None, model="gpt-3.5-turbo"):
-        """راه‌اندازی کلاینت OpenAI"""
-        self.api_key = api_key or config.OPENAI_API_KEY
-        self.model = model
-        self.client = OpenAI(api_key=self.api_key)
-    
-    def get_completion(self, prompt, system_message="You are a helpful assistant."):
-        """
-        دریافت پاسخ از مدل OpenAI
-        
         Args:
-            prompt (str): پیام ورودی کاربر
-            system_message (str): پیام سیستم برای تنظیم رفتار مدل
-            
+            caller (str, optional): قابلیت فراخواننده برای حسابداری مصرف
+        """
+        messages = self._messages(prompt, system_message)
+        breaker = self.breaker
+        started = time.monotonic()
+        for attempt in range(AI_MAX_RETRIES):
+            # مدار باز: رد فوری بدون تماس با سرویس (و بدون ادامه تلاش‌ها)
+            if not breaker.allow():
+                self._record(messages, None, started, attempt, caller)
+                raise CircuitOpenError(self.name)
+            try:
+                with _sync_slots:
+                    result = self._request(messages)
+            except Exception as e:
+                breaker.record_failure(e)
+                if attempt + 1 >= AI_MAX_RETRIES or not _is_retryable(e):
+                    self._record(messages, None, started, attempt, caller)
+                    raise
+                delay = backoff_delay(attempt)
+                logger.warning(f"خطا در دریافت پاسخ از {self.name} (تلاش {attempt+1}/{AI_MAX_RETRIES})، تلاش دوباره پس از {delay:.1f} ثانیه: {e}")
+                time.sleep(delay)
+                continue
+            breaker.record_success()
+            return self._record(messages, result, started, attempt, caller)
+
+    async def complete_async(self, prompt, system_message=None, caller=None):
+        """نسخه ناهمگام complete (قابل لغو؛ لغو task درخواست در جریان را هم لغو می‌کند)"""
+        messages = self._messages(prompt, system_message)
+        breaker = self.breaker
+        started = time.monotonic()
+        for attempt in range(AI_MAX_RETRIES):
+            if not breaker.allow():
+                self._record(messages, None, started, attempt, caller)
+                raise CircuitOpenError(self.name)
+            try:
+                async with _async_slot():
+                    result = await asyncio.wait_for(self._request_async(messages), AI_REQUEST_TIMEOUT)
+            except asyncio.CancelledError:
+                breaker.release()
+                raise
+            except Exception as e:
+                breaker.record_failure(e)
+                if attempt + 1 >= AI_MAX_RETRIES or not _is_retryable(e):
+                    self._record(messages, None, started, attempt, caller)
+                    raise
+                delay = backoff_delay(attempt)
+                logger.warning(f"خطا در دریافت پاسخ از {self.name} (تلاش {attempt+1}/{AI_MAX_RETRIES})، تلاش دوباره پس از {delay:.1f} ثانیه: {e!r}")
+                await asyncio.sleep(delay)
+                continue
+            breaker.record_success()
+            return self._record(messages, result, started, attempt, caller)
+
+    def _failure_message(self, error):
+        if isinstance(error, CircuitOpenError):
+            return "⚠️ سرویس هوش مصنوعی موقتاً در دسترس نیست. لطفاً چند دقیقه دیگر دوباره امتحان کنید."
+        return f"متأسفانه در دریافت پاسخ از هوش مصنوعی خطایی رخ داد: {error}"
+
+    def _fallbacks(self):
+        """مدل‌های پشتیبان این مدل (به ترتیب ترجیح)"""
+        return []
+
+    def _failed(self, errors):
+        message = self._failure_message(errors[0])
+        if len(errors) > 1:
+            message += "\n\nهمچنین تلاش برای استفاده از مدل پشتیبان نیز ناموفق بود."
+        return message, False
+
+    def answer(self, prompt, system_message="You are a helpful assistant.", caller=None):
+        """دریافت پاسخ بدون بالا فرستادن خطا (از سالم‌ترین سرویس، با پشتیبان‌ها)
+
         Returns:
-            str: پاسخ دریافتی از مدل
+            tuple: (متن، موفق، مدلی که پاسخ داد یا None) که در صورت شکست متن پیام
+            خطای قابل نمایش به کاربر است
         """
-        try:
-            messages = []
-            if system_message:
-                messages.append({"role": "system", "content": system_message})
-            messages.append({"role": "user", "content": prompt})
-            
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages
-            )
-            
-            return response.choices[0].message.content
-        except Exception as e:
-            logger.error(f"خطا در دریافت پاسخ از OpenAI: {e}")
-            return f"متأسفانه در دریافت پاسخ از هوش مصنوعی خطایی رخ داد: {e}"
+        errors = []
+        for model in route([self] + self._fallbacks()):
+            try:
+                return model.complete(prompt, system_message, caller), True, model
+            except Exception as e:
+                logger.error(f"خطا در دریافت پاسخ از {model.name}: {e!r}")
+                errors.append(e)
+        return self._failed(errors) + (None,)
+
+    async def answer_async(self, prompt, system_message="You are a helpful assistant.", caller=None):
+        """نسخه ناهمگام answer"""
+        errors = []
+        for model in route([self] + self._fallbacks()):
+            try:
+                return await model.complete_async(prompt, system_message, caller), True, model
+            except Exception as e:
+                logger.error(f"خطا در دریافت پاسخ از {model.name}: {e!r}")
+                errors.append(e)
+        return self._failed(errors) + (None,)
+
+    def respond(self, prompt, system_message="You are a helpful assistant.", caller=None):
+        """دریافت پاسخ بدون بالا فرستادن خطا
+
+        Returns:
+            tuple: (متن، موفق) که در صورت شکست متن پیام خطای قابل نمایش به کاربر است
+        """
+        return self.answer(prompt, system_message, caller)[:2]
+
+    async def respond_async(self, prompt, system_message="You are a helpful assistant.", caller=None):
+        """نسخه ناهمگام respond"""
+        return (await self.answer_async(prompt, system_message, caller))[:2]
 
-class GeminiModel(AIModel):
-    """کلاس مدیریت ارتباط با سرویس Google Gemini از طریق رابط OpenAI"""
-    
-    def __init__(self, api_key=None, model="gemini-2.0-flash"):
-        """راه‌اندازی کلاینت Gemini با استفاده از OpenAI Client"""
-        self.api_key = api_key or config.GEMINI_API_KEY
-        self.model = model
-        self.client = OpenAI(
-            api_key=self.api_key,
-            base_url=config.GEMINI_BASE_URL
-        )
-    
     def get_completion(self, prompt, system_message="You are a helpful assistant."):
         """
-        دریافت پاسخ از مدل Gemini
+        دریافت پاسخ از مدل (همگام)
         
         Args:
             prompt (str): پیام ورودی کاربر
             system_message (str): پیام سیستم برای تنظیم رفتار مدل
             
         Returns:
-            str: پاسخ دریافتی از مدل
+            str: پاسخ دریافتی از مدل یا پیام خطای قابل نمایش به کاربر
         """
+        return self.respond(prompt, system_message)[0]
+
+    async def get_completion_async(self, prompt, system_message="You are a helpful assistant."):
+        """نسخه ناهمگام get_completion (حلقه ربات در زمان انتظار آزاد می‌ماند)"""
+        return (await self.respond_async(prompt, system_message))[0]
+
+
+def _http_client(asynchronous=False):
+    """کلاینت httpx با استخر اتصال keep-alive (None: پیش‌فرض کتابخانه openai)"""
+    if httpx is None:
+        return None
+    limits = httpx.Limits(
+        max_connections=AI_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=AI_HTTP_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=AI_HTTP_KEEPALIVE_EXPIRY,
+    )
+    cls = httpx.AsyncClient if asynchronous else httpx.Client
+    return cls(limits=limits, http2=AI_HTTP2, timeout=AI_REQUEST_TIMEOUT)
+
+
+class _OpenAICompatibleModel(AIModel):
+    """مدلی که از طریق رابط OpenAI (کلاینت همگام و AsyncOpenAI) فراخوانی می‌شود
+
+    کلاینت همگام یک بار ساخته و بین تردها مشترک است؛ کلاینت ناهمگام برای هر حلقه
+    asyncio جداست (اتصال‌های httpx به حلقه سازنده‌شان وابسته‌اند).
+    """
+
+    def __init__(self, api_key, model, base_url=None):
+        if OpenAI is None:
+            raise RuntimeError("کتابخانه openai نصب نیست")
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url
+        self._client = None
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._client_lock = threading.Lock()
+
+    def _client_options(self, http_client):
+        # تلاش دوباره و timeout در همین ماژول مدیریت می‌شوند
+        options = {"api_key": self.api_key, "max_retries": 0, "timeout": AI_REQUEST_TIMEOUT}
+        if self.base_url:
+            options["base_url"] = self.base_url
+        if http_client is not None:
+            options["http_client"] = http_client
+        return options
+
+    @property
+    def client(self):
+        with self._client_lock:
+            if self._client is None:
+                self._client = OpenAI(**self._client_options(_http_client()))
+            return self._client
+
+    @property
+    def async_client(self):
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = AsyncOpenAI(**self._client_options(_http_client(asynchronous=True)))
+            self._async_clients[loop] = client
+        return client
+
+    def close(self):
+        with self._client_lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
+
+    async def aclose(self):
+        self.close()
+        # کلاینت ناهمگام فقط روی حلقه سازنده‌اش بسته می‌شود
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.close()
+
+    @staticmethod
+    def _completion(response):
+        usage = getattr(response, "usage", None)
+        return Completion(
+            response.choices[0].message.content,
+            getattr(usage, "prompt_tokens", None),
+            getattr(usage, "completion_tokens", None),
+        )
+
+    def _request(self, messages):
+        response = self.client.chat.completions.create(model=self.model, messages=messages)
+        return self._completion(response)
+
+    async def _request_async(self, messages):
+        response = await self.async_client.chat.completions.create(model=self.model, messages=messages)
+        return self._completion(response)
+
+
+class OpenAIModel(_OpenAICompatibleModel):
+    """کلاس مدیریت ارتباط با سرویس OpenAI"""
+
+    name = "openai"
+    
+    def __init__(self, api_key=None, model="gpt-3.5-turbo"):
+        """راه‌اندازی کلاینت OpenAI"""
+        super().__init__(api_key or config.OPENAI_API_KEY, model)
+
+
+def _openai_fallback_configured():
+    key = getattr(config, 'OPENAI_API_KEY', None)
+    return bool(key) and key != "YOUR_OPENAI_API_KEY"
+
+
+def _openai_fallback():
+    return _shared_model("openai", OpenAIModel)
+
+
+class GeminiModel(_OpenAICompatibleModel):
+    """کلاس مدیریت ارتباط با سرویس Google Gemini از طریق رابط OpenAI
+
+    اگر کلید OpenAI تنظیم شده باشد، OpenAI پشتیبان است: پس از شکست Gemini، یا از ابتدا
+    وقتی مدار Gemini باز است یا سلامتش به طور محسوس کمتر است.
+    """
+
+    name = "gemini"
+    
+    def __init__(self, api_key=None, model="gemini-2.0-flash"):
+        """راه‌اندازی کلاینت Gemini با استفاده از OpenAI Client"""
+        super().__init__(api_key or config.GEMINI_API_KEY, model, base_url=config.GEMINI_BASE_URL)
+
+    def _fallbacks(self):
+        return [_openai_fallback()] if _openai_fallback_configured() else []
+
+    def _failure_message(self, error):
+        """پیام خطای مناسب بر اساس نوع خطا"""
+        if isinstance(error, CircuitOpenError):
+            return super()._failure_message(error)
+        error_msg = str(error).lower()
+        if _is_overloaded(error):
+            return "متأسفانه در حال حاضر سرویس هوش مصنوعی Google Gemini با ترافیک بالا مواجه است. لطفاً چند دقیقه دیگر دوباره امتحان کنید."
+        if "quota" in error_msg or "rate limit" in error_msg:
+            return "متأسفانه سهمیه استفاده از Google Gemini به اتمام رسیده است. لطفاً با ادمین تماس بگیرید."
+        if "invalid" in error_msg and "key" in error_msg:
+            return "خطا در کلید API هوش مصنوعی. لطفاً به ادمین سیستم اطلاع دهید."
+        return "متأسفانه در دریافت پاسخ از Google Gemini خطایی رخ داد. لطفاً دوباره تلاش کنید."
+
+
+class FakeAIModel(AIModel):
+    """پشتیبان محلی بدون شبکه برای تست و اجرای آفلاین
+
+    Args:
+        responses (list, optional): پاسخ‌های از پیش تعیین شده (به ترتیب)؛ در نبود آن پاسخ از روی پرامپت ساخته می‌شود
+        delay (float): تأخیر شبیه‌سازی شده هر درخواست (ثانیه)
+        failures (int): تعداد درخواست‌های اول که با خطا شکست می‌خورند
+        error (Exception, optional): خطای شبیه‌سازی شده (پیش‌فرض: بار اضافی سرور)
+        fallback (AIModel, optional): مدل پشتیبان
+        name (str): نام سرویس؛ هر نمونه مدارشکن جداگانه خودش را دارد
+    """
+
+    name = "fake"
+
+    def __init__(self, responses=None, delay=0.0, failures=0, error=None, fallback=None, name="fake"):
+        self.responses = list(responses or [])
+        self.delay = delay
+        self.failures = failures
+        self.error = error
+        self.fallback = fallback
+        self.name = name
+        self.calls = []
+        self._lock = threading.Lock()
+        self._breaker = CircuitBreaker(name)
+
+    @property
+    def breaker(self):
+        return self._breaker
+
+    def _fallbacks(self):
+        return [self.fallback] if self.fallback else []
+
+    def _next(self, messages):
+        with self._lock:
+            self.calls.append(messages)
+            if self.failures > 0:
+                self.failures -= 1
+                raise self.error or ConnectionError("503 service unavailable (fake)")
+            if self.responses:
+                return self.responses.pop(0)
+        prompt = messages[-1]["content"].strip()
+        return f"پاسخ آزمایشی: {prompt[:80]}"
+
+    def _request(self, messages):
+        if self.delay:
+            time.sleep(self.delay)
+        return self._next(messages)
+
+    async def _request_async(self, messages):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return self._next(messages)
+
+
+# نمونه‌های مشترک مدل هر سرویس (و کلاینت‌ها و استخر اتصالشان) در کل فرایند
+_models = {}
+_models_lock = threading.Lock()
+
+
+def _shared_model(key, factory):
+    with _models_lock:
+        model = _models.get(key)
+        if model is None:
+            model = _models[key] = factory()
+        return model
+
+
+async def close_clients():
+    """بستن کلاینت‌های مشترک همه سرویس‌ها (هنگام خاموش شدن ربات یا پس از تعویض کلید API)"""
+    with _models_lock:
+        models = list(_models.values())
+        _models.clear()
+    for model in models:
         try:
-            messages = []
-            if system_message:
-                messages.append({"role": "system", "content": system_message})
-            messages.append({"role": "user", "content": prompt})
-            
-            # تلاش اول
-            max_retries = 3
-            retry_count = 0
-            last_error = None
-            
-            while retry_count < max_retries:
-                try:
-                    response = self.client.chat.completions.create(
-                        model=self.model,
-                        messages=messages
-                    )
-                    return response.choices[0].message.content
-                except Exception as e:
-                    last_error = e
-                    error_msg = str(e)
-                    logger.warning(f"خطا در دریافت پاسخ از Gemini (تلاش {retry_count+1}/{max_retries}): {error_msg}")
-                    
-                    # اگر خطای بار اضافی سرور بود، زمان انتظار را افزایش دهیم
-                    if "overloaded" in error_msg.lower() or "503" in error_msg or "unavailable" in error_msg.lower():
-                        wait_time = (retry_count + 1) * 2  # 2، 4، 6 ثانیه
-                        logger.info(f"سرور Gemini دچار بار اضافی است. انتظار باید {wait_time} ثانیه...")
-                        time.sleep(wait_time)
-                    else:
-                        # برای سایر خطاها، انتظار کوتاه‌تر
-                        time.sleep(1)
-                    
-                    retry_count += 1
-            
-            # اگر تمام تلاش‌ها ناموفق بود، خطای آخر را لاگ کنیم
-            logger.error(f"تلاش‌های متعدد برای دریافت پاسخ از Gemini ناموفق بود: {last_error}")
-            
-            # بررسی نوع خطا برای ارائه پیام مناسب به کاربر
-            error_msg = str(last_error).lower()
-            
-            # پیام خطای مناسب بر اساس نوع خطا
-            if "overloaded" in error_msg or "503" in error_msg or "unavailable" in error_msg:
-                user_message = "متأسفانه در حال حاضر سرویس هوش مصنوعی Google Gemini با ترافیک بالا مواجه است. لطفاً چند دقیقه دیگر دوباره امتحان کنید."
-            elif "quota" in error_msg or "rate limit" in error_msg:
-                user_message = "متأسفانه سهمیه استفاده از Google Gemini به اتمام رسیده است. لطفاً با ادمین تماس بگیرید."
-            elif "invalid" in error_msg and "key" in error_msg:
-                user_message = "خطا در کلید API هوش مصنوعی. لطفاً به ادمین سیستم اطلاع دهید."
-            else:
-                user_message = "متأسفانه در دریافت پاسخ از Google Gemini خطایی رخ داد. لطفاً دوباره تلاش کنید."
-            
-            # سعی می‌کنیم از OpenAI استفاده کنیم به عنوان پشتیبان
-            if hasattr(config, 'OPENAI_API_KEY') and config.OPENAI_API_KEY and config.OPENAI_API_KEY != "YOUR_OPENAI_API_KEY":
-                logger.info("در حال تغییر به مدل OpenAI به عنوان پشتیبان...")
-                try:
-                    openai_model = OpenAIModel()
-                    return openai_model.get_completion(prompt, system_message)
-                except Exception as openai_error:
-                    logger.error(f"خطا در استفاده از OpenAI به عنوان پشتیبان: {openai_error}")
-                    return f"{user_message}\n\nهمچنین تلاش برای استفاده از مدل پشتیبان نیز ناموفق بود."
-            
-            return user_message
+            await model.aclose()
         except Exception as e:
-            logger.error(f"خطا در دریافت پاسخ از Gemini: {e}")
-            traceback.print_exc()
-            return f"متأسفانه در دریافت پاسخ از هوش مصنوعی خطایی رخ داد: {e}"
+            logger.error(f"خطا در بستن کلاینت {model.name}: {e}")
+
 
 # فانکشن کمکی برای دریافت نمونه مدل هوش مصنوعی
 def get_ai_model(model_type="gemini"):
@@ -160,18 +688,120 @@ def get_ai_model(model_type="gemini"):
     دریافت مدل هوش مصنوعی بر اساس نوع مشخص شده
     
     Args:
-        model_type (str): نوع مدل هوش مصنوعی ("openai" یا "gemini")
+        model_type (str): نوع مدل هوش مصنوعی ("openai"، "gemini" یا "fake")
         
     Returns:
-        AIModel: نمونه‌ای از کلاس مدل هوش مصنوعی
+        AIModel: نمونه مشترک مدل هوش مصنوعی (FakeAIModel برای هر فراخوانی جدید است)
     """
+    if getattr(config, "AI_BACKEND", None) == "fake" or model_type.lower() == "fake":
+        return FakeAIModel()
     if model_type.lower() == "openai":
-        return OpenAIModel()
+        return _shared_model("openai", OpenAIModel)
     elif model_type.lower() == "gemini":
-        return GeminiModel()
+        return _shared_model("gemini", GeminiModel)
     else:
         logger.warning(f"نوع مدل نامعتبر: {model_type}. استفاده از Gemini به صورت پیش‌فرض.")
-        return GeminiModel()
+        return _shared_model("gemini", GeminiModel)
+
+
+# درخواست آماده ارسال به مدل: بخش دیتابیسی هر قابلیت (خواندن و ساخت پرامپت) جدا از
+# انتظار برای پاسخ انجام می‌شود تا مسیر ناهمگام آن را در ترد خواننده اجرا کند.
+# save(text) در صورت نیاز (query, params) ذخیره پاسخ را برمی‌گرداند و
+# postprocess(text) متن نهایی را می‌سازد. پاسخ موفق با اثر انگشت مدل و پرامپت در
+# ai_cache نگه داشته می‌شود تا داده بدون تغییر دوباره به مدل فرستاده نشود.
+# feature نام قابلیت در حسابداری مصرف (ai_usage) است. fallback پاسخ قبلی (کهنه)
+# است که وقتی هیچ سرویسی پاسخ نداد به جای پیام خطا نمایش داده می‌شود.
+AIRequest = namedtuple(
+    "AIRequest", ["prompt", "system_message", "model_type", "save", "postprocess", "cache", "feature", "fallback"]
+)
+AIRequest.__new__.__defaults__ = ("gemini", None, None, True, None, None)
+
+
+def _model_id(model):
+    return f"{model.name}:{getattr(model, 'model', '')}"
+
+
+def _cache_key(request, model):
+    if not request.cache:
+        return None
+    return ai_cache.fingerprint(_model_id(model), request.system_message, request.prompt)
+
+
+def _cache_keys(request, model):
+    """اثر انگشت درخواست برای هر سرویسی که ممکن است پاسخ داده باشد (به ترتیب مسیریابی)
+
+    پاسخ هر سرویس با اثر انگشت همان سرویس ذخیره می‌شود؛ جستجو در همه آن‌ها باعث می‌شود
+    پاسخ پشتیبان (مثلاً در زمان قطعی سرویس اصلی) هم برای داده بدون تغییر دوباره استفاده شود.
+    """
+    if not request.cache:
+        return []
+    return [_cache_key(request, candidate) for candidate in route([model] + model._fallbacks())]
+
+
+def _finish(request, text):
+    if request.postprocess:
+        text = request.postprocess(text)
+    return text
+
+
+def _complete(request):
+    """اجرای همگام یک AIRequest (یا برگرداندن متن آماده اگر پرامپتی لازم نبود)"""
+    if not isinstance(request, AIRequest):
+        return request
+    model = get_ai_model(request.model_type)
+    keys = _cache_keys(request, model)
+    text = ai_cache.get(*keys) if keys else None
+    if text is None:
+        text, ok, answered = model.answer(request.prompt, request.system_message, request.feature)
+        if not ok:
+            # پیام خطا نه ذخیره می‌شود و نه در کش می‌ماند
+            return _finish(request, request.fallback) if request.fallback else text
+        if keys:
+            # پاسخ مدل پشتیبان با شناسه همان مدل نگه داشته می‌شود
+            ai_cache.put(_cache_key(request, answered), _model_id(answered), text)
+    if request.save:
+        write_queue.execute(*request.save(text))
+    return _finish(request, text)
+
+
+async def _execute_async(request):
+    """اجرای ناهمگام یک AIRequest
+
+    Returns:
+        tuple: (متن، موفق، توکن‌های تخمینی مصرف شده؛ صفر اگر مدل فراخوانی نشد)
+    """
+    if not isinstance(request, AIRequest):
+        return request, True, 0
+    model = get_ai_model(request.model_type)
+    keys = _cache_keys(request, model)
+    text = await ai_cache.get_async(*keys) if keys else None
+    tokens = 0
+    if text is None:
+        text, ok, answered = await model.answer_async(request.prompt, request.system_message, request.feature)
+        tokens = estimate_tokens(request.system_message) + estimate_tokens(request.prompt)
+        if not ok:
+            if request.fallback:
+                text = _finish(request, request.fallback)
+            return text, False, tokens
+        tokens += estimate_tokens(text)
+        if keys:
+            await ai_cache.put_async(_cache_key(request, answered), _model_id(answered), text)
+    if request.save:
+        await write_queue.execute_async(*request.save(text))
+    return _finish(request, text), True, tokens
+
+
+async def _complete_async(request, strict=False):
+    """نسخه ناهمگام _complete (انتظار برای مدل و صف نوشتن بدون اشغال ترد)
+
+    Args:
+        strict (bool): به جای برگرداندن پیام خطا، AIRequestError بالا فرستاده شود
+    """
+    text, ok, _ = await _execute_async(request)
+    if strict and not ok and not request.fallback:
+        raise AIRequestError(text)
+    return text
+
 
 # توابع تحلیل داده و پروفایل کاربر
 def get_user_data(user_id):
@@ -179,8 +809,7 @@ def get_user_data(user_id):
     conn = None
     try:
         # ایجاد اتصال جدید به دیتابیس
-        conn = sqlite3.connect(config.DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_connection()
         c = conn.cursor()
         
         # دریافت اطلاعات اصلی کاربر
@@ -236,17 +865,18 @@ def get_user_data(user_id):
         received_from = {}
         given_to = {}
         
+        # sqlite3.Row با «in» مقدارها را بررسی می‌کند نه نام ستون‌ها را
         for p in received_points:
-            from_name = p['from_name'] if 'from_name' in p else 'ناشناس'
-            amount = p['amount'] if 'amount' in p else 0
+            from_name = p['from_name'] or 'ناشناس'
+            amount = p['amount'] or 0
             if from_name in received_from:
                 received_from[from_name] += amount
             else:
                 received_from[from_name] = amount
                 
         for p in given_points:
-            to_name = p['to_name'] if 'to_name' in p else 'ناشناس'
-            amount = p['amount'] if 'amount' in p else 0
+            to_name = p['to_name'] or 'ناشناس'
+            amount = p['amount'] or 0
             if to_name in given_to:
                 given_to[to_name] += amount
             else:
@@ -282,6 +912,26 @@ def get_user_data(user_id):
         if conn:
             conn.close()
 
+# بودجه توکن امتیازهای جدید و خلاصه قبلی در پرامپت زاویه دید
+PERSPECTIVE_FEEDBACK_TOKENS = 1500
+PERSPECTIVE_SUMMARY_TOKENS = 800
+# حداکثر امتیازهای جدیدی که جزئیاتشان از دیتابیس خوانده می‌شود (جدیدترین‌ها)؛ بقیه فقط شمرده می‌شوند
+PERSPECTIVE_DELTA_LIMIT = 300
+
+
+_PERSPECTIVE_UPSERT = """
+    INSERT INTO user_perspectives
+        (user_id, season_id, perspective, created_at, last_transaction_id, last_vote_id, feedback_count)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(user_id, season_id) DO UPDATE SET
+        perspective = excluded.perspective,
+        created_at = excluded.created_at,
+        last_transaction_id = excluded.last_transaction_id,
+        last_vote_id = excluded.last_vote_id,
+        feedback_count = excluded.feedback_count
+"""
+
+
 def get_user_perspective(user_id, season_id=None, force_update=False, is_admin=False):
     """
     تحلیل زاویه دید دیگران نسبت به کاربر
@@ -295,11 +945,40 @@ def get_user_perspective(user_id, season_id=None, force_update=False, is_admin=F
     Returns:
         str: متن تحلیلی دیدگاه دیگران
     """
+    return _complete(_prepare_user_perspective(user_id, season_id, force_update, is_admin))
+
+
+async def get_user_perspective_async(user_id, season_id=None, force_update=False, is_admin=False, strict=False):
+    """نسخه ناهمگام get_user_perspective (strict: خطای مدل به صورت AIRequestError)"""
+    return await _complete_async(
+        await run_read(_prepare_user_perspective, user_id, season_id, force_update, is_admin), strict
+    )
+
+
+async def refresh_user_perspective_async(user_id, season_id):
+    """به‌روزرسانی زاویه دید ذخیره شده برای پیش‌محاسبه دسته‌ای (بدون توجه به زمان ساخت)
+
+    Returns:
+        tuple: (موفق، توکن‌های تخمینی مصرف شده)
+    """
+    _, ok, tokens = await _execute_async(
+        await run_read(_prepare_user_perspective, user_id, season_id, True, False)
+    )
+    return ok, tokens
+
+
+def _prepare_user_perspective(user_id, season_id, force_update, is_admin):
+    """خواندن داده‌های زاویه دید و ساخت درخواست (یا متن آماده در صورت وجود کش)
+
+    به‌روزرسانی افزایشی است: زاویه دید ذخیره شده خلاصه غلتان نظرات تا امتیاز
+    last_transaction_id است و فقط امتیازهای دریافتی بعد از آن (مهم‌ترین‌ها بر اساس
+    مقدار و تازگی در حد PERSPECTIVE_FEEDBACK_TOKENS) همراه خلاصه قبلی فرستاده می‌شوند؛ پس اندازه پرامپت با
+    فعالیت کاربر در طول فصل رشد نمی‌کند. امتیازهای داده شده کاربر فرستاده نمی‌شوند.
+    """
     conn = None
     try:
         # بررسی آیا کاربر وجود دارد
-        conn = sqlite3.connect(config.DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_connection()
         c = conn.cursor()
         
         c.execute("SELECT name FROM users WHERE user_id = ?", (user_id,))
@@ -310,8 +989,7 @@ def get_user_perspective(user_id, season_id=None, force_update=False, is_admin=F
         
         # اگر فصل مشخص نشده، از فصل فعال استفاده کن
         if not season_id:
-            c.execute("SELECT id, name FROM season WHERE is_active = 1")
-            season = c.fetchone()
+            season = season_functions.get_active_season()
             if season:
                 season_id = season['id']
                 season_name = season['name']
@@ -328,7 +1006,8 @@ def get_user_perspective(user_id, season_id=None, force_update=False, is_admin=F
         
         # بررسی آیا قبلاً دیدگاهی ایجاد شده
         c.execute("""
-            SELECT perspective, created_at FROM user_perspectives 
+            SELECT perspective, created_at, last_transaction_id, last_vote_id, feedback_count
+            FROM user_perspectives 
             WHERE user_id = ? AND season_id = ?
         """, (user_id, season_id))
         
@@ -347,32 +1026,34 @@ def get_user_perspective(user_id, season_id=None, force_update=False, is_admin=F
         
         # دریافت اطلاعات کاربر
         user_name = user['name']
+        summary = existing['perspective'] if existing else None
+        last_transaction_id = existing['last_transaction_id'] if existing else 0
         
-        # دریافت تمام امتیازات دریافتی کاربر در فصل مشخص شده
+        # امتیازات دریافتی پس از خلاصه قبلی (جدیدترین اول)
         c.execute("""
-            SELECT t.amount, t.reason, u.name AS from_name, t.created_at
-                FROM transactions t
-                JOIN users u ON t.user_id = u.user_id
-            WHERE t.touser = ? AND t.season_id = ?
-                ORDER BY t.created_at DESC
-        """, (user_id, season_id))
+            SELECT t.transaction_id, t.amount, t.reason, u.name AS from_name
+            FROM transactions t
+            LEFT JOIN users u ON t.user_id = u.user_id
+            WHERE t.touser = ? AND t.season_id = ? AND t.transaction_id > ?
+            ORDER BY t.created_at DESC, t.transaction_id DESC
+            LIMIT ?
+        """, (user_id, season_id, last_transaction_id, PERSPECTIVE_DELTA_LIMIT))
         
         received_points = c.fetchall()
         
-        # دریافت امتیازات داده شده توسط کاربر
+        # امتیازهای جدید بیرون از این سقف هم شمرده می‌شوند تا نقطه پایان و تعداد نظرات درست بماند
         c.execute("""
-            SELECT t.amount, t.reason, u.name AS to_name, t.created_at
-            FROM transactions t
-            JOIN users u ON t.touser = u.user_id
-            WHERE t.user_id = ? AND t.season_id = ?
-            ORDER BY t.created_at DESC
-        """, (user_id, season_id))
-        
-        given_points = c.fetchall()
-        
-        # دریافت رأی‌های ترین‌ها برای کاربر
+            SELECT COUNT(*), COALESCE(SUM(amount), 0), MAX(transaction_id)
+            FROM transactions
+            WHERE touser = ? AND season_id = ? AND transaction_id > ?
+        """, (user_id, season_id, last_transaction_id))
+        new_count, new_amount, new_last_id = c.fetchone()
+        skipped_count = new_count - len(received_points)
+        skipped_amount = new_amount - sum(point['amount'] or 0 for point in received_points)
+        
+        # دریافت رأی‌های ترین‌ها برای کاربر (تعداد آن به تعداد سؤال‌ها محدود است)
         c.execute("""
-            SELECT q.text, COUNT(*) as vote_count
+            SELECT q.text, COUNT(*) as vote_count, MAX(v.vote_id) AS last_vote_id
             FROM top_votes v
             JOIN top_questions q ON v.question_id = q.question_id
             WHERE v.voted_for_user_id = ? AND v.season_id = ?
@@ -381,47 +1062,72 @@ def get_user_perspective(user_id, season_id=None, force_update=False, is_admin=F
         """, (user_id, season_id))
         
         top_votes = c.fetchall()
+        last_vote_id = max((vote['last_vote_id'] for vote in top_votes), default=0)
         
-        # جمع‌آوری اطلاعات برای ارسال به هوش مصنوعی
-        prompt = f"""
-        لطفاً یک تحلیل شخصیتی و زاویه دید دیگران را برای فردی به نام '{user_name}' ارائه دهید.
+        # بدون امتیاز و رأی جدید، خلاصه قبلی همچنان معتبر است
+        if summary and not received_points and last_vote_id == existing['last_vote_id']:
+            return summary
         
-        اطلاعات دریافتی:
+        feedback_count = (existing['feedback_count'] if existing else 0) + new_count
+        if new_last_id:
+            last_transaction_id = new_last_id
         
-        1. امتیازات دریافتی (نظرات دیگران درباره این فرد که باید برای تحلیل استفاده شود):
-        """
+        # جمع‌آوری اطلاعات برای ارسال به هوش مصنوعی
+        prompt = PromptBuilder()
+        prompt.add(f"""
+        لطفاً یک تحلیل شخصیتی و زاویه دید دیگران را برای فردی به نام '{user_name}' ارائه دهید.
+        """)
+        if summary:
+            prompt.add(f"""
+        تحلیل قبلی (بر اساس {feedback_count - new_count} امتیاز دریافتی پیشین):
+        {summary[:PERSPECTIVE_SUMMARY_TOKENS * CHARS_PER_TOKEN]}
         
-        # افزودن امتیازات دریافتی
-        if received_points:
-            for point in received_points:
-                prompt += f"- {point['amount']} امتیاز از {point['from_name']} به دلیل: {point['reason']}\n"
+        1. امتیازات دریافتی جدید از زمان تحلیل قبلی (نظرات دیگران درباره این فرد):
+        """)
         else:
-            prompt += "- هیچ امتیازی دریافت نکرده است.\n"
+            prompt.add("""
+        اطلاعات دریافتی:
         
-        prompt += "\n2. امتیازات داده شده (نظرات این فرد درباره دیگران که نباید در تحلیل شخصیتی او استفاده شود):\n"
+        1. امتیازات دریافتی (نظرات دیگران درباره این فرد):
+        """)
         
-        # افزودن امتیازات داده شده
-        if given_points:
-            for point in given_points:
-                prompt += f"- {point['amount']} امتیاز به {point['to_name']} به دلیل: {point['reason']}\n"
-        else:
-            prompt += "- هیچ امتیازی نداده است.\n"
+        # مهم‌ترین امتیازات جدید (مقدار و تازگی) تا سقف بودجه توکن؛ دلایل تکراری ادغام می‌شوند
+        prompt.add_items(
+            [
+                Item(
+                    f"- {point['amount']} امتیاز از {point['from_name'] or 'ناشناس'} به دلیل: {point['reason']}",
+                    point['amount'] or 0, point['transaction_id'], point['reason'] or ""
+                )
+                for point in received_points
+            ],
+            budget=PERSPECTIVE_FEEDBACK_TOKENS,
+            empty="- امتیاز جدیدی دریافت نکرده است.\n" if summary else "- هیچ امتیازی دریافت نکرده است.\n",
+            omitted=lambda points: f"- و {len(points)} امتیاز دیگر (قدیمی‌تر یا کم‌اهمیت‌تر) با مجموع {sum(point.weight for point in points)} امتیاز."
+        )
+        if skipped_count > 0:
+            prompt.add(f"- و {skipped_count} امتیاز قدیمی‌تر دیگر با مجموع {skipped_amount} امتیاز.\n")
         
-        prompt += "\n3. رأی‌های ترین‌ها (نظرات دیگران درباره این فرد که باید برای تحلیل استفاده شود):\n"
+        prompt.add("\n2. رأی‌های ترین‌ها (نظرات دیگران درباره این فرد):\n")
         
         # افزودن رأی‌های ترین‌ها
-        if top_votes:
-            for vote in top_votes:
-                prompt += f"- {vote['vote_count']} نفر به او در دسته '{vote['text']}' رأی داده‌اند.\n"
-        else:
-            prompt += "- هیچ رأیی در بخش ترین‌ها دریافت نکرده است.\n"
+        prompt.add_items(
+            [
+                Item(f"- {vote['vote_count']} نفر به او در دسته '{vote['text']}' رأی داده‌اند.", vote['vote_count'])
+                for vote in top_votes
+            ],
+            empty="- هیچ رأیی در بخش ترین‌ها دریافت نکرده است.\n", dedup=False
+        )
         
-        prompt += f"""
+        if summary:
+            prompt.add(f"""
+        لطفاً تحلیل قبلی را با توجه به امتیازات جدید و رأی‌ها به‌روز کنید و یک تحلیل کامل و مستقل از زاویه دید دیگران نسبت به '{user_name}' ارائه دهید.
+        نکاتی از تحلیل قبلی که همچنان معتبرند حفظ شوند و تغییرات تازه در آن منعکس شوند.
+        """)
+        else:
+            prompt.add(f"""
         با توجه به این اطلاعات، لطفاً یک تحلیل جامع و دقیق از زاویه دید دیگران نسبت به '{user_name}' ارائه دهید.
-        
-        توجه مهم: تحلیل شما باید فقط بر اساس بخش 1 (امتیازات دریافتی) و بخش 3 (رأی‌های ترین‌ها) باشد که نشان‌دهنده نظر دیگران درباره این فرد است. 
-        بخش 2 (امتیازات داده شده) که نظرات خود این فرد درباره دیگران است را در تحلیل خود وارد نکنید.
-        
+        """)
+        prompt.add("""
         این تحلیل باید شامل:
         
         1. خلاصه‌ای از تصویر کلی فرد از نگاه دیگران
@@ -431,10 +1137,10 @@ def get_user_perspective(user_id, season_id=None, force_update=False, is_admin=F
         
         پاسخ باید به زبان فارسی، صمیمی و غیررسمی باشد. از اطلاعات دقیق ارائه شده استفاده کنید و از بیان کلیشه‌ای اجتناب کنید.
         پاسخ نهایی را حداکثر در 4 پاراگراف ارائه دهید.
-        """
+        """)
+        prompt = prompt.build()
         
         # استفاده از هوش مصنوعی برای تحلیل (فقط از Gemini استفاده کن)
-        model = get_ai_model("gemini")
         system_message = """
         تو یک سیستم تحلیل شخصیت هوشمند هستی. وظیفه تو ارائه تحلیل‌های دقیق، سازنده و مفید از دیدگاه دیگران به یک فرد است.
         تحلیل‌های تو باید صادقانه و در عین حال مثبت و سازنده باشد و به شخص کمک کند تا دیدگاه دیگران را نسبت به خود بهتر درک کند.
@@ -448,28 +1154,14 @@ def get_user_perspective(user_id, season_id=None, force_update=False, is_admin=F
         پاسخ‌های تو باید به زبان فارسی روان، صمیمی و غیررسمی باشد.
         """
         
-        # دریافت پاسخ از مدل
-        perspective = model.get_completion(prompt, system_message)
-        
-        # ذخیره نتیجه در دیتابیس
+        # پاسخ مدل در صف نوشتن ذخیره (ایجاد یا به‌روزرسانی) می‌شود
         current_time_str = current_time.strftime("%Y-%m-%d %H:%M:%S")
-        
-        # اگر قبلاً وجود داشته، به‌روزرسانی کن
-        if existing:
-            c.execute("""
-                UPDATE user_perspectives
-                SET perspective = ?, created_at = ?
-                WHERE user_id = ? AND season_id = ?
-            """, (perspective, current_time_str, user_id, season_id))
-        else:
-            # در غیر این صورت، رکورد جدید ایجاد کن
-            c.execute("""
-                INSERT INTO user_perspectives (user_id, season_id, perspective, created_at)
-                VALUES (?, ?, ?, ?)
-            """, (user_id, season_id, perspective, current_time_str))
-        
-        conn.commit()
-        return perspective
+        return AIRequest(
+            prompt, system_message, feature="perspective", fallback=summary,
+            save=lambda perspective: (_PERSPECTIVE_UPSERT, (
+                user_id, season_id, perspective, current_time_str, last_transaction_id, last_vote_id, feedback_count
+            ))
+        )
         
     except Exception as e:
         logger.error(f"خطا در دریافت زاویه دید کاربر: {e}")
@@ -480,43 +1172,26 @@ def get_user_perspective(user_id, season_id=None, force_update=False, is_admin=F
             conn.close()
 
 def save_user_perspective(user_id, season_id, perspective_text):
-    """ذخیره زاویه دید کاربر در دیتابیس برای استفاده مجدد"""
-    conn = None
-    try:
-        # ایجاد اتصال جدید به دیتابیس
-        conn = sqlite3.connect(config.DB_PATH)
-        conn.row_factory = sqlite3.Row
-        c = conn.cursor()
-        
-        # بررسی وجود جدول ai_user_perspectives
-        c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='ai_user_perspectives'")
-        if not c.fetchone():
-            # ایجاد جدول اگر وجود ندارد
-            c.execute("""
-                CREATE TABLE ai_user_perspectives (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    season_id INTEGER,
-                    perspective_text TEXT,
-                    last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            conn.commit()
-        
-        # ذخیره نتیجه تحلیل
-        c.execute("""
-            INSERT INTO ai_user_perspectives (user_id, season_id, perspective_text)
-            VALUES (?, ?, ?)
-        """, (user_id, season_id or 0, perspective_text))
-        
-        conn.commit()
-    except Exception as e:
-        logger.error(f"خطا در ذخیره زاویه دید کاربر: {e}")
-        traceback.print_exc()
-    finally:
-        # حتما اتصال دیتابیس را ببندیم، حتی اگر خطایی رخ داده باشد
-        if conn:
-            conn.close()
+    """ذخیره زاویه دید کاربر در دیتابیس برای استفاده مجدد (در صف نوشتن)"""
+    if not write_queue.execute("""
+        INSERT INTO ai_user_perspectives (user_id, season_id, perspective_text)
+        VALUES (?, ?, ?)
+    """, (user_id, season_id or 0, perspective_text)):
+        logger.error(f"خطا در ذخیره زاویه دید کاربر {user_id}")
+
+_PROFILE_UPSERT = """
+    INSERT INTO user_profiles (user_id, profile_text, created_at)
+    VALUES (?, ?, ?)
+    ON CONFLICT(user_id) DO UPDATE SET
+        profile_text = excluded.profile_text,
+        created_at = excluded.created_at
+"""
+
+
+# سقف توکن کل پرامپت پروفایل و بخش دلایل امتیاز دادن
+PROFILE_PROMPT_TOKENS = 2500
+PROFILE_REASON_TOKENS = 400
+
 
 def generate_user_profile(user_id, force_update=False, is_admin=False):
     """
@@ -530,11 +1205,30 @@ def generate_user_profile(user_id, force_update=False, is_admin=False):
     Returns:
         str: متن پروفایل هوشمند
     """
+    return _complete(_prepare_user_profile(user_id, force_update, is_admin))
+
+
+async def generate_user_profile_async(user_id, force_update=False, is_admin=False, strict=False):
+    """نسخه ناهمگام generate_user_profile (strict: خطای مدل به صورت AIRequestError)"""
+    return await _complete_async(await run_read(_prepare_user_profile, user_id, force_update, is_admin), strict)
+
+
+async def refresh_user_profile_async(user_id):
+    """به‌روزرسانی پروفایل ذخیره شده برای پیش‌محاسبه دسته‌ای
+
+    Returns:
+        tuple: (موفق، توکن‌های تخمینی مصرف شده)
+    """
+    _, ok, tokens = await _execute_async(await run_read(_prepare_user_profile, user_id, True, False))
+    return ok, tokens
+
+
+def _prepare_user_profile(user_id, force_update, is_admin):
+    """خواندن داده‌های پروفایل و ساخت درخواست (یا متن آماده در صورت وجود کش)"""
     conn = None
     try:
         # بررسی آیا کاربر وجود دارد
-        conn = sqlite3.connect(config.DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_connection()
         c = conn.cursor()
         
         c.execute("SELECT * FROM users WHERE user_id = ?", (user_id,))
@@ -569,8 +1263,9 @@ def generate_user_profile(user_id, force_update=False, is_admin=False):
             user_name = dict(user).get('name', 'کاربر')
             return f"اطلاعات کافی برای ایجاد پروفایل هوشمند {user_name} وجود ندارد. لطفاً بعد از انجام چند تراکنش دوباره تلاش کنید."
         
-        # ایجاد پرامپت برای مدل هوش مصنوعی
-        prompt = f"""
+        # ایجاد پرامپت برای مدل هوش مصنوعی (لیست‌ها به ترتیب اهمیت تا سقف PROFILE_PROMPT_TOKENS)
+        prompt = PromptBuilder(PROFILE_PROMPT_TOKENS)
+        prompt.add(f"""
         لطفاً یک پروفایل هوشمند برای کاربری با نام '{user_data['name']}' بر اساس اطلاعات زیر ایجاد کنید:
         
         اطلاعات کاربر:
@@ -582,36 +1277,35 @@ def generate_user_profile(user_id, force_update=False, is_admin=False):
         - تعداد تراکنش‌های انجام شده: {len(user_data['transactions']) if 'transactions' in user_data else 0}
         
         نمونه‌هایی از دلایل امتیاز دادن (نظرات این کاربر درباره دیگران):
-        """
+        """)
         
-        # افزودن نمونه‌هایی از دلایل امتیاز دادن
-        if user_data.get('transactions', []):
-            for i, tx in enumerate(user_data['transactions'][:5]):
-                reason = tx['reason'] if 'reason' in tx else 'بدون دلیل'
-                prompt += f"- {reason}\n"
-        else:
-            prompt += "- هیچ تراکنشی وجود ندارد\n"
+        # افزودن نمونه‌هایی از دلایل امتیاز دادن (دلایل تکراری ادغام می‌شوند)
+        prompt.add_items(
+            [
+                Item(f"- {tx['reason'] or 'بدون دلیل'}", tx['amount'] or 0, tx['transaction_id'], tx['reason'] or "")
+                for tx in user_data.get('transactions', [])
+            ],
+            budget=PROFILE_REASON_TOKENS, empty="- هیچ تراکنشی وجود ندارد\n"
+        )
         
-        prompt += "\nآمار دریافت امتیاز (نظرات دیگران درباره این کاربر):\n"
+        prompt.add("\nآمار دریافت امتیاز (نظرات دیگران درباره این کاربر):\n")
         
-        # افزودن آمار دریافت امتیاز از هر کاربر
-        if user_data.get('received_from', {}):
-            for person, amount in user_data['received_from'].items():
-                prompt += f"- از {person}: {amount} امتیاز\n"
-        else:
-            prompt += "- هیچ امتیازی دریافت نشده است\n"
+        # افزودن آمار دریافت امتیاز از هر کاربر (بیشترین امتیاز اول)
+        prompt.add_items(
+            [Item(f"- از {person}: {amount} امتیاز", amount) for person, amount in user_data.get('received_from', {}).items()],
+            empty="- هیچ امتیازی دریافت نشده است\n", dedup=False
+        )
         
-        prompt += "\nآمار دادن امتیاز (نظرات این کاربر درباره دیگران):\n"
+        prompt.add("\nآمار دادن امتیاز (نظرات این کاربر درباره دیگران):\n")
         
         # افزودن آمار دادن امتیاز به هر کاربر
-        if user_data.get('given_to', {}):
-            for person, amount in user_data['given_to'].items():
-                prompt += f"- به {person}: {amount} امتیاز\n"
-        else:
-            prompt += "- هیچ امتیازی داده نشده است\n"
+        prompt.add_items(
+            [Item(f"- به {person}: {amount} امتیاز", amount) for person, amount in user_data.get('given_to', {}).items()],
+            empty="- هیچ امتیازی داده نشده است\n", dedup=False
+        )
         
         # اضافه کردن اطلاعات رأی‌های ترین‌ها
-        prompt += "\nآمار رأی‌های ترین‌ها (نظرات دیگران درباره این کاربر):\n"
+        prompt.add("\nآمار رأی‌های ترین‌ها (نظرات دیگران درباره این کاربر):\n")
         
         # دریافت رأی‌های ترین‌ها برای کاربر
         c.execute("""
@@ -625,13 +1319,12 @@ def generate_user_profile(user_id, force_update=False, is_admin=False):
         
         top_votes = c.fetchall()
         
-        if top_votes:
-            for vote in top_votes:
-                prompt += f"- {vote['vote_count']} رأی در '{vote['question_text']}'\n"
-        else:
-            prompt += "- هیچ رأیی در بخش ترین‌ها ندارد\n"
+        prompt.add_items(
+            [Item(f"- {vote['vote_count']} رأی در '{vote['question_text']}'", vote['vote_count']) for vote in top_votes],
+            empty="- هیچ رأیی در بخش ترین‌ها ندارد\n", dedup=False
+        )
         
-        prompt += f"""
+        prompt.add(f"""
         با توجه به این اطلاعات، لطفاً یک پروفایل هوشمند جامع برای '{user_data['name']}' ایجاد کنید.
         
         این پروفایل باید شامل:
@@ -647,10 +1340,10 @@ def generate_user_profile(user_id, force_update=False, is_admin=False):
         
         پاسخ باید به زبان فارسی، صمیمی و غیررسمی باشد. سعی کنید پروفایل را طوری بنویسید که منعکس‌کننده شخصیت واقعی کاربر باشد.
         پاسخ نهایی را حداکثر در 4 پاراگراف ارائه دهید.
-        """
+        """)
+        prompt = prompt.build()
         
         # استفاده از هوش مصنوعی برای ایجاد پروفایل (فقط از Gemini استفاده کن)
-        model = get_ai_model("gemini")
         system_message = """
         تو یک سیستم تحلیل شخصیت هوشمند هستی. وظیفه تو ایجاد پروفایل‌های دقیق، جذاب و شخصی‌سازی شده برای کاربران است.
         پروفایل‌های تو باید صادقانه، مثبت و الهام‌بخش باشد و به کاربر نگاهی جدید به خودش بدهد.
@@ -662,27 +1355,13 @@ def generate_user_profile(user_id, force_update=False, is_admin=False):
         پاسخ‌های تو باید به زبان فارسی روان، صمیمی و غیررسمی باشد.
         """
         
-        # دریافت پاسخ از مدل
-        profile_text = model.get_completion(prompt, system_message)
-        
-        # ذخیره نتیجه در دیتابیس
+        # پاسخ مدل در صف نوشتن ذخیره (ایجاد یا به‌روزرسانی) می‌شود
         current_time_str = current_time.strftime("%Y-%m-%d %H:%M:%S")
-        
-        # اگر قبلاً وجود داشته، به‌روزرسانی کن
-        if existing:
-            c.execute("""
-                UPDATE user_profiles
-                SET profile_text = ?, created_at = ?
-                    WHERE user_id = ?
-            """, (profile_text, current_time_str, user_id))
-        else:
-            c.execute("""
-                INSERT INTO user_profiles (user_id, profile_text, created_at)
-                VALUES (?, ?, ?)
-            """, (user_id, profile_text, current_time_str))
-            
-            conn.commit()
-        return profile_text
+        return AIRequest(
+            prompt, system_message, feature="profile",
+            fallback=existing['profile_text'] if existing else None,
+            save=lambda profile_text: (_PROFILE_UPSERT, (user_id, profile_text, current_time_str))
+        )
         
     except Exception as e:
         logger.error(f"خطا در ایجاد پروفایل هوشمند: {e}")
@@ -694,21 +1373,7 @@ def generate_user_profile(user_id, force_update=False, is_admin=False):
 
 def is_admin(user_id):
     """بررسی اینکه آیا کاربر ادمین است یا خیر"""
-    try:
-        conn = sqlite3.connect(config.DB_PATH)
-        conn.row_factory = sqlite3.Row
-        c = conn.cursor()
-        
-        c.execute("SELECT role FROM admins WHERE user_id = ?", (user_id,))
-        admin = c.fetchone()
-        
-        return admin is not None
-    except Exception as e:
-        logger.error(f"خطا در بررسی وضعیت ادمین: {e}")
-        return False
-    finally:
-        if conn:
-            conn.close()
+    return permissions.is_admin(user_id)
 
 def analyze_admin_data(season_id=None, force_update=True):
     """تحلیل داده‌ها برای ادمین
@@ -720,10 +1385,19 @@ def analyze_admin_data(season_id=None, force_update=True):
     Returns:
         str: متن تحلیل برای ادمین
     """
+    return _complete(_prepare_admin_analysis(season_id))
+
+
+async def analyze_admin_data_async(season_id=None, force_update=True, strict=False):
+    """نسخه ناهمگام analyze_admin_data (strict: خطای مدل به صورت AIRequestError)"""
+    return await _complete_async(await run_read(_prepare_admin_analysis, season_id), strict)
+
+
+def _prepare_admin_analysis(season_id):
+    """خواندن آمار فصل و ساخت درخواست تحلیل ادمین"""
     conn = None
     try:
-        conn = sqlite3.connect(config.DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_connection()
         c = conn.cursor()
         
         # تعیین شرط فصل
@@ -737,8 +1411,7 @@ def analyze_admin_data(season_id=None, force_update=True):
             season_name = season['name'] if season else "نامشخص"
         else:
             # دریافت فصل فعال
-            c.execute("SELECT id, name FROM season WHERE is_active = 1")
-            season = c.fetchone()
+            season = season_functions.get_active_season()
             if season:
                 season_id = season['id']
                 season_name = season['name']
@@ -809,15 +1482,17 @@ def analyze_admin_data(season_id=None, force_update=True):
         """)
         mutual_transactions = c.fetchall()
         
-        # کلمات پرتکرار در دلایل
+        # نمونه‌ای از دلایل اخیر (مهم‌ترین‌ها تا سقف ANALYSIS_REASON_TOKENS در پرامپت می‌آیند)
         c.execute(f"""
-            SELECT reason FROM transactions 
+            SELECT transaction_id, amount, substr(reason, 1, ?) AS reason FROM transactions 
             WHERE reason IS NOT NULL AND reason != '' {season_condition}
-        """)
+            ORDER BY transaction_id DESC LIMIT ?
+        """, (ANALYSIS_REASON_CHARS, ANALYSIS_REASON_LIMIT))
         reasons = c.fetchall()
         
         # تهیه پرامپت برای هوش مصنوعی
-        prompt = f"""
+        prompt = PromptBuilder(ANALYSIS_PROMPT_TOKENS)
+        prompt.add(f"""
         بر اساس اطلاعات زیر، یک تحلیل جامع از وضعیت سیستم امتیازدهی در فصل {season_name} ارائه بده.
         
         اطلاعات کلی:
@@ -825,24 +1500,41 @@ def analyze_admin_data(season_id=None, force_update=True):
         - میانگین امتیازات داده شده: {avg_amount}
         
         کاربرانی که بیشترین امتیاز را داده‌اند:
-        """
+        """)
         
-        for giver in top_givers:
-            prompt += f"- {giver['name']}: {giver['total']} امتیاز در {giver['count']} تراکنش\n"
+        prompt.add_items(
+            [Item(f"- {giver['name']}: {giver['total']} امتیاز در {giver['count']} تراکنش", giver['total'] or 0) for giver in top_givers],
+            dedup=False
+        )
         
-        prompt += "\nکاربرانی که بیشترین امتیاز را دریافت کرده‌اند:\n"
-        for receiver in top_receivers:
-            prompt += f"- {receiver['name']}: {receiver['total']} امتیاز در {receiver['count']} تراکنش\n"
+        prompt.add("\nکاربرانی که بیشترین امتیاز را دریافت کرده‌اند:\n")
+        prompt.add_items(
+            [Item(f"- {receiver['name']}: {receiver['total']} امتیاز در {receiver['count']} تراکنش", receiver['total'] or 0) for receiver in top_receivers],
+            dedup=False
+        )
         
-        prompt += "\nالگوهای امتیازدهی متقابل (ممکن است نشان‌دهنده تقلب باشد):\n"
-        for mutual in mutual_transactions:
-            prompt += f"- {mutual['from_name']} و {mutual['to_name']}: {mutual['transaction_count']} تراکنش متقابل با مجموع {mutual['total_amount']} امتیاز\n"
+        prompt.add("\nالگوهای امتیازدهی متقابل (ممکن است نشان‌دهنده تقلب باشد):\n")
+        prompt.add_items(
+            [
+                Item(
+                    f"- {mutual['from_name']} و {mutual['to_name']}: {mutual['transaction_count']} تراکنش متقابل با مجموع {mutual['total_amount']} امتیاز",
+                    mutual['total_amount'] or 0
+                )
+                for mutual in mutual_transactions
+            ],
+            dedup=False
+        )
         
-        prompt += "\nدلایل امتیازدهی:\n"
-        all_reasons = " ".join([r['reason'] for r in reasons])
-        prompt += all_reasons[:1000] + "...\n\n"  # محدود کردن متن برای جلوگیری از طولانی شدن پرامپت
+        # دلایل به ترتیب مقدار و تازگی؛ دلایل تقریباً یکسان در یک خط با تعدادشان می‌آیند
+        prompt.add("\nدلایل امتیازدهی:\n")
+        prompt.add_items(
+            [Item(f"- {r['reason']}", r['amount'] or 0, r['transaction_id'], r['reason']) for r in reasons],
+            budget=ANALYSIS_REASON_TOKENS,
+            omitted=lambda items: f"- و {len(items)} دلیل دیگر"
+        )
+        prompt.add("\n")
         
-        prompt += """
+        prompt.add("""
         لطفاً یک تحلیل جامع ارائه بده که شامل این بخش‌ها باشد:
         1. وضعیت کلی سیستم امتیازدهی (با ایموجی 📊)
         2. الگوهای مثبت (کاربرانی که به درستی از سیستم استفاده می‌کنند) (با ایموجی ✅)
@@ -854,15 +1546,13 @@ def analyze_admin_data(season_id=None, force_update=True):
         خروجی باید به زبان فارسی محاوره‌ای، صمیمی و مودبانه باشد. 
         از کلمات و جملات رسمی و کتابی استفاده نکن.
         اگر نشانه‌های تقلب وجود دارد، آن را به صورت محترمانه بیان کن.
-        """
-          # دریافت پاسخ از هوش مصنوعی
-        ai_model = get_ai_model("gemini")
+        """)
+        prompt = prompt.build()
+        # دریافت پاسخ از هوش مصنوعی
         system_message = """تو یک تحلیلگر داده با لحن دوستانه و صمیمی هستی. وظیفه‌ات ارائه تحلیل‌های کاربردی و قابل فهم از داده‌هاست. 
 از زبان فارسی محاوره‌ای و صمیمی استفاده کن. خیلی رسمی و کتابی صحبت نکن.
 از ایموجی‌های مناسب برای جدا کردن بخش‌ها استفاده کن و از علامت‌های ** یا markdown استفاده نکن."""
-        response = ai_model.get_completion(prompt, system_message)
-        
-        return response
+        return AIRequest(prompt, system_message, feature="analysis")
     except Exception as e:
         logger.error(f"خطا در تحلیل داده‌ها برای ادمین: {e}")
         return f"متأسفانه در تحلیل داده‌ها خطایی رخ داد: {e}"
@@ -918,10 +1608,26 @@ def improve_reason_text(user_id, original_reason, touser_name, amount):
     Returns:
         str: متن بهبود یافته
     """
+    return _complete(_prepare_reason_improvement(user_id, original_reason, touser_name, amount))
+
+
+async def improve_reason_text_async(user_id, original_reason, touser_name, amount):
+    """نسخه ناهمگام improve_reason_text"""
+    return await _complete_async(
+        await run_read(_prepare_reason_improvement, user_id, original_reason, touser_name, amount)
+    )
+
+
+def _strip_quotes(text):
+    # حذف نقل قول‌ها از متن
+    return text.strip('"\'')
+
+
+def _prepare_reason_improvement(user_id, original_reason, touser_name, amount):
+    """خواندن دلایل قبلی کاربر و ساخت درخواست بهبود متن"""
     try:
         # دریافت تاریخچه پیام‌های کاربر
-        conn = sqlite3.connect(config.DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_connection()
         c = conn.cursor()
         
         # دریافت 5 تراکنش آخر کاربر برای تحلیل سبک نوشتاری
@@ -967,14 +1673,8 @@ def improve_reason_text(user_id, original_reason, touser_name, amount):
         else:
             prompt += "لطفاً متن دلیل را بهبود دهید. فقط متن بهبود یافته را برگردانید، بدون هیچ توضیح اضافی."
         
-        # دریافت پاسخ از مدل هوش مصنوعی
-        ai_model = get_ai_model()  # استفاده از مدل پیش‌فرض (Gemini)
-        improved_text = ai_model.get_completion(prompt, system_message)
-        
-        # حذف نقل قول‌ها از متن
-        improved_text = improved_text.strip('"\'')
-        
-        return improved_text
+        # استفاده از مدل پیش‌فرض (Gemini)
+        return AIRequest(prompt, system_message, postprocess=_strip_quotes, feature="reason")
     except Exception as e:
         logger.error(f"خطا در بهبود متن با هوش مصنوعی: {e}")
         traceback.print_exc()
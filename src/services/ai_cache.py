@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+کش پاسخ‌های هوش مصنوعی با کلید اثر انگشت ورودی‌ها (content-addressed)
+کش‌های user_profiles و user_perspectives فقط بر اساس کاربر/فصل و یک بازه زمانی ثابت
+بودند؛ پس از پایان بازه یا به‌روزرسانی اجباری، حتی اگر هیچ امتیاز یا رأی جدیدی ثبت
+نشده بود، دوباره درخواست پولی و کند به مدل فرستاده می‌شد. اینجا کلید هر پاسخ، هش
+SHA-256 از مدل، پیام سیستم و پرامپت نرمال شده (فاصله‌ها و نویسه‌های عربی/فارسی یکسان)
+است؛ پرامپت از روی امتیازها و رأی‌ها ساخته می‌شود، پس داده بدون تغییر همان کلید را
+می‌دهد و پاسخ قبلی بدون فراخوانی مدل برگردانده می‌شود.
+
+لایه اول یک LRU در حافظه (AI_CACHE_MEMORY_ENTRIES مورد) و لایه دوم جدول
+ai_response_cache است. هر پاسخ پس از AI_CACHE_TTL ثانیه از زمان ساخت منقضی می‌شود و
+جدول به AI_CACHE_MAX_ROWS سطر اخیراً استفاده شده محدود می‌شود. فقط پاسخ‌های موفق
+ذخیره می‌شوند.
+"""
+
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from ..database import write_queue
+from ..database.db_utils import execute_db_query
+from ..database.async_db import run_read
+
+logger = logging.getLogger(__name__)
+
+# مدت اعتبار هر پاسخ از زمان ساخت (ثانیه)
+AI_CACHE_TTL = 30 * 24 * 3600
+# تعداد پاسخ‌های نگه داشته شده در حافظه
+AI_CACHE_MEMORY_ENTRIES = 256
+# حداکثر سطرهای جدول؛ کم‌استفاده‌ترین‌ها حذف می‌شوند
+AI_CACHE_MAX_ROWS = 5000
+# هر چند ذخیره یک بار جدول هرس شود
+AI_CACHE_PRUNE_EVERY = 50
+
+_ARABIC_TO_PERSIAN = str.maketrans({"ي": "ی", "ى": "ی", "ك": "ک", "‌": " "})
+
+_lock = threading.Lock()
+# fingerprint -> (response, created_at)
+_entries = OrderedDict()
+_stats = {"memory_hits": 0, "db_hits": 0, "misses": 0, "stores": 0, "expired": 0, "evictions": 0, "prunes": 0}
+
+
+def _normalize(text):
+    lines = (" ".join(line.split()) for line in (text or "").translate(_ARABIC_TO_PERSIAN).splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def fingerprint(model, system_message, prompt):
+    """اثر انگشت ورودی‌های یک درخواست (مستقل از فاصله‌گذاری و شکل نویسه‌ها)"""
+    payload = json.dumps([model, _normalize(system_message), _normalize(prompt)], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _remember(key, response, created_at):
+    with _lock:
+        _entries[key] = (response, created_at)
+        _entries.move_to_end(key)
+        while len(_entries) > AI_CACHE_MEMORY_ENTRIES:
+            _entries.popitem(last=False)
+            _stats["evictions"] += 1
+
+
+def _touch_op(conn, key, now):
+    conn.execute(
+        "UPDATE ai_response_cache SET last_used_at = ?, hits = hits + 1 WHERE fingerprint = ?", (now, key)
+    )
+
+
+def _memory_get(key, now):
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:
+            return None
+        if now - entry[1] >= AI_CACHE_TTL:
+            del _entries[key]
+            _stats["expired"] += 1
+            return None
+        _entries.move_to_end(key)
+        _stats["memory_hits"] += 1
+        return entry[0]
+
+
+def _db_get(key, now):
+    row = execute_db_query(
+        "SELECT response, created_at FROM ai_response_cache WHERE fingerprint = ? AND created_at > ?",
+        (key, now - AI_CACHE_TTL), fetchone=True
+    )
+    if not row:
+        return None
+    _remember(key, row[0], row[1])
+    return row[0]
+
+
+def _lookup(key, now):
+    response = _memory_get(key, now)
+    if response is None:
+        response = _db_get(key, now)
+        if response is None:
+            return None
+        _stats["db_hits"] += 1
+    # ثبت استفاده برای LRU جدول بدون انتظار برای commit
+    write_queue.submit(_touch_op, key, now)
+    return response
+
+
+def get(*keys):
+    """پاسخ کش شده برای اولین اثر انگشتی (به ترتیب) که پاسخ معتبر دارد
+
+    چند اثر انگشت برای یک درخواست وقتی لازم است که پاسخ ممکن است از هر یک از چند
+    سرویس (اصلی یا پشتیبان) آمده باشد؛ نبود پاسخ برای همه یک miss حساب می‌شود.
+
+    Returns:
+        str: پاسخ یا None اگر پاسخ معتبری وجود نداشته باشد
+    """
+    now = int(time.time())
+    for key in keys:
+        response = _lookup(key, now)
+        if response is not None:
+            return response
+    _stats["misses"] += 1
+    return None
+
+
+async def get_async(*keys):
+    """نسخه awaitable از get (در صورت وجود در حافظه بدون رفتن به ترد خواننده)"""
+    now = int(time.time())
+    for key in keys:
+        response = _memory_get(key, now)
+        if response is not None:
+            write_queue.submit(_touch_op, key, now)
+            return response
+    return await run_read(get, *keys)
+
+
+def _store_op(conn, key, model, response, now, prune):
+    conn.execute("""
+        INSERT INTO ai_response_cache (fingerprint, model, response, created_at, last_used_at)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(fingerprint) DO UPDATE SET
+            response = excluded.response,
+            created_at = excluded.created_at,
+            last_used_at = excluded.last_used_at
+    """, (key, model, response, now, now))
+    if prune:
+        conn.execute("DELETE FROM ai_response_cache WHERE created_at <= ?", (now - AI_CACHE_TTL,))
+        conn.execute("""
+            DELETE FROM ai_response_cache WHERE fingerprint IN (
+                SELECT fingerprint FROM ai_response_cache ORDER BY last_used_at DESC LIMIT -1 OFFSET ?
+            )
+        """, (AI_CACHE_MAX_ROWS,))
+
+
+def _prepare_store(key, response):
+    now = int(time.time())
+    _remember(key, response, now)
+    with _lock:
+        _stats["stores"] += 1
+        prune = _stats["stores"] % AI_CACHE_PRUNE_EVERY == 0
+    if prune:
+        _stats["prunes"] += 1
+    return now, prune
+
+
+def put(key, model, response):
+    """ذخیره پاسخ موفق مدل (در حافظه و در صف نوشتن)"""
+    now, prune = _prepare_store(key, response)
+    try:
+        write_queue.run(_store_op, key, model, response, now, prune)
+    except Exception as e:
+        logger.error(f"خطا در ذخیره پاسخ هوش مصنوعی در کش: {e}")
+
+
+async def put_async(key, model, response):
+    """نسخه awaitable از put"""
+    now, prune = _prepare_store(key, response)
+    try:
+        await write_queue.run_async(_store_op, key, model, response, now, prune)
+    except Exception as e:
+        logger.error(f"خطا در ذخیره پاسخ هوش مصنوعی در کش: {e}")
+
+
+def invalidate(key=None):
+    """حذف یک پاسخ (یا همه پاسخ‌ها) از کش حافظه و جدول"""
+    with _lock:
+        if key is None:
+            _entries.clear()
+        else:
+            _entries.pop(key, None)
+    if key is None:
+        write_queue.execute("DELETE FROM ai_response_cache")
+    else:
+        write_queue.execute("DELETE FROM ai_response_cache WHERE fingerprint = ?", (key,))
+
+
+def get_stats():
+    """آمار کش پاسخ‌ها: برخورد در حافظه و جدول، خطا و نرخ برخورد (درصد)"""
+    with _lock:
+        stats = dict(_stats)
+        stats["entries"] = len(_entries)
+    hits = stats["memory_hits"] + stats["db_hits"]
+    lookups = hits + stats["misses"]
+    stats["hit_rate"] = round(100 * hits / lookups, 1) if lookups else 0.0
+    return stats
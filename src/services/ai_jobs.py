@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+"""
+صف پایدار کارهای هوش مصنوعی (پروفایل هوشمند، زاویه دید و تحلیل ادمین)
+هندلرها به جای انتظار برای پاسخ مدل، فقط یک کار در جدول ai_jobs ثبت می‌کنند و پیام
+«در حال پردازش» کاربر را به عنوان منتظر آن کار ذخیره می‌کنند؛ چند task کارگر روی حلقه
+ربات کارها را به ترتیب برمی‌دارند، اجرا می‌کنند و پس از پایان، همه پیام‌های منتظر را
+با تابع اعلام (notifier) ویرایش می‌کنند.
+
+درخواست تکراری برای همان (نوع، کاربر، فصل) تا وقتی کار قبلی در جریان است کار جدیدی
+نمی‌سازد و فقط پیامش به منتظران اضافه می‌شود؛ پس هجوم درخواست‌ها یک فراخوانی مدل
+دارد. کارها در دیتابیس می‌مانند و کارهای نیمه‌تمام پس از راه‌اندازی دوباره اجرا می‌شوند.
+همه نوشتن‌ها از صف نوشتن عبور می‌کنند و برداشتن کار در آن اتمی است.
+"""
+
+import asyncio
+import logging
+from collections import namedtuple
+
+from ..database import write_queue
+from ..database.async_db import run_read
+from ..database.db_utils import execute_db_query
+from . import ai
+
+logger = logging.getLogger(__name__)
+
+# انواع کار
+JOB_PROFILE = "profile"
+JOB_PERSPECTIVE = "perspective"
+JOB_ANALYSIS = "analysis"
+
+# وضعیت کارها
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+# تعداد task‌های کارگر (هر کارگر در هر لحظه یک فراخوانی مدل دارد)
+AI_JOB_WORKERS = 2
+# فاصله بررسی دوباره صف وقتی اعلام کار جدید نرسیده است (ثانیه)
+AI_JOB_POLL_INTERVAL = 5.0
+# تعداد کل تلاش‌ها برای کاری که با خطا تمام می‌شود
+AI_JOB_MAX_ATTEMPTS = 2
+# مدت نگهداری کارهای تمام شده (روز)
+AI_JOB_RETENTION_DAYS = 7
+
+Job = namedtuple("Job", ["job_id", "kind", "user_id", "season_id", "status", "result", "error", "attempts"])
+
+_JOB_COLUMNS = "job_id, kind, user_id, season_id, status, result, error, attempts"
+
+
+# شکست مدل (بدون پاسخ قبلی برای نمایش) به صورت AIRequestError بالا می‌آید تا کار
+# دوباره در صف قرار گیرد یا ناموفق ثبت شود
+def _perspective(job):
+    return ai.get_user_perspective_async(job.user_id, job.season_id, strict=True)
+
+
+def _profile(job):
+    return ai.generate_user_profile_async(job.user_id, strict=True)
+
+
+def _analysis(job):
+    return ai.analyze_admin_data_async(job.season_id or None, strict=True)
+
+
+_RUNNERS = {
+    JOB_PERSPECTIVE: _perspective,
+    JOB_PROFILE: _profile,
+    JOB_ANALYSIS: _analysis,
+}
+
+_state = {"workers": [], "wakeup": None, "notifier": None}
+_stats = {"enqueued": 0, "deduplicated": 0, "completed": 0, "failed": 0, "retried": 0}
+
+
+def _job(row):
+    return Job(*row) if row else None
+
+
+def _enqueue_op(conn, kind, user_id, season_id, chat_id, message_id):
+    """ثبت کار (یا پیوستن به کار در جریان همان کلید) و ثبت پیام منتظر
+
+    Returns:
+        tuple: (job_id, آیا کار جدید ساخته شد)
+    """
+    row = conn.execute(
+        "SELECT job_id FROM ai_jobs WHERE kind = ? AND user_id = ? AND season_id = ? AND status IN (?, ?)",
+        (kind, user_id, season_id, JOB_PENDING, JOB_RUNNING)
+    ).fetchone()
+    created = row is None
+    if created:
+        job_id = conn.execute(
+            "INSERT INTO ai_jobs (kind, user_id, season_id) VALUES (?, ?, ?)", (kind, user_id, season_id)
+        ).lastrowid
+    else:
+        job_id = row[0]
+    if chat_id is not None and message_id is not None:
+        conn.execute(
+            "INSERT OR IGNORE INTO ai_job_waiters (job_id, chat_id, message_id) VALUES (?, ?, ?)",
+            (job_id, chat_id, message_id)
+        )
+    return job_id, created
+
+
+def _claim_op(conn):
+    """برداشتن قدیمی‌ترین کار منتظر و علامت‌گذاری آن به عنوان در حال اجرا"""
+    row = conn.execute(
+        f"SELECT {_JOB_COLUMNS} FROM ai_jobs WHERE status = ? ORDER BY job_id LIMIT 1", (JOB_PENDING,)
+    ).fetchone()
+    if row is None:
+        return None
+    conn.execute(
+        "UPDATE ai_jobs SET status = ?, attempts = attempts + 1, started_at = CURRENT_TIMESTAMP WHERE job_id = ?",
+        (JOB_RUNNING, row[0])
+    )
+    return _job(row)._replace(status=JOB_RUNNING, attempts=row[7] + 1)
+
+
+def _finish_op(conn, job_id, status, result, error):
+    """ثبت نتیجه کار و برداشتن پیام‌های منتظر آن
+
+    Returns:
+        list: لیست (chat_id, message_id) پیام‌های منتظر
+    """
+    conn.execute(
+        "UPDATE ai_jobs SET status = ?, result = ?, error = ?, finished_at = CURRENT_TIMESTAMP WHERE job_id = ?",
+        (status, result, error, job_id)
+    )
+    waiters = conn.execute(
+        "SELECT chat_id, message_id FROM ai_job_waiters WHERE job_id = ?", (job_id,)
+    ).fetchall()
+    conn.execute("DELETE FROM ai_job_waiters WHERE job_id = ?", (job_id,))
+    return [tuple(waiter) for waiter in waiters]
+
+
+def _requeue_op(conn, job_id, error=None):
+    conn.execute("UPDATE ai_jobs SET status = ?, error = ? WHERE job_id = ?", (JOB_PENDING, error, job_id))
+
+
+def _recover_op(conn, retention_days):
+    """بازگرداندن کارهای نیمه‌تمام (توقف ناگهانی ربات) به صف و حذف کارهای قدیمی"""
+    recovered = conn.execute(
+        "UPDATE ai_jobs SET status = ? WHERE status = ?", (JOB_PENDING, JOB_RUNNING)
+    ).rowcount
+    conn.execute(
+        "DELETE FROM ai_jobs WHERE status IN (?, ?) AND finished_at < datetime('now', ?)",
+        (JOB_DONE, JOB_FAILED, f"-{int(retention_days)} days")
+    )
+    conn.execute("DELETE FROM ai_job_waiters WHERE job_id NOT IN (SELECT job_id FROM ai_jobs)")
+    return recovered
+
+
+def _wake():
+    wakeup = _state["wakeup"]
+    if wakeup is not None:
+        wakeup.set()
+
+
+async def enqueue_async(kind, user_id=0, season_id=None, chat_id=None, message_id=None):
+    """ثبت یک کار هوش مصنوعی (بدون انتظار برای اجرای آن)
+
+    Args:
+        kind (str): نوع کار (JOB_PROFILE، JOB_PERSPECTIVE یا JOB_ANALYSIS)
+        user_id (int): کاربر هدف (برای تحلیل ادمین 0)
+        season_id (int, optional): شناسه فصل
+        chat_id (int, optional): چت پیام منتظر
+        message_id (int, optional): پیامی که پس از پایان کار ویرایش می‌شود
+
+    Returns:
+        int: شناسه کار (کار در جریان همان کلید در صورت وجود) یا None در صورت خطا
+    """
+    if kind not in _RUNNERS:
+        raise ValueError(f"نوع کار نامعتبر: {kind}")
+    try:
+        job_id, created = await write_queue.run_async(
+            _enqueue_op, kind, user_id or 0, season_id or 0, chat_id, message_id
+        )
+    except Exception as e:
+        logger.error(f"خطا در ثبت کار هوش مصنوعی {kind} برای کاربر {user_id}: {e}")
+        return None
+    _stats["enqueued" if created else "deduplicated"] += 1
+    if created:
+        _wake()
+    return job_id
+
+
+def get_job(job_id):
+    """دریافت وضعیت یک کار (Job یا None)"""
+    return _job(execute_db_query(f"SELECT {_JOB_COLUMNS} FROM ai_jobs WHERE job_id = ?", (job_id,), fetchone=True))
+
+
+def get_latest_job(kind, user_id=0, season_id=None):
+    """آخرین کار ثبت شده برای یک (نوع، کاربر، فصل)"""
+    return _job(execute_db_query(
+        f"""SELECT {_JOB_COLUMNS} FROM ai_jobs WHERE kind = ? AND user_id = ? AND season_id = ?
+            ORDER BY job_id DESC LIMIT 1""",
+        (kind, user_id or 0, season_id or 0), fetchone=True
+    ))
+
+
+def get_queue_position(job_id):
+    """تعداد کارهای منتظر پیش از این کار + 1 (برای کارهای در صف)"""
+    row = execute_db_query(
+        "SELECT COUNT(*) FROM ai_jobs WHERE status = ? AND job_id <= ?", (JOB_PENDING, job_id), fetchone=True
+    )
+    return row[0] if row else 0
+
+
+async def get_job_async(job_id):
+    """نسخه awaitable از get_job"""
+    return await run_read(get_job, job_id)
+
+
+async def get_latest_job_async(kind, user_id=0, season_id=None):
+    """نسخه awaitable از get_latest_job"""
+    return await run_read(get_latest_job, kind, user_id, season_id)
+
+
+async def get_queue_position_async(job_id):
+    """نسخه awaitable از get_queue_position"""
+    return await run_read(get_queue_position, job_id)
+
+
+async def _run_job(job):
+    try:
+        result = await _RUNNERS[job.kind](job)
+    except asyncio.CancelledError:
+        # توقف ربات: کار دوباره در صف قرار می‌گیرد (صف نوشتن پیش از بسته شدن خالی می‌شود)
+        write_queue.submit(_requeue_op, job.job_id)
+        raise
+    except Exception as e:
+        logger.error(f"خطا در اجرای کار هوش مصنوعی {job.job_id} ({job.kind}): {e}")
+        if job.attempts < AI_JOB_MAX_ATTEMPTS:
+            _stats["retried"] += 1
+            await write_queue.run_async(_requeue_op, job.job_id, str(e))
+            return
+        status, result, error = JOB_FAILED, None, str(e)
+    else:
+        status, error = JOB_DONE, None
+
+    waiters = await write_queue.run_async(_finish_op, job.job_id, status, result, error)
+    _stats["completed" if status == JOB_DONE else "failed"] += 1
+    notifier = _state["notifier"]
+    if notifier and waiters:
+        try:
+            await notifier(job._replace(status=status, result=result, error=error), waiters)
+        except Exception as e:
+            logger.error(f"خطا در اعلام نتیجه کار هوش مصنوعی {job.job_id}: {e}")
+
+
+async def _worker():
+    wakeup = _state["wakeup"]
+    while True:
+        try:
+            wakeup.clear()
+            job = await write_queue.run_async(_claim_op)
+            if job is None:
+                try:
+                    await asyncio.wait_for(wakeup.wait(), AI_JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await _run_job(job)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"خطا در کارگر صف هوش مصنوعی: {e}")
+            await asyncio.sleep(AI_JOB_POLL_INTERVAL)
+
+
+async def start(notifier=None, workers=AI_JOB_WORKERS):
+    """راه‌اندازی کارگرهای صف روی حلقه جاری (پس از initialize ربات)
+
+    Args:
+        notifier (callable, optional): ``async notifier(job, waiters)`` برای ویرایش پیام‌های منتظر
+        workers (int): تعداد کارگرها
+    """
+    if _state["workers"]:
+        return
+    _state["notifier"] = notifier
+    _state["wakeup"] = asyncio.Event()
+    recovered = await write_queue.run_async(_recover_op, AI_JOB_RETENTION_DAYS)
+    if recovered:
+        logger.info(f"{recovered} کار نیمه‌تمام هوش مصنوعی دوباره در صف قرار گرفت")
+    _state["workers"] = [
+        asyncio.create_task(_worker(), name=f"ai-job-worker-{index}") for index in range(workers)
+    ]
+
+
+async def stop():
+    """توقف کارگرها؛ کارهای در حال اجرا در راه‌اندازی بعدی ادامه پیدا می‌کنند"""
+    workers, _state["workers"] = _state["workers"], []
+    for task in workers:
+        task.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+    _state["wakeup"] = None
+
+
+def get_stats():
+    """آمار صف کارهای هوش مصنوعی"""
+    stats = dict(_stats)
+    stats["workers"] = len(_state["workers"])
+    return stats
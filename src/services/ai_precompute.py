@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""
+پیش‌محاسبه دسته‌ای پروفایل هوشمند و زاویه دید کاربران فعال یک فصل
+پروفایل و زاویه دید در حالت عادی هنگام اولین کلیک هر کاربر ساخته می‌شوند و اولین
+کلیک پس از انقضای کش کند است. اینجا همه کاربرانی که در فصل سطری در season_totals
+دارند به ترتیب user_id پیمایش می‌شوند و هر دو متن پیش از کلیک کاربران در
+user_profiles و user_perspectives ذخیره می‌شوند.
+
+- همزمانی: در هر مرحله AI_PRECOMPUTE_CONCURRENCY کاربر با هم پردازش می‌شوند.
+- نرخ: شروع درخواست‌ها حداکثر AI_PRECOMPUTE_RPS در ثانیه است تا کارهای تعاملی ربات
+  (صف ai_jobs) سهم خود را از محدودیت سرویس داشته باشند.
+- بودجه: با مصرف AI_PRECOMPUTE_TOKEN_BUDGET توکن تخمینی در یک اجرا، اجرا متوقف
+  (paused) می‌شود و بررسی بعدی زمان‌بند ادامه‌اش می‌دهد.
+- ادامه‌پذیری: پس از هر مرحله پیشرفت در ai_precompute_runs ثبت می‌شود؛ اجرای دوباره
+  همان run_key (پس از توقف، خطا یا راه‌اندازی دوباره ربات) از کاربر بعدی ادامه دارد.
+
+زمان‌بند هر AI_PRECOMPUTE_CHECK_INTERVAL ثانیه مرزهای فصل را بررسی می‌کند: در
+AI_PRECOMPUTE_LEAD_DAYS روز پایانی فصل فعال هر روز یک اجرا، و برای آخرین فصل
+پایان یافته یک اجرای نهایی. اجرای دستی: scripts/precompute_ai.py
+"""
+
+import asyncio
+import datetime
+import logging
+from collections import namedtuple
+
+from ..database import write_queue
+from ..database.async_db import run_read
+from ..database.db_utils import execute_db_query
+from . import ai
+
+logger = logging.getLogger(__name__)
+
+# تعداد کاربرانی که همزمان پردازش می‌شوند (و فاصله ثبت نقطه بازیابی)
+AI_PRECOMPUTE_CONCURRENCY = 2
+# حداکثر شروع درخواست در ثانیه (صفر: بدون محدودیت)
+AI_PRECOMPUTE_RPS = 0.5
+# سقف توکن تخمینی هر اجرا (صفر: بدون محدودیت)
+AI_PRECOMPUTE_TOKEN_BUDGET = 200000
+# فاصله بررسی مرزهای فصل توسط زمان‌بند (ثانیه)
+AI_PRECOMPUTE_CHECK_INTERVAL = 3600
+# چند روز پیش از end_date فصل فعال پیش‌محاسبه روزانه شروع شود
+AI_PRECOMPUTE_LEAD_DAYS = 3
+
+# وضعیت اجراها
+RUN_RUNNING = "running"
+RUN_PAUSED = "paused"
+RUN_DONE = "done"
+RUN_FAILED = "failed"
+
+Run = namedtuple("Run", ["run_key", "season_id", "status", "last_user_id", "processed", "failed", "tokens"])
+
+_RUN_COLUMNS = "run_key, season_id, status, last_user_id, processed, failed, tokens"
+
+_state = {"task": None}
+_stats = {"runs": 0, "users": 0, "failed": 0, "tokens": 0, "paused": 0}
+
+
+class _RateLimiter:
+    """فاصله‌گذاری شروع درخواست‌ها به حداکثر rps در ثانیه"""
+
+    def __init__(self, rps):
+        self.interval = 1.0 / rps if rps else 0.0
+        self._next = 0.0
+
+    async def wait(self):
+        if not self.interval:
+            return
+        now = asyncio.get_running_loop().time()
+        delay = self._next - now
+        self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def _run(row):
+    return Run(*row) if row else None
+
+
+def _begin_op(conn, run_key, season_id):
+    """ساخت اجرا (یا برداشتن اجرای نیمه‌تمام همان کلید) و علامت‌گذاری به عنوان در حال اجرا"""
+    conn.execute(
+        "INSERT OR IGNORE INTO ai_precompute_runs (run_key, season_id) VALUES (?, ?)", (run_key, season_id)
+    )
+    conn.execute(
+        "UPDATE ai_precompute_runs SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE run_key = ?",
+        (RUN_RUNNING, run_key)
+    )
+    return _run(conn.execute(
+        f"SELECT {_RUN_COLUMNS} FROM ai_precompute_runs WHERE run_key = ?", (run_key,)
+    ).fetchone())
+
+
+def _checkpoint_op(conn, run):
+    conn.execute("""
+        UPDATE ai_precompute_runs
+        SET last_user_id = ?, processed = ?, failed = ?, tokens = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE run_key = ?
+    """, (run.last_user_id, run.processed, run.failed, run.tokens, run.run_key))
+
+
+def _finish_op(conn, run_key, status):
+    conn.execute(
+        """UPDATE ai_precompute_runs SET status = ?, updated_at = CURRENT_TIMESTAMP, finished_at = CURRENT_TIMESTAMP
+           WHERE run_key = ?""",
+        (status, run_key)
+    )
+
+
+def _next_users(season_id, after_user_id, limit):
+    """کاربران فعال بعدی فصل به ترتیب user_id (None در صورت خطا)"""
+    rows = execute_db_query(
+        "SELECT user_id FROM season_totals WHERE season_id = ? AND user_id > ? ORDER BY user_id LIMIT ?",
+        (season_id, after_user_id, limit)
+    )
+    return None if rows is None else [row[0] for row in rows]
+
+
+def get_run(run_key):
+    """وضعیت یک اجرا (Run یا None)"""
+    return _run(execute_db_query(
+        f"SELECT {_RUN_COLUMNS} FROM ai_precompute_runs WHERE run_key = ?", (run_key,), fetchone=True
+    ))
+
+
+async def get_run_async(run_key):
+    """نسخه awaitable از get_run"""
+    return await run_read(get_run, run_key)
+
+
+def _perspective(user_id, season_id):
+    return ai.refresh_user_perspective_async(user_id, season_id)
+
+
+def _profile(user_id, season_id):
+    return ai.refresh_user_profile_async(user_id)
+
+
+_STEPS = (_perspective, _profile)
+
+
+async def _refresh_user(user_id, season_id, limiter):
+    """ساخت زاویه دید و پروفایل یک کاربر
+
+    Returns:
+        tuple: (موفق، توکن‌های تخمینی مصرف شده)
+    """
+    ok, tokens = True, 0
+    for step in _STEPS:
+        await limiter.wait()
+        try:
+            step_ok, used = await step(user_id, season_id)
+        except Exception as e:
+            logger.error(f"خطا در پیش‌محاسبه {step.__name__.strip('_')} کاربر {user_id}: {e}")
+            step_ok, used = False, 0
+        ok = ok and step_ok
+        tokens += used
+    return ok, tokens
+
+
+async def run(season_id, run_key=None, concurrency=AI_PRECOMPUTE_CONCURRENCY, rps=AI_PRECOMPUTE_RPS,
+              token_budget=AI_PRECOMPUTE_TOKEN_BUDGET):
+    """پیش‌محاسبه پروفایل و زاویه دید همه کاربران فعال یک فصل (یا ادامه اجرای قبلی)
+
+    Args:
+        season_id (int): شناسه فصل
+        run_key (str, optional): کلید اجرا برای ادامه؛ پیش‌فرض «فصل:تاریخ امروز»
+        concurrency (int): تعداد کاربران همزمان
+        rps (float): حداکثر شروع درخواست در ثانیه (صفر: بدون محدودیت)
+        token_budget (int): سقف توکن تخمینی این اجرا (صفر: بدون محدودیت)
+
+    Returns:
+        Run: وضعیت نهایی اجرا (done، paused در صورت تمام شدن بودجه یا failed)
+    """
+    run_key = run_key or f"{season_id}:{datetime.date.today().isoformat()}"
+    current = await get_run_async(run_key)
+    if current and current.status == RUN_DONE:
+        return current
+    current = await write_queue.run_async(_begin_op, run_key, season_id)
+    limiter = _RateLimiter(rps)
+    spent = 0
+    status = RUN_DONE
+    try:
+        while True:
+            if token_budget and spent >= token_budget:
+                status = RUN_PAUSED
+                break
+            users = await run_read(_next_users, season_id, current.last_user_id, max(1, concurrency))
+            if users is None:
+                status = RUN_FAILED
+                break
+            if not users:
+                break
+            results = await asyncio.gather(*(_refresh_user(user_id, season_id, limiter) for user_id in users))
+            failed = sum(1 for ok, _ in results if not ok)
+            used = sum(tokens for _, tokens in results)
+            spent += used
+            current = current._replace(
+                last_user_id=users[-1], processed=current.processed + len(users),
+                failed=current.failed + failed, tokens=current.tokens + used
+            )
+            await write_queue.run_async(_checkpoint_op, current)
+            _stats["users"] += len(users)
+            _stats["failed"] += failed
+            _stats["tokens"] += used
+    except asyncio.CancelledError:
+        # کاربران مرحله نیمه‌تمام در ادامه اجرا دوباره پردازش می‌شوند
+        write_queue.submit(_finish_op, run_key, RUN_PAUSED)
+        raise
+
+    await write_queue.run_async(_finish_op, run_key, status)
+    _stats["runs"] += 1
+    if status == RUN_PAUSED:
+        _stats["paused"] += 1
+    logger.info(
+        f"پیش‌محاسبه هوش مصنوعی {run_key}: {status}، {current.processed} کاربر، "
+        f"{current.failed} خطا، حدود {current.tokens} توکن"
+    )
+    return current._replace(status=status)
+
+
+def _due_runs(today):
+    """اجراهای لازم در مرز فصل‌ها: لیست (run_key، season_id)"""
+    runs = []
+    row = execute_db_query(
+        """SELECT id FROM season
+           WHERE is_active = 1 AND end_date IS NOT NULL AND date(end_date) <= date('now', ?)
+           LIMIT 1""",
+        (f"+{int(AI_PRECOMPUTE_LEAD_DAYS)} days",), fetchone=True
+    )
+    if row:
+        runs.append((f"{row[0]}:{today}", row[0]))
+    row = execute_db_query(
+        """SELECT id FROM season s
+           WHERE is_active = 0 AND EXISTS (SELECT 1 FROM season_totals t WHERE t.season_id = s.id)
+           ORDER BY id DESC LIMIT 1""",
+        fetchone=True
+    )
+    if row:
+        runs.append((f"{row[0]}:final", row[0]))
+    return runs
+
+
+async def _scheduler():
+    while True:
+        try:
+            for run_key, season_id in await run_read(_due_runs, datetime.date.today().isoformat()):
+                await run(season_id, run_key)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"خطا در زمان‌بند پیش‌محاسبه هوش مصنوعی: {e}")
+        await asyncio.sleep(AI_PRECOMPUTE_CHECK_INTERVAL)
+
+
+async def start():
+    """راه‌اندازی زمان‌بند پیش‌محاسبه روی حلقه جاری"""
+    if _state["task"] is None:
+        _state["task"] = asyncio.create_task(_scheduler(), name="ai-precompute")
+
+
+async def stop():
+    """توقف زمان‌بند؛ اجرای نیمه‌تمام در بررسی بعدی از نقطه بازیابی ادامه پیدا می‌کند"""
+    task, _state["task"] = _state["task"], None
+    if task is not None:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
+def get_stats():
+    """آمار پیش‌محاسبه دسته‌ای"""
+    stats = dict(_stats)
+    stats["scheduled"] = _state["task"] is not None
+    return stats
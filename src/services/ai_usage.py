@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+حسابداری مصرف توکن، تأخیر و هزینه هر فراخوانی مدل هوش مصنوعی
+AIModel پس از هر فراخوانی (موفق یا ناموفق پس از همه تلاش‌ها) مدل، قابلیت فراخواننده
+(perspective، profile، analysis، reason یا direct برای فراخوانی مستقیم)، توکن‌های
+ورودی و خروجی گزارش شده توسط سرویس، تأخیر کل (شامل تلاش‌های دوباره) و تعداد تلاش
+دوباره را اینجا ثبت می‌کند. ثبت از صف نوشتن و بدون انتظار انجام می‌شود تا مسیر پاسخ
+کند نشود. هزینه هنگام ثبت از روی AI_MODEL_PRICES محاسبه و ذخیره می‌شود.
+
+get_report برای پنل ادمین، تأخیر میانه و صدک ۹۵ و هزینه روزانه هر قابلیت را می‌سازد.
+"""
+
+import math
+import time
+import logging
+import threading
+
+from ..database import write_queue
+from ..database.db_utils import execute_db_query
+from ..database.async_db import run_read
+
+logger = logging.getLogger(__name__)
+
+# مدت نگهداری سطرها (روز)
+AI_USAGE_RETENTION_DAYS = 30
+# هر چند ثبت یک بار سطرهای قدیمی حذف شوند
+AI_USAGE_PRUNE_EVERY = 200
+# قیمت هر هزار توکن به دلار: (ورودی، خروجی)
+AI_MODEL_PRICES = {
+    "gemini-2.0-flash": (0.0001, 0.0004),
+    "gpt-3.5-turbo": (0.0005, 0.0015),
+}
+# قابلیت فراخوانی‌هایی که از مسیر AIRequest نمی‌آیند
+DEFAULT_CALLER = "direct"
+
+_lock = threading.Lock()
+_stats = {"recorded": 0, "failed_calls": 0, "prunes": 0}
+
+
+def cost(model, prompt_tokens, completion_tokens):
+    """هزینه تخمینی یک فراخوانی (دلار)؛ برای مدل بدون قیمت صفر
+
+    Args:
+        model (str): شناسه مدل («سرویس:مدل» یا فقط نام مدل)
+    """
+    prices = AI_MODEL_PRICES.get(model.split(":", 1)[-1])
+    if not prices:
+        return 0.0
+    return (prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1000
+
+
+def _record_op(conn, row, prune):
+    conn.execute("""
+        INSERT INTO ai_usage
+            (created_at, model, caller, prompt_tokens, completion_tokens, latency_ms, retries, ok, cost)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, row)
+    if prune:
+        conn.execute(
+            "DELETE FROM ai_usage WHERE created_at < ?", (row[0] - AI_USAGE_RETENTION_DAYS * 86400,)
+        )
+
+
+def record(model, caller, prompt_tokens, completion_tokens, latency, retries, ok=True):
+    """ثبت یک فراخوانی مدل (بدون انتظار برای commit)
+
+    Args:
+        model (str): شناسه مدل
+        caller (str): قابلیت فراخواننده
+        prompt_tokens (int): توکن‌های ورودی
+        completion_tokens (int): توکن‌های خروجی
+        latency (float): تأخیر کل به ثانیه
+        retries (int): تعداد تلاش‌های دوباره
+        ok (bool): آیا پاسخ دریافت شد
+    """
+    now = int(time.time())
+    with _lock:
+        _stats["recorded"] += 1
+        if not ok:
+            _stats["failed_calls"] += 1
+        prune = _stats["recorded"] % AI_USAGE_PRUNE_EVERY == 0
+        if prune:
+            _stats["prunes"] += 1
+    row = (
+        now, model, caller or DEFAULT_CALLER, int(prompt_tokens), int(completion_tokens),
+        int(latency * 1000), int(retries), 1 if ok else 0, cost(model, prompt_tokens, completion_tokens)
+    )
+    try:
+        write_queue.submit(_record_op, row, prune)
+    except Exception as e:
+        logger.error(f"خطا در ثبت مصرف هوش مصنوعی: {e}")
+
+
+def percentile(values, q):
+    """صدک q (نزدیک‌ترین رتبه) از لیست مرتب شده؛ برای لیست خالی صفر"""
+    if not values:
+        return 0
+    return values[max(0, math.ceil(q / 100 * len(values)) - 1)]
+
+
+def get_report(days=7):
+    """گزارش مصرف روزهای اخیر
+
+    Returns:
+        dict: days، features (لیست هر قابلیت به ترتیب هزینه: caller، calls، errors،
+        retries، prompt_tokens، completion_tokens، cost، p50_ms، p95_ms) و daily
+        (لیست (روز، قابلیت، تعداد، توکن، هزینه) از جدیدترین روز) یا None در صورت خطا
+    """
+    rows = execute_db_query("""
+        SELECT created_at, caller, prompt_tokens, completion_tokens, latency_ms, retries, ok, cost
+        FROM ai_usage WHERE created_at >= ?
+    """, (int(time.time()) - days * 86400,))
+    if rows is None:
+        return None
+
+    features, daily, latencies = {}, {}, {}
+    for created_at, caller, prompt_tokens, completion_tokens, latency_ms, retries, ok, row_cost in rows:
+        feature = features.setdefault(caller, {
+            "caller": caller, "calls": 0, "errors": 0, "retries": 0,
+            "prompt_tokens": 0, "completion_tokens": 0, "cost": 0.0,
+        })
+        feature["calls"] += 1
+        feature["errors"] += 0 if ok else 1
+        feature["retries"] += retries
+        feature["prompt_tokens"] += prompt_tokens
+        feature["completion_tokens"] += completion_tokens
+        feature["cost"] += row_cost
+        latencies.setdefault(caller, []).append(latency_ms)
+
+        day = time.strftime("%Y-%m-%d", time.localtime(created_at))
+        entry = daily.setdefault((day, caller), [0, 0, 0.0])
+        entry[0] += 1
+        entry[1] += prompt_tokens + completion_tokens
+        entry[2] += row_cost
+
+    for caller, values in latencies.items():
+        values.sort()
+        features[caller]["p50_ms"] = percentile(values, 50)
+        features[caller]["p95_ms"] = percentile(values, 95)
+
+    return {
+        "days": days,
+        "features": sorted(features.values(), key=lambda f: (-f["cost"], -f["calls"])),
+        "daily": [
+            (day, caller, calls, tokens, round(spend, 6))
+            for (day, caller), (calls, tokens, spend)
+            in sorted(daily.items(), key=lambda item: (item[0][0], item[1][2]), reverse=True)
+        ],
+    }
+
+
+async def get_report_async(days=7):
+    """نسخه awaitable از get_report"""
+    return await run_read(get_report, days)
+
+
+def get_stats():
+    """آمار ثبت مصرف در این اجرای ربات"""
+    with _lock:
+        return dict(_stats)
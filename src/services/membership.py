@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+کش نتیجه بررسی عضویت کاربران در کانال
+بررسی عضویت (get_chat_member) یک درخواست شبکه به API تلگرام است و پیش از هر کلیک
+اجرا می‌شد. نتیجه برای هر کاربر در حافظه نگه داشته می‌شود: عضویت مدت طولانی‌تر و
+عدم عضویت مدت کوتاه‌تر (تا کاربری که تازه عضو شده سریع‌تر شناخته شود).
+"""
+
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# مدت اعتبار نتیجه «عضو است» (ثانیه)
+POSITIVE_TTL = 600
+# مدت اعتبار نتیجه «عضو نیست» (ثانیه)
+NEGATIVE_TTL = 30
+# حداکثر تعداد کاربران در کش؛ پس از آن موارد منقضی شده پاک می‌شوند
+MAX_ENTRIES = 10000
+
+# وضعیت‌هایی که عضو کانال محسوب می‌شوند
+MEMBER_STATUSES = ('member', 'administrator', 'creator')
+
+_lock = threading.Lock()
+# user_id -> (is_member, expires_at)
+_verdicts = {}
+_stats = {"hits": 0, "misses": 0, "refreshes": 0, "updates": 0}
+
+
+def get_cached(user_id):
+    """نتیجه کش شده عضویت
+
+    Returns:
+        bool: نتیجه عضویت، یا None اگر نتیجه معتبری در کش نباشد
+    """
+    entry = _verdicts.get(user_id)
+    if entry is not None and time.monotonic() < entry[1]:
+        _stats["hits"] += 1
+        return entry[0]
+    _stats["misses"] += 1
+    return None
+
+
+def record(user_id, is_member):
+    """ثبت نتیجه بررسی عضویت یک کاربر
+
+    Returns:
+        bool: همان is_member
+    """
+    ttl = POSITIVE_TTL if is_member else NEGATIVE_TTL
+    now = time.monotonic()
+    with _lock:
+        if len(_verdicts) >= MAX_ENTRIES:
+            for key in [k for k, v in _verdicts.items() if v[1] <= now]:
+                del _verdicts[key]
+        _verdicts[user_id] = (is_member, now + ttl)
+    return is_member
+
+
+def record_status(user_id, status):
+    """ثبت نتیجه عضویت بر اساس وضعیت عضو در تلگرام (member، left، kicked، ...)"""
+    return record(user_id, status in MEMBER_STATUSES)
+
+
+def note_refresh():
+    """شمارش بررسی‌های اجباری (مثلاً پس از زدن دکمه «عضو شدم»)"""
+    _stats["refreshes"] += 1
+
+
+def apply_member_update(user_id, status):
+    """به‌روزرسانی کش از روی رویداد chat_member کانال"""
+    _stats["updates"] += 1
+    logger.debug(f"تغییر عضویت کاربر {user_id} در کانال: {status}")
+    return record_status(user_id, status)
+
+
+def invalidate(user_id=None):
+    """حذف نتیجه یک کاربر (یا همه کاربران) از کش"""
+    with _lock:
+        if user_id is None:
+            _verdicts.clear()
+        else:
+            _verdicts.pop(user_id, None)
+
+
+def get_stats():
+    """آمار کش عضویت"""
+    stats = dict(_stats)
+    stats["entries"] = len(_verdicts)
+    return stats
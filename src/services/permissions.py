@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+سرویس نقش‌ها و دسترسی‌های ادمین
+جدول admins کوچک است و به ندرت تغییر می‌کند، ولی در هر به‌روزرسانی چند بار خوانده
+می‌شد (is_admin، get_admin_permissions و کیبوردها). این سرویس کل جدول را با یک کوئری
+در حافظه نگه می‌دارد و بررسی هر دسترسی با یک جستجوی frozenset انجام می‌شود.
+"""
+
+import time
+import logging
+import threading
+
+from ..database.db_utils import execute_db_query
+from ..database.models import ADMIN_PERMISSIONS
+from ..database.async_db import run_read, run_write
+
+logger = logging.getLogger(__name__)
+
+ALL_PERMISSIONS = frozenset(p[0] for p in ADMIN_PERMISSIONS)
+
+# پشتیبان تغییراتی که خارج از این پردازه در جدول admins انجام می‌شوند (ثانیه)
+PERMISSIONS_CACHE_TTL = 120
+
+# دسترسی لازم برای callbackهای بخش مدیریت (بر اساس پیشوند)
+CALLBACK_PERMISSIONS = (
+    ("toggle_show_users^", "admin_users"),
+    ("admin_users^", "admin_users"),
+    ("broadcast", "admin_users"),
+    ("admin_transactions^", "admin_transactions"),
+    ("admin_search", "admin_transactions"),
+    ("admin_stats^", "admin_stats"),
+    ("toggle_ai_features^", "admin_stats"),
+    ("ai_analysis^", "admin_stats"),
+    ("manage_admins^", "manage_admins"),
+    ("manage_top_questions^", "manage_questions"),
+    ("manage_seasons^", "manage_questions"),
+)
+
+_lock = threading.Lock()
+# user_id -> (role, frozenset(permissions))
+_cache = {"admins": None, "expires": 0.0, "generation": 0}
+_stats = {"hits": 0, "loads": 0, "invalidations": 0}
+
+
+def _parse_permissions(role, permissions):
+    if role == 'god':
+        return ALL_PERMISSIONS
+    if not permissions:
+        return frozenset()
+    return frozenset(p.strip() for p in permissions.split(",") if p.strip())
+
+
+def _cached_admins():
+    admins = _cache["admins"]
+    if admins is not None and time.monotonic() < _cache["expires"]:
+        _stats["hits"] += 1
+        return admins
+    return None
+
+
+def _load():
+    """بارگذاری کل جدول admins با یک کوئری"""
+    with _lock:
+        generation = _cache["generation"]
+    rows = execute_db_query("SELECT user_id, role, permissions FROM admins")
+    _stats["loads"] += 1
+    if rows is None:
+        logger.warning("خواندن جدول admins ناموفق بود")
+        return {}
+    admins = {row[0]: (row[1], _parse_permissions(row[1], row[2])) for row in rows}
+    with _lock:
+        if generation == _cache["generation"]:
+            _cache["admins"] = admins
+            _cache["expires"] = time.monotonic() + PERMISSIONS_CACHE_TTL
+    return admins
+
+
+def _admins():
+    admins = _cached_admins()
+    if admins is None:
+        admins = _load()
+    return admins
+
+
+def get_admin(user_id):
+    """دریافت نقش و دسترسی‌های یک ادمین
+
+    Returns:
+        tuple: (role, frozenset(permissions)) یا None اگر کاربر ادمین نباشد
+    """
+    return _admins().get(user_id)
+
+
+def is_admin(user_id):
+    """بررسی آیا کاربر ادمین است"""
+    return user_id in _admins()
+
+
+def get_role(user_id):
+    """نقش ادمین ('god' یا 'admin') یا None"""
+    admin = get_admin(user_id)
+    return admin[0] if admin else None
+
+
+def has_permission(user_id, permission):
+    """بررسی یک دسترسی مشخص برای کاربر"""
+    admin = get_admin(user_id)
+    return admin is not None and permission in admin[1]
+
+
+def get_admin_permissions(user_id):
+    """دریافت دسترسی‌های ادمین (سازگار با خروجی قبلی)
+
+    Returns:
+        tuple: (لیست دسترسی‌ها به ترتیب ADMIN_PERMISSIONS، نقش)
+    """
+    admin = get_admin(user_id)
+    if not admin:
+        return [], ""
+    role, permissions = admin
+    ordered = [p[0] for p in ADMIN_PERMISSIONS if p[0] in permissions]
+    # دسترسی‌های ناشناخته (ثبت‌شده در دیتابیس) هم حفظ می‌شوند
+    ordered += sorted(permissions - ALL_PERMISSIONS)
+    return ordered, role
+
+
+def required_permission(callback_data):
+    """دسترسی لازم برای یک callback مدیریتی (None اگر دسترسی خاصی لازم نباشد)"""
+    for prefix, permission in CALLBACK_PERMISSIONS:
+        if callback_data.startswith(prefix):
+            return permission
+    return None
+
+
+def set_admin(user_id, role, permissions=None):
+    """افزودن یا به‌روزرسانی یک ادمین و باطل کردن کش
+
+    Args:
+        user_id (int): شناسه کاربر
+        role (str): 'god' یا 'admin'
+        permissions (iterable, optional): دسترسی‌ها
+    """
+    permissions_text = ",".join(permissions) if permissions else None
+    result = execute_db_query(
+        "INSERT OR REPLACE INTO admins (user_id, role, permissions) VALUES (?, ?, ?)",
+        (user_id, role, permissions_text), commit=True
+    )
+    invalidate()
+    return bool(result)
+
+
+def remove_admin(user_id):
+    """حذف یک ادمین و باطل کردن کش"""
+    result = execute_db_query("DELETE FROM admins WHERE user_id=?", (user_id,), commit=True)
+    invalidate()
+    return bool(result)
+
+
+def invalidate():
+    """باطل کردن کش دسترسی‌ها (پس از هر تغییر در جدول admins)"""
+    with _lock:
+        _cache["admins"] = None
+        _cache["expires"] = 0.0
+        _cache["generation"] += 1
+    _stats["invalidations"] += 1
+
+
+def get_stats():
+    """آمار کش دسترسی‌ها"""
+    return dict(_stats)
+
+
+async def _admins_async():
+    admins = _cached_admins()
+    if admins is None:
+        admins = await run_read(_admins)
+    return admins
+
+
+async def get_admin_async(user_id):
+    """نسخه awaitable از get_admin (در صورت معتبر بودن کش، بدون رفتن به ترد خواننده)"""
+    return (await _admins_async()).get(user_id)
+
+
+async def is_admin_async(user_id):
+    """نسخه awaitable از is_admin"""
+    return user_id in await _admins_async()
+
+
+async def has_permission_async(user_id, permission):
+    """نسخه awaitable از has_permission"""
+    admin = await get_admin_async(user_id)
+    return admin is not None and permission in admin[1]
+
+
+async def set_admin_async(user_id, role, permissions=None):
+    """نسخه awaitable از set_admin (در ترد نویسنده)"""
+    return await run_write(set_admin, user_id, role, permissions)
+
+
+async def remove_admin_async(user_id):
+    """نسخه awaitable از remove_admin (در ترد نویسنده)"""
+    return await run_write(remove_admin, user_id)
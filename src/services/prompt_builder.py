@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+ساخت پرامپت‌های هوش مصنوعی در بودجه توکن
+پرامپت‌های زاویه دید، پروفایل و تحلیل ادمین از لیست امتیازها، دلایل و رأی‌ها ساخته
+می‌شوند و بدون محدودیت، در فصل‌های بزرگ درخواست‌های طولانی، کند و پرهزینه می‌سازند.
+اینجا هر مورد لیست یک Item با وزن (مثلاً مقدار امتیاز) و تازگی (مثلاً transaction_id)
+است؛ موارد بر اساس وزن × ضریب تازگی رتبه‌بندی می‌شوند، دلایل تقریباً یکسان در یک خط
+ادغام می‌شوند و مهم‌ترین موارد تا سقف بودجه انتخاب می‌شوند.
+
+PromptBuilder متن‌های ثابت را اول حساب می‌کند و باقی بودجه کل را به ترتیب بین بخش‌های
+لیستی تقسیم می‌کند (هر بخش می‌تواند سقف جداگانه هم داشته باشد).
+"""
+
+import re
+from collections import namedtuple
+
+# میانگین تقریبی نویسه به ازای هر توکن برای متن فارسی
+CHARS_PER_TOKEN = 3
+# شباهت واژگانی (Jaccard) که از آن به بالا دو دلیل تکراری حساب می‌شوند
+DEDUP_SIMILARITY = 0.8
+# نیمه‌عمر اهمیت بر حسب رتبه تازگی: وزن nامین مورد تازه در 2^(-n/نیمه‌عمر) ضرب می‌شود
+RECENCY_HALF_LIFE = 20
+
+_ARABIC_TO_PERSIAN = str.maketrans({"ي": "ی", "ى": "ی", "ك": "ک", "‌": " "})
+_NON_WORD = re.compile(r"[^\w\s]+")
+
+# یک مورد لیست: text خط نمایش داده شده، key متن مقایسه برای ادغام تکراری‌ها (None: بدون ادغام)
+Item = namedtuple("Item", ["text", "weight", "recency", "key"])
+Item.__new__.__defaults__ = (1.0, 0, None)
+
+
+def estimate_tokens(text):
+    """تخمین تعداد توکن‌های یک متن (بدون نیاز به tokenizer مدل)"""
+    return len(text or "") // CHARS_PER_TOKEN + 1
+
+
+def normalize(text):
+    """متن مقایسه: حروف کوچک، نویسه‌های عربی/فارسی یکسان، بدون علائم و فاصله اضافه"""
+    text = _NON_WORD.sub(" ", (text or "").lower().translate(_ARABIC_TO_PERSIAN))
+    return " ".join(text.split())
+
+
+def rank(items, half_life=RECENCY_HALF_LIFE):
+    """مرتب‌سازی موارد به ترتیب اهمیت (وزن × ضریب تازگی؛ در تساوی تازه‌تر اول)"""
+    by_recency = sorted(items, key=lambda item: item.recency, reverse=True)
+    scored = [
+        (item.weight * 0.5 ** (index / half_life), -index, item) for index, item in enumerate(by_recency)
+    ]
+    scored.sort(key=lambda entry: entry[:2], reverse=True)
+    return [item for _, _, item in scored]
+
+
+def dedupe(items, similarity=DEDUP_SIMILARITY):
+    """ادغام موارد با key تقریباً یکسان در اولین (مهم‌ترین) مورد
+
+    Returns:
+        list: لیست (Item، تعداد موارد مشابه ادغام شده) به همان ترتیب ورودی
+    """
+    kept = []
+    exact = {}
+    for item in items:
+        if item.key is None:
+            kept.append([item, None, 0])
+            continue
+        key = normalize(item.key)
+        entry = exact.get(key)
+        if entry is None:
+            words = set(key.split())
+            entry = next((
+                kept_entry for kept_entry in kept
+                if kept_entry[1] and words and len(words & kept_entry[1]) / len(words | kept_entry[1]) >= similarity
+            ), None)
+        if entry is not None:
+            entry[2] += 1
+            exact[key] = entry
+            continue
+        entry = [item, set(key.split()), 0]
+        exact[key] = entry
+        kept.append(entry)
+    return [(item, count) for item, _, count in kept]
+
+
+def fit(items, budget, dedup=True, half_life=RECENCY_HALF_LIFE):
+    """انتخاب مهم‌ترین موارد در بودجه توکن
+
+    موردی که در باقی‌مانده بودجه جا نشود کنار گذاشته می‌شود و موارد کوتاه‌تر بعدی
+    همچنان بررسی می‌شوند.
+
+    Returns:
+        tuple: (لیست خط‌های انتخاب شده به ترتیب اهمیت، لیست Itemهای کنار گذاشته شده)
+    """
+    ranked = rank(items, half_life)
+    entries = dedupe(ranked) if dedup else [(item, 0) for item in ranked]
+    lines, omitted = [], []
+    remaining = budget
+    for item, duplicates in entries:
+        line = f"{item.text} (+{duplicates} مورد مشابه)" if duplicates else item.text
+        cost = estimate_tokens(line)
+        if remaining is not None and cost > remaining:
+            omitted.append(item)
+            continue
+        if remaining is not None:
+            remaining -= cost
+        lines.append(line)
+    return lines, omitted
+
+
+_Section = namedtuple("_Section", ["items", "budget", "empty", "omitted", "dedup"])
+
+
+class PromptBuilder:
+    """ساخت پرامپت از متن‌های ثابت و بخش‌های لیستی در یک بودجه کل توکن
+
+    Args:
+        budget (int, optional): سقف توکن کل پرامپت (None: فقط سقف بخش‌ها)
+    """
+
+    def __init__(self, budget=None):
+        self.budget = budget
+        self._parts = []
+        self.omitted = 0
+
+    def add(self, text):
+        """افزودن متن ثابت (همیشه در پرامپت می‌ماند)"""
+        self._parts.append(text)
+        return self
+
+    def add_items(self, items, budget=None, empty="", omitted=None, dedup=True):
+        """افزودن بخش لیستی (هر خط یک Item)
+
+        Args:
+            items (list): موارد بخش
+            budget (int, optional): سقف توکن این بخش
+            empty (str): متن جایگزین وقتی لیست خالی است
+            omitted (callable, optional): ``omitted(items)`` متن خلاصه موارد کنار گذاشته شده
+            dedup (bool): ادغام موارد با key تقریباً یکسان
+        """
+        self._parts.append(_Section(list(items), budget, empty, omitted, dedup))
+        return self
+
+    def build(self):
+        """ساخت متن نهایی پرامپت"""
+        fixed = sum(estimate_tokens(part) for part in self._parts if isinstance(part, str))
+        remaining = None if self.budget is None else max(0, self.budget - fixed)
+        self.omitted = 0
+        rendered = []
+        for part in self._parts:
+            if isinstance(part, str):
+                rendered.append(part)
+                continue
+            if not part.items:
+                rendered.append(part.empty)
+                continue
+            budget = part.budget
+            if remaining is not None:
+                budget = remaining if budget is None else min(budget, remaining)
+            lines, omitted = fit(part.items, budget, part.dedup)
+            if remaining is not None:
+                remaining -= sum(estimate_tokens(line) for line in lines)
+            self.omitted += len(omitted)
+            text = "".join(f"{line}\n" for line in lines)
+            if omitted and part.omitted:
+                text += f"{part.omitted(omitted)}\n"
+            rendered.append(text)
+        return "".join(rendered)
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+سرویس رتبه‌بندی زنده کاربران در هر فصل
+امتیاز دریافتی همه کاربران یک فصل یک بار از season_totals خوانده و در یک لیست مرتب
+نگه داشته می‌شود. رتبه، درصد و همسایه‌های بالا و پایین هر کاربر با جستجوی دودویی
+(bisect) پیدا می‌شوند و هر تراکنش ثبت شده در همین پردازه، بدون مراجعه دوباره به
+دیتابیس، جای گیرنده را در لیست جابه‌جا می‌کند.
+"""
+
+import time
+import bisect
+import logging
+import threading
+from collections import namedtuple
+
+from ..database.db_utils import execute_db_query
+from ..database.async_db import run_read
+
+logger = logging.getLogger(__name__)
+
+# پشتیبان تغییراتی که خارج از این پردازه در جدول transactions انجام می‌شوند (ثانیه)
+RANK_CACHE_TTL = 300
+
+# rank: رتبه (امتیاز برابر = رتبه برابر)، total: تعداد کاربران رتبه‌بندی شده،
+# score: امتیاز دریافتی، percentile: درصد کاربرانی که امتیاز کمتری دارند
+RankInfo = namedtuple("RankInfo", ["rank", "total", "score", "percentile"])
+
+
+class _SeasonRanking:
+    """رتبه‌بندی یک فصل: لیست مرتب (-امتیاز، user_id) و نگاشت user_id به امتیاز"""
+
+    __slots__ = ("scores", "entries", "expires")
+
+    def __init__(self, rows):
+        self.scores = {user_id: score for user_id, score in rows}
+        self.entries = sorted((-score, user_id) for user_id, score in self.scores.items())
+        self.expires = time.monotonic() + RANK_CACHE_TTL
+
+    def rank_of_score(self, score):
+        # تعداد کاربرانی که امتیاز بیشتری دارند + 1
+        return bisect.bisect_left(self.entries, (-score,)) + 1
+
+    def add(self, user_id, amount):
+        old = self.scores.get(user_id)
+        if old is not None:
+            index = bisect.bisect_left(self.entries, (-old, user_id))
+            del self.entries[index]
+        score = (old or 0) + amount
+        self.scores[user_id] = score
+        bisect.insort(self.entries, (-score, user_id))
+
+    def info(self, user_id):
+        score = self.scores.get(user_id)
+        if score is None:
+            return None
+        total = len(self.entries)
+        rank = self.rank_of_score(score)
+        # کاربرانی که امتیاز کمتری دارند
+        below = total - bisect.bisect_right(self.entries, (-score, float("inf")))
+        percentile = round(100 * below / (total - 1)) if total > 1 else 100
+        return RankInfo(rank, total, score, percentile)
+
+    def neighbours(self, user_id, above, below):
+        score = self.scores.get(user_id)
+        if score is None:
+            return [], []
+        index = bisect.bisect_left(self.entries, (-score, user_id))
+        upper = self.entries[max(0, index - above):index]
+        lower = self.entries[index + 1:index + 1 + below]
+        return self._rows(upper), self._rows(lower)
+
+    def _rows(self, entries):
+        return [(user_id, -negative, self.rank_of_score(-negative)) for negative, user_id in entries]
+
+
+_lock = threading.Lock()
+# season_id -> _SeasonRanking
+_seasons = {}
+_generation = {"value": 0}
+_stats = {"hits": 0, "loads": 0, "updates": 0, "invalidations": 0}
+
+
+def _cached_ranking(season_id):
+    ranking = _seasons.get(season_id)
+    if ranking is not None and time.monotonic() < ranking.expires:
+        _stats["hits"] += 1
+        return ranking
+    return None
+
+
+def _load(season_id):
+    """بارگذاری امتیاز دریافتی همه کاربران فصل از season_totals با یک کوئری"""
+    with _lock:
+        generation = _generation["value"]
+    rows = execute_db_query(
+        "SELECT user_id, received FROM season_totals WHERE season_id = ? AND received_count > 0",
+        (season_id,)
+    )
+    _stats["loads"] += 1
+    if rows is None:
+        logger.warning(f"خواندن season_totals برای رتبه‌بندی فصل {season_id} ناموفق بود")
+        return _SeasonRanking([])
+    ranking = _SeasonRanking(rows)
+    with _lock:
+        # اگر در حین بارگذاری تراکنشی ثبت شده باشد، نتیجه ذخیره نمی‌شود
+        if generation == _generation["value"]:
+            _seasons[season_id] = ranking
+    return ranking
+
+
+def _ranking(season_id):
+    ranking = _cached_ranking(season_id)
+    if ranking is None:
+        ranking = _load(season_id)
+    return ranking
+
+
+def get_rank(user_id, season_id):
+    """رتبه کاربر در فصل
+
+    Returns:
+        RankInfo: (rank, total, score, percentile) یا None اگر کاربر در این فصل امتیازی دریافت نکرده باشد
+    """
+    if season_id is None:
+        return None
+    ranking = _ranking(season_id)
+    with _lock:
+        return ranking.info(user_id)
+
+
+def get_neighbours(user_id, season_id, above=1, below=1):
+    """کاربران بلافاصله بالاتر و پایین‌تر از کاربر در رتبه‌بندی فصل
+
+    Returns:
+        tuple: (لیست بالاتر‌ها، لیست پایین‌تر‌ها) که هر عضو (user_id, score, rank) است
+    """
+    if season_id is None:
+        return [], []
+    ranking = _ranking(season_id)
+    with _lock:
+        return ranking.neighbours(user_id, above, below)
+
+
+def record_transaction(season_id, touser_id, amount):
+    """اعمال یک تراکنش ثبت شده روی رتبه‌بندی (پس از commit در دیتابیس فراخوانی شود)"""
+    with _lock:
+        _generation["value"] += 1
+        ranking = _seasons.get(season_id)
+        if ranking is not None:
+            ranking.add(touser_id, amount)
+    _stats["updates"] += 1
+
+
+def invalidate(season_id=None):
+    """حذف رتبه‌بندی یک فصل (یا همه فصل‌ها) از حافظه"""
+    with _lock:
+        _generation["value"] += 1
+        if season_id is None:
+            _seasons.clear()
+        else:
+            _seasons.pop(season_id, None)
+    _stats["invalidations"] += 1
+
+
+def get_stats():
+    """آمار سرویس رتبه‌بندی"""
+    stats = dict(_stats)
+    stats["seasons"] = len(_seasons)
+    return stats
+
+
+async def _ranking_async(season_id):
+    ranking = _cached_ranking(season_id)
+    if ranking is None:
+        ranking = await run_read(_ranking, season_id)
+    return ranking
+
+
+async def get_rank_async(user_id, season_id):
+    """نسخه awaitable از get_rank (در صورت وجود رتبه‌بندی در حافظه، بدون رفتن به ترد خواننده)"""
+    if season_id is None:
+        return None
+    ranking = await _ranking_async(season_id)
+    with _lock:
+        return ranking.info(user_id)
+
+
+async def get_neighbours_async(user_id, season_id, above=1, below=1):
+    """نسخه awaitable از get_neighbours"""
+    if season_id is None:
+        return [], []
+    ranking = await _ranking_async(season_id)
+    with _lock:
+        return ranking.neighbours(user_id, above, below)
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+سرویس تنظیمات ربات
+جدول settings یک بار (با یک کوئری) در حافظه بارگذاری می‌شود و همه خواندن‌ها از حافظه
+پاسخ داده می‌شوند. نوشتن‌ها از طریق همین سرویس انجام می‌شوند تا کش به‌روز بماند و
+مشترکان (subscribe) از تغییر باخبر شوند.
+"""
+
+import time
+import logging
+import threading
+
+from ..database.db_utils import execute_db_query
+from ..database.async_db import run_read
+from ..database import write_queue
+
+logger = logging.getLogger(__name__)
+
+# مقدار پیش‌فرض تنظیماتی که ممکن است در جدول وجود نداشته باشند
+DEFAULTS = {
+    "show_all_users": "0",
+    "ai_features_enabled": "1",
+}
+
+# پشتیبان تغییراتی که خارج از این پردازه در جدول settings انجام می‌شوند (ثانیه)
+SETTINGS_CACHE_TTL = 300
+
+_TRUE_VALUES = ("1", "true", "yes", "on")
+
+_lock = threading.Lock()
+_cache = {"values": None, "expires": 0.0, "generation": 0}
+_subscribers = []
+_stats = {"hits": 0, "loads": 0, "invalidations": 0}
+
+
+def _cached_values():
+    """مقادیر کش شده یا None اگر کش معتبر نباشد"""
+    values = _cache["values"]
+    if values is not None and time.monotonic() < _cache["expires"]:
+        _stats["hits"] += 1
+        return values
+    return None
+
+
+def _load():
+    """بارگذاری کل جدول settings با یک کوئری"""
+    with _lock:
+        generation = _cache["generation"]
+    rows = execute_db_query("SELECT key, value FROM settings")
+    _stats["loads"] += 1
+    if rows is None:
+        # خطای دیتابیس: مقادیر پیش‌فرض بدون ذخیره در کش
+        logger.warning("خواندن جدول settings ناموفق بود - استفاده از مقادیر پیش‌فرض")
+        return {}
+    values = {row[0]: row[1] for row in rows}
+    with _lock:
+        if generation == _cache["generation"]:
+            _cache["values"] = values
+            _cache["expires"] = time.monotonic() + SETTINGS_CACHE_TTL
+    return values
+
+
+def _values():
+    values = _cached_values()
+    if values is None:
+        values = _load()
+    return values
+
+
+def _resolve(values, key, default):
+    if key in values and values[key] is not None:
+        return values[key]
+    return DEFAULTS.get(key) if default is None else default
+
+
+def to_bool(value):
+    """تبدیل مقدار متنی تنظیم به bool"""
+    return str(value).strip().lower() in _TRUE_VALUES
+
+
+def get(key, default=None):
+    """دریافت مقدار یک تنظیم
+
+    Args:
+        key (str): کلید تنظیم
+        default (str, optional): مقدار پیش‌فرض (در صورت نبود، از DEFAULTS)
+
+    Returns:
+        str: مقدار تنظیم
+    """
+    return _resolve(_values(), key, default)
+
+
+def get_bool(key, default=None):
+    """دریافت مقدار یک تنظیم به صورت bool"""
+    return to_bool(get(key, default))
+
+
+def get_many(keys):
+    """دریافت چند تنظیم با حداکثر یک مراجعه به دیتابیس
+
+    Args:
+        keys (iterable): کلیدهای تنظیمات
+
+    Returns:
+        dict: نگاشت کلید به مقدار
+    """
+    values = _values()
+    return {key: _resolve(values, key, None) for key in keys}
+
+
+_SET_QUERY = """
+    INSERT INTO settings (key, value, description, updated_at)
+    VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT(key) DO UPDATE SET
+        value=excluded.value,
+        description=COALESCE(excluded.description, settings.description),
+        updated_at=CURRENT_TIMESTAMP
+"""
+
+
+def set(key, value, description=None):
+    """ذخیره مقدار یک تنظیم و به‌روزرسانی کش
+
+    Returns:
+        bool: موفقیت عملیات
+    """
+    value = str(value)
+    result = write_queue.execute(_SET_QUERY, (key, value, description))
+    return _stored(key, value, result)
+
+
+def _stored(key, value, result):
+    """به‌روزرسانی کش پس از ثبت قطعی مقدار"""
+    if not result:
+        invalidate()
+        return False
+
+    with _lock:
+        _cache["generation"] += 1
+        if _cache["values"] is not None:
+            _cache["values"] = dict(_cache["values"], **{key: value})
+    _notify(key, value)
+    return True
+
+
+def toggle(key):
+    """معکوس کردن یک تنظیم bool
+
+    Returns:
+        bool: مقدار جدید، یا None در صورت خطا
+    """
+    new_value = not get_bool(key)
+    if not set(key, "1" if new_value else "0"):
+        return None
+    return new_value
+
+
+def invalidate(key=None):
+    """باطل کردن کش تنظیمات (پس از تغییر مستقیم جدول settings)"""
+    with _lock:
+        _cache["values"] = None
+        _cache["expires"] = 0.0
+        _cache["generation"] += 1
+    _stats["invalidations"] += 1
+    _notify(key, None)
+
+
+def subscribe(callback):
+    """ثبت تابعی که پس از هر تغییر با (key, value) فراخوانی می‌شود
+
+    در باطل‌سازی کلی، key و value برابر None هستند.
+    """
+    _subscribers.append(callback)
+    return callback
+
+
+def unsubscribe(callback):
+    """حذف تابع ثبت شده با subscribe"""
+    try:
+        _subscribers.remove(callback)
+    except ValueError:
+        pass
+
+
+def _notify(key, value):
+    for callback in list(_subscribers):
+        try:
+            callback(key, value)
+        except Exception as e:
+            logger.error(f"خطا در اطلاع‌رسانی تغییر تنظیم {key}: {e}")
+
+
+def get_stats():
+    """آمار کش تنظیمات"""
+    return dict(_stats)
+
+
+async def get_async(key, default=None):
+    """نسخه awaitable از get (در صورت معتبر بودن کش، بدون رفتن به ترد خواننده)"""
+    values = _cached_values()
+    if values is None:
+        values = await run_read(_values)
+    return _resolve(values, key, default)
+
+
+async def get_bool_async(key, default=None):
+    """نسخه awaitable از get_bool"""
+    return to_bool(await get_async(key, default))
+
+
+async def get_many_async(keys):
+    """نسخه awaitable از get_many"""
+    values = _cached_values()
+    if values is None:
+        values = await run_read(_values)
+    return {key: _resolve(values, key, None) for key in keys}
+
+
+async def set_async(key, value, description=None):
+    """نسخه awaitable از set (انتظار روی صف نوشتن بدون اشغال ترد)"""
+    value = str(value)
+    result = await write_queue.execute_async(_SET_QUERY, (key, value, description))
+    return _stored(key, value, result)
+
+
+async def toggle_async(key):
+    """نسخه awaitable از toggle"""
+    new_value = not await get_bool_async(key)
+    if not await set_async(key, "1" if new_value else "0"):
+        return None
+    return new_value
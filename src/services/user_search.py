@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+ایندکس جستجوی کاربران در حافظه
+جستجوی اینلاین با هر کاراکتری که کاربر تایپ می‌کند اجرا می‌شود. قبلاً در هر بار همه
+ردیف‌های users خوانده و در پایتون پیمایش می‌شد و برای هر نتیجه یک SELECT username
+جداگانه اجرا می‌شد. این سرویس نام و نام کاربری همه کاربران را یک بار بارگذاری و
+پس از نرمال‌سازی (ی/ي، ک/ك، نیم‌فاصله، فاصله‌های اضافی) روی n-gramهای آن‌ها ایندکس
+می‌کند؛ هر جستجو فقط چند جستجوی dict و اشتراک مجموعه است.
+"""
+
+import time
+import logging
+import threading
+
+from ..database.db_utils import execute_db_query
+from ..database.async_db import run_read
+from ..utils.text_normalize import normalize
+
+logger = logging.getLogger(__name__)
+
+# پشتیبان تغییراتی که خارج از این پردازه در جدول users انجام می‌شوند (ثانیه)
+USER_SEARCH_CACHE_TTL = 300
+# بیشترین طول n-gram ایندکس شده؛ عبارت‌های بلندتر با اشتراک n-gramها و بررسی نهایی پیدا می‌شوند
+MAX_GRAM = 3
+
+_lock = threading.Lock()
+# index: {"entries": [(user_id, name, username, name_key, username_key)], "grams": {gram: set(positions)}}
+_cache = {"index": None, "expires": 0.0, "generation": 0}
+_stats = {"hits": 0, "loads": 0, "invalidations": 0, "searches": 0}
+
+
+def _grams(key):
+    """همه n-gramهای یک کلید تا طول MAX_GRAM"""
+    grams = set()
+    length = len(key)
+    for size in range(1, MAX_GRAM + 1):
+        for start in range(length - size + 1):
+            grams.add(key[start:start + size])
+    return grams
+
+
+def _build(rows):
+    """ساخت ایندکس از ردیف‌های (user_id, name, username)؛ ترتیب بر اساس نام نرمال شده"""
+    entries = []
+    for user_id, name, username in rows:
+        name = (name or "").strip()
+        username = (username or "").strip().lstrip("@")
+        entries.append((user_id, name, username or None, normalize(name), normalize(username)))
+    entries.sort(key=lambda e: (e[3], e[0]))
+
+    grams = {}
+    for position, entry in enumerate(entries):
+        for gram in _grams(entry[3]) | _grams(entry[4]):
+            grams.setdefault(gram, set()).add(position)
+    return {"entries": entries, "grams": grams}
+
+
+def _cached_index():
+    index = _cache["index"]
+    if index is not None and time.monotonic() < _cache["expires"]:
+        _stats["hits"] += 1
+        return index
+    return None
+
+
+def _load():
+    """بارگذاری نام و نام کاربری همه کاربران با یک کوئری و ساخت ایندکس"""
+    with _lock:
+        generation = _cache["generation"]
+    rows = execute_db_query("SELECT user_id, name, username FROM users")
+    _stats["loads"] += 1
+    if rows is None:
+        logger.warning("خواندن جدول users برای ایندکس جستجو ناموفق بود")
+        return _build([])
+    index = _build(rows)
+    with _lock:
+        if generation == _cache["generation"]:
+            _cache["index"] = index
+            _cache["expires"] = time.monotonic() + USER_SEARCH_CACHE_TTL
+    logger.debug(f"ایندکس جستجوی کاربران با {len(index['entries'])} کاربر ساخته شد")
+    return index
+
+
+def _index():
+    index = _cached_index()
+    if index is None:
+        index = _load()
+    return index
+
+
+def _search_index(index, query, limit, exclude_id):
+    key = normalize(query).lstrip("@")
+    if not key:
+        return []
+    _stats["searches"] += 1
+
+    grams = index["grams"]
+    if len(key) <= MAX_GRAM:
+        positions = grams.get(key, ())
+    else:
+        candidates = [grams.get(key[i:i + MAX_GRAM]) for i in range(len(key) - MAX_GRAM + 1)]
+        if not all(candidates):
+            return []
+        candidates.sort(key=len)
+        positions = set.intersection(*candidates)
+
+    entries = index["entries"]
+    prefix_matches = []
+    other_matches = []
+    for position in sorted(positions):
+        user_id, name, username, name_key, username_key = entries[position]
+        if user_id == exclude_id:
+            continue
+        # n-gramها فقط کاندید هستند؛ برای عبارت‌های بلندتر از MAX_GRAM بررسی نهایی لازم است
+        if key not in name_key and key not in username_key:
+            continue
+        if name_key.startswith(key) or f" {key}" in name_key or username_key.startswith(key):
+            prefix_matches.append((user_id, name, username))
+            if len(prefix_matches) >= limit:
+                break
+        elif len(other_matches) < limit:
+            other_matches.append((user_id, name, username))
+    return (prefix_matches + other_matches)[:limit]
+
+
+def search(query, limit=10, exclude_id=None):
+    """جستجوی کاربران بر اساس نام یا نام کاربری
+
+    ابتدا کاربرانی که نام (یا یکی از کلمات نام) یا نام کاربری‌شان با عبارت شروع می‌شود و
+    سپس سایر کاربرانی که عبارت در نامشان هست، هر گروه به ترتیب نام.
+
+    Args:
+        query (str): متن جستجو
+        limit (int): حداکثر تعداد نتایج
+        exclude_id (int, optional): شناسه کاربری که از نتایج حذف می‌شود
+
+    Returns:
+        list: لیست (user_id, name, username)
+    """
+    return _search_index(_index(), query, limit, exclude_id)
+
+
+async def search_async(query, limit=10, exclude_id=None):
+    """نسخه awaitable از search (در صورت معتبر بودن ایندکس، بدون رفتن به ترد خواننده)"""
+    index = _cached_index()
+    if index is None:
+        index = await run_read(_index)
+    return _search_index(index, query, limit, exclude_id)
+
+
+def invalidate():
+    """باطل کردن ایندکس (پس از افزودن یا تایید کاربر، یا تغییر نام)"""
+    with _lock:
+        _cache["index"] = None
+        _cache["expires"] = 0.0
+        _cache["generation"] += 1
+    _stats["invalidations"] += 1
+
+
+def get_stats():
+    """آمار ایندکس جستجوی کاربران"""
+    stats = dict(_stats)
+    index = _cache["index"]
+    stats["users"] = len(index["entries"]) if index else 0
+    stats["grams"] = len(index["grams"]) if index else 0
+    return stats
@@ -3,29 +3,14 @@
 """
 import logging
 from ..database.db_utils import get_db_connection
+from ..database import season_totals
+from ..services import rank_service
 
 logger = logging.getLogger(__name__)
 
 def get_season_scoreboard(season_id):
-    """دریافت تابلوی امتیازات یک فصل خاص"""
-    conn = get_db_connection()
-    try:
-        c = conn.cursor()
-        c.execute("""
-            SELECT touser, SUM(amount) as total, u.name 
-            FROM transactions t 
-            LEFT JOIN users u ON t.touser = u.user_id 
-            WHERE t.season_id=?
-            GROUP BY touser 
-            ORDER BY total DESC LIMIT 10
-        """, (season_id,))
-        return c.fetchall()
-    except Exception as e:
-        logger.error(f"خطا در دریافت تابلوی امتیازات: {e}")
-        return []
-    finally:
-        if conn:
-            conn.close()
+    """دریافت تابلوی امتیازات یک فصل خاص (از جدول تجمیعی season_totals)"""
+    return season_totals.get_season_leaderboard(season_id)
 
 def get_user_season_stats(user_id, season_id):
     """دریافت آمار کاربر در یک فصل خاص"""
@@ -36,54 +21,25 @@ def get_user_season_stats(user_id, season_id):
         'given_amount': 0,
         'top_votes': [],
         'rank': 0,
-        'total_users': 0
+        'total_users': 0,
+        'percentile': 0
     }
     
     conn = get_db_connection()
     try:
         c = conn.cursor()
         
-        # دریافت آمار تراکنش‌های دریافتی
-        c.execute("""
-            SELECT COUNT(*), SUM(amount)
-            FROM transactions
-            WHERE touser=? AND season_id=?
-        """, (user_id, season_id))
-        result = c.fetchone()
-        if result:
-            stats['received_count'] = result[0] or 0
-            stats['received_amount'] = result[1] or 0
-        
-        # دریافت آمار تراکنش‌های داده شده
-        c.execute("""
-            SELECT COUNT(*), SUM(amount)
-            FROM transactions
-            WHERE user_id=? AND season_id=?
-        """, (user_id, season_id))
-        result = c.fetchone()
-        if result:
-            stats['given_count'] = result[0] or 0
-            stats['given_amount'] = result[1] or 0
+        # آمار تراکنش‌های دریافتی و داده شده از جدول تجمیعی season_totals
+        received, given, received_count, given_count = season_totals.get_user_totals(user_id, season_id, conn)
+        stats['received_count'] = received_count
+        stats['received_amount'] = received
+        stats['given_count'] = given_count
+        stats['given_amount'] = given
         
-        # دریافت رتبه کاربر در فصل
-        c.execute("""
-            WITH UserRanks AS (
-                SELECT 
-                    touser, 
-                    SUM(amount) as total,
-                    RANK() OVER (ORDER BY SUM(amount) DESC) as rank
-                FROM transactions 
-                WHERE season_id=?
-                GROUP BY touser
-            )
-            SELECT rank, (SELECT COUNT(DISTINCT touser) FROM transactions WHERE season_id=?)
-            FROM UserRanks 
-            WHERE touser=?
-        """, (season_id, season_id, user_id))
-        rank_result = c.fetchone()
-        if rank_result:
-            stats['rank'] = rank_result[0]
-            stats['total_users'] = rank_result[1]
+        # رتبه از رتبه‌بندی زنده فصل در حافظه
+        rank = rank_service.get_rank(user_id, season_id)
+        if rank:
+            stats['rank'], stats['total_users'], stats['percentile'] = rank.rank, rank.total, rank.percentile
         
         # دریافت آمار ترین‌های کاربر
         c.execute("""
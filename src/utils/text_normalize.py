@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+نرمال‌سازی متن فارسی برای جستجو
+یک فهرست جایگزینی مشترک هم در پایتون (ایندکس حافظه و عبارت جستجو) و هم در SQL
+(تریگرهای جدول‌های FTS) استفاده می‌شود تا متن ذخیره شده و عبارت جستجو یکسان باشند.
+"""
+
+import re
+
+# (حرف، جایگزین): یکسان‌سازی حروف عربی و فارسی و حذف نیم‌فاصله، کشیده و اعراب
+REPLACEMENTS = (
+    ("ي", "ی"),
+    ("ى", "ی"),
+    ("ئ", "ی"),
+    ("ك", "ک"),
+    ("ۀ", "ه"),
+    ("ة", "ه"),
+    ("أ", "ا"),
+    ("إ", "ا"),
+    ("آ", "ا"),
+    ("\u200c", ""),  # نیم‌فاصله (ZWNJ)
+    ("\u200d", ""),  # ZWJ
+    ("\u0640", ""),  # کشیده
+) + tuple((chr(code), "") for code in range(0x064B, 0x0653)) + (
+    ("\u0670", ""),  # الف کوچک بالای حرف
+)
+
+_CHAR_MAP = str.maketrans(dict(REPLACEMENTS))
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(text):
+    """نرمال‌سازی متن برای جستجو (حروف عربی/فارسی، نیم‌فاصله، اعراب، فاصله و حروف بزرگ)"""
+    if not text:
+        return ""
+    return _SPACES.sub(" ", text.translate(_CHAR_MAP)).strip().casefold()
+
+
+def sql_normalize(expression):
+    """عبارت SQL معادل normalize با replace() تو در تو (برای تریگرها)
+
+    فاصله‌ها و حروف بزرگ را توکنایزر FTS خودش یکسان می‌کند.
+    """
+    for source, target in REPLACEMENTS:
+        expression = f"replace({expression}, '{source}', '{target}')"
+    return expression
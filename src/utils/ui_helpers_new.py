@@ -2,6 +2,8 @@
 
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 from src.database.db_utils import get_active_season, execute_db_query
+from src.services import settings
+from src.services import permissions
 import config
 
 def main_menu_keyboard(user_id=None):
@@ -40,12 +42,14 @@ def main_menu_keyboard(user_id=None):
         else:
             keyboard.append([InlineKeyboardButton(f"🏆 ترین‌های {season_name}!", callback_data="top_vote^")])
     
-    # بررسی وضعیت فعال/غیرفعال بودن قابلیت‌های هوش مصنوعی
-    ai_features_enabled = execute_db_query("SELECT value FROM settings WHERE key='ai_features_enabled'", fetchone=True)
-    ai_features_enabled = ai_features_enabled[0] if ai_features_enabled else "1"  # پیش‌فرض: فعال
+    # بررسی وضعیت فعال/غیرفعال بودن قابلیت‌های هوش مصنوعی (از کش تنظیمات)
+    ai_features_enabled = settings.get_bool("ai_features_enabled")
+    
+    # نقش کاربر یک بار از کش سرویس دسترسی‌ها
+    admin = permissions.get_admin(user_id) if user_id else None
     
     # فقط اگر قابلیت‌های هوش مصنوعی فعال باشند یا کاربر ادمین باشد، دکمه را نمایش بده
-    if ai_features_enabled == "1" or (user_id and execute_db_query("SELECT role FROM admins WHERE user_id=?", (user_id,), fetchone=True)):
+    if ai_features_enabled or admin:
         keyboard.append([InlineKeyboardButton("🤖 دستیار هوشمند", callback_data="ai_chat^")])
     
     keyboard += [
@@ -54,12 +58,10 @@ def main_menu_keyboard(user_id=None):
     ]
     
     # اضافه کردن دکمه پنل ادمین برای کاربران ادمین
-    if user_id:
-        admin_result = execute_db_query("SELECT role, permissions FROM admins WHERE user_id=?", (user_id,), fetchone=True)
-        if admin_result:
-            role, permissions = admin_result
-            if role == 'god' or permissions:
-                keyboard.append([InlineKeyboardButton("👑 پنل ادمین", callback_data="admin_panel^")])
+    if admin:
+        role, admin_permissions = admin
+        if role == 'god' or admin_permissions:
+            keyboard.append([InlineKeyboardButton("👑 پنل ادمین", callback_data="admin_panel^")])
     
     return InlineKeyboardMarkup(keyboard)
 
@@ -87,31 +89,22 @@ def create_user_list_keyboard(users, callback_prefix, back_button="userpanel^"):
 
 def create_admin_panel_keyboard(user_id):
     """ایجاد کیبورد پنل ادمین"""
-    # لیست دسترسی‌های ادمین
-    ADMIN_PERMISSIONS = [
-        ("admin_users", "مدیریت کاربران"),
-        ("admin_transactions", "مدیریت تراکنش"),
-        ("admin_stats", "آمار و گزارشات"),
-        ("manage_admins", "مدیریت ادمین‌ها"),
-        ("manage_questions", "مدیریت سوالات ترین‌ها"),
-    ]
-    
-    admin_result = execute_db_query("SELECT role, permissions FROM admins WHERE user_id=?", (user_id,), fetchone=True)
-    if not admin_result:
+    admin = permissions.get_admin(user_id)
+    if not admin:
         return None
     
-    role, permissions = admin_result
-    allowed = []
-    if role == 'god':
-        allowed = [p[0] for p in ADMIN_PERMISSIONS]
-    elif permissions:
-        allowed = [p.strip() for p in permissions.split(",") if p.strip()]
+    # مجموعه دسترسی‌ها (برای god همه دسترسی‌ها)
+    allowed = admin[1]
+    
+    # همه تنظیمات مورد نیاز این کیبورد با یک بار خواندن از کش
+    current_settings = settings.get_many(("show_all_users", "ai_features_enabled"))
     
     keyboard = []
     if "admin_users" in allowed:
         keyboard.append([InlineKeyboardButton("👥 مدیریت کاربران", callback_data="admin_users^")])
     if "admin_transactions" in allowed:
         keyboard.append([InlineKeyboardButton("💰 مدیریت تراکنش‌ها", callback_data="admin_transactions^")])
+        keyboard.append([InlineKeyboardButton("🔎 جستجوی تراکنش‌ها", callback_data="admin_search^")])
     if "admin_stats" in allowed:
         keyboard.append([InlineKeyboardButton("📊 آمار و گزارشات", callback_data="admin_stats^")])
     if "manage_admins" in allowed:
@@ -127,17 +120,15 @@ def create_admin_panel_keyboard(user_id):
     # اضافه کردن گزینه تنظیمات نمایش کاربران
     if "admin_users" in allowed:
         # بررسی وضعیت فعلی نمایش لیست کاربران
-        show_all_users = execute_db_query("SELECT value FROM settings WHERE key='show_all_users'", fetchone=True)
-        show_all_users = show_all_users[0] if show_all_users else "0"
-        button_text = "🔄 غیرفعال کردن نمایش کاربران" if show_all_users == "1" else "🔄 فعال کردن نمایش کاربران"
+        show_all_users = settings.to_bool(current_settings["show_all_users"])
+        button_text = "🔄 غیرفعال کردن نمایش کاربران" if show_all_users else "🔄 فعال کردن نمایش کاربران"
         keyboard.append([InlineKeyboardButton(button_text, callback_data="toggle_show_users^")])
     
     # اضافه کردن گزینه فعال/غیرفعال کردن قابلیت‌های هوش مصنوعی
     if "admin_stats" in allowed:
         # بررسی وضعیت فعلی قابلیت‌های هوش مصنوعی
-        ai_features_enabled = execute_db_query("SELECT value FROM settings WHERE key='ai_features_enabled'", fetchone=True)
-        ai_features_enabled = ai_features_enabled[0] if ai_features_enabled else "1"  # پیش‌فرض: فعال
-        button_text = "🤖 غیرفعال کردن هوش مصنوعی" if ai_features_enabled == "1" else "🤖 فعال کردن هوش مصنوعی"
+        ai_features_enabled = settings.to_bool(current_settings["ai_features_enabled"])
+        button_text = "🤖 غیرفعال کردن هوش مصنوعی" if ai_features_enabled else "🤖 فعال کردن هوش مصنوعی"
         keyboard.append([InlineKeyboardButton(button_text, callback_data="toggle_ai_features^")])
     
     keyboard.append([InlineKeyboardButton("» بازگشت به منوی اصلی", callback_data="userpanel^")])
@@ -0,0 +1,117 @@
+"""
+تست مدارشکن سرویس‌های هوش مصنوعی: باز شدن پس از خطاهای پشت سر هم، رد فوری، آزمایش نیمه‌باز،
+انتخاب سرویس سالم‌تر و نمایش پاسخ قبلی وقتی هیچ سرویسی پاسخ نمی‌دهد
+"""
+import os
+import time
+import asyncio
+import tempfile
+
+import config
+
+# دیتابیس موقت پیش از import ماژول‌های دیتابیس
+config.DB_PATH = os.path.join(tempfile.mkdtemp(), "ai_breaker_test.db")
+
+CALLER = "breaker-test"
+
+
+def test_ai_breaker():
+    from src.database.migrator import ensure_schema
+    from src.services import ai
+
+    ensure_schema()
+    backoff_delay = ai.backoff_delay
+    ai.backoff_delay = lambda attempt: 0.0
+    try:
+        _check_breaker(ai)
+        _check_routing(ai)
+        _check_degraded_answer(ai)
+    finally:
+        ai.backoff_delay = backoff_delay
+        ai.reset_breakers()
+    print("✅ تست مدارشکن هوش مصنوعی موفق بود")
+
+
+def _check_breaker(ai):
+    model = ai.FakeAIModel(failures=100, name="breaker-a")
+    model.breaker.threshold = 4
+    model.breaker.cooldown = model.breaker.base_cooldown = 0.05
+
+    # دو فراخوانی با سه تلاش: مدار پس از خطای چهارم باز می‌شود و تلاش بعدی اصلاً ارسال نمی‌شود
+    assert not model.respond("سلام", None, caller=CALLER)[1]
+    text, ok = model.respond("سلام", None, caller=CALLER)
+    assert not ok and "موقتاً در دسترس نیست" in text
+    assert len(model.calls) == 4 and model.breaker.state == ai.CircuitBreaker.OPEN
+
+    # مدار باز: رد فوری بدون تماس با سرویس
+    started = time.monotonic()
+    text, ok = asyncio.run(model.respond_async("سلام", None, caller=CALLER))
+    assert not ok and len(model.calls) == 4 and time.monotonic() - started < 0.05
+    assert model.breaker.snapshot()["rejected"] >= 2
+
+    # نیمه‌باز: فقط یک درخواست آزمایشی؛ شکست آن مدار را با cooldown دو برابر باز می‌کند
+    time.sleep(0.06)
+    assert model.breaker.available()
+    assert model.breaker.allow() and not model.breaker.allow() and not model.breaker.available()
+    model.breaker.record_failure(RuntimeError("503 overloaded"))
+    assert model.breaker.state == ai.CircuitBreaker.OPEN and abs(model.breaker.cooldown - 0.1) < 1e-9
+
+    # موفقیت آزمایش مدار را می‌بندد و cooldown را برمی‌گرداند
+    time.sleep(0.11)
+    model.failures = 0
+    assert model.respond("سلام", None, caller=CALLER)[1]
+    assert model.breaker.state == ai.CircuitBreaker.CLOSED and model.breaker.cooldown == 0.05
+
+    # خطای غیرگذرا (مثلاً کلید نامعتبر) مدار را باز نمی‌کند
+    invalid = ai.FakeAIModel(failures=10, error=ValueError("invalid api key"), name="breaker-b")
+    for _ in range(10):
+        assert not invalid.respond("سلام", None, caller=CALLER)[1]
+    assert invalid.breaker.state == ai.CircuitBreaker.CLOSED and len(invalid.calls) == 10
+
+
+def _check_routing(ai):
+    backup = ai.FakeAIModel(responses=["پاسخ پشتیبان"] * 10, name="breaker-backup")
+    primary = ai.FakeAIModel(responses=["پاسخ اصلی"] * 10, fallback=backup, name="breaker-primary")
+    assert ai.route([primary, backup]) == [primary, backup]
+
+    # اختلاف کم سلامت: اصلی همچنان ترجیح دارد
+    primary.breaker.health = 0.9
+    assert primary.respond("سلام", None, caller=CALLER) == ("پاسخ اصلی", True)
+
+    # سلامت اصلی به طور محسوس کمتر: ابتدا پشتیبان
+    primary.breaker.health = 0.3
+    assert primary.respond("سلام", None, caller=CALLER) == ("پاسخ پشتیبان", True)
+
+    # مدار اصلی باز: پشتیبان بدون تماس با اصلی
+    primary.breaker.health = 1.0
+    primary.breaker.failures = primary.breaker.threshold
+    primary.breaker._open()
+    calls = len(primary.calls)
+    text, ok = asyncio.run(primary.respond_async("سلام", None, caller=CALLER))
+    assert (text, ok) == ("پاسخ پشتیبان", True) and len(primary.calls) == calls
+
+    # هر دو ناموفق: پیام خطا به همراه اطلاع از شکست پشتیبان
+    backup.failures = 100
+    text, ok = primary.respond("سلام", None, caller=CALLER)
+    assert not ok and "مدل پشتیبان" in text
+
+
+def _check_degraded_answer(ai):
+    failing = ai.FakeAIModel(failures=100, name="breaker-degraded")
+    get_ai_model = ai.get_ai_model
+    ai.get_ai_model = lambda model_type="gemini": failing
+    try:
+        request = ai.AIRequest("پرامپت مدارشکن", "سیستم", cache=False, fallback="پاسخ قبلی", postprocess=str.strip)
+        assert ai._complete(request) == "پاسخ قبلی"
+        text, ok, _ = asyncio.run(ai._execute_async(request))
+        assert text == "پاسخ قبلی" and not ok
+
+        # بدون پاسخ قبلی پیام خطا برمی‌گردد
+        text = ai._complete(request._replace(fallback=None))
+        assert "پاسخ قبلی" not in text and "موقتاً در دسترس نیست" in text
+    finally:
+        ai.get_ai_model = get_ai_model
+
+
+if __name__ == "__main__":
+    test_ai_breaker()
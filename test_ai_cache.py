@@ -0,0 +1,125 @@
+"""
+تست کش پاسخ‌های هوش مصنوعی: اثر انگشت ورودی‌ها، LRU، انقضا و عدم فراخوانی مدل برای داده بدون تغییر
+"""
+import os
+import asyncio
+import time
+import tempfile
+
+import config
+
+# دیتابیس موقت پیش از import ماژول‌های دیتابیس
+config.DB_PATH = os.path.join(tempfile.mkdtemp(), "ai_cache_test.db")
+
+USER = 7201
+GIVER = 7202
+SEASON = 9601
+
+
+def test_ai_cache():
+    from src.database.migrator import ensure_schema
+    from src.database.db_utils import execute_db_query
+    from src.services import ai, ai_cache
+
+    ensure_schema()
+
+    # فاصله‌گذاری و شکل عربی نویسه‌ها اثر انگشت را تغییر نمی‌دهد
+    key = ai_cache.fingerprint("fake:", "سیستم", "  امتیاز از علي\n\n  به دلیل کمک ")
+    assert key == ai_cache.fingerprint("fake:", "سیستم", "امتیاز از علی\nبه دلیل  کمک")
+    assert key != ai_cache.fingerprint("gemini:x", "سیستم", "امتیاز از علی\nبه دلیل کمک")
+
+    assert ai_cache.get(key) is None
+    ai_cache.put(key, "fake:", "پاسخ")
+    assert ai_cache.get(key) == "پاسخ"
+    # پس از پاک شدن حافظه از جدول خوانده می‌شود
+    ai_cache._entries.clear()
+    assert ai_cache.get(key) == "پاسخ"
+    stats = ai_cache.get_stats()
+    assert stats["memory_hits"] >= 1 and stats["db_hits"] >= 1 and stats["misses"] >= 1
+
+    # LRU حافظه: قدیمی‌ترین مورد استفاده نشده حذف می‌شود
+    memory_entries, ttl = ai_cache.AI_CACHE_MEMORY_ENTRIES, ai_cache.AI_CACHE_TTL
+    ai_cache.AI_CACHE_MEMORY_ENTRIES = 2
+    try:
+        for name in ("a", "b"):
+            ai_cache.put(f"lru-{name}", "fake:", name)
+        ai_cache.get("lru-a")
+        ai_cache.put("lru-c", "fake:", "c")
+        assert list(ai_cache._entries) == ["lru-a", "lru-c"]
+
+        # انقضا: پاسخ قدیمی‌تر از TTL نه از حافظه و نه از جدول برگردانده می‌شود
+        execute_db_query(
+            "UPDATE ai_response_cache SET created_at = ? WHERE fingerprint = 'lru-a'",
+            (int(time.time()) - 100,), commit=True
+        )
+        ai_cache._entries["lru-a"] = ("a", int(time.time()) - 100)
+        ai_cache.AI_CACHE_TTL = 50
+        assert ai_cache.get("lru-a") is None and "lru-a" not in ai_cache._entries
+    finally:
+        ai_cache.AI_CACHE_MEMORY_ENTRIES, ai_cache.AI_CACHE_TTL = memory_entries, ttl
+
+    # داده بدون تغییر دوباره به مدل فرستاده نمی‌شود
+    execute_db_query(
+        "INSERT INTO users (user_id, name) VALUES (?, 'کاربر کش'), (?, 'دهنده کش')", (USER, GIVER), commit=True
+    )
+    execute_db_query(
+        "INSERT INTO transactions (user_id, touser, amount, season_id, reason) VALUES (?, ?, 2, ?, 'ai-cache-test')",
+        (GIVER, USER, SEASON), commit=True
+    )
+    model = ai.FakeAIModel()
+    get_ai_model = ai.get_ai_model
+    ai.get_ai_model = lambda model_type="gemini": model
+    try:
+        first = ai.get_user_perspective(USER, SEASON, force_update=True)
+        assert ai.get_user_perspective(USER, SEASON, force_update=True) == first
+        assert len(model.calls) == 1
+        # امتیاز جدید ورودی را تغییر می‌دهد و پاسخ تازه گرفته می‌شود
+        execute_db_query(
+            "INSERT INTO transactions (user_id, touser, amount, season_id, reason) VALUES (?, ?, 1, ?, 'ai-cache-new')",
+            (GIVER, USER, SEASON), commit=True
+        )
+        ai.get_user_perspective(USER, SEASON, force_update=True)
+        assert len(model.calls) == 2
+
+        # پاسخ ناموفق در کش نمی‌ماند و ذخیره نمی‌شود
+        failing = ai.FakeAIModel(failures=1, error=ValueError("invalid api key"))
+        ai.get_ai_model = lambda model_type="gemini": failing
+        assert ai.analyze_admin_data(SEASON).startswith("متأسفانه")
+        assert ai.analyze_admin_data(SEASON).startswith("پاسخ آزمایشی")
+
+        # پاسخ مدل پشتیبان با شناسه خودش نگه داشته می‌شود، نه به نام مدل اصلی
+        backup = ai.FakeAIModel(responses=["پاسخ پشتیبان کش"], name="cache-backup")
+        primary = ai.FakeAIModel(failures=100, fallback=backup, name="cache-primary")
+        ai.get_ai_model = lambda model_type="gemini": primary
+        assert ai.improve_reason_text(GIVER, "ai-cache-fallback", "کاربر کش", 1) == "پاسخ پشتیبان کش"
+        models = [row[0] for row in execute_db_query("SELECT model FROM ai_response_cache")]
+        assert "cache-backup:" in models and "cache-primary:" not in models
+
+        # تکرار همان درخواست در زمان قطعی سرویس اصلی از کش پاسخ داده می‌شود (همگام و ناهمگام)
+        calls = (len(primary.calls), len(backup.calls))
+        before = ai_cache.get_stats()
+        assert ai.improve_reason_text(GIVER, "ai-cache-fallback", "کاربر کش", 1) == "پاسخ پشتیبان کش"
+        assert asyncio.run(
+            ai.improve_reason_text_async(GIVER, "ai-cache-fallback", "کاربر کش", 1)
+        ) == "پاسخ پشتیبان کش"
+        after = ai_cache.get_stats()
+        assert (len(primary.calls), len(backup.calls)) == calls
+        assert after["memory_hits"] + after["db_hits"] == before["memory_hits"] + before["db_hits"] + 2
+        assert (after["misses"], after["stores"]) == (before["misses"], before["stores"])
+
+        # پاسخ پشتیبان پس از بازگشت سرویس اصلی هم برای داده بدون تغییر استفاده می‌شود
+        primary.failures = 0
+        primary.breaker.health = 1.0
+        assert ai.improve_reason_text(GIVER, "ai-cache-fallback", "کاربر کش", 1) == "پاسخ پشتیبان کش"
+        assert (len(primary.calls), len(backup.calls)) == calls
+    finally:
+        ai.get_ai_model = get_ai_model
+
+    stats = ai_cache.get_stats()
+    assert 0 < stats["hit_rate"] < 100
+    print(f"آمار کش پاسخ‌های هوش مصنوعی: {stats}")
+    print("✅ تست کش پاسخ‌های هوش مصنوعی موفق بود")
+
+
+if __name__ == "__main__":
+    test_ai_cache()
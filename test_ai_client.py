@@ -0,0 +1,119 @@
+"""
+تست لایه ناهمگام هوش مصنوعی با پشتیبان آفلاین: تلاش دوباره، timeout، لغو و محدودیت همزمانی
+"""
+import os
+import time
+import asyncio
+import tempfile
+
+import config
+
+# دیتابیس موقت پیش از import ماژول‌های دیتابیس
+config.DB_PATH = os.path.join(tempfile.mkdtemp(), "ai_client_test.db")
+
+USER = 7001
+SEASON = 9401
+
+
+def test_ai_client():
+    from src.services import ai
+
+    # تأخیر بین تلاش‌ها در تست کوتاه می‌شود
+    backoff_delay, request_timeout = ai.backoff_delay, ai.AI_REQUEST_TIMEOUT
+    ai.backoff_delay = lambda attempt: 0.01
+    try:
+        asyncio.run(_check_model(ai))
+    finally:
+        ai.backoff_delay, ai.AI_REQUEST_TIMEOUT = backoff_delay, request_timeout
+
+    # تأخیر نمایی با jitter در بازه [0, min(cap, base * 2^attempt)]
+    for attempt in range(6):
+        assert 0 <= backoff_delay(attempt) <= min(ai.AI_BACKOFF_MAX, ai.AI_BACKOFF_BASE * 2 ** attempt)
+
+    print("✅ تست لایه ناهمگام هوش مصنوعی موفق بود")
+
+
+async def _check_model(ai):
+    # خطای گذرا: تلاش دوباره تا موفقیت
+    model = ai.FakeAIModel(responses=["سلام"], failures=2)
+    assert await model.get_completion_async("test") == "سلام"
+    assert len(model.calls) == 3
+    # مسیر همگام همان رفتار را دارد
+    model = ai.FakeAIModel(responses=["سلام"], failures=1)
+    assert model.get_completion("test") == "سلام" and len(model.calls) == 2
+
+    # خطای غیرگذرا: بدون تلاش دوباره
+    model = ai.FakeAIModel(failures=5, error=ValueError("invalid api key"))
+    assert (await model.get_completion_async("test")).startswith("متأسفانه")
+    assert len(model.calls) == 1
+
+    # timeout هر درخواست
+    ai.AI_REQUEST_TIMEOUT = 0.05
+    model = ai.FakeAIModel(delay=5)
+    started = time.monotonic()
+    assert (await model.get_completion_async("test")).startswith("متأسفانه")
+    assert time.monotonic() - started < 1
+    ai.AI_REQUEST_TIMEOUT = 5
+
+    # لغو task درخواست در جریان را هم لغو می‌کند
+    model = ai.FakeAIModel(delay=5)
+    task = asyncio.create_task(model.get_completion_async("test"))
+    await asyncio.sleep(0.05)
+    task.cancel()
+    try:
+        await task
+        assert False, "درخواست لغو نشد"
+    except asyncio.CancelledError:
+        pass
+    assert model.calls == []
+
+    # محدودیت تعداد درخواست‌های همزمان
+    class CountingModel(ai.FakeAIModel):
+        active = peak = 0
+
+        async def _request_async(self, messages):
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            try:
+                return await super()._request_async(messages)
+            finally:
+                self.active -= 1
+
+    model = CountingModel(delay=0.05)
+    results = await asyncio.gather(*(model.get_completion_async(f"q{i}") for i in range(12)))
+    assert len(results) == 12 and model.peak == ai.AI_MAX_CONCURRENCY
+
+    # قابلیت کامل با پشتیبان آفلاین: ساخت، ذخیره و استفاده دوباره از زاویه دید
+    await _check_feature(ai)
+
+
+async def _check_feature(ai):
+    from src.database.migrator import ensure_schema
+    from src.database.db_utils import execute_db_query
+
+    ensure_schema()
+    execute_db_query("INSERT INTO users (user_id, name) VALUES (?, 'کاربر تست')", (USER,), commit=True)
+    execute_db_query(
+        "INSERT INTO transactions (user_id, touser, amount, season_id, reason) VALUES (?, ?, 3, ?, 'ai-client-test')",
+        (USER, USER, SEASON), commit=True
+    )
+    backend = getattr(config, "AI_BACKEND", None)
+    config.AI_BACKEND = "fake"
+    try:
+        perspective = await ai.get_user_perspective_async(USER, SEASON)
+        assert perspective.startswith("پاسخ آزمایشی")
+        stored = execute_db_query(
+            "SELECT perspective FROM user_perspectives WHERE user_id = ? AND season_id = ?",
+            (USER, SEASON), fetchone=True
+        )
+        assert stored[0] == perspective
+        # دیدگاه ذخیره شده بدون درخواست دوباره برگردانده می‌شود
+        execute_db_query("UPDATE user_perspectives SET perspective = 'کش' WHERE user_id = ?", (USER,), commit=True)
+        assert await ai.get_user_perspective_async(USER, SEASON) == "کش"
+        assert (await ai.improve_reason_text_async(USER, "ممنون", "کاربر تست", 2)).startswith("پاسخ آزمایشی")
+    finally:
+        config.AI_BACKEND = backend
+
+
+if __name__ == "__main__":
+    test_ai_client()
@@ -0,0 +1,72 @@
+"""
+تست نمونه‌های مشترک مدل‌های هوش مصنوعی: یک نمونه برای هر سرویس در کل فرایند، کلاینت‌های
+دوباره استفاده شده و بستن آن‌ها هنگام خاموش شدن
+"""
+import os
+import asyncio
+import tempfile
+import threading
+
+import config
+
+# دیتابیس موقت پیش از import ماژول‌های دیتابیس
+config.DB_PATH = os.path.join(tempfile.mkdtemp(), "ai_clients_test.db")
+
+
+def test_ai_clients():
+    from src.services import ai
+
+    created = []
+    closed = []
+
+    class CountedModel(ai.FakeAIModel):
+        def __init__(self):
+            super().__init__(name="clients-test")
+            created.append(self)
+
+        async def aclose(self):
+            closed.append(self)
+
+    # فراخوانی همزمان از چند ترد فقط یک نمونه می‌سازد
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(ai._shared_model("clients-test", CountedModel)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(created) == 1 and all(model is created[0] for model in results)
+
+    # بستن کلاینت‌ها: نمونه بسته و از فهرست مشترک حذف می‌شود
+    asyncio.run(ai.close_clients())
+    assert closed == created
+    assert ai._shared_model("clients-test", CountedModel) is created[1]
+    asyncio.run(ai.close_clients())
+
+    if ai.OpenAI is not None:
+        _check_openai_clients(ai)
+    print("✅ تست نمونه‌های مشترک هوش مصنوعی موفق بود")
+
+
+def _check_openai_clients(ai):
+    """کلاینت همگام یک بار و کلاینت ناهمگام یک بار برای هر حلقه ساخته می‌شود"""
+    model = ai.get_ai_model("gemini")
+    assert model is ai.get_ai_model("gemini") and model.client is model.client
+
+    async def async_clients():
+        return model.async_client, model.async_client
+
+    first, second = asyncio.run(async_clients())
+    assert first is second
+    other, _ = asyncio.run(async_clients())
+    assert other is not first
+
+    asyncio.run(ai.close_clients())
+    assert ai.get_ai_model("gemini") is not model
+    asyncio.run(ai.close_clients())
+
+
+if __name__ == "__main__":
+    test_ai_clients()
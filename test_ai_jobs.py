@@ -0,0 +1,135 @@
+"""
+تست صف پایدار کارهای هوش مصنوعی: ادغام درخواست‌های تکراری، اعلام نتیجه، ادامه کارهای نیمه‌تمام
+و تلاش دوباره و ثبت شکست وقتی مدل پاسخ نمی‌دهد
+"""
+import os
+import asyncio
+import tempfile
+
+import config
+
+# دیتابیس موقت پیش از import ماژول‌های دیتابیس
+config.DB_PATH = os.path.join(tempfile.mkdtemp(), "ai_jobs_test.db")
+
+USER = 7101
+OTHER = 7102
+SEASON = 9501
+FAILING_SEASON = 9502
+
+
+def test_ai_jobs():
+    from src.database.migrator import ensure_schema
+    from src.database.db_utils import execute_db_query
+    from src.services import ai, ai_jobs
+
+    ensure_schema()
+    execute_db_query(
+        "INSERT INTO users (user_id, name) VALUES (?, 'کاربر صف'), (?, 'کاربر دوم')", (USER, OTHER), commit=True
+    )
+    # کار نیمه‌تمام از اجرای قبلی ربات
+    execute_db_query(
+        "INSERT INTO ai_jobs (kind, user_id, season_id, status, attempts) VALUES ('profile', ?, 0, 'running', 1)",
+        (OTHER,), commit=True
+    )
+
+    model = ai.FakeAIModel(delay=0.05)
+    get_ai_model, poll_interval = ai.get_ai_model, ai_jobs.AI_JOB_POLL_INTERVAL
+    ai.get_ai_model = lambda model_type="gemini": model
+    ai_jobs.AI_JOB_POLL_INTERVAL = 0.05
+    try:
+        delivered = asyncio.run(_run_queue(ai_jobs))
+    finally:
+        ai.get_ai_model, ai_jobs.AI_JOB_POLL_INTERVAL = get_ai_model, poll_interval
+
+    # هجوم درخواست‌های یکسان یک فراخوانی مدل دارد و همه پیام‌های منتظر ویرایش می‌شوند
+    perspective = [job for job, _ in delivered if job.kind == ai_jobs.JOB_PERSPECTIVE]
+    assert len(perspective) == 1 and perspective[0].status == ai_jobs.JOB_DONE
+    waiters = dict((job.kind, waiters) for job, waiters in delivered)
+    assert sorted(waiters[ai_jobs.JOB_PERSPECTIVE]) == [(1, 10), (1, 11), (1, 12)]
+    assert len(model.calls) == 3
+
+    # کار نیمه‌تمام قبلی دوباره اجرا شده و نتیجه در جدول مانده است
+    job = ai_jobs.get_latest_job(ai_jobs.JOB_PROFILE, OTHER)
+    assert job.status == ai_jobs.JOB_DONE and job.attempts == 2 and job.result
+    assert execute_db_query("SELECT COUNT(*) FROM ai_job_waiters", fetchone=True)[0] == 0
+    stats = ai_jobs.get_stats()
+    assert stats["deduplicated"] >= 2 and stats["workers"] == 0
+
+    print(f"آمار صف هوش مصنوعی: {stats}")
+    print("✅ تست صف کارهای هوش مصنوعی موفق بود")
+
+
+def test_ai_jobs_failure():
+    from src.database.migrator import ensure_schema
+    from src.services import ai, ai_jobs
+
+    ensure_schema()
+    model = ai.FakeAIModel(failures=100, error=RuntimeError("boom"), name="jobs-failing")
+    get_ai_model, poll_interval = ai.get_ai_model, ai_jobs.AI_JOB_POLL_INTERVAL
+    ai.get_ai_model = lambda model_type="gemini": model
+    ai_jobs.AI_JOB_POLL_INTERVAL = 0.05
+    failed_before = ai_jobs.get_stats()["failed"]
+    try:
+        delivered = asyncio.run(_run_failing_job(ai_jobs))
+    finally:
+        ai.get_ai_model, ai_jobs.AI_JOB_POLL_INTERVAL = get_ai_model, poll_interval
+
+    # پیام خطا به عنوان نتیجه ذخیره نمی‌شود؛ کار پس از همه تلاش‌ها ناموفق ثبت می‌شود
+    job = ai_jobs.get_latest_job(ai_jobs.JOB_ANALYSIS, 0, FAILING_SEASON)
+    assert job.status == ai_jobs.JOB_FAILED and job.attempts == ai_jobs.AI_JOB_MAX_ATTEMPTS
+    assert job.result is None and job.error
+    assert len(model.calls) == ai_jobs.AI_JOB_MAX_ATTEMPTS
+    assert ai_jobs.get_stats()["failed"] == failed_before + 1
+    (notified, waiters), = delivered
+    assert notified.status == ai_jobs.JOB_FAILED and waiters == [(3, 30)]
+    print("✅ تست شکست کار هوش مصنوعی موفق بود")
+
+
+async def _run_failing_job(ai_jobs):
+    delivered = []
+    finished = asyncio.Event()
+
+    async def notifier(job, waiters):
+        delivered.append((job, waiters))
+        finished.set()
+
+    await ai_jobs.start(notifier)
+    try:
+        await ai_jobs.enqueue_async(ai_jobs.JOB_ANALYSIS, 0, FAILING_SEASON, chat_id=3, message_id=30)
+        await asyncio.wait_for(finished.wait(), 10)
+    finally:
+        await ai_jobs.stop()
+    return delivered
+
+
+async def _run_queue(ai_jobs):
+    delivered = []
+    finished = asyncio.Event()
+
+    async def notifier(job, waiters):
+        delivered.append((job, waiters))
+        if len(delivered) == 2:
+            finished.set()
+
+    await ai_jobs.start(notifier)
+    try:
+        ids = await asyncio.gather(*(
+            ai_jobs.enqueue_async(ai_jobs.JOB_PERSPECTIVE, USER, SEASON, chat_id=1, message_id=message_id)
+            for message_id in (10, 11, 12, 11)
+        ))
+        assert len(set(ids)) == 1
+        job = await ai_jobs.get_job_async(ids[0])
+        assert job.status in (ai_jobs.JOB_PENDING, ai_jobs.JOB_RUNNING)
+        await ai_jobs.enqueue_async(ai_jobs.JOB_ANALYSIS, 0, SEASON, chat_id=2, message_id=20)
+        await asyncio.wait_for(finished.wait(), 10)
+        # کار بازیابی شده پیام منتظری ندارد؛ فقط نتیجه‌اش ثبت می‌شود
+        while (await ai_jobs.get_latest_job_async(ai_jobs.JOB_PROFILE, OTHER)).status != ai_jobs.JOB_DONE:
+            await asyncio.sleep(0.02)
+    finally:
+        await ai_jobs.stop()
+    return delivered
+
+
+if __name__ == "__main__":
+    test_ai_jobs()
+    test_ai_jobs_failure()
@@ -0,0 +1,90 @@
+"""
+تست زاویه دید افزایشی: ارسال فقط امتیازهای جدید، خلاصه غلتان، بودجه توکن و حذف امتیازهای داده شده
+"""
+import os
+import tempfile
+
+import config
+
+# دیتابیس موقت پیش از import ماژول‌های دیتابیس
+config.DB_PATH = os.path.join(tempfile.mkdtemp(), "ai_perspective_test.db")
+
+USER = 7301
+GIVER = 7302
+SEASON = 9701
+
+
+def _give(execute_db_query, giver, receiver, amount, reason):
+    execute_db_query(
+        "INSERT INTO transactions (user_id, touser, amount, season_id, reason) VALUES (?, ?, ?, ?, ?)",
+        (giver, receiver, amount, SEASON, reason), commit=True
+    )
+
+
+def test_ai_perspective():
+    from src.database.migrator import ensure_schema
+    from src.database.db_utils import execute_db_query
+    from src.services import ai
+
+    ensure_schema()
+    execute_db_query(
+        "INSERT INTO users (user_id, name) VALUES (?, 'کاربر افزایشی'), (?, 'دهنده افزایشی')", (USER, GIVER),
+        commit=True
+    )
+    _give(execute_db_query, GIVER, USER, 3, "persp-first")
+    _give(execute_db_query, GIVER, USER, 2, "persp-second")
+    _give(execute_db_query, USER, GIVER, 4, "persp-given")
+
+    model = ai.FakeAIModel(responses=["خلاصه اول", "خلاصه دوم", "خلاصه سوم"])
+    get_ai_model = ai.get_ai_model
+    ai.get_ai_model = lambda model_type="gemini": model
+    try:
+        assert ai.get_user_perspective(USER, SEASON) == "خلاصه اول"
+        prompt = model.calls[-1][-1]["content"]
+        assert "persp-first" in prompt and "persp-second" in prompt
+        # امتیازهای داده شده کاربر فرستاده نمی‌شوند
+        assert "persp-given" not in prompt
+        row = execute_db_query(
+            "SELECT last_transaction_id, feedback_count FROM user_perspectives WHERE user_id = ? AND season_id = ?",
+            (USER, SEASON), fetchone=True
+        )
+        assert row[0] > 0 and row[1] == 2
+
+        # بدون امتیاز جدید، خلاصه قبلی بدون فراخوانی مدل برگردانده می‌شود
+        assert ai.get_user_perspective(USER, SEASON, force_update=True) == "خلاصه اول"
+        assert len(model.calls) == 1
+
+        # فقط امتیاز جدید همراه خلاصه قبلی فرستاده می‌شود
+        _give(execute_db_query, GIVER, USER, 1, "persp-third")
+        assert ai.get_user_perspective(USER, SEASON, force_update=True) == "خلاصه دوم"
+        prompt = model.calls[-1][-1]["content"]
+        assert "persp-third" in prompt and "خلاصه اول" in prompt
+        assert "persp-first" not in prompt and "persp-given" not in prompt
+
+        # حجم پرامپت با تعداد امتیازهای جدید رشد نمی‌کند
+        for i in range(400):
+            _give(execute_db_query, GIVER, USER, 1, f"persp-bulk-{i} " + "توضیح طولانی " * 20)
+        ai.get_user_perspective(USER, SEASON, force_update=True)
+        prompt = model.calls[-1][-1]["content"]
+        assert ai.estimate_tokens(prompt) < ai.PERSPECTIVE_FEEDBACK_TOKENS + ai.PERSPECTIVE_SUMMARY_TOKENS + 600
+        assert "persp-bulk-399" in prompt and "امتیاز دیگر (قدیمی‌تر یا کم‌اهمیت‌تر)" in prompt
+        # امتیازهای بیرون از سقف خواندن هم شمرده و خلاصه می‌شوند و نقطه پایان از همه آن‌ها می‌گذرد
+        skipped = 400 - ai.PERSPECTIVE_DELTA_LIMIT
+        assert f"- و {skipped} امتیاز قدیمی‌تر دیگر با مجموع {skipped} امتیاز." in prompt
+        row = execute_db_query(
+            "SELECT last_transaction_id, feedback_count FROM user_perspectives WHERE user_id = ? AND season_id = ?",
+            (USER, SEASON), fetchone=True
+        )
+        last_id = execute_db_query("SELECT MAX(transaction_id) FROM transactions", fetchone=True)[0]
+        assert tuple(row) == (last_id, 2 + 1 + 400)
+        calls = len(model.calls)
+        ai.get_user_perspective(USER, SEASON, force_update=True)
+        assert len(model.calls) == calls
+    finally:
+        ai.get_ai_model = get_ai_model
+
+    print("✅ تست زاویه دید افزایشی موفق بود")
+
+
+if __name__ == "__main__":
+    test_ai_perspective()
@@ -0,0 +1,83 @@
+"""
+تست پیش‌محاسبه دسته‌ای پروفایل و زاویه دید: بودجه توکن، ادامه از نقطه بازیابی و محدودیت نرخ
+"""
+import os
+import time
+import asyncio
+import tempfile
+
+import config
+
+# دیتابیس موقت پیش از import ماژول‌های دیتابیس
+config.DB_PATH = os.path.join(tempfile.mkdtemp(), "ai_precompute_test.db")
+
+USERS = [7401, 7402, 7403, 7404, 7405]
+SEASON = 9801
+RUN_KEY = "precompute-test"
+
+
+def test_ai_precompute():
+    from src.database.migrator import ensure_schema
+    from src.database.db_utils import execute_db_query
+    from src.services import ai, ai_precompute
+
+    ensure_schema()
+    for index, user_id in enumerate(USERS):
+        execute_db_query("INSERT INTO users (user_id, name) VALUES (?, ?)", (user_id, f"پیش‌محاسبه {index}"), commit=True)
+    for giver, receiver in zip(USERS, USERS[1:] + USERS[:1]):
+        execute_db_query(
+            "INSERT INTO transactions (user_id, touser, amount, season_id, reason) VALUES (?, ?, 2, ?, ?)",
+            (giver, receiver, SEASON, f"precompute-{giver}"), commit=True
+        )
+
+    model = ai.FakeAIModel()
+    get_ai_model = ai.get_ai_model
+    ai.get_ai_model = lambda model_type="gemini": model
+    try:
+        # بودجه یک توکنی پس از اولین مرحله (دو کاربر) اجرا را متوقف می‌کند
+        run = asyncio.run(ai_precompute.run(SEASON, RUN_KEY, concurrency=2, rps=0, token_budget=1))
+        assert run.status == ai_precompute.RUN_PAUSED
+        assert run.last_user_id == USERS[1] and run.processed == 2 and run.tokens > 0
+        assert len(model.calls) == 4
+
+        # ادامه از کاربر بعدی بدون پردازش دوباره کاربران قبلی
+        run = asyncio.run(ai_precompute.run(SEASON, RUN_KEY, concurrency=2, rps=0, token_budget=0))
+        assert run.status == ai_precompute.RUN_DONE
+        assert run.last_user_id == USERS[-1] and run.processed == len(USERS) and run.failed == 0
+        assert len(model.calls) == 2 * len(USERS)
+        assert ai_precompute.get_run(RUN_KEY).status == ai_precompute.RUN_DONE
+
+        # اجرای تمام شده دوباره اجرا نمی‌شود
+        asyncio.run(ai_precompute.run(SEASON, RUN_KEY))
+        assert len(model.calls) == 2 * len(USERS)
+
+        # کلیک کاربر از جدول پاسخ داده می‌شود
+        placeholders = ",".join("?" * len(USERS))
+        profiles = execute_db_query(
+            f"SELECT COUNT(*) FROM user_profiles WHERE user_id IN ({placeholders})", tuple(USERS), fetchone=True
+        )[0]
+        perspectives = execute_db_query(
+            f"SELECT COUNT(*) FROM user_perspectives WHERE season_id = ? AND user_id IN ({placeholders})",
+            (SEASON, *USERS), fetchone=True
+        )[0]
+        assert profiles == perspectives == len(USERS)
+        assert ai.generate_user_profile(USERS[0]) and len(model.calls) == 2 * len(USERS)
+    finally:
+        ai.get_ai_model = get_ai_model
+
+    # محدودیت نرخ: سه شروع با 20 درخواست در ثانیه حداقل 0.1 ثانیه طول می‌کشد
+    async def paced():
+        limiter = ai_precompute._RateLimiter(20)
+        started = time.monotonic()
+        for _ in range(3):
+            await limiter.wait()
+        return time.monotonic() - started
+
+    assert asyncio.run(paced()) >= 0.09
+
+    print(f"آمار پیش‌محاسبه: {ai_precompute.get_stats()}")
+    print("✅ تست پیش‌محاسبه دسته‌ای هوش مصنوعی موفق بود")
+
+
+if __name__ == "__main__":
+    test_ai_precompute()
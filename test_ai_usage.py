@@ -0,0 +1,76 @@
+"""
+تست حسابداری مصرف هوش مصنوعی: توکن‌های گزارش شده یا تخمینی، تلاش دوباره، هزینه و صدک‌های تأخیر
+"""
+import os
+import asyncio
+import tempfile
+
+import config
+
+# دیتابیس موقت پیش از import ماژول‌های دیتابیس
+config.DB_PATH = os.path.join(tempfile.mkdtemp(), "ai_usage_test.db")
+
+CALLER = "usage-test"
+FAILING_CALLER = "usage-test-failing"
+
+
+def test_ai_usage():
+    from src.database.migrator import ensure_schema
+    from src.database import write_queue
+    from src.services import ai, ai_usage
+
+    ensure_schema()
+
+    class BilledModel(ai.FakeAIModel):
+        """مدلی که مانند سرویس واقعی مصرف توکن را گزارش می‌کند"""
+        model = "gemini-2.0-flash"
+
+        async def _request_async(self, messages):
+            text = await super()._request_async(messages)
+            return ai.Completion(text, 1000, 500)
+
+    backoff_delay = ai.backoff_delay
+    ai.backoff_delay = lambda attempt: 0.01
+    try:
+        billed = BilledModel(failures=1, delay=0.01)
+        text, ok = asyncio.run(billed.respond_async("سلام", "usage system", caller=CALLER))
+        assert ok and text.startswith("پاسخ آزمایشی")
+
+        # بدون گزارش سرویس، توکن‌ها از طول متن تخمین زده می‌شوند
+        fake = ai.FakeAIModel(responses=["پاسخ کوتاه"])
+        assert fake.respond("x" * 300, None, caller=CALLER) == ("پاسخ کوتاه", True)
+
+        failing = ai.FakeAIModel(failures=5)
+        text, ok = failing.respond("سلام", None, caller=FAILING_CALLER)
+        assert not ok
+    finally:
+        ai.backoff_delay = backoff_delay
+
+    # ثبت مصرف از صف نوشتن می‌گذرد؛ عملیات بعدی پس از commit آن اجرا می‌شود
+    write_queue.run(lambda conn: None)
+
+    report = ai_usage.get_report(days=1)
+    features = dict((f["caller"], f) for f in report["features"])
+    usage = features[CALLER]
+    assert usage["calls"] == 2 and usage["errors"] == 0 and usage["retries"] == 1
+    assert usage["prompt_tokens"] == 1000 + 101 and usage["completion_tokens"] == 500 + 4
+    assert abs(usage["cost"] - ai_usage.cost("gemini-2.0-flash", 1000, 500)) < 1e-9
+    assert usage["p95_ms"] >= usage["p50_ms"] >= 0
+
+    failed = features[FAILING_CALLER]
+    assert failed["calls"] == 1 and failed["errors"] == 1 and failed["retries"] == ai.AI_MAX_RETRIES - 1
+    assert failed["cost"] == 0
+
+    days = [row for row in report["daily"] if row[1] == CALLER]
+    assert len(days) == 1 and days[0][2] == 2
+
+    assert ai_usage.percentile([10, 20, 30, 40], 50) == 20
+    assert ai_usage.percentile(list(range(1, 101)), 95) == 95
+    assert ai_usage.percentile([], 95) == 0
+
+    print(f"گزارش مصرف: {usage}")
+    print("✅ تست حسابداری مصرف هوش مصنوعی موفق بود")
+
+
+if __name__ == "__main__":
+    test_ai_usage()
@@ -0,0 +1,61 @@
+"""
+تست لایه ناهمگام دیتابیس: اجرای خواندن و نوشتن در تردهای جدا و نوشتن از صف نوشتن با execute_query
+"""
+import os
+import asyncio
+import tempfile
+import threading
+
+import config
+
+# دیتابیس موقت پیش از import ماژول‌های دیتابیس
+config.DB_PATH = os.path.join(tempfile.mkdtemp(), "async_db_test.db")
+
+USER = 8101
+
+
+def test_async_db():
+    from src.database.migrator import ensure_schema
+    from src.database import async_db, write_queue
+    from src.database.db_utils import execute_db_query
+
+    ensure_schema()
+
+    def thread_name(value):
+        return threading.current_thread().name, value
+
+    async def scenario():
+        loop_thread = threading.current_thread().name
+
+        # تابع همگام خواندن و نوشتن در تردهای خودشان اجرا می‌شوند، نه روی حلقه
+        name, value = await async_db.run_read(thread_name, value=1)
+        assert name.startswith("db-reader") and name != loop_thread and value == 1
+        name, value = await async_db.run_write(thread_name, 2)
+        assert name.startswith("db-writer") and value == 2
+
+        # execute_query با commit از صف نوشتن می‌گذرد و پس از commit برمی‌گردد
+        submitted = write_queue.get_stats()["submitted"]
+        rows = await async_db.execute_query(
+            "INSERT INTO users (user_id, name) VALUES (?, 'کاربر ناهمگام')", (USER,), commit=True
+        )
+        assert rows == 1 and write_queue.get_stats()["submitted"] == submitted + 1
+        row = await async_db.execute_query("SELECT name FROM users WHERE user_id = ?", (USER,), fetchone=True)
+        assert row[0] == "کاربر ناهمگام"
+
+        # خطای کوئری مانند execute_db_query مقدار None برمی‌گرداند
+        assert await async_db.execute_query("SELECT * FROM missing_table") is None
+
+        # خواندن‌های همزمان روی چند ترد اجرا می‌شوند
+        results = await asyncio.gather(*(
+            async_db.execute_query("SELECT COUNT(*) FROM users WHERE user_id = ?", (USER,), fetchone=True)
+            for _ in range(8)
+        ))
+        assert all(result[0] == 1 for result in results)
+
+    asyncio.run(scenario())
+    assert execute_db_query("SELECT COUNT(*) FROM users WHERE user_id = ?", (USER,), fetchone=True)[0] == 1
+    print("✅ تست لایه ناهمگام دیتابیس موفق بود")
+
+
+if __name__ == "__main__":
+    test_async_db()
@@ -0,0 +1,41 @@
+"""
+تست کش عضویت کانال با TTL جداگانه برای نتیجه مثبت و منفی
+"""
+import time
+
+
+def test_membership_cache():
+    from src.services import membership
+
+    membership.invalidate()
+    assert membership.get_cached(1) is None
+
+    assert membership.record_status(1, "member") is True
+    assert membership.record_status(2, "left") is False
+    assert membership.get_cached(1) is True
+    assert membership.get_cached(2) is False
+
+    # نتیجه منفی زودتر منقضی می‌شود
+    old_negative = membership.NEGATIVE_TTL
+    membership.NEGATIVE_TTL = 0
+    try:
+        membership.record_status(2, "kicked")
+        time.sleep(0.01)
+        assert membership.get_cached(2) is None
+        assert membership.get_cached(1) is True
+    finally:
+        membership.NEGATIVE_TTL = old_negative
+
+    # رویداد chat_member کش را به‌روز می‌کند
+    membership.apply_member_update(1, "left")
+    assert membership.get_cached(1) is False
+
+    membership.invalidate(1)
+    assert membership.get_cached(1) is None
+
+    print(f"آمار کش عضویت: {membership.get_stats()}")
+    print("✅ تست کش عضویت موفق بود")
+
+
+if __name__ == "__main__":
+    test_membership_cache()
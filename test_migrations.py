@@ -0,0 +1,57 @@
+"""
+تست اجراکننده مایگریشن‌ها روی یک دیتابیس موقت
+"""
+import os
+import sqlite3
+import tempfile
+
+import config
+
+
+def test_migrations():
+    tmp_dir = tempfile.mkdtemp()
+    db_path = os.path.join(tmp_dir, "migrations_test.db")
+
+    # دیتابیس قدیمی: جدول users بدون ستون‌های اضافه‌شده بعدی
+    legacy = sqlite3.connect(db_path)
+    legacy.execute("CREATE TABLE users (user_id INTEGER PRIMARY KEY, username TEXT, name TEXT)")
+    legacy.execute("INSERT INTO users (user_id, username, name) VALUES (1, 'ali', 'علی')")
+    legacy.commit()
+    legacy.close()
+
+    from src.database import migrator
+    from src.database.connection_pool import get_pool
+
+    version = migrator.ensure_schema(db_path)
+    print(f"نسخه طرح پس از مایگریشن: {version}")
+    assert version == migrator.latest_version()
+
+    conn = get_pool(db_path).acquire(row_factory=None)
+    try:
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(users)")}
+        assert {"balance", "is_approved", "total_received", "telegram_name", "join_date"} <= columns
+        assert conn.execute("SELECT name FROM users WHERE user_id=1").fetchone()[0] == "علی"
+
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        assert {"transactions", "season", "top_votes", "settings", "schema_version"} <= tables
+
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+        assert "idx_transactions_touser_season" in indexes
+
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("SELECT value FROM settings WHERE key='show_all_users'").fetchone()[0] == "1"
+        assert conn.execute("SELECT role FROM admins WHERE user_id=?", (config.ADMIN_USER_ID,)).fetchone()[0] == "god"
+
+        # اجرای دوباره هیچ مایگریشنی را تکرار نمی‌کند
+        assert migrator.migrate(conn) == []
+        count = conn.execute("SELECT COUNT(*) FROM schema_version").fetchone()[0]
+        assert count == len(migrator.discover_migrations())
+    finally:
+        conn.close()
+        get_pool(db_path).close_all()
+
+    print("✅ تست مایگریشن‌ها موفق بود")
+
+
+if __name__ == "__main__":
+    test_migrations()
@@ -0,0 +1,47 @@
+"""
+تست سرویس دسترسی‌ها: کش نقش‌ها و بررسی دسترسی‌ها
+"""
+import os
+import tempfile
+
+import config
+
+# دیتابیس موقت پیش از import ماژول‌های دیتابیس
+config.DB_PATH = os.path.join(tempfile.mkdtemp(), "permissions_test.db")
+
+
+def test_permissions_service():
+    from src.database.migrator import ensure_schema
+    from src.services import permissions
+
+    ensure_schema()
+    permissions.invalidate()
+
+    # ادمین گاد توسط مایگریشن اولیه اضافه می‌شود
+    loads = permissions.get_stats()["loads"]
+    assert permissions.is_admin(config.ADMIN_USER_ID)
+    assert permissions.get_role(config.ADMIN_USER_ID) == "god"
+    assert permissions.has_permission(config.ADMIN_USER_ID, "manage_admins")
+    assert not permissions.is_admin(123)
+    assert permissions.get_admin_permissions(123) == ([], "")
+    assert permissions.get_stats()["loads"] - loads == 1
+
+    assert permissions.set_admin(123, "admin", ["admin_stats", "admin_users"])
+    assert permissions.is_admin(123)
+    assert permissions.has_permission(123, "admin_stats")
+    assert not permissions.has_permission(123, "manage_admins")
+    assert permissions.get_admin_permissions(123) == (["admin_users", "admin_stats"], "admin")
+
+    assert permissions.required_permission("toggle_ai_features^") == "admin_stats"
+    assert permissions.required_permission("manage_seasons^") == "manage_questions"
+    assert permissions.required_permission("admin_panel^") is None
+
+    assert permissions.remove_admin(123)
+    assert not permissions.is_admin(123)
+
+    print(f"آمار کش دسترسی‌ها: {permissions.get_stats()}")
+    print("✅ تست سرویس دسترسی‌ها موفق بود")
+
+
+if __name__ == "__main__":
+    test_permissions_service()
@@ -0,0 +1,81 @@
+"""
+تست ساخت پرامپت در بودجه توکن: رتبه‌بندی با وزن و تازگی، ادغام دلایل تکراری و سقف پرامپت تحلیل ادمین
+"""
+import os
+import tempfile
+
+import config
+
+# دیتابیس موقت پیش از import ماژول‌های دیتابیس
+config.DB_PATH = os.path.join(tempfile.mkdtemp(), "prompt_builder_test.db")
+
+GIVER = 7501
+RECEIVER = 7502
+SEASON = 9901
+
+
+def test_prompt_builder():
+    from src.services.prompt_builder import PromptBuilder, Item, fit, rank, dedupe, estimate_tokens
+
+    # امتیاز بزرگ قدیمی از امتیاز کوچک تازه مهم‌تر است؛ در تساوی وزن تازه‌تر اول
+    items = [Item("old-big", 10, 1), Item("new-small", 1, 3), Item("new-mid", 1, 2)]
+    assert [item.text for item in rank(items)] == ["old-big", "new-small", "new-mid"]
+
+    # دلایل تقریباً یکسان (علائم، فاصله و شکل نویسه) در مهم‌ترین مورد ادغام می‌شوند
+    merged = dedupe([
+        Item("a", 1, 3, "ممنون بابت کمک در پروژه"),
+        Item("b", 1, 2, "ممنون  بابت کمک در پروژه!!"),
+        Item("c", 1, 1, "ممنون بابت كمك در پروژه"),
+        Item("d", 1, 0, "ارائه عالی در جلسه"),
+    ])
+    assert [(item.text, count) for item, count in merged] == [("a", 2), ("d", 0)]
+
+    lines, omitted = fit([Item("- تکراری", 1, i, "تکراری") for i in range(5)] + [Item("- یکتا", 1, 9, "یکتا")], None)
+    assert lines == ["- یکتا", "- تکراری (+4 مورد مشابه)"] and not omitted
+
+    # بودجه: موارد کم‌اهمیت کنار گذاشته و خلاصه می‌شوند
+    long_items = [Item(f"- دلیل شماره {i} " + "متن " * 30, 1, i, f"reason-{i}") for i in range(50)]
+    builder = PromptBuilder(300)
+    builder.add("سرآغاز\n")
+    builder.add_items(long_items, omitted=lambda items: f"- و {len(items)} مورد دیگر")
+    builder.add("پایان\n")
+    prompt = builder.build()
+    assert estimate_tokens(prompt) <= 300 + 20
+    assert "دلیل شماره 49 " in prompt and "دلیل شماره 0 " not in prompt
+    assert prompt.startswith("سرآغاز") and prompt.endswith("پایان\n") and builder.omitted > 0
+    assert f"- و {builder.omitted} مورد دیگر" in prompt
+
+    # بخش خالی متن جایگزین دارد
+    assert PromptBuilder().add_items([], empty="- خالی\n").build() == "- خالی\n"
+
+    _check_admin_prompt()
+    print("✅ تست ساخت پرامپت در بودجه توکن موفق بود")
+
+
+def _check_admin_prompt():
+    """پرامپت تحلیل ادمین با دلایل زیاد و تکراری در سقف بودجه می‌ماند"""
+    from src.database.migrator import ensure_schema
+    from src.database.db_utils import execute_db_query
+    from src.services import ai
+
+    ensure_schema()
+    execute_db_query(
+        "INSERT INTO users (user_id, name) VALUES (?, 'دهنده پرامپت'), (?, 'گیرنده پرامپت')", (GIVER, RECEIVER),
+        commit=True
+    )
+    for i in range(300):
+        reason = "prompt-dup ممنون بابت همه چیز" if i % 2 else f"prompt-unique-{i} " + "توضیح مفصل " * 15
+        execute_db_query(
+            "INSERT INTO transactions (user_id, touser, amount, season_id, reason) VALUES (?, ?, 1, ?, ?)",
+            (GIVER, RECEIVER, SEASON, reason), commit=True
+        )
+
+    request = ai._prepare_admin_analysis(SEASON)
+    assert isinstance(request, ai.AIRequest)
+    assert ai.estimate_tokens(request.prompt) <= ai.ANALYSIS_PROMPT_TOKENS
+    assert request.prompt.count("prompt-dup") == 1 and "مورد مشابه" in request.prompt
+    assert "prompt-unique-298" in request.prompt and "دلیل دیگر" in request.prompt
+
+
+if __name__ == "__main__":
+    test_prompt_builder()
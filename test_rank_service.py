@@ -0,0 +1,75 @@
+"""
+تست سرویس رتبه‌بندی زنده: رتبه، درصد، همسایه‌ها و به‌روزرسانی با هر تراکنش
+"""
+import os
+import random
+import tempfile
+
+import config
+
+# دیتابیس موقت پیش از import ماژول‌های دیتابیس
+config.DB_PATH = os.path.join(tempfile.mkdtemp(), "rank_service_test.db")
+
+SEASON = 9101
+
+
+def test_rank_service():
+    from src.database.migrator import ensure_schema
+    from src.database.db_utils import execute_db_query
+    from src.database import season_totals
+    from src.services import rank_service
+
+    ensure_schema()
+    rank_service.invalidate()
+
+    for giver, receiver, amount in [(1, 4001, 10), (1, 4002, 6), (1, 4003, 6), (1, 4004, 1)]:
+        execute_db_query(
+            "INSERT INTO transactions (user_id, touser, amount, season_id) VALUES (?, ?, ?, ?)",
+            (giver, receiver, amount, SEASON), commit=True
+        )
+
+    loads = rank_service.get_stats()["loads"]
+    assert rank_service.get_rank(4001, SEASON) == (1, 4, 10, 100)
+    # امتیاز برابر، رتبه برابر
+    assert rank_service.get_rank(4002, SEASON).rank == 2
+    assert rank_service.get_rank(4003, SEASON).rank == 2
+    assert rank_service.get_rank(4004, SEASON) == (4, 4, 1, 0)
+    assert rank_service.get_rank(4999, SEASON) is None
+    assert rank_service.get_rank(4001, None) is None
+
+    above, below = rank_service.get_neighbours(4004, SEASON, above=2, below=1)
+    assert [row[2] for row in above] == [2, 2] and below == []
+    above, below = rank_service.get_neighbours(4001, SEASON)
+    assert above == [] and below[0][1:] == (6, 2)
+    assert rank_service.get_stats()["loads"] - loads == 1
+
+    # تراکنش جدید بدون بارگذاری دوباره اعمال می‌شود
+    execute_db_query(
+        "INSERT INTO transactions (user_id, touser, amount, season_id) VALUES (1, 4004, 20, ?)",
+        (SEASON,), commit=True
+    )
+    rank_service.record_transaction(SEASON, 4004, 20)
+    assert rank_service.get_rank(4004, SEASON) == (1, 4, 21, 100)
+    assert rank_service.get_rank(4001, SEASON).rank == 2
+
+    # نتیجه با رتبه محاسبه شده از season_totals یکسان است
+    users = list(range(4100, 4160))
+    for _ in range(300):
+        receiver, amount = random.choice(users), random.randint(1, 5)
+        execute_db_query(
+            "INSERT INTO transactions (user_id, touser, amount, season_id) VALUES (1, ?, ?, ?)",
+            (receiver, amount, SEASON), commit=True
+        )
+        rank_service.record_transaction(SEASON, receiver, amount)
+    for user_id in users + [4001, 4004]:
+        info = rank_service.get_rank(user_id, SEASON)
+        expected = season_totals.get_user_rank(user_id, SEASON)
+        assert ((info.rank, info.total) if info else (0, 0)) == expected
+    assert rank_service.get_stats()["loads"] - loads == 1
+
+    print(f"آمار سرویس رتبه‌بندی: {rank_service.get_stats()}")
+    print("✅ تست سرویس رتبه‌بندی موفق بود")
+
+
+if __name__ == "__main__":
+    test_rank_service()
@@ -0,0 +1,71 @@
+"""
+تست کانتکست درخواست: بارگذاری کاربر، نقش و فصل فعال، ساخت در نبود پیش‌هندلر و ساخت دوباره برای کاربر دیگر
+"""
+import os
+import asyncio
+import tempfile
+from types import SimpleNamespace
+
+import config
+
+# دیتابیس موقت پیش از import ماژول‌های دیتابیس
+config.DB_PATH = os.path.join(tempfile.mkdtemp(), "request_context_test.db")
+
+USER = 8201
+ADMIN = 8202
+STRANGER = 8203
+SEASON = 9601
+
+
+def test_request_context():
+    from src.database.migrator import ensure_schema
+    from src.database.db_utils import execute_db_query
+    from src.database import season_functions
+    from src.services import permissions
+    from src.handlers import request_context
+
+    ensure_schema()
+    execute_db_query(
+        "INSERT INTO users (user_id, name, username, balance) VALUES (?, 'کاربر کانتکست', 'ctx_user', 7), (?, 'ادمین کانتکست', NULL, 3)",
+        (USER, ADMIN), commit=True
+    )
+    execute_db_query("UPDATE season SET is_active = 0", commit=True)
+    execute_db_query(
+        "INSERT INTO season (id, name, balance, is_active) VALUES (?, 'فصل کانتکست', 10, 1)", (SEASON,), commit=True
+    )
+    season_functions.invalidate_season_cache()
+    assert permissions.set_admin(ADMIN, "admin", ["admin_stats"])
+
+    async def scenario():
+        ctx = await request_context.build_request_context(USER)
+        assert ctx.user_id == USER and ctx.is_approved and not ctx.is_admin
+        assert (ctx.name, ctx.username, ctx.balance) == ("کاربر کانتکست", "ctx_user", 7)
+        assert ctx.season[0] == SEASON and ctx.role is None and not ctx.has_permission("admin_stats")
+
+        admin = await request_context.build_request_context(ADMIN)
+        assert admin.is_admin and admin.role == "admin"
+        assert admin.has_permission("admin_stats") and not admin.has_permission("manage_admins")
+
+        # کاربر ثبت نشده
+        stranger = await request_context.build_request_context(STRANGER)
+        assert not stranger.is_approved and stranger.name is None and stranger.balance == 0
+
+        # پیش‌هندلر اجرا نشده: کانتکست همین‌جا ساخته و در context ذخیره می‌شود
+        context = SimpleNamespace()
+        loaded = await request_context.get_request_context(context, USER)
+        assert loaded.user_id == USER and getattr(context, request_context.CONTEXT_ATTR) is loaded
+        # فراخوانی دوباره همان نمونه را برمی‌گرداند
+        assert await request_context.get_request_context(context, USER) is loaded
+
+        # کانتکست کاربر دیگری در context مانده: برای کاربر درخواست شده دوباره ساخته می‌شود
+        rebuilt = await request_context.get_request_context(context, ADMIN)
+        assert rebuilt is not loaded and rebuilt.user_id == ADMIN and rebuilt.is_admin
+        assert getattr(context, request_context.CONTEXT_ATTR) is rebuilt
+
+    asyncio.run(scenario())
+    permissions.remove_admin(ADMIN)
+    print("✅ تست کانتکست درخواست موفق بود")
+
+
+if __name__ == "__main__":
+    test_request_context()
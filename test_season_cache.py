@@ -0,0 +1,58 @@
+"""
+تست کش فصل فعال و باطل شدن آن پس از تغییر فصل
+"""
+import os
+import tempfile
+
+import config
+
+# دیتابیس موقت پیش از import ماژول‌های دیتابیس
+config.DB_PATH = os.path.join(tempfile.mkdtemp(), "season_cache_test.db")
+
+
+def test_season_cache():
+    from src.database.migrator import ensure_schema
+    from src.database import season_functions, db_utils
+
+    ensure_schema()
+    season_functions.invalidate_season_cache()
+
+    assert season_functions.get_active_season() is None
+
+    season_functions.db_manager.execute_query(
+        "INSERT INTO season (id, name, balance, is_active) VALUES (1, 'فصل اول', 20, 0)", commit=True
+    )
+    season_functions.db_manager.execute_query(
+        "INSERT INTO season (id, name, balance, is_active) VALUES (2, 'فصل دوم', 30, 0)", commit=True
+    )
+
+    # فعال‌سازی کش منفی را باطل می‌کند
+    assert season_functions.activate_season(1) == 20
+    before = season_functions.get_season_cache_stats()
+    assert season_functions.get_active_season()[0] == 1
+    assert season_functions.get_active_season()[0] == 1
+    assert db_utils.get_active_season()[0] == 1
+    after = season_functions.get_season_cache_stats()
+    assert after["misses"] - before["misses"] == 1
+    assert after["hits"] - before["hits"] == 2
+
+    # تغییر نام فصل فعال بلافاصله دیده می‌شود
+    db_utils.update_season(1, name="فصل یکم")
+    assert season_functions.get_active_season()[1] == "فصل یکم"
+
+    # فعال شدن فصل دیگر
+    db_utils.activate_season(2)
+    assert season_functions.get_active_season()[0] == 2
+    assert db_utils.get_user_profile(config.ADMIN_USER_ID)[3] == 30
+
+    # پایان فصل
+    season_functions.end_season(2)
+    assert season_functions.get_active_season() is None
+    assert db_utils.get_active_season()[0] == config.SEASON_ID
+
+    print(f"آمار کش فصل: {season_functions.get_season_cache_stats()}")
+    print("✅ تست کش فصل موفق بود")
+
+
+if __name__ == "__main__":
+    test_season_cache()
@@ -0,0 +1,79 @@
+"""
+تست جدول تجمیعی season_totals: نگهداری با تریگر، تابلوی امتیازات، رتبه و ساخت دوباره
+"""
+import os
+import tempfile
+
+import config
+
+# دیتابیس موقت پیش از import ماژول‌های دیتابیس
+config.DB_PATH = os.path.join(tempfile.mkdtemp(), "season_totals_test.db")
+
+SEASON = 9001
+
+
+def test_season_totals():
+    from src.database.migrator import ensure_schema
+    from src.database.db_utils import execute_db_query, get_db_connection, get_scoreboard
+    from src.database import season_totals
+    from src.utils.season_utils import get_user_season_stats
+
+    ensure_schema()
+    execute_db_query(
+        "INSERT INTO users (user_id, name) VALUES (3001, 'الف'), (3002, 'ب'), (3003, 'پ')",
+        commit=True
+    )
+    for giver, receiver, amount in [(3001, 3002, 5), (3003, 3002, 2), (3002, 3001, 4), (3001, 3003, 4)]:
+        execute_db_query(
+            "INSERT INTO transactions (user_id, touser, amount, season_id, reason) VALUES (?, ?, ?, ?, ?)",
+            (giver, receiver, amount, SEASON, "تست"), commit=True
+        )
+
+    assert season_totals.get_user_totals(3002, SEASON) == (7, 4, 2, 1)
+    scoreboard = [tuple(row) for row in get_scoreboard(SEASON)]
+    assert scoreboard[0] == (3002, 7, "ب")
+    assert set(scoreboard[1:]) == {(3001, 4, "الف"), (3003, 4, "پ")}
+    # امتیاز برابر، رتبه برابر (مانند RANK())
+    assert season_totals.get_user_rank(3002, SEASON) == (1, 3)
+    assert season_totals.get_user_rank(3001, SEASON) == (2, 3)
+    assert season_totals.get_user_rank(3003, SEASON) == (2, 3)
+    assert season_totals.get_user_rank(3999, SEASON) == (0, 0)
+
+    stats = get_user_season_stats(3001, SEASON)
+    assert (stats['received_amount'], stats['received_count'], stats['given_amount'], stats['given_count']) == (4, 1, 9, 2)
+    assert (stats['rank'], stats['total_users']) == (2, 3)
+
+    # ویرایش و حذف تراکنش در همان تراکنش دیتابیس اعمال می‌شود
+    execute_db_query("UPDATE transactions SET amount = 10 WHERE user_id = 3003 AND season_id = ?", (SEASON,), commit=True)
+    assert season_totals.get_user_totals(3002, SEASON) == (15, 4, 2, 1)
+    execute_db_query("DELETE FROM transactions WHERE user_id = 3002 AND season_id = ?", (SEASON,), commit=True)
+    assert season_totals.get_user_totals(3001, SEASON) == (0, 9, 0, 2)
+    assert season_totals.get_user_rank(3001, SEASON) == (0, 0)
+
+    # rollback تراکنش، مجموع‌ها را هم برمی‌گرداند
+    conn = get_db_connection()
+    try:
+        conn.execute(
+            "INSERT INTO transactions (user_id, touser, amount, season_id) VALUES (3001, 3002, 50, ?)", (SEASON,)
+        )
+        conn.rollback()
+    finally:
+        conn.close()
+    assert season_totals.get_user_totals(3002, SEASON) == (15, 0, 2, 0)
+
+    # ساخت دوباره از روی transactions همان نتیجه تریگرها را می‌دهد
+    conn = get_db_connection()
+    try:
+        query = "SELECT * FROM season_totals WHERE season_id = ? ORDER BY user_id"
+        before = [tuple(row) for row in conn.execute(query, (SEASON,))]
+        season_totals.rebuild_season_totals(conn)
+        conn.commit()
+        assert [tuple(row) for row in conn.execute(query, (SEASON,))] == before
+    finally:
+        conn.close()
+
+    print("✅ تست جدول تجمیعی season_totals موفق بود")
+
+
+if __name__ == "__main__":
+    test_season_totals()
@@ -0,0 +1,54 @@
+"""
+تست سرویس تنظیمات: بارگذاری یک‌باره، خواندن از حافظه و اطلاع‌رسانی تغییرات
+"""
+import os
+import tempfile
+
+import config
+
+# دیتابیس موقت پیش از import ماژول‌های دیتابیس
+config.DB_PATH = os.path.join(tempfile.mkdtemp(), "settings_test.db")
+
+
+def test_settings_service():
+    from src.database.migrator import ensure_schema
+    from src.database.db_utils import execute_db_query
+    from src.services import settings
+
+    ensure_schema()
+    settings.invalidate()
+
+    loads = settings.get_stats()["loads"]
+    values = settings.get_many(["show_all_users", "ai_features_enabled"])
+    assert values == {"show_all_users": "1", "ai_features_enabled": "1"}
+    assert settings.get_bool("show_all_users") is True
+    assert settings.get("ai_features_enabled") == "1"
+    # همه خواندن‌ها فقط یک بار به دیتابیس رفته‌اند
+    assert settings.get_stats()["loads"] - loads == 1
+
+    changes = []
+    callback = settings.subscribe(lambda key, value: changes.append((key, value)))
+    try:
+        assert settings.toggle("show_all_users") is False
+        assert settings.get_bool("show_all_users") is False
+        assert settings.toggle("ai_features_enabled") is False
+        assert changes == [("show_all_users", "0"), ("ai_features_enabled", "0")]
+
+        stored = execute_db_query("SELECT value FROM settings WHERE key='ai_features_enabled'", fetchone=True)
+        assert stored[0] == "0"
+
+        # تغییر مستقیم در دیتابیس پس از invalidate دیده می‌شود
+        execute_db_query("UPDATE settings SET value='1' WHERE key='show_all_users'", commit=True)
+        assert settings.get_bool("show_all_users") is False
+        settings.invalidate()
+        assert settings.get_bool("show_all_users") is True
+        assert changes[-1] == (None, None)
+    finally:
+        settings.unsubscribe(callback)
+
+    print(f"آمار کش تنظیمات: {settings.get_stats()}")
+    print("✅ تست سرویس تنظیمات موفق بود")
+
+
+if __name__ == "__main__":
+    test_settings_service()
@@ -0,0 +1,79 @@
+"""
+تست صفحه‌بندی تاریخچه تراکنش‌ها با cursor و شمارش از season_totals
+"""
+import os
+import tempfile
+
+import config
+
+# دیتابیس موقت پیش از import ماژول‌های دیتابیس
+config.DB_PATH = os.path.join(tempfile.mkdtemp(), "transaction_history_test.db")
+
+SEASON = 9301
+GIVER = 6001
+RECEIVER = 6002
+
+
+def test_transaction_history():
+    from src.database.migrator import ensure_schema
+    from src.database.db_utils import execute_db_query
+    from src.database.user_functions import count_user_transactions
+    from src.database.transaction_history import get_transactions_page, encode_cursor, decode_cursor
+
+    ensure_schema()
+    assert decode_cursor(encode_cursor("2024-03-09 07:05:01", 123456)) == ("2024-03-09 07:05:01", 123456)
+    assert encode_cursor(None, 1) is None and encode_cursor("دیروز", 1) is None
+    assert decode_cursor("xyz") is None and decode_cursor("a.b.c") is None
+
+    # زمان‌های تکراری تا ترتیب دوم (transaction_id) هم بررسی شود
+    for i in range(20):
+        execute_db_query(
+            "INSERT INTO transactions (user_id, touser, amount, season_id, reason, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (GIVER, RECEIVER, i + 1, SEASON, f"دلیل {i}", f"2024-01-{1 + i // 3:02d} 10:00:00"), commit=True
+        )
+    expected = [tuple(row) for row in execute_db_query("""
+        SELECT amount, transaction_id FROM transactions WHERE touser = ? AND season_id = ?
+        ORDER BY created_at DESC, transaction_id DESC
+    """, (RECEIVER, SEASON))]
+
+    # حرکت رو به جلو تا انتها
+    pages, cursor = [], None
+    while True:
+        rows, has_more = get_transactions_page(RECEIVER, given=False, season_id=SEASON, cursor=cursor)
+        pages.append(rows)
+        if not has_more:
+            break
+        cursor = encode_cursor(rows[-1][4], rows[-1][6])
+    assert [(row[0], row[6]) for rows in pages for row in rows] == expected
+    assert [len(rows) for rows in pages] == [3] * 6 + [2]
+    assert pages[0][0][1] == GIVER
+
+    # حرکت رو به عقب از صفحه آخر همان صفحه‌ها را برمی‌گرداند
+    for index in range(len(pages) - 1, 0, -1):
+        first = pages[index][0]
+        rows, has_more = get_transactions_page(
+            RECEIVER, given=False, season_id=SEASON, cursor=encode_cursor(first[4], first[6]), newer=True
+        )
+        assert [row[6] for row in rows] == [row[6] for row in pages[index - 1]]
+        assert has_more == (index > 1)
+
+    # cursor نامعتبر یعنی صفحه اول
+    assert get_transactions_page(GIVER, given=True, season_id=SEASON, cursor="bad")[0][0][6] == expected[0][1]
+    rows, has_more = get_transactions_page(GIVER, given=True, season_id=None)
+    assert len(rows) == 3 and has_more
+
+    # شمارش از شمارنده‌های season_totals
+    assert count_user_transactions(RECEIVER, given=False, season_id=SEASON) == 20
+    assert count_user_transactions(GIVER, given=True, season_id=SEASON) == 20
+    assert count_user_transactions(GIVER, given=False, season_id=SEASON) == 0
+    execute_db_query(
+        "INSERT INTO transactions (user_id, touser, amount, season_id) VALUES (?, ?, 1, ?)",
+        (GIVER, RECEIVER, SEASON + 1), commit=True
+    )
+    assert count_user_transactions(GIVER, given=True) == 21
+
+    print("✅ تست صفحه‌بندی تاریخچه تراکنش‌ها موفق بود")
+
+
+if __name__ == "__main__":
+    test_transaction_history()
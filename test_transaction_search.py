@@ -0,0 +1,68 @@
+"""
+تست جستجوی متن کامل تراکنش‌ها: همگام‌سازی با تریگر، نرمال‌سازی فارسی و صفحه‌بندی
+"""
+import os
+import tempfile
+
+import config
+
+# دیتابیس موقت پیش از import ماژول‌های دیتابیس
+config.DB_PATH = os.path.join(tempfile.mkdtemp(), "transaction_search_test.db")
+
+
+def test_transaction_search():
+    from src.database.migrator import ensure_schema
+    from src.database.db_utils import execute_db_query
+    from src.database.search_functions import search_transactions, build_match_query
+
+    ensure_schema()
+    execute_db_query(
+        "INSERT INTO users (user_id, name) VALUES (2001, 'نگار شريفي'), (2002, 'پويا نادري')",
+        commit=True
+    )
+    reasons = [
+        "بابت كمك در پروژه",              # ک و ی عربی
+        "ارائه عالی در جلسه",
+        "می\u200cخواهم از همکاری\u200cات تشکر کنم",  # نیم‌فاصله
+        None,
+    ] + [f"همکاری شماره {i}" for i in range(7)]
+    for i, reason in enumerate(reasons):
+        execute_db_query(
+            "INSERT INTO transactions (user_id, touser, amount, season_id, reason) VALUES (?, ?, ?, ?, ?)",
+            (2001, 2002, i + 1, 1 if i < 4 else 2, reason), commit=True
+        )
+
+    assert build_match_query("  كمك  پروژه ") == '"کمک"* "پروژه"*'
+    assert build_match_query("!!") is None
+
+    rows, has_more = search_transactions("کمک")
+    assert [row["reason"] for row in rows] == ["بابت كمك در پروژه"] and not has_more
+    # جستجوی پیشوندی و نیم‌فاصله
+    assert len(search_transactions("پروژ")[0]) == 1
+    assert len(search_transactions("میخواهم")[0]) == 1
+    # جستجو با نام فرستنده یا گیرنده
+    rows, _ = search_transactions("نادری ارائه")
+    assert [row["amount"] for row in rows] == [2]
+    assert rows[0]["giver_name"] == "نگار شريفي"
+
+    # صفحه‌بندی (جدیدترین اول) با یک سطر اضافه برای تشخیص صفحه بعد
+    first, has_more = search_transactions("همکاری", page=0, page_size=5)
+    assert has_more and [row["amount"] for row in first] == [11, 10, 9, 8, 7]
+    second, has_more = search_transactions("همکاری", page=1, page_size=5)
+    assert not has_more and [row["amount"] for row in second] == [6, 5, 3]
+    assert len(search_transactions("همکاری", season_id=1)[0]) == 1
+
+    # تریگرها: ویرایش دلیل، تغییر نام کاربر و حذف تراکنش
+    execute_db_query("UPDATE transactions SET reason='کمک در استقرار' WHERE amount=2", commit=True)
+    assert [row["amount"] for row in search_transactions("استقرار")[0]] == [2]
+    assert search_transactions("جلسه")[0] == []
+    execute_db_query("UPDATE users SET name='کیان تهرانی' WHERE user_id=2001", commit=True)
+    assert len(search_transactions("تهرانی")[0]) == 5
+    execute_db_query("DELETE FROM transactions WHERE amount=1", commit=True)
+    assert search_transactions("پروژه")[0] == []
+
+    print("✅ تست جستجوی متن کامل تراکنش‌ها موفق بود")
+
+
+if __name__ == "__main__":
+    test_transaction_search()
@@ -0,0 +1,95 @@
+"""
+تست انتقال اتمیک امتیاز: کسر مشروط اعتبار، کلید یکتایی و فشار همزمان از چندین task
+"""
+import os
+import asyncio
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+
+# دیتابیس موقت پیش از import ماژول‌های دیتابیس
+config.DB_PATH = os.path.join(tempfile.mkdtemp(), "transfer_kudos_test.db")
+
+SEASON = 9201
+SENDER = 5001
+RECEIVERS = [5002, 5003, 5004]
+START_BALANCE = 40
+
+
+async def _hammer(requests, workers=16):
+    """اجرای همزمان درخواست‌ها از چندین task روی تردهای جدا (مانند چند پردازه/کلیک همزمان)"""
+    from src.database.transfer_functions import transfer_kudos
+
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        tasks = [
+            loop.run_in_executor(
+                pool, lambda r=r: transfer_kudos(SENDER, r[0], r[1], SEASON, "فشار", idempotency_key=r[2])
+            )
+            for r in requests
+        ]
+        return await asyncio.gather(*tasks)
+
+
+def test_transfer_kudos():
+    from src.database.migrator import ensure_schema
+    from src.database.db_utils import execute_db_query, add_transaction
+    from src.database import season_totals
+    from src.database.transfer_functions import (
+        transfer_kudos, make_idempotency_key, TRANSFER_OK, TRANSFER_INSUFFICIENT_BALANCE,
+        TRANSFER_DUPLICATE, TRANSFER_INVALID,
+    )
+
+    ensure_schema()
+    execute_db_query(
+        "INSERT INTO users (user_id, name, balance) VALUES (?, 'فرستنده', ?), (5002, 'گیرنده۱', 0), "
+        "(5003, 'گیرنده۲', 0), (5004, 'گیرنده۳', 0)",
+        (SENDER, START_BALANCE), commit=True
+    )
+
+    # حالت‌های ساده
+    key = make_idempotency_key(SENDER, "a1")
+    first = transfer_kudos(SENDER, 5002, 3, SEASON, "اول", idempotency_key=key)
+    assert first.status == TRANSFER_OK and first.balance == START_BALANCE - 3
+    again = transfer_kudos(SENDER, 5002, 3, SEASON, "اول", idempotency_key=key)
+    assert again == (TRANSFER_DUPLICATE, first.transaction_id, START_BALANCE - 3)
+    assert transfer_kudos(SENDER, 5002, 1000, SEASON, "زیاد").status == TRANSFER_INSUFFICIENT_BALANCE
+    assert transfer_kudos(SENDER, SENDER, 1, SEASON, "خودم").status == TRANSFER_INVALID
+    assert transfer_kudos(SENDER, 5002, 0, SEASON, "صفر").status == TRANSFER_INVALID
+    assert add_transaction(SENDER, 5003, 2, SEASON, "قدیمی") is True
+    assert add_transaction(SENDER, 5003, 1000, SEASON, "قدیمی") is False
+
+    # فشار همزمان: 300 درخواست (هر کلید سه بار) با موجودی باقیمانده 35
+    requests = [
+        (RECEIVERS[i % 3], 1 + i % 3, make_idempotency_key(SENDER, f"s{i}"))
+        for i in range(100)
+    ] * 3
+    results = asyncio.run(_hammer(requests))
+
+    statuses = [r.status for r in results]
+    assert statuses.count(TRANSFER_OK) > 0
+    assert statuses.count(TRANSFER_DUPLICATE) > 0
+    assert statuses.count(TRANSFER_INSUFFICIENT_BALANCE) > 0
+    assert all(s in (TRANSFER_OK, TRANSFER_DUPLICATE, TRANSFER_INSUFFICIENT_BALANCE) for s in statuses)
+
+    balance = execute_db_query("SELECT balance FROM users WHERE user_id = ?", (SENDER,), fetchone=True)[0]
+    spent, keys, distinct_keys = execute_db_query("""
+        SELECT SUM(amount), COUNT(idempotency_key), COUNT(DISTINCT idempotency_key)
+        FROM transactions WHERE user_id = ? AND season_id = ?
+    """, (SENDER, SEASON), fetchone=True)
+    # هیچ اعتباری بیش از موجودی خرج نشده و هر کسر دقیقاً یک تراکنش دارد
+    assert balance >= 0
+    assert spent + balance == START_BALANCE
+    assert keys == distinct_keys
+    assert statuses.count(TRANSFER_OK) == keys - 1
+    assert season_totals.get_user_totals(SENDER, SEASON)[1] == spent
+
+    print(f"نتیجه فشار همزمان: {statuses.count(TRANSFER_OK)} موفق، "
+          f"{statuses.count(TRANSFER_DUPLICATE)} تکراری، "
+          f"{statuses.count(TRANSFER_INSUFFICIENT_BALANCE)} اعتبار ناکافی؛ موجودی نهایی {balance}")
+    print("✅ تست انتقال اتمیک امتیاز موفق بود")
+
+
+if __name__ == "__main__":
+    test_transfer_kudos()
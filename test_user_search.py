@@ -0,0 +1,78 @@
+"""
+تست ایندکس جستجوی کاربران: نرمال‌سازی فارسی/عربی، جستجوی پیشوندی و n-gram
+"""
+import os
+import time
+import tempfile
+
+import config
+
+# دیتابیس موقت پیش از import ماژول‌های دیتابیس
+config.DB_PATH = os.path.join(tempfile.mkdtemp(), "user_search_test.db")
+
+
+def test_user_search_index():
+    from src.database.migrator import ensure_schema
+    from src.database.db_utils import execute_db_query
+    from src.database.user_functions import search_users
+    from src.services import user_search
+
+    ensure_schema()
+    users = [
+        (1001, "علی رضایی", "ali_r"),
+        (1002, "مهدي كريمي", None),            # ی و ک عربی
+        (1003, "زهرا  محمدی", "zahra"),         # فاصله اضافی
+        (1004, "محمد\u200cرضا کاظمی", "mreza"),  # نیم‌فاصله
+        (1005, "رضا علوی", None),
+    ]
+    for user_id, name, username in users:
+        execute_db_query(
+            "INSERT INTO users (user_id, name, username) VALUES (?, ?, ?)",
+            (user_id, name, username), commit=True
+        )
+    user_search.invalidate()
+
+    assert user_search.normalize(" مهدي  كريمي ") == "مهدی کریمی"
+    assert user_search.normalize("محمد\u200cرضا") == "محمدرضا"
+
+    loads = user_search.get_stats()["loads"]
+
+    # حروف عربی و فارسی یکسان در نظر گرفته می‌شوند
+    assert [u[0] for u in user_search.search("کریمی")] == [1002]
+    assert [u[0] for u in user_search.search("مهدي")] == [1002]
+    # نیم‌فاصله و فاصله‌های اضافی
+    assert [u[0] for u in user_search.search("محمدرضا")] == [1004]
+    assert [u[0] for u in user_search.search("زهرا محمدی")] == [1003]
+    # جستجو با نام کاربری
+    assert user_search.search("@ali") == [(1001, "علی رضایی", "ali_r")]
+    # ابتدا تطبیق‌های پیشوندی (رضا علوی)، سپس تطبیق در میانه نام
+    assert [u[0] for u in user_search.search("رضا")] == [1005, 1001, 1004]
+    assert [u[0] for u in user_search.search("رضا", exclude_id=1005)] == [1001, 1004]
+    assert len(user_search.search("ی", limit=2)) == 2
+    assert user_search.search("ناموجود") == []
+    # تابع قبلی هم از همان ایندکس استفاده می‌کند
+    assert [u[0] for u in search_users("علوی")] == [1005]
+
+    # همه جستجوها فقط یک بار به دیتابیس رفته‌اند
+    assert user_search.get_stats()["loads"] - loads == 1
+
+    # کاربر جدید پس از invalidate پیدا می‌شود
+    execute_db_query(
+        "INSERT INTO users (user_id, name, username) VALUES (?, ?, ?)",
+        (1006, "سارا رضوی", None), commit=True
+    )
+    assert user_search.search("سارا") == []
+    user_search.invalidate()
+    assert [u[0] for u in user_search.search("سارا")] == [1006]
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        user_search.search("رضا", exclude_id=1001)
+    per_search = (time.perf_counter() - start) / 1000 * 1e6
+    print(f"میانگین زمان هر جستجو: {per_search:.1f} میکروثانیه")
+    print(f"آمار ایندکس جستجو: {user_search.get_stats()}")
+    print("✅ تست ایندکس جستجوی کاربران موفق بود")
+
+
+if __name__ == "__main__":
+    test_user_search_index()
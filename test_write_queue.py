@@ -0,0 +1,98 @@
+"""
+تست صف نوشتن با commit گروهی: دسته‌بندی، جداسازی خطای هر عملیات با SAVEPOINT و آمار
+"""
+import os
+import time
+import asyncio
+import tempfile
+import threading
+
+import config
+
+# دیتابیس موقت پیش از import ماژول‌های دیتابیس
+config.DB_PATH = os.path.join(tempfile.mkdtemp(), "write_queue_test.db")
+
+
+def _insert_setting(conn, key, value):
+    conn.execute("INSERT INTO settings (key, value) VALUES (?, ?)", (key, value))
+    return key
+
+
+def _slow_insert(conn, key):
+    # دسته را به اندازه کافی نگه می‌دارد تا عملیات بعدی در صف جمع شوند
+    time.sleep(0.05)
+    return _insert_setting(conn, key, "slow")
+
+
+def test_write_queue():
+    from src.database.migrator import ensure_schema
+    from src.database.db_utils import execute_db_query
+    from src.database import write_queue
+    from src.database.write_queue import WriteQueue
+
+    ensure_schema()
+    queue = WriteQueue(max_ops=50, max_delay=0.005)
+
+    # عملیات همزمان از چند ترد در دسته‌های کمتر از تعداد عملیات commit می‌شوند
+    first = queue.submit(_slow_insert, "wq_slow")
+    futures = []
+
+    def producer(n):
+        for i in range(25):
+            futures.append(queue.submit(_insert_setting, f"wq_{n}_{i}", str(i)))
+
+    threads = [threading.Thread(target=producer, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert first.result(timeout=10) == "wq_slow"
+    assert sorted(f.result(timeout=10) for f in futures) == sorted(
+        f"wq_{n}_{i}" for n in range(8) for i in range(25)
+    )
+    stats = queue.get_stats()
+    assert stats["committed"] == 201 and stats["failed"] == 0
+    assert stats["batches"] < 201 and 1 < stats["max_batch"] <= 50
+    assert stats["queue_depth"] == 0 and stats["commit_ms_max"] > 0
+
+    # خطای یک عملیات فقط همان عملیات را برمی‌گرداند
+    ok = queue.submit(_insert_setting, "wq_ok", "1")
+    duplicate = queue.submit(_insert_setting, "wq_ok", "2")
+    after = queue.submit(_insert_setting, "wq_after", "3")
+    assert ok.result(timeout=10) == "wq_ok" and after.result(timeout=10) == "wq_after"
+    try:
+        duplicate.result(timeout=10)
+        assert False, "درج تکراری باید شکست بخورد"
+    except Exception as e:
+        assert "UNIQUE" in str(e)
+    row = execute_db_query("SELECT value FROM settings WHERE key = 'wq_ok'", fetchone=True)
+    assert row[0] == "1"
+    assert queue.get_stats()["failed"] == 1
+
+    # عملیات لغو شده پیش از اجرا نادیده گرفته می‌شود و ترد نویسنده از کار نمی‌افتد
+    blocker = queue.submit(_slow_insert, "wq_blocker")
+    cancelled = queue.submit(_insert_setting, "wq_cancelled", "1")
+    assert cancelled.cancel()
+    assert blocker.result(timeout=10) == "wq_blocker"
+    assert queue.submit(_insert_setting, "wq_alive", "1").result(timeout=10) == "wq_alive"
+    assert execute_db_query("SELECT 1 FROM settings WHERE key = 'wq_cancelled'", fetchone=True) is None
+
+    queue.stop()
+    try:
+        queue.submit(_insert_setting, "wq_stopped", "1")
+        assert False, "صف متوقف شده نباید عملیات بپذیرد"
+    except RuntimeError:
+        pass
+
+    # رابط‌های صف پیش‌فرض: execute همانند execute_db_query با commit=True
+    assert write_queue.execute("INSERT INTO settings (key, value) VALUES ('wq_default', 'x')") is True
+    assert write_queue.execute("INSERT INTO settings (key, value) VALUES ('wq_default', 'y')") is None
+    assert asyncio.run(write_queue.run_async(_insert_setting, "wq_async", "1")) == "wq_async"
+    assert write_queue.get_stats()["committed"] >= 2
+
+    print(f"آمار صف نوشتن: {stats}")
+    print("✅ تست صف نوشتن با commit گروهی موفق بود")
+
+
+if __name__ == "__main__":
+    test_write_queue()